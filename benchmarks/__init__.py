@@ -0,0 +1 @@
+"""Benchmarks de bout en bout du pipeline (LLM, API amont et Google simulés)"""
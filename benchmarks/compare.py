@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compare deux fichiers de résultats de benchmarks.run
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json --threshold 0.1
+
+Code de sortie 1 si une latence médiane (totale ou par nœud) ou le RSS de
+crête régresse de plus du seuil, ou si les appels API augmentent.
+"""
+
+import sys
+import json
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+
+def _index(report: Dict[str, Any]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    return {(result["scenario"], result["rows"]): result for result in report["results"]}
+
+def _metrics(result: Dict[str, Any]) -> Dict[str, float]:
+    metrics = {"total_ms": result["total"]["median_ms"], "peak_rss_mb": result["peak_rss_mb"]}
+    for step, stats in result.get("nodes", {}).items():
+        metrics[f"{step}_ms"] = stats["median_ms"]
+    metrics["upstream_calls"] = result.get("upstream_calls", 0)
+    metrics["google_calls"] = sum(result.get("google_calls", {}).values())
+    if "llm_output_tokens_per_call" in result:
+        metrics["llm_input_tokens"] = result["llm_input_tokens_per_call"]
+        metrics["llm_output_tokens"] = result["llm_output_tokens_per_call"]
+    return metrics
+
+# Les petites durées sont bruitées: pas de régression sous ce plancher (ms)
+MIN_SIGNIFICANT_MS = 5.0
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Lignes de comparaison (une par métrique et par scénario commun)"""
+    rows = []
+    base_index, cand_index = _index(baseline), _index(candidate)
+    for key in sorted(set(base_index) & set(cand_index)):
+        if base_index[key].get("error") or cand_index[key].get("error"):
+            continue
+        before, after = _metrics(base_index[key]), _metrics(cand_index[key])
+        for metric in sorted(set(before) & set(after)):
+            old, new = before[metric], after[metric]
+            change = (new - old) / old if old else 0.0
+            if metric.endswith("_calls"):
+                regression = new > old
+            elif metric.endswith("_ms"):
+                regression = change > threshold and new - old > MIN_SIGNIFICANT_MS
+            else:
+                regression = change > threshold
+            rows.append({
+                "scenario": key[0], "rows": key[1], "metric": metric,
+                "before": old, "after": new, "change": change, "regression": regression,
+            })
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Point d'entrée CLI : compare deux fichiers de résultats"""
+    parser = argparse.ArgumentParser(description="Compare deux résultats de benchmark")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Régression relative tolérée (0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        flag = "❌" if row["regression"] else "  "
+        print(f"{flag} {row['scenario']:<10} {row['rows']:>8} {row['metric']:<18} "
+              f"{row['before']:>12.1f} -> {row['after']:>12.1f} ({row['change']:+.1%})")
+
+    regressions = [row for row in rows if row["regression"]]
+    print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Modèle de chat déterministe pour les benchmarks
+
+Retourne, pour chaque requête utilisateur connue, les paramètres fixés par
+le scénario (sinon les paramètres de repli de l'agent), après une latence
+simulée optionnelle. Aucun appel réseau. Lié à un outil (`bind_tools`), il
+répond par un appel d'outil comme un modèle en sortie structurée (une entrée
+par ligne numérotée pour le prompt multi-requêtes); sinon par un JSON en
+contenu. L'usage de tokens est estimé (~4 caractères par token).
+"""
+
+import re
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+_NUMBERED_LINE = re.compile(r"^\d+\. (.+)$", re.MULTILINE)
+
+class FakeChatModel(BaseChatModel):
+    """Chat model hors ligne: requête -> paramètres prédéfinis"""
+
+    responses: Dict[str, Dict[str, Any]] = {}
+    latency: float = 0.0
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark-chat"
+
+    def bind_tools(self, tools: Sequence[Any], tool_choice: Optional[str] = None, **kwargs: Any) -> Any:
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _response_for(self, prompt: str) -> Dict[str, Any]:
+        for query, params in self.responses.items():
+            if query in prompt:
+                return params
+        from agent.graph import create_fallback_params
+        return create_fallback_params(prompt)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = "\n".join(str(message.content) for message in messages)
+        name = tools[0]["function"]["name"] if tools else None
+        if name == "QueryParamsBatch":
+            # Prompt multi-requêtes (micro-batching): une ligne numérotée par requête
+            params = {"items": [self._response_for(query) for query in _NUMBERED_LINE.findall(prompt)]}
+        else:
+            params = self._response_for(prompt)
+        output = json.dumps(params, ensure_ascii=False)
+        # Le schéma des outils est envoyé au modèle: il compte en entrée
+        input_chars = len(prompt) + (len(json.dumps(tools, ensure_ascii=False)) if tools else 0)
+        usage = {
+            "input_tokens": input_chars // 4,
+            "output_tokens": len(output) // 4,
+            "total_tokens": (input_chars + len(output)) // 4,
+        }
+        self.input_tokens += usage["input_tokens"]
+        self.output_tokens += usage["output_tokens"]
+
+        if tools:
+            message = AIMessage(content="", tool_calls=[{"name": name, "args": params, "id": f"call_{self.calls}"}],
+                                usage_metadata=usage)
+        else:
+            message = AIMessage(content=output, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de l'analyse lexicale des requêtes
+
+Compare, sur un vocabulaire synthétique (500 synonymes de champs, dont des
+expressions de plusieurs mots) et 10k requêtes:
+
+- `substring`: l'approche historique, un test `f" {kw} " in f" {requête} "`
+  par champ et par mot-clé, puis les mots de restriction, puis `re.findall`;
+- `tokens`: découpage `\\w+` puis lookups dict, une passe par information;
+- `compiled`: `KeywordMatcher` (agent.keyword_matcher), une seule passe.
+
+Usage:
+    python -m benchmarks.keywords
+    python -m benchmarks.keywords --queries 50000 --synonyms 2000 --repeat 5
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+
+from agent.keyword_matcher import KeywordMatcher
+
+RESTRICTION_KEYWORDS = ["avec", "seulement", "uniquement", "juste"]
+FILLER = ["récupère", "donne", "moi", "les", "des", "pour", "le", "la", "export", "tableau", "de", "et"]
+
+# =============================================================================
+# JEU DE DONNÉES
+# =============================================================================
+
+def build_vocabulary(synonyms: int, fields: int = 50, multi_word_ratio: float = 0.2, seed: int = 0) -> Dict[str, List[str]]:
+    """champ -> synonymes (dont ~20% d'expressions de deux mots)"""
+    rng = random.Random(seed)
+    vocabulary: Dict[str, List[str]] = {f"field{i}": [] for i in range(fields)}
+    names = list(vocabulary)
+    for i in range(synonyms):
+        field = names[i % fields]
+        if rng.random() < multi_word_ratio:
+            vocabulary[field].append(f"terme{i} composé{i}")
+        else:
+            vocabulary[field].append(f"mot{i}")
+    return vocabulary
+
+def build_queries(vocabulary: Dict[str, List[str]], count: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    keywords = [keyword for synonyms in vocabulary.values() for keyword in synonyms]
+    queries = []
+    for _ in range(count):
+        words = rng.sample(FILLER, 5) + rng.sample(keywords, rng.randint(1, 4))
+        words.append(str(rng.randint(1, 500)))
+        if rng.random() < 0.5:
+            words.append(rng.choice(RESTRICTION_KEYWORDS))
+        rng.shuffle(words)
+        queries.append(" ".join(words))
+    return queries
+
+# =============================================================================
+# IMPLÉMENTATIONS COMPARÉES
+# =============================================================================
+
+Result = Tuple[Optional[int], List[str], bool]
+
+def substring_matcher(vocabulary: Dict[str, List[str]]) -> Any:
+    def match(query: str) -> Result:
+        query_lower = f" {query.lower()} "
+        fields = [field for field, synonyms in vocabulary.items()
+                  if any(f" {keyword} " in query_lower for keyword in synonyms)]
+        restriction = any(f" {keyword} " in query_lower for keyword in RESTRICTION_KEYWORDS)
+        numbers = re.findall(r"\b(\d+)\b", query)
+        return (int(numbers[0]) if numbers else None), fields, restriction
+    return match
+
+def token_matcher(vocabulary: Dict[str, List[str]]) -> Any:
+    index = {keyword: field for field, synonyms in vocabulary.items() for keyword in synonyms}
+    restriction_set = frozenset(RESTRICTION_KEYWORDS)
+    token_pattern = re.compile(r"\w+")
+    order = {field: i for i, field in enumerate(vocabulary)}
+
+    def match(query: str) -> Result:
+        lowered = query.lower()
+        tokens = token_pattern.findall(lowered)
+        # Les expressions multi-mots exigent un second balayage
+        found = {index[token] for token in tokens if token in index}
+        found.update(field for keyword, field in index.items() if " " in keyword and keyword in lowered)
+        numbers = re.findall(r"\b(\d+)\b", query)
+        return (int(numbers[0]) if numbers else None), sorted(found, key=order.get), not restriction_set.isdisjoint(tokens)
+    return match
+
+def compiled_matcher(vocabulary: Dict[str, List[str]]) -> Any:
+    index = {keyword: field for field, synonyms in vocabulary.items() for keyword in synonyms}
+    matcher = KeywordMatcher(index, {"restriction": RESTRICTION_KEYWORDS})
+    order = {field: i for i, field in enumerate(vocabulary)}
+
+    def match(query: str) -> Result:
+        scan = matcher.scan(query)
+        found = {index[token] for token in scan.tokens if token in index}
+        return scan.first_number(), sorted(found, key=order.get), scan.has("restriction")
+    return match
+
+MATCHERS = {
+    "substring": substring_matcher,
+    "tokens": token_matcher,
+    "compiled": compiled_matcher,
+}
+
+# =============================================================================
+# EXÉCUTION
+# =============================================================================
+
+def run(queries: int = 10000, synonyms: int = 500, repeat: int = 3) -> Dict[str, Any]:
+    """Temps par implémentation (meilleur de `repeat`), résultats vérifiés identiques"""
+    vocabulary = build_vocabulary(synonyms)
+    workload = build_queries(vocabulary, queries)
+    results: Dict[str, Any] = {}
+    reference: Optional[List[Result]] = None
+
+    for name, factory in MATCHERS.items():
+        build_started = time.perf_counter()
+        match = factory(vocabulary)
+        build_seconds = time.perf_counter() - build_started
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            outputs = [match(query) for query in workload]
+            timings.append(time.perf_counter() - started)
+
+        if reference is None:
+            reference = outputs
+        elif outputs != reference:
+            raise AssertionError(f"Résultats divergents pour {name}")
+
+        best = min(timings)
+        results[name] = {
+            "build_ms": round(build_seconds * 1000, 3),
+            "total_ms": round(best * 1000, 3),
+            "us_per_query": round(best / queries * 1e6, 3),
+            "queries_per_second": round(queries / best) if best else 0,
+        }
+
+    return {"queries": queries, "synonyms": synonyms, "repeat": repeat, "results": results}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark de l'analyse lexicale des requêtes")
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--synonyms", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.queries, args.synonyms, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"{report['queries']} requêtes, {report['synonyms']} synonymes (meilleur de {report['repeat']})")
+    for name, stats in report["results"].items():
+        print(f"  {name:<10} {stats['total_ms']:>9.1f} ms  {stats['us_per_query']:>8.2f} µs/requête  "
+              f"(construction {stats['build_ms']:.1f} ms)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
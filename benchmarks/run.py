@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Benchmark de bout en bout du graphe (parse -> fetch -> process -> aggregate
+-> create_sheet | write_file -> respond)
+
+Le processus parent démarre une API amont locale (benchmarks.upstream) et le
+faux serveur Google (agent.fake_google), puis exécute chaque scénario dans un
+processus enfant isolé (RSS de crête propre à l'agent) avec un modèle de chat
+déterministe. Résultats: latence par nœud, RSS de crête, appels API amont et
+Google, lignes/s, en JSON comparable entre commits (benchmarks.compare).
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios export aggregate --sizes 100 100000 1000000 --repeat 3
+    python -m benchmarks.run --google-latency 0.05 --output benchmarks/results/ma_branche.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+
+# Nœuds du graphe -> étapes rapportées
+NODE_STEPS = {
+    "prefetch": "prefetch",
+    "parse_query": "parse",
+    "fetch_data": "fetch",
+    "process_data": "process",
+    "aggregate": "aggregate",
+    "create_sheet": "create_sheet",
+    "write_file": "write_file",
+    "respond": "respond",
+}
+
+# =============================================================================
+# PROCESSUS ENFANT: EXÉCUTION DU GRAPHE
+# =============================================================================
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 3),
+        "p95_ms": round(_percentile(values, 0.95) * 1000, 3),
+        "min_ms": round(min(values) * 1000, 3),
+    }
+
+def run_child(scenario: Dict[str, Any], repeat: int, llm_latency: float) -> Dict[str, Any]:
+    """Exécute un scénario `repeat` fois dans ce processus (appelé dans l'enfant)"""
+    from langchain_core.messages import HumanMessage
+
+    from agent import graph as agent_graph
+    from agent.blobs import row_count, release_rows
+    from benchmarks.fake_llm import FakeChatModel
+
+    llm = FakeChatModel(responses={scenario["query"]: scenario["llm_response"]}, latency=llm_latency)
+    agent_graph.llm = llm
+
+    node_times: Dict[str, List[float]] = {step: [] for step in NODE_STEPS.values()}
+    totals: List[float] = []
+    rows_exported = rows_fetched = 0
+    error = ""
+
+    for run in range(repeat):
+        state = agent_graph.get_initial_state()
+        state["messages"] = [HumanMessage(content=scenario["query"])]
+        # CHECKPOINT_ENABLED=true: coût des checkpoints inclus dans chaque nœud
+        stream_options: Dict[str, Any] = {}
+        if agent_graph.checkpointer is not None:
+            stream_options = {"config": {"configurable": {"thread_id": f"bench_{os.getpid()}_{run}"}},
+                              "durability": "sync"}
+
+        started = previous = time.perf_counter()
+        final: Dict[str, Any] = {}
+        for update in agent_graph.graph.stream(state, stream_mode="updates", **stream_options):
+            now = time.perf_counter()
+            for node, node_state in update.items():
+                node_times[NODE_STEPS.get(node, node)].append(now - previous)
+                if node_state:
+                    if node == "fetch_data":
+                        rows_fetched = row_count(node_state.get("api_data"))
+                    final.update(node_state)
+            previous = now
+        totals.append(time.perf_counter() - started)
+
+        error = final.get("error") or ""
+        rows_exported = row_count(final.get("processed_data"))
+        release_rows(final.get("processed_data"))
+
+    # ru_maxrss: kilo-octets sous Linux, octets sous macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+    total_median = statistics.median(totals)
+    return {
+        "error": error,
+        "rows_fetched": rows_fetched,
+        "rows_exported": rows_exported,
+        "total": _summary(totals),
+        "nodes": {step: _summary(times) for step, times in node_times.items() if times},
+        "rows_per_second": round(rows_fetched / total_median, 1) if total_median > 0 else 0.0,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "llm_calls": llm.calls,
+        "llm_input_tokens_per_call": llm.input_tokens // max(1, llm.calls),
+        "llm_output_tokens_per_call": llm.output_tokens // max(1, llm.calls),
+    }
+
+# =============================================================================
+# PROCESSUS PARENT: SERVEURS ET ORCHESTRATION
+# =============================================================================
+
+def _child_env(upstream_url: str, google_url: str, rows: int, tmp_dir: Path, google_quota: float) -> Dict[str, str]:
+    env = dict(os.environ)
+    for key in ("OPENAI_API_KEY", "LANGSMITH_API_KEY", "LANGCHAIN_API_KEY"):
+        env.pop(key, None)
+    env.update({
+        "API_BASE_URL": upstream_url,
+        "DEFAULT_API_URL": f"{upstream_url}/posts",
+        "GOOGLE_API_ENDPOINT": google_url,
+        "GOOGLE_PERSONAL_EMAIL": "bench@example.com",
+        "GOOGLE_READ_REQUESTS_PER_MINUTE": str(google_quota),
+        "GOOGLE_WRITE_REQUESTS_PER_MINUTE": str(google_quota),
+        "LANGCHAIN_TRACING_V2": "false",
+        "MAX_LIMIT": str(max(rows, 100)),
+        "RESPONSE_CACHE_MAX_ENTRIES": "0",
+        "RETENTION_DB_PATH": str(tmp_dir / "retention.sqlite3"),
+        "RETENTION_GC_INTERVAL": "0",
+        "CHECKPOINT_DB_PATH": str(tmp_dir / "checkpoints.sqlite3"),
+        "DEBUG": "false",
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), str(REPO_ROOT / "src"), env.get("PYTHONPATH")])),
+    })
+    return env
+
+def run_scenario(
+    scenario: Dict[str, Any],
+    upstream: Any,
+    google: Any,
+    repeat: int,
+    llm_latency: float,
+    tmp_dir: Path,
+    google_quota: float,
+) -> Dict[str, Any]:
+    """Exécute un scénario dans un processus enfant et ajoute les compteurs serveurs"""
+    upstream.set_rows(scenario["rows"])
+    upstream.reset_stats()
+    google.reset_stats()
+
+    command = [
+        sys.executable, "-m", "benchmarks.run", "--child",
+        "--scenario-json", json.dumps(scenario),
+        "--repeat", str(repeat),
+        "--llm-latency", str(llm_latency),
+    ]
+    completed = subprocess.run(
+        command,
+        cwd=REPO_ROOT,
+        env=_child_env(upstream.url, google.url, scenario["rows"], tmp_dir, google_quota),
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1:] or ["échec du processus enfant"]}
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["upstream_calls"] = round(sum(upstream.calls.values()) / repeat, 1)
+    result["upstream_bytes"] = round(upstream.bytes_sent / repeat)
+    result["google_calls"] = {name: round(count / repeat, 1) for name, count in sorted(google.calls.items())}
+    result["google_quota_errors"] = google.quota_errors
+    return result
+
+def environment_info() -> Dict[str, Any]:
+    """Contexte d'exécution (pour comparer des résultats comparables)"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Point d'entrée en ligne de commande"""
+    from benchmarks.scenarios import SCENARIOS, DEFAULT_SIZES, build_scenario
+
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout du graphe")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Tailles du jeu amont (lignes)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Latence simulée du LLM (secondes)")
+    parser.add_argument("--google-latency", type=float, default=0.0, help="Latence du faux serveur Google (secondes)")
+    parser.add_argument("--google-quota", type=float, default=1e6, help="Quota Google du limiteur client (requêtes/min)")
+    parser.add_argument("--output", default=None, help="Fichier JSON de résultats (défaut: benchmarks/results/<commit>.json)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--scenario-json", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        # Le graphe imprime sa configuration au chargement: stdout réservé au JSON
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        result = run_child(json.loads(args.scenario_json), args.repeat, args.llm_latency)
+        sys.stdout = stdout
+        print(json.dumps(result))
+        return 0
+
+    import tempfile
+    from agent.fake_google import FakeGoogleServer
+    from benchmarks.upstream import UpstreamServer
+
+    results: List[Dict[str, Any]] = []
+    with UpstreamServer() as upstream, FakeGoogleServer(latency=args.google_latency, seed=0) as google, \
+            tempfile.TemporaryDirectory() as tmp:
+        for name in args.scenarios:
+            for rows in args.sizes:
+                scenario = build_scenario(name, rows)
+                print(f"⏱️  {name} ({rows} lignes)...", file=sys.stderr, flush=True)
+                result = run_scenario(scenario, upstream, google, args.repeat, args.llm_latency, Path(tmp), args.google_quota)
+                results.append({"scenario": name, "rows": rows, **result})
+                if result.get("error"):
+                    print(f"   ❌ {result['error']}", file=sys.stderr)
+                else:
+                    nodes = ", ".join(f"{step} {stats['median_ms']:.0f}ms" for step, stats in result["nodes"].items())
+                    print(
+                        f"   ✅ {result['total']['median_ms']:.0f}ms ({nodes}) | "
+                        f"{result['rows_per_second']:.0f} lignes/s | RSS {result['peak_rss_mb']:.0f} MB | "
+                        f"{result['upstream_calls']:.0f} appels amont, {sum(result['google_calls'].values()):.0f} appels Google",
+                        file=sys.stderr,
+                    )
+
+    report = {
+        "environment": environment_info(),
+        "settings": {
+            "repeat": args.repeat,
+            "llm_latency": args.llm_latency,
+            "google_latency": args.google_latency,
+            "google_quota": args.google_quota,
+        },
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{report['environment']['commit'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"📄 Résultats: {output}", file=sys.stderr)
+    return 1 if any(result.get("error") for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
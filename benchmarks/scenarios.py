@@ -0,0 +1,40 @@
+"""
+Scénarios de benchmark: requête utilisateur, réponse du LLM simulé, volume amont
+"""
+
+from typing import Dict, Any, List
+
+def _params(source: str, limit: int, fields: List[str], **extra: Any) -> Dict[str, Any]:
+    params = {
+        "source": source,
+        "limit": limit,
+        "fields": fields,
+        "filters": {},
+        "joins": [],
+        "aggregate": None,
+        "description": f"Benchmark {source}",
+    }
+    params.update(extra)
+    return params
+
+def build_scenario(name: str, rows: int) -> Dict[str, Any]:
+    """Scénario `name` pour un jeu amont de `rows` lignes"""
+    if name == "export":
+        query = f"récupère {rows} posts avec id, title et userId"
+        params = _params("posts", rows, ["id", "title", "userId"])
+    elif name == "join":
+        query = f"récupère {rows} posts avec title et le nom de l'auteur"
+        params = _params("posts", rows, ["id", "title"], joins=[{"source": "users", "fields": ["name"]}])
+    elif name == "aggregate":
+        query = "nombre de posts par userId"
+        params = _params("posts", rows, ["userId"], aggregate={
+            "group_by": ["userId"],
+            "metrics": [{"op": "count", "field": None}],
+        })
+    else:
+        raise ValueError(f"Scénario inconnu: {name}")
+
+    return {"name": name, "rows": rows, "query": query, "llm_response": params}
+
+SCENARIOS = ["export", "join", "aggregate"]
+DEFAULT_SIZES = [100, 10_000]
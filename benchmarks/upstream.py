@@ -0,0 +1,169 @@
+"""
+API amont locale (façon JSONPlaceholder) à volume configurable
+
+Les lignes sont générées à la demande à partir de leur index: un jeu de
+1M posts ne coûte pas 1M dictionnaires en mémoire. Supporte les paramètres
+`_start`/`_limit`, `_page`/`_limit` et les filtres d'égalité.
+"""
+
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Callable, Iterator, Optional
+from urllib.parse import urlsplit, parse_qs
+
+USERS = 10
+
+def _post(i: int) -> Dict[str, Any]:
+    return {"userId": i % USERS + 1, "id": i + 1, "title": f"post {i + 1}", "body": f"contenu du post {i + 1} " * 4}
+
+def _user(i: int) -> Dict[str, Any]:
+    return {
+        "id": i + 1,
+        "name": f"Utilisateur {i + 1}",
+        "username": f"user{i + 1}",
+        "email": f"user{i + 1}@example.com",
+        "phone": f"01 02 03 04 {i + 1:02d}",
+        "website": f"user{i + 1}.example.com",
+    }
+
+def _comment(i: int) -> Dict[str, Any]:
+    return {"postId": i // 5 + 1, "id": i + 1, "name": f"commentaire {i + 1}", "email": f"c{i + 1}@example.com", "body": "ok"}
+
+def _todo(i: int) -> Dict[str, Any]:
+    return {"userId": i % USERS + 1, "id": i + 1, "title": f"tâche {i + 1}", "completed": i % 3 == 0}
+
+def _album(i: int) -> Dict[str, Any]:
+    return {"userId": i % USERS + 1, "id": i + 1, "title": f"album {i + 1}"}
+
+def _photo(i: int) -> Dict[str, Any]:
+    return {"albumId": i // 50 + 1, "id": i + 1, "title": f"photo {i + 1}", "url": f"https://img/{i + 1}", "thumbnailUrl": f"https://img/t/{i + 1}"}
+
+GENERATORS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "posts": _post,
+    "users": _user,
+    "comments": _comment,
+    "todos": _todo,
+    "albums": _album,
+    "photos": _photo,
+}
+
+class UpstreamServer:
+    """Serveur HTTP local des ressources générées"""
+
+    def __init__(self, rows: int = 100, host: str = "127.0.0.1", port: int = 0, sizes: Optional[Dict[str, int]] = None):
+        self.sizes = {name: rows for name in GENERATORS}
+        self.sizes["users"] = USERS
+        self.sizes.update(sizes or {})
+        self.calls: Counter = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL de base du serveur"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_rows(self, rows: int) -> None:
+        """Fixe le nombre de lignes de chaque ressource (hors users)"""
+        for name in GENERATORS:
+            if name != "users":
+                self.sizes[name] = rows
+
+    def reset_stats(self) -> None:
+        """Remet à zéro les compteurs d'appels et d'octets"""
+        with self._lock:
+            self.calls.clear()
+            self.bytes_sent = 0
+
+    def start(self) -> "UpstreamServer":
+        """Démarre le serveur dans un thread daemon"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="bench-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Arrête le serveur et libère le port"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "UpstreamServer":
+        """Démarre le serveur à l'entrée du bloc with"""
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        """Arrête le serveur à la sortie du bloc with"""
+        self.stop()
+
+    def _rows(self, resource: str, filters: Dict[str, str]) -> Iterator[Dict[str, Any]]:
+        generate = GENERATORS[resource]
+        for i in range(self.sizes[resource]):
+            row = generate(i)
+            if all(str(row.get(key)).lower() == value.lower() for key, value in filters.items()):
+                yield row
+
+    def respond(self, target: str) -> Optional[bytes]:
+        """Construit la réponse JSON d'une cible, None si la ressource est inconnue"""
+        split = urlsplit(target)
+        parts = [part for part in split.path.split("/") if part]
+        if not parts or parts[0] not in GENERATORS:
+            return None
+        resource = parts[0]
+        params = {key: values[-1] for key, values in parse_qs(split.query).items()}
+        with self._lock:
+            self.calls[resource] += 1
+
+        if len(parts) == 2:
+            index = int(parts[1]) - 1
+            if not 0 <= index < self.sizes[resource]:
+                return None
+            return json.dumps(GENERATORS[resource](index)).encode("utf-8")
+
+        limit = int(params.pop("_limit", 0)) or None
+        start = int(params.pop("_start", 0))
+        page = params.pop("_page", None)
+        if page is not None and limit:
+            start = (int(page) - 1) * limit
+
+        if not params:
+            # Sans filtre: accès direct à la tranche demandée
+            end = self.sizes[resource] if limit is None else min(self.sizes[resource], start + limit)
+            generate = GENERATORS[resource]
+            return json.dumps([generate(i) for i in range(start, end)]).encode("utf-8")
+
+        selected = []
+        for position, row in enumerate(self._rows(resource, params)):
+            if position < start:
+                continue
+            if limit is not None and len(selected) >= limit:
+                break
+            selected.append(row)
+        return json.dumps(selected).encode("utf-8")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                payload = server.respond(self.path)
+                status = 200 if payload is not None else 404
+                payload = payload if payload is not None else b"{}"
+                with server._lock:
+                    server.bytes_sent += len(payload)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
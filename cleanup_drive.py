@@ -1,21 +1,52 @@
 #!/usr/bin/env python3
 """
 Script pour nettoyer le Google Drive d'un compte de service
+Usage:
+    python cleanup_drive.py                          # menu interactif
+    python cleanup_drive.py --pattern API_Data --yes # mode non interactif (cron)
+    python cleanup_drive.py --older-than 7 --yes
+    python cleanup_drive.py --quick --empty-trash
 """
 
 import os
+import sys
+import argparse
 from pathlib import Path
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 
+# Limiteur de débit Google partagé avec l'agent (priorité basse pour le nettoyage)
+# et moteur de nettoyage (listing paginé, suppressions par batch)
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+from agent.google_quota import google_execute, READ, WRITE, PRIORITY_BACKGROUND
+from agent.drive_cleanup import (
+    DRIVE_BATCH_SIZE,
+    DRIVE_BATCH_WORKERS,
+    list_drive_files,
+    batch_delete_files,
+    print_progress,
+)
+from agent.google_endpoint import get_google_endpoint, load_credentials, build_drive_service
+
+# Patterns supprimés par le nettoyage rapide
+QUICK_CLEANUP_PATTERNS = ["MCP", "Test", "Posts", "API_Data"]
+
+# Au-delà, le détail des fichiers trouvés est abrégé
+MAX_LISTED_DETAILS = 50
+
+# Options de suppression par batch (modifiées par la ligne de commande)
+DELETE_OPTIONS = {
+    "service_factory": None,
+    "batch_size": DRIVE_BATCH_SIZE,
+    "max_workers": DRIVE_BATCH_WORKERS,
+}
+
 def setup_drive_service():
     """Configure le service Google Drive"""
     # Chemin vers les credentials
     project_root = Path(__file__).parent
     credentials_path = project_root / "google-credentials.json"
     
-    if not credentials_path.exists():
+    if not credentials_path.exists() and not get_google_endpoint():
         print(f"❌ Fichier credentials non trouvé: {credentials_path}")
         return None
     
@@ -26,11 +57,10 @@ def setup_drive_service():
     ]
     
     try:
-        creds = Credentials.from_service_account_file(
-            str(credentials_path), 
-            scopes=scopes
-        )
-        service = build('drive', 'v3', credentials=creds)
+        creds = load_credentials(str(credentials_path), scopes)
+        service = build_drive_service(creds)
+        # Un client par thread de suppression (httplib2 n'est pas thread-safe)
+        DELETE_OPTIONS["service_factory"] = lambda: build_drive_service(creds)
         print("✅ Service Google Drive configuré")
         return service
     except Exception as e:
@@ -38,16 +68,15 @@ def setup_drive_service():
         return None
 
 def list_all_files(service, max_files=100):
-    """Liste tous les fichiers du Drive"""
+    """Liste tous les fichiers du Drive (None si le listing échoue)"""
     try:
         print(f"\n📋 Listing des fichiers (max {max_files})...")
         
-        results = service.files().list(
-            pageSize=max_files,
-            fields="nextPageToken, files(id, name, createdTime, size, mimeType, trashed)"
-        ).execute()
-        
-        files = results.get('files', [])
+        files = list_drive_files(
+            service,
+            fields="id, name, createdTime, size, mimeType, trashed",
+            max_files=max_files,
+        )
         
         if not files:
             print("📂 Aucun fichier trouvé")
@@ -81,40 +110,72 @@ def list_all_files(service, max_files=100):
         
     except Exception as e:
         print(f"❌ Erreur listing: {e}")
-        return []
+        return None
+
+def print_files_summary(files):
+    """Affiche les fichiers trouvés et retourne leur taille totale (MB)"""
+    total_size = 0
+    for i, file in enumerate(files):
+        size = int(file.get('size', 0))
+        total_size += size
+        if i < MAX_LISTED_DETAILS:
+            name = file['name']
+            size_mb = size / (1024 * 1024) if size > 0 else 0
+            created = file.get('createdTime', 'Inconnue')
+            print(f"  📄 {name[:60]:<60} | {size_mb:6.2f} MB | {created[:10]}")
+    
+    if len(files) > MAX_LISTED_DETAILS:
+        print(f"  ... et {len(files) - MAX_LISTED_DETAILS} autres fichiers")
+    
+    total_mb = total_size / (1024 * 1024)
+    return total_mb
+
+def delete_files(service, files, total_mb=0.0):
+    """Supprime les fichiers par batchs HTTP parallèles et affiche le bilan
+
+    Retourne le nombre de fichiers supprimés, None si des suppressions ont échoué.
+    """
+    report = batch_delete_files(
+        service,
+        [file['id'] for file in files],
+        progress=print_progress,
+        **DELETE_OPTIONS,
+    )
+    
+    names = {file['id']: file['name'] for file in files}
+    for file_id, error in list(report["errors"].items())[:5]:
+        print(f"❌ Erreur suppression {names.get(file_id, file_id)}: {error}")
+    if len(report["errors"]) > 5:
+        print(f"  ... et {len(report['errors']) - 5} autres erreurs")
+    
+    print(f"\n🎉 {report['deleted']}/{len(files)} fichier(s) supprimé(s) "
+          f"en {report['elapsed_seconds']:.1f}s ({report['files_per_second']:.1f} fichiers/s)")
+    print(f"💾 Espace libéré: ~{total_mb:.2f} MB")
+    
+    if report["errors"]:
+        return None
+    return report['deleted']
 
 def delete_files_by_pattern(service, pattern="", confirm=True):
-    """Supprime les fichiers contenant un pattern dans le nom"""
+    """Supprime les fichiers contenant un pattern dans le nom
+
+    Retourne le nombre de fichiers supprimés, None en cas d'erreur (même partielle).
+    """
     try:
         print(f"\n🔍 Recherche fichiers contenant: '{pattern}'")
         
         # Construire la requête
-        query = f"name contains '{pattern}'" if pattern else "trashed=false"
+        escaped = pattern.replace("\\", "\\\\").replace("'", "\\'")
+        query = f"name contains '{escaped}' and trashed=false" if pattern else "trashed=false"
         
-        results = service.files().list(
-            q=query,
-            fields="files(id, name, createdTime, size)"
-        ).execute()
-        
-        files = results.get('files', [])
+        files = list_drive_files(service, query, fields="id, name, createdTime, size")
         
         if not files:
             print(f"📂 Aucun fichier trouvé avec le pattern '{pattern}'")
             return 0
         
         print(f"🎯 {len(files)} fichier(s) trouvé(s) à supprimer:")
-        
-        total_size = 0
-        for file in files:
-            name = file['name']
-            size = int(file.get('size', 0))
-            total_size += size
-            size_mb = size / (1024 * 1024) if size > 0 else 0
-            created = file.get('createdTime', 'Inconnue')
-            
-            print(f"  📄 {name[:60]:<60} | {size_mb:6.2f} MB | {created[:10]}")
-        
-        total_mb = total_size / (1024 * 1024)
+        total_mb = print_files_summary(files)
         print(f"\n💾 Taille totale à libérer: {total_mb:.2f} MB")
         
         if confirm:
@@ -123,59 +184,33 @@ def delete_files_by_pattern(service, pattern="", confirm=True):
                 print("❌ Suppression annulée")
                 return 0
         
-        # Supprimer les fichiers
-        deleted_count = 0
-        for file in files:
-            try:
-                service.files().delete(fileId=file['id']).execute()
-                print(f"✅ Supprimé: {file['name']}")
-                deleted_count += 1
-            except Exception as e:
-                print(f"❌ Erreur suppression {file['name']}: {e}")
-        
-        print(f"\n🎉 {deleted_count}/{len(files)} fichier(s) supprimé(s)")
-        print(f"💾 Espace libéré: ~{total_mb:.2f} MB")
-        
-        return deleted_count
+        return delete_files(service, files, total_mb)
         
     except Exception as e:
         print(f"❌ Erreur suppression: {e}")
-        return 0
+        return None
 
 def delete_old_files(service, days_old=7, confirm=True):
-    """Supprime les fichiers plus anciens que X jours"""
+    """Supprime les fichiers plus anciens que X jours
+
+    Retourne le nombre de fichiers supprimés, None en cas d'erreur (même partielle).
+    """
     try:
         cutoff_date = datetime.now() - timedelta(days=days_old)
         cutoff_str = cutoff_date.isoformat() + 'Z'
         
         print(f"\n🗓️  Recherche fichiers créés avant: {cutoff_date.strftime('%Y-%m-%d %H:%M')}")
         
-        query = f"createdTime < '{cutoff_str}'"
+        query = f"createdTime < '{cutoff_str}' and trashed=false"
         
-        results = service.files().list(
-            q=query,
-            fields="files(id, name, createdTime, size)"
-        ).execute()
-        
-        files = results.get('files', [])
+        files = list_drive_files(service, query, fields="id, name, createdTime, size")
         
         if not files:
             print(f"📂 Aucun fichier trouvé plus ancien que {days_old} jours")
             return 0
         
         print(f"🎯 {len(files)} fichier(s) ancien(s) trouvé(s):")
-        
-        total_size = 0
-        for file in files:
-            name = file['name']
-            size = int(file.get('size', 0))
-            total_size += size
-            size_mb = size / (1024 * 1024) if size > 0 else 0
-            created = file.get('createdTime', 'Inconnue')
-            
-            print(f"  📄 {name[:60]:<60} | {size_mb:6.2f} MB | {created[:10]}")
-        
-        total_mb = total_size / (1024 * 1024)
+        total_mb = print_files_summary(files)
         print(f"\n💾 Taille totale à libérer: {total_mb:.2f} MB")
         
         if confirm:
@@ -184,30 +219,17 @@ def delete_old_files(service, days_old=7, confirm=True):
                 print("❌ Suppression annulée")
                 return 0
         
-        # Supprimer les fichiers
-        deleted_count = 0
-        for file in files:
-            try:
-                service.files().delete(fileId=file['id']).execute()
-                print(f"✅ Supprimé: {file['name']}")
-                deleted_count += 1
-            except Exception as e:
-                print(f"❌ Erreur suppression {file['name']}: {e}")
-        
-        print(f"\n🎉 {deleted_count}/{len(files)} fichier(s) supprimé(s)")
-        print(f"💾 Espace libéré: ~{total_mb:.2f} MB")
-        
-        return deleted_count
+        return delete_files(service, files, total_mb)
         
     except Exception as e:
         print(f"❌ Erreur suppression: {e}")
-        return 0
+        return None
 
 def empty_trash(service):
     """Vide la corbeille"""
     try:
         print("\n🗑️  Vidage de la corbeille...")
-        service.files().emptyTrash().execute()
+        google_execute(service.files().emptyTrash(), kind=WRITE, priority=PRIORITY_BACKGROUND)
         print("✅ Corbeille vidée")
         return True
     except Exception as e:
@@ -215,11 +237,11 @@ def empty_trash(service):
         return False
 
 def get_drive_usage(service):
-    """Affiche l'utilisation du Drive"""
+    """Affiche l'utilisation du Drive (False si la requête échoue)"""
     try:
         print("\n📊 Analyse de l'utilisation du Drive...")
         
-        about = service.about().get(fields="storageQuota").execute()
+        about = google_execute(service.about().get(fields="storageQuota"), kind=READ, priority=PRIORITY_BACKGROUND)
         quota = about.get('storageQuota', {})
         
         limit = int(quota.get('limit', 0))
@@ -243,9 +265,68 @@ def get_drive_usage(service):
                 print("⚠️  Avertissement: Quota à plus de 80%")
         else:
             print("❓ Impossible de récupérer les informations de quota")
+        return True
             
     except Exception as e:
         print(f"❌ Erreur récupération usage: {e}")
+        return False
+
+def quick_cleanup(service):
+    """Nettoyage rapide des fichiers de test MCP (sans confirmation)
+
+    Retourne le nombre de fichiers supprimés, None si une étape a échoué.
+    """
+    print("🚀 Nettoyage rapide des fichiers de test MCP...")
+    deleted = 0
+    failed = False
+    for pattern in QUICK_CLEANUP_PATTERNS:
+        count = delete_files_by_pattern(service, pattern, confirm=False)
+        if count is None:
+            failed = True
+        else:
+            deleted += count
+    if not empty_trash(service):
+        failed = True
+    print(f"🎉 Nettoyage terminé! {deleted} fichier(s) supprimé(s)")
+    return None if failed else deleted
+
+def run_cli(argv=None):
+    """Mode non interactif (cron): retourne le code de sortie"""
+    parser = argparse.ArgumentParser(description="Nettoyage du Google Drive du compte de service")
+    parser.add_argument("--pattern", action="append", default=[], help="Supprimer les fichiers dont le nom contient PATTERN (répétable)")
+    parser.add_argument("--older-than", type=int, metavar="JOURS", help="Supprimer les fichiers plus anciens que JOURS")
+    parser.add_argument("--quick", action="store_true", help="Nettoyage rapide des fichiers de test MCP")
+    parser.add_argument("--empty-trash", action="store_true", help="Vider la corbeille")
+    parser.add_argument("--usage", action="store_true", help="Afficher l'utilisation du Drive")
+    parser.add_argument("--list", action="store_true", help="Lister les fichiers")
+    parser.add_argument("--max-files", type=int, default=100, help="Nombre maximal de fichiers listés avec --list")
+    parser.add_argument("--yes", action="store_true", help="Ne pas demander de confirmation")
+    parser.add_argument("--batch-size", type=int, default=DRIVE_BATCH_SIZE, help="Suppressions par batch HTTP (max 100)")
+    parser.add_argument("--workers", type=int, default=DRIVE_BATCH_WORKERS, help="Batchs exécutés en parallèle")
+    args = parser.parse_args(argv)
+
+    service = setup_drive_service()
+    if not service:
+        return 1
+
+    DELETE_OPTIONS["batch_size"] = args.batch_size
+    DELETE_OPTIONS["max_workers"] = args.workers
+
+    # Chaque étape est exécutée, mais un échec (listing, suppression) donne un code non nul
+    ok = True
+    if args.usage:
+        ok = get_drive_usage(service) and ok
+    if args.list:
+        ok = list_all_files(service, max_files=args.max_files) is not None and ok
+    for pattern in args.pattern:
+        ok = delete_files_by_pattern(service, pattern, confirm=not args.yes) is not None and ok
+    if args.older_than is not None:
+        ok = delete_old_files(service, args.older_than, confirm=not args.yes) is not None and ok
+    if args.quick:
+        ok = quick_cleanup(service) is not None and ok
+    elif args.empty_trash:
+        ok = empty_trash(service) and ok
+    return 0 if ok else 1
 
 def main():
     """Fonction principale"""
@@ -296,14 +377,7 @@ def main():
             get_drive_usage(service)
             
         elif choice == "6":
-            print("🚀 Nettoyage rapide des fichiers de test MCP...")
-            deleted = 0
-            deleted += delete_files_by_pattern(service, "MCP", confirm=False)
-            deleted += delete_files_by_pattern(service, "Test", confirm=False)
-            deleted += delete_files_by_pattern(service, "Posts", confirm=False)
-            deleted += delete_files_by_pattern(service, "API_Data", confirm=False)
-            empty_trash(service)
-            print(f"🎉 Nettoyage terminé! {deleted} fichier(s) supprimé(s)")
+            quick_cleanup(service)
             
         elif choice == "0":
             print("👋 Au revoir!")
@@ -313,4 +387,6 @@ def main():
             print("❌ Choix invalide")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli())
     main()
\ No newline at end of file
@@ -1,71 +1,105 @@
 #!/usr/bin/env python3
 """
 Script de nettoyage des Google Sheets créés par l'agent
-Usage: python cleanup_sheets.py
+Usage:
+    python cleanup_sheets.py                       # menu interactif
+    python cleanup_sheets.py --list
+    python cleanup_sheets.py --older-than 7 --yes  # mode non interactif (cron)
+    python cleanup_sheets.py --delete-all --yes
+    python cleanup_sheets.py --ids ID1,ID2 --yes
 """
 
 import os
 import sys
+import argparse
 from datetime import datetime, timedelta
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
+from pathlib import Path
+
+# Moteur de nettoyage partagé: listing paginé et suppressions par batch, sous le
+# limiteur de débit Google de l'agent (priorité basse pour le nettoyage)
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+from agent.drive_cleanup import (
+    API_DATA_SHEETS_QUERY,
+    DRIVE_BATCH_SIZE,
+    DRIVE_BATCH_WORKERS,
+    list_drive_files,
+    batch_delete_files,
+    print_progress,
+)
+from agent.google_endpoint import get_google_endpoint, load_credentials as load_service_account, build_drive_service
 
 # Configuration - utilisez les mêmes variables que votre projet
 GOOGLE_CREDENTIALS_PATH = os.getenv("GOOGLE_CREDENTIALS_PATH", "./google-credentials.json")
 
+# Au-delà, le listing détaillé est abrégé
+MAX_LISTED_DETAILS = 50
+
+def load_credentials():
+    """Charge les credentials du compte de service
+
+    Retourne False si absents (None avec GOOGLE_API_ENDPOINT: pas d'authentification).
+    """
+    if get_google_endpoint():
+        return None
+    if not os.path.exists(GOOGLE_CREDENTIALS_PATH):
+        print(f"❌ Fichier credentials non trouvé: {GOOGLE_CREDENTIALS_PATH}")
+        return False
+    scopes = [
+        'https://www.googleapis.com/auth/drive'
+    ]
+    return load_service_account(GOOGLE_CREDENTIALS_PATH, scopes)
+
+def make_service_factory(creds):
+    """Fabrique de clients Drive (un par thread de suppression)"""
+    return lambda: build_drive_service(creds)
+
 def setup_drive_service():
-    """Configuration du service Google Drive"""
+    """Configuration du service Google Drive
+
+    Retourne (service, fabrique de services) ou (None, None).
+    """
     try:
         print("🔧 Configuration du service Google Drive...")
         
-        # Vérifier que le fichier credentials existe
-        if not os.path.exists(GOOGLE_CREDENTIALS_PATH):
-            print(f"❌ Fichier credentials non trouvé: {GOOGLE_CREDENTIALS_PATH}")
-            return None
-        
-        # Définir les scopes
-        scopes = [
-            'https://www.googleapis.com/auth/drive'
-        ]
+        creds = load_credentials()
+        if creds is False:
+            return None, None
         
-        # Charger les credentials
-        creds = Credentials.from_service_account_file(GOOGLE_CREDENTIALS_PATH, scopes=scopes)
-        
-        # Créer le service Drive
-        drive_service = build('drive', 'v3', credentials=creds)
+        factory = make_service_factory(creds)
+        drive_service = factory()
         
         print("✅ Service Google Drive configuré avec succès")
-        return drive_service
+        return drive_service, factory
         
     except Exception as e:
         print(f"❌ Erreur configuration Drive: {e}")
-        return None
+        return None, None
+
+def list_api_data_sheets(drive_service, verbose=True):
+    """Liste tous les sheets créés par l'API (toutes les pages)
 
-def list_api_data_sheets(drive_service):
-    """Liste tous les sheets créés par l'API"""
+    Retourne None si le listing échoue (distinct d'une liste vide).
+    """
     try:
         print("🔍 Recherche des Google Sheets API_Data...")
         
-        # Chercher tous les fichiers Google Sheets avec le préfixe API_Data
-        query = "name contains 'API_Data_' and mimeType='application/vnd.google-apps.spreadsheet' and trashed=false"
-        
-        results = drive_service.files().list(
-            q=query,
-            fields="files(id, name, createdTime, webViewLink, parents)",
-            orderBy="createdTime desc",
-            pageSize=50
-        ).execute()
-        
-        files = results.get('files', [])
+        files = list_drive_files(
+            drive_service,
+            API_DATA_SHEETS_QUERY,
+            fields="id, name, createdTime, webViewLink, parents",
+            order_by="createdTime desc",
+        )
         
         if not files:
             print("✅ Aucun sheet API_Data trouvé.")
             return []
         
         print(f"📊 {len(files)} sheets trouvés:")
+        if not verbose:
+            return files
         print("-" * 80)
         
-        for i, file in enumerate(files, 1):
+        for i, file in enumerate(files[:MAX_LISTED_DETAILS], 1):
             try:
                 created_time = datetime.fromisoformat(file['createdTime'].replace('Z', '+00:00'))
                 created_str = created_time.strftime('%Y-%m-%d %H:%M:%S')
@@ -78,14 +112,18 @@ def list_api_data_sheets(drive_service):
             print(f"    URL: {file.get('webViewLink', 'Non disponible')}")
             print()
         
+        if len(files) > MAX_LISTED_DETAILS:
+            print(f"... et {len(files) - MAX_LISTED_DETAILS} autres sheets")
+        
         return files
         
     except Exception as e:
         print(f"❌ Erreur lors de la recherche: {e}")
-        return []
+        return None
 
-def delete_all_api_sheets(drive_service, files, confirm=True):
-    """Supprime tous les sheets API_Data"""
+def delete_all_api_sheets(drive_service, files, confirm=True, service_factory=None,
+                          batch_size=DRIVE_BATCH_SIZE, workers=DRIVE_BATCH_WORKERS):
+    """Supprime tous les sheets API_Data (batchs HTTP parallèles)"""
     if not files:
         print("ℹ️  Aucun sheet à supprimer.")
         return
@@ -94,8 +132,10 @@ def delete_all_api_sheets(drive_service, files, confirm=True):
     
     if confirm:
         print("\nListe des sheets qui seront supprimés:")
-        for i, file in enumerate(files, 1):
+        for i, file in enumerate(files[:MAX_LISTED_DETAILS], 1):
             print(f"  {i}. {file['name']}")
+        if len(files) > MAX_LISTED_DETAILS:
+            print(f"  ... et {len(files) - MAX_LISTED_DETAILS} autres")
         
         print(f"\n🗑️  Confirmer la suppression de {len(files)} sheets ?")
         response = input("Tapez 'OUI' en majuscules pour confirmer: ").strip()
@@ -104,26 +144,24 @@ def delete_all_api_sheets(drive_service, files, confirm=True):
             print("❌ Suppression annulée.")
             return
     
-    print(f"\n🗑️  Suppression en cours...")
-    deleted_count = 0
-    errors = []
-    
-    for i, file in enumerate(files, 1):
-        try:
-            print(f"[{i}/{len(files)}] Suppression de: {file['name']}")
-            drive_service.files().delete(fileId=file['id']).execute()
-            print(f"    ✅ Supprimé avec succès")
-            deleted_count += 1
-        except Exception as e:
-            error_msg = f"    ❌ Erreur: {e}"
-            print(error_msg)
-            errors.append(f"{file['name']}: {e}")
+    print(f"\n🗑️  Suppression en cours (batchs de {batch_size}, {workers} worker(s))...")
+    report = batch_delete_files(
+        drive_service,
+        [file['id'] for file in files],
+        service_factory=service_factory,
+        batch_size=batch_size,
+        max_workers=workers,
+        progress=print_progress,
+    )
+    names = {file['id']: file['name'] for file in files}
+    errors = [f"{names.get(file_id, file_id)}: {error}" for file_id, error in report["errors"].items()]
     
     # Résumé
     print(f"\n" + "="*60)
     print(f"🎯 RÉSUMÉ DE LA SUPPRESSION")
     print(f"="*60)
-    print(f"✅ Sheets supprimés: {deleted_count}/{len(files)}")
+    print(f"✅ Sheets supprimés: {report['deleted']}/{len(files)}")
+    print(f"⏱️  Durée: {report['elapsed_seconds']:.1f}s ({report['files_per_second']:.1f} sheets/s)")
     
     if errors:
         print(f"❌ Erreurs: {len(errors)}")
@@ -134,9 +172,14 @@ def delete_all_api_sheets(drive_service, files, confirm=True):
             print(f"  ... et {len(errors) - 5} autres erreurs")
     
     print(f"\n🎉 Nettoyage terminé!")
+    return report
+
+def delete_sheets_older_than(drive_service, files, days, confirm=True, **delete_options):
+    """Supprime les sheets plus anciens que X jours
 
-def delete_sheets_older_than(drive_service, files, days):
-    """Supprime les sheets plus anciens que X jours"""
+    Retourne le rapport de suppression, None s'il n'y a rien à supprimer
+    et False en cas d'erreur.
+    """
     try:
         cutoff_date = datetime.now(datetime.now().astimezone().tzinfo) - timedelta(days=days)
         old_files = []
@@ -151,10 +194,10 @@ def delete_sheets_older_than(drive_service, files, days):
         
         if not old_files:
             print(f"✅ Aucun sheet de plus de {days} jours trouvé.")
-            return
+            return None
         
         print(f"\n📅 {len(old_files)} sheets de plus de {days} jours trouvés:")
-        for file in old_files:
+        for file in old_files[:MAX_LISTED_DETAILS]:
             try:
                 created_time = datetime.fromisoformat(file['createdTime'].replace('Z', '+00:00'))
                 created_str = created_time.strftime('%Y-%m-%d')
@@ -163,35 +206,40 @@ def delete_sheets_older_than(drive_service, files, days):
             print(f"  • {file['name']} (créé le {created_str})")
         
         # Supprimer les anciens sheets
-        delete_all_api_sheets(drive_service, old_files, confirm=True)
+        return delete_all_api_sheets(drive_service, old_files, confirm=confirm, **delete_options)
         
     except Exception as e:
         print(f"❌ Erreur: {e}")
+        return False
 
-def delete_specific_sheets(drive_service, sheet_ids):
+def delete_specific_sheets(drive_service, sheet_ids, confirm=False, service_factory=None,
+                           batch_size=DRIVE_BATCH_SIZE, workers=DRIVE_BATCH_WORKERS):
     """Supprime des sheets spécifiques par leurs IDs"""
     if not sheet_ids:
         print("ℹ️  Aucun ID fourni.")
-        return
+        return None
+    
+    if confirm:
+        response = input(f"\n🗑️  Confirmer la suppression de {len(sheet_ids)} sheets ? (oui/non): ").strip()
+        if response.lower() not in ['oui', 'o', 'yes', 'y']:
+            print("❌ Suppression annulée.")
+            return None
     
     print(f"🗑️  Suppression de {len(sheet_ids)} sheets spécifiques...")
     
-    deleted_count = 0
-    for i, sheet_id in enumerate(sheet_ids, 1):
-        try:
-            # Récupérer le nom avant suppression
-            file_info = drive_service.files().get(fileId=sheet_id, fields='name').execute()
-            file_name = file_info.get('name', 'Nom inconnu')
-            
-            print(f"[{i}/{len(sheet_ids)}] Suppression: {file_name}")
-            drive_service.files().delete(fileId=sheet_id).execute()
-            print(f"    ✅ Supprimé avec succès")
-            deleted_count += 1
-            
-        except Exception as e:
-            print(f"    ❌ Erreur: {e}")
+    report = batch_delete_files(
+        drive_service,
+        sheet_ids,
+        service_factory=service_factory,
+        batch_size=batch_size,
+        max_workers=workers,
+        progress=print_progress,
+    )
+    for sheet_id, error in report["errors"].items():
+        print(f"    ❌ {sheet_id}: {error}")
     
-    print(f"\n🎯 {deleted_count}/{len(sheet_ids)} sheets supprimés.")
+    print(f"\n🎯 {report['deleted']}/{len(sheet_ids)} sheets supprimés.")
+    return report
 
 def main_menu():
     """Menu principal du script de nettoyage"""
@@ -200,7 +248,7 @@ def main_menu():
     print("="*60)
     
     # Test de la configuration
-    drive_service = setup_drive_service()
+    drive_service, service_factory = setup_drive_service()
     if not drive_service:
         print("❌ Impossible de continuer sans service Google Drive.")
         return
@@ -224,7 +272,7 @@ def main_menu():
             # Supprimer tous les sheets
             files = list_api_data_sheets(drive_service)
             if files:
-                delete_all_api_sheets(drive_service, files)
+                delete_all_api_sheets(drive_service, files, service_factory=service_factory)
             
         elif choice == "3":
             # Supprimer les anciens sheets
@@ -232,7 +280,7 @@ def main_menu():
                 days = int(input("\nSupprimer les sheets de plus de combien de jours ? "))
                 files = list_api_data_sheets(drive_service)
                 if files:
-                    delete_sheets_older_than(drive_service, files, days)
+                    delete_sheets_older_than(drive_service, files, days, service_factory=service_factory)
             except ValueError:
                 print("❌ Veuillez entrer un nombre valide.")
                 
@@ -245,7 +293,7 @@ def main_menu():
             
             if ids_input:
                 sheet_ids = [id.strip() for id in ids_input.split(',') if id.strip()]
-                delete_specific_sheets(drive_service, sheet_ids)
+                delete_specific_sheets(drive_service, sheet_ids, service_factory=service_factory)
             else:
                 print("❌ Aucun ID fourni.")
                 
@@ -256,8 +304,52 @@ def main_menu():
         else:
             print("❌ Option invalide. Choisissez entre 1 et 5.")
 
+def run_cli(argv=None):
+    """Mode non interactif (cron): retourne le code de sortie"""
+    parser = argparse.ArgumentParser(description="Nettoyage des Google Sheets API_Data")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--list", action="store_true", help="Lister les sheets API_Data")
+    action.add_argument("--delete-all", action="store_true", help="Supprimer tous les sheets API_Data")
+    action.add_argument("--older-than", type=int, metavar="JOURS", help="Supprimer les sheets plus anciens que JOURS")
+    action.add_argument("--ids", help="Supprimer les sheets listés (IDs séparés par des virgules)")
+    parser.add_argument("--yes", action="store_true", help="Ne pas demander de confirmation")
+    parser.add_argument("--batch-size", type=int, default=DRIVE_BATCH_SIZE, help="Suppressions par batch HTTP (max 100)")
+    parser.add_argument("--workers", type=int, default=DRIVE_BATCH_WORKERS, help="Batchs exécutés en parallèle")
+    args = parser.parse_args(argv)
+
+    drive_service, service_factory = setup_drive_service()
+    if not drive_service:
+        return 1
+
+    delete_options = {
+        "service_factory": service_factory,
+        "batch_size": args.batch_size,
+        "workers": args.workers,
+    }
+
+    if args.list:
+        return 0 if list_api_data_sheets(drive_service) is not None else 1
+
+    if args.ids:
+        sheet_ids = [id.strip() for id in args.ids.split(',') if id.strip()]
+        report = delete_specific_sheets(drive_service, sheet_ids, confirm=not args.yes, **delete_options)
+    else:
+        files = list_api_data_sheets(drive_service, verbose=False)
+        if files is None:
+            return 1
+        if args.delete_all:
+            report = delete_all_api_sheets(drive_service, files, confirm=not args.yes, **delete_options)
+        else:
+            report = delete_sheets_older_than(drive_service, files, args.older_than, confirm=not args.yes, **delete_options)
+
+    if report is False or (report and report["errors"]):
+        return 1
+    return 0
+
 if __name__ == "__main__":
     try:
+        if len(sys.argv) > 1:
+            sys.exit(run_cli())
         main_menu()
     except KeyboardInterrupt:
         print("\n\n⚠️  Interruption détectée. Au revoir !")
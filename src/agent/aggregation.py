@@ -0,0 +1,224 @@
+"""
+Étape d'agrégation (group-by, count, sum, min, max, avg) avant l'export
+
+L'agrégateur est un hachage en streaming: chaque ligne met à jour les
+accumulateurs de son groupe, en mémoire O(nombre de groupes) et non
+O(nombre de lignes). La feuille reçoit quelques lignes de synthèse au lieu
+de milliers de lignes brutes.
+"""
+
+from typing import Dict, Any, List, Optional, Iterable, Callable, Tuple
+
+# =============================================================================
+# CONFIGURATION (LOGIQUE MÉTIER)
+# =============================================================================
+
+AGGREGATE_OPS = ("count", "sum", "min", "max", "avg")
+
+# Mots-clés → opération d'agrégation
+AGGREGATE_KEYWORDS = {
+    "nombre": "count",
+    "combien": "count",
+    "count": "count",
+    "compte": "count",
+    "somme": "sum",
+    "sum": "sum",
+    "total": "sum",
+    "moyenne": "avg",
+    "moyen": "avg",
+    "average": "avg",
+    "avg": "avg",
+    "minimum": "min",
+    "min": "min",
+    "maximum": "max",
+    "max": "max",
+}
+
+# Mots-clés introduisant le regroupement (« par utilisateur »)
+GROUP_BY_KEYWORDS = frozenset(["par", "per", "by"])
+
+# =============================================================================
+# SPÉCIFICATION
+# =============================================================================
+
+def metric_alias(op: str, field: Optional[str]) -> str:
+    """Nom de colonne d'une métrique (count, sum_id, avg_userId...)"""
+    return op if not field else f"{op}_{field}"
+
+def detect_aggregate(tokens: List[str], field_for_token: Callable[[str], Optional[str]]) -> Optional[Dict[str, Any]]:
+    """Reconnaît une demande d'agrégation dans les tokens d'une requête
+
+    Une opération (nombre, somme, moyenne...) est obligatoire; le champ de
+    regroupement suit un mot-clé « par ». Les opérations autres que count
+    exigent un champ mesuré, cherché entre l'opération et le regroupement.
+    """
+    group_by: List[str] = []
+    metrics: List[Dict[str, Any]] = []
+    pending_op = None
+    in_group_by = False
+
+    for token in tokens:
+        if token in GROUP_BY_KEYWORDS:
+            if pending_op == "count":
+                metrics.append({"op": "count", "field": None})
+            pending_op = None
+            in_group_by = True
+            continue
+
+        op = AGGREGATE_KEYWORDS.get(token)
+        if op:
+            if pending_op == "count":
+                metrics.append({"op": "count", "field": None})
+            pending_op = op
+            in_group_by = False
+            continue
+
+        field = field_for_token(token)
+        if not field:
+            continue
+        if in_group_by:
+            if field not in group_by:
+                group_by.append(field)
+        elif pending_op:
+            metrics.append({"op": pending_op, "field": field})
+            pending_op = None
+
+    if pending_op == "count":
+        metrics.append({"op": "count", "field": None})
+
+    if not metrics:
+        return None
+
+    return build_aggregate_spec(group_by, metrics)
+
+def build_aggregate_spec(group_by: List[str], metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Construit une spécification normalisée (alias calculés, doublons retirés)"""
+    seen = set()
+    normalized = []
+    for metric in metrics:
+        op, field = metric["op"], metric.get("field")
+        alias = metric.get("alias") or metric_alias(op, field)
+        if alias in seen:
+            continue
+        seen.add(alias)
+        normalized.append({"op": op, "field": field, "alias": alias})
+    return {"group_by": list(group_by), "metrics": normalized}
+
+def validate_aggregate_spec(spec: Any, is_valid_field: Callable[[str], bool]) -> Optional[Dict[str, Any]]:
+    """Ne conserve qu'une spécification d'agrégation cohérente avec le schéma"""
+    if not isinstance(spec, dict):
+        return None
+
+    group_by = [field for field in spec.get("group_by") or [] if isinstance(field, str) and is_valid_field(field)]
+
+    metrics = []
+    for metric in spec.get("metrics") or []:
+        if not isinstance(metric, dict) or metric.get("op") not in AGGREGATE_OPS:
+            continue
+        field = metric.get("field")
+        if field is not None and not is_valid_field(field):
+            continue
+        if field is None and metric["op"] != "count":
+            continue
+        metrics.append({"op": metric["op"], "field": field, "alias": metric.get("alias")})
+
+    if not metrics:
+        return None
+    return build_aggregate_spec(group_by, metrics)
+
+def required_fields(spec: Dict[str, Any]) -> List[str]:
+    """Champs d'entrée nécessaires à l'agrégation"""
+    fields = list(spec["group_by"])
+    for metric in spec["metrics"]:
+        if metric["field"] and metric["field"] not in fields:
+            fields.append(metric["field"])
+    return fields
+
+def describe_aggregate(spec: Dict[str, Any]) -> str:
+    """Description lisible d'une agrégation (réponses, descriptions)"""
+    metrics = ", ".join(metric["alias"] for metric in spec["metrics"])
+    if spec["group_by"]:
+        return f"{metrics} par {', '.join(spec['group_by'])}"
+    return metrics
+
+# =============================================================================
+# AGRÉGATEUR PAR HACHAGE EN STREAMING
+# =============================================================================
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class HashAggregator:
+    """Agrégateur group-by en streaming (un accumulateur par groupe et métrique)"""
+
+    def __init__(self, group_by: List[str], metrics: List[Dict[str, Any]]):
+        self.group_by = list(group_by)
+        self.metrics = list(metrics)
+        self._groups: Dict[Tuple, List[Any]] = {}
+        self.rows_consumed = 0
+
+    def _new_accumulators(self) -> List[Any]:
+        accumulators = []
+        for metric in self.metrics:
+            if metric["op"] == "avg":
+                accumulators.append([0, 0])
+            elif metric["op"] in ("count", "sum"):
+                accumulators.append(0)
+            else:
+                accumulators.append(None)
+        return accumulators
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Intègre une ligne dans les accumulateurs de son groupe"""
+        self.rows_consumed += 1
+        key = tuple(row.get(field) for field in self.group_by)
+        accumulators = self._groups.get(key)
+        if accumulators is None:
+            accumulators = self._groups[key] = self._new_accumulators()
+
+        for i, metric in enumerate(self.metrics):
+            op, field = metric["op"], metric["field"]
+            if op == "count":
+                if field is None or row.get(field) is not None:
+                    accumulators[i] += 1
+                continue
+
+            value = row.get(field)
+            if value is None:
+                continue
+            if op == "sum":
+                if _is_number(value):
+                    accumulators[i] += value
+            elif op == "avg":
+                if _is_number(value):
+                    accumulators[i][0] += value
+                    accumulators[i][1] += 1
+            elif op == "min":
+                if accumulators[i] is None or value < accumulators[i]:
+                    accumulators[i] = value
+            elif op == "max":
+                if accumulators[i] is None or value > accumulators[i]:
+                    accumulators[i] = value
+
+    def consume(self, rows: Iterable[Dict[str, Any]]) -> "HashAggregator":
+        """Intègre un flux de lignes"""
+        for row in rows:
+            self.add(row)
+        return self
+
+    def results(self) -> List[Dict[str, Any]]:
+        """Lignes de synthèse, dans l'ordre d'apparition des groupes"""
+        output = []
+        for key, accumulators in self._groups.items():
+            row = dict(zip(self.group_by, key))
+            for metric, value in zip(self.metrics, accumulators):
+                if metric["op"] == "avg":
+                    total, count = value
+                    value = round(total / count, 4) if count else None
+                row[metric["alias"]] = value
+            output.append(row)
+        return output
+
+def aggregate_rows(rows: Iterable[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Agrège un flux de lignes selon une spécification validée"""
+    return HashAggregator(spec["group_by"], spec["metrics"]).consume(rows).results()
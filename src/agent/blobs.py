@@ -0,0 +1,142 @@
+"""
+Stockage hors état des gros volumes de lignes
+
+Les nœuds du graphe ne placent dans l'état que des petites listes de lignes;
+au-delà de `BLOB_INLINE_MAX_ROWS`, les lignes sont déposées dans un magasin
+en mémoire du processus et l'état ne contient qu'une poignée sérialisable
+(`{"$rows": <id>, "count": <n>}`). Traces LangSmith, checkpointers et
+flux `updates` ne recopient ainsi jamais les données.
+
+Les nœuds lisent indifféremment une liste ou une poignée via `load_rows` et
+libèrent explicitement les lignes devenues inutiles (`release_rows`); les
+points d'entrée (`run_agent_with_tracing`, jobs, benchmarks) relâchent le
+résultat du run. Le magasin est borné (`BLOB_STORE_MAX_BLOBS`, éviction
+LRU) pour les résultats jamais relâchés, mais seuls les blobs inutilisés
+depuis `BLOB_STORE_MAX_IDLE_SECONDS` sont évincés: sous forte concurrence,
+le magasin dépasse temporairement sa borne plutôt que de retirer les
+lignes d'un run en cours.
+
+Un `loader` optionnel (le checkpointer, voir agent.checkpoints) fournit les
+lignes des poignées absentes du magasin: runs repris après un crash.
+"""
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+BLOB_INLINE_MAX_ROWS = int(os.getenv("BLOB_INLINE_MAX_ROWS", "1000"))
+BLOB_STORE_MAX_BLOBS = int(os.getenv("BLOB_STORE_MAX_BLOBS", "32"))
+BLOB_STORE_MAX_IDLE_SECONDS = float(os.getenv("BLOB_STORE_MAX_IDLE_SECONDS", "3600"))
+
+HANDLE_KEY = "$rows"
+
+# =============================================================================
+# MAGASIN
+# =============================================================================
+
+class RowBlobStore:
+    """Magasin en mémoire: identifiant -> liste de lignes (LRU borné)"""
+
+    def __init__(self, max_blobs: int = BLOB_STORE_MAX_BLOBS, max_idle: float = BLOB_STORE_MAX_IDLE_SECONDS):
+        self.max_blobs = max(1, max_blobs)
+        self.max_idle = max_idle
+        self._blobs: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._touched: Dict[str, float] = {}  # id de blob -> dernier accès (monotonic)
+        self._lock = threading.Lock()
+        self.stats = {"stored": 0, "released": 0, "evicted": 0, "loaded": 0}
+        # id de blob -> lignes persistées (None si inconnu)
+        self.loader: Optional[Callable[[str], Optional[List[Dict[str, Any]]]]] = None
+
+    def put(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Dépose des lignes et retourne leur poignée"""
+        blob_id = uuid.uuid4().hex
+        with self._lock:
+            self._blobs[blob_id] = rows
+            self._touched[blob_id] = time.monotonic()
+            self.stats["stored"] += 1
+            self._evict()
+        return {HANDLE_KEY: blob_id, "count": len(rows)}
+
+    def _evict(self) -> None:
+        """Évince les plus anciens blobs au-delà de la borne, s'ils sont inutilisés (sous `_lock`)"""
+        now = time.monotonic()
+        while len(self._blobs) > self.max_blobs:
+            blob_id = next(iter(self._blobs))
+            if now - self._touched.get(blob_id, 0.0) < self.max_idle:
+                # Le moins récent est encore utilisé: les autres aussi
+                return
+            self._blobs.popitem(last=False)
+            self._touched.pop(blob_id, None)
+            self.stats["evicted"] += 1
+
+    def get(self, handle: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Lignes d'une poignée, rechargées via `loader` si elles ont été évincées"""
+        blob_id = handle[HANDLE_KEY]
+        with self._lock:
+            rows = self._blobs.get(blob_id)
+            if rows is not None:
+                self._blobs.move_to_end(blob_id)
+                self._touched[blob_id] = time.monotonic()
+                return rows
+        rows = self.loader(blob_id) if self.loader else None
+        if rows is None:
+            raise KeyError(f"Lignes libérées ou inconnues: {blob_id}")
+        with self._lock:
+            # Un autre thread a pu recharger le même blob entre-temps
+            rows = self._blobs.setdefault(blob_id, rows)
+            self._blobs.move_to_end(blob_id)
+            self._touched[blob_id] = time.monotonic()
+            self.stats["loaded"] += 1
+            self._evict()
+        return rows
+
+    def release(self, handle: Dict[str, Any]) -> None:
+        """Libère les lignes d'une poignée (no-op si déjà libérées)"""
+        with self._lock:
+            self._touched.pop(handle[HANDLE_KEY], None)
+            if self._blobs.pop(handle[HANDLE_KEY], None) is not None:
+                self.stats["released"] += 1
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+# Magasin partagé du processus
+row_store = RowBlobStore()
+
+# =============================================================================
+# API POUR LES NŒUDS
+# =============================================================================
+
+def is_rows_handle(value: Any) -> bool:
+    """Vrai si la valeur d'état est une poignée de lignes"""
+    return isinstance(value, dict) and HANDLE_KEY in value
+
+def store_rows(rows: Optional[List[Dict[str, Any]]]) -> Any:
+    """Valeur d'état pour `rows`: la liste si elle est petite, sinon une poignée"""
+    if rows is None or len(rows) <= BLOB_INLINE_MAX_ROWS:
+        return rows
+    return row_store.put(rows)
+
+def load_rows(value: Any) -> List[Dict[str, Any]]:
+    """Lignes désignées par une valeur d'état (liste, poignée ou None)"""
+    if is_rows_handle(value):
+        return row_store.get(value)
+    return value or []
+
+def row_count(value: Any) -> int:
+    """Nombre de lignes sans charger le blob"""
+    if is_rows_handle(value):
+        return value["count"]
+    return len(value) if value else 0
+
+def release_rows(value: Any) -> None:
+    """Libère le blob désigné (sans effet sur une liste en ligne)"""
+    if is_rows_handle(value):
+        row_store.release(value)
@@ -0,0 +1,433 @@
+"""
+Checkpoints persistants du graphe (reprise après crash, rejeu)
+
+Avec `CHECKPOINT_ENABLED=true`, le graphe est compilé avec un checkpointer
+SQLite (`CHECKPOINT_DB_PATH`): chaque nœud terminé est enregistré sous le
+`thread_id` de l'export. Si le processus meurt après le parsing LLM et le
+fetch, un nouvel appel sur le même `thread_id` reprend au premier nœud non
+terminé au lieu de tout refaire (voir `agent.graph.invoke_graph`; les jobs
+utilisent leur identifiant comme `thread_id`).
+
+Les gros volumes de lignes ne passent pas par le sérialiseur de LangGraph:
+une poignée `agent.blobs` est enregistrée par référence, ses lignes étant
+écrites une seule fois (JSON compressé zlib) dans la table `row_blobs`. À la
+reprise, l'état contient une poignée vers cette référence et les lignes ne
+sont relues (puis remises dans `row_store`) que si un nœud les charge. Les
+autres valeurs au-delà de `CHECKPOINT_COMPRESS_MIN_BYTES` sont compressées.
+
+Le paquet langgraph-checkpoint-sqlite n'est pas requis: `SqliteCheckpointSaver`
+implémente directement `BaseCheckpointSaver` sur le modèle de `InMemorySaver`.
+"""
+
+import os
+import json
+import uuid
+import zlib
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator, AsyncIterator, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from agent.blobs import HANDLE_KEY, RowBlobStore, is_rows_handle, row_store
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "false").lower() == "true"
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "./agent_checkpoints.sqlite3")
+# Conserve les checkpoints des runs terminés sans erreur (rejeu, inspection)
+CHECKPOINT_KEEP_COMPLETED = os.getenv("CHECKPOINT_KEEP_COMPLETED", "false").lower() == "true"
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "4096"))
+CHECKPOINT_COMPRESS_LEVEL = int(os.getenv("CHECKPOINT_COMPRESS_LEVEL", "1"))
+
+ROWS_TYPE = "rows"
+ZLIB_SUFFIX = "+zlib"
+ROW_REF_PREFIX = "ckpt-"
+ROW_REFS_MAX = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS channel_values (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS row_blobs (
+    ref TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS row_blobs_thread ON row_blobs (thread_id);
+"""
+
+# =============================================================================
+# CHECKPOINTER SQLITE
+# =============================================================================
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """Checkpointer LangGraph persistant (SQLite), lignes stockées par référence"""
+
+    def __init__(self, db_path: str = CHECKPOINT_DB_PATH, store: Optional[RowBlobStore] = None,
+                 compress_min_bytes: int = CHECKPOINT_COMPRESS_MIN_BYTES,
+                 compress_level: int = CHECKPOINT_COMPRESS_LEVEL):
+        """Base SQLite créée au besoin; `store` reçoit le chargeur des lignes persistées"""
+        super().__init__()
+        self.db_path = db_path
+        self.store = store if store is not None else row_store
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+        # (thread_id, checkpoint parent, id de blob) -> référence des lignes écrites
+        self._row_refs: "OrderedDict[Tuple[str, Optional[str], str], Dict[str, Any]]" = OrderedDict()
+        # Clé en cours d'écriture -> événement signalé une fois la référence écrite
+        self._pending_refs: Dict[Tuple[str, Optional[str], str], threading.Event] = {}
+        self._refs_lock = threading.Lock()  # Index des références seulement (pas d'I/O)
+        self.stats = {"row_blobs_written": 0, "row_bytes_written": 0, "row_blobs_loaded": 0}
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        # Lignes des runs repris: relues à la demande depuis la base
+        self.store.loader = self.load_row_blob
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ---- Sérialisation -----------------------------------------------------
+
+    def _row_ref(self, thread_id: str, parent_id: Optional[str], handle: Dict[str, Any]) -> Dict[str, Any]:
+        """Référence persistée des lignes d'une poignée, écrites une fois par étape
+
+        Les écritures d'un nœud (put_writes) et le checkpoint qui suit (put)
+        partagent le checkpoint parent et désignent le même contenu: la
+        première des deux écrit les lignes, l'autre réutilise la référence.
+        Sérialisation et INSERT se font hors du verrou: seules les écritures
+        d'une même clé s'attendent, les autres threads ne sont pas bloqués.
+        """
+        key = (thread_id, parent_id, handle[HANDLE_KEY])
+        while True:
+            with self._refs_lock:
+                ref = self._row_refs.get(key)
+                if ref is not None:
+                    return ref
+                pending = self._pending_refs.get(key)
+                if pending is None:
+                    pending = self._pending_refs[key] = threading.Event()
+                    break
+            # Même clé en cours d'écriture par un autre thread (reprise s'il échoue)
+            pending.wait()
+
+        try:
+            rows = self.store.get(handle)
+            data = zlib.compress(json.dumps(rows, default=str, separators=(",", ":")).encode("utf-8"),
+                                 self.compress_level)
+            ref = {"ref": ROW_REF_PREFIX + uuid.uuid4().hex, "count": len(rows)}
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "INSERT INTO row_blobs (ref, thread_id, count, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (ref["ref"], thread_id, ref["count"], data, datetime.now().isoformat(timespec="milliseconds")),
+                )
+            with self._refs_lock:
+                self._row_refs[key] = ref
+                while len(self._row_refs) > ROW_REFS_MAX:
+                    self._row_refs.popitem(last=False)
+                self.stats["row_blobs_written"] += 1
+                self.stats["row_bytes_written"] += len(data)
+            return ref
+        finally:
+            with self._refs_lock:
+                self._pending_refs.pop(key, None)
+            pending.set()
+
+    def _dump(self, thread_id: str, parent_id: Optional[str], value: Any) -> Tuple[str, bytes]:
+        if is_rows_handle(value):
+            return ROWS_TYPE, json.dumps(self._row_ref(thread_id, parent_id, value)).encode("utf-8")
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) >= self.compress_min_bytes:
+            return type_ + ZLIB_SUFFIX, zlib.compress(data, self.compress_level)
+        return type_, data
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        if type_ == ROWS_TYPE:
+            ref = json.loads(data)
+            return {HANDLE_KEY: ref["ref"], "count": ref["count"]}
+        if type_.endswith(ZLIB_SUFFIX):
+            return self.serde.loads_typed((type_[:-len(ZLIB_SUFFIX)], zlib.decompress(data)))
+        return self.serde.loads_typed((type_, data))
+
+    def load_row_blob(self, ref: str) -> Optional[List[Dict[str, Any]]]:
+        """Lignes d'une référence persistée (None si inconnue)"""
+        if not ref.startswith(ROW_REF_PREFIX):
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT data FROM row_blobs WHERE ref = ?", (ref,)).fetchone()
+        if row is None:
+            return None
+        self.stats["row_blobs_loaded"] += 1
+        return json.loads(zlib.decompress(row["data"]))
+
+    # ---- Lecture -----------------------------------------------------------
+
+    def _to_tuple(self, conn: sqlite3.Connection, row: sqlite3.Row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id = row["thread_id"], row["checkpoint_ns"], row["checkpoint_id"]
+        checkpoint: Checkpoint = self.serde.loads_typed((row["checkpoint_type"], row["checkpoint"]))
+
+        channel_values: Dict[str, Any] = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = conn.execute(
+                "SELECT type, value FROM channel_values "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if blob is not None and blob["type"] != "empty":
+                channel_values[channel] = self._load(blob["type"], blob["value"])
+
+        writes = conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w["task_path"], w["task_id"], w["idx"]))
+
+        parent_id = row["parent_checkpoint_id"]
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((row["metadata_type"], row["metadata"])),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=[(w["task_id"], w["channel"], self._load(w["type"], w["value"])) for w in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Checkpoint demandé, ou le plus récent du thread (None si absent)"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with closing(self._connect()) as conn:
+            if checkpoint_id:
+                row = conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._to_tuple(conn, row) if row is not None else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        """Checkpoints du thread, du plus récent au plus ancien"""
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT * FROM checkpoints {where} ORDER BY checkpoint_id DESC", params).fetchall()
+            tuples = []
+            for row in rows:
+                if limit is not None and len(tuples) >= limit:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row["metadata_type"], row["metadata"]))
+                    if not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                tuples.append(self._to_tuple(conn, row))
+        yield from tuples
+
+    # ---- Écriture ----------------------------------------------------------
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        """Écrit un checkpoint et les nouvelles versions de ses canaux (une transaction)"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        values = checkpoint.get("channel_values", {})
+        stored = {key: value for key, value in checkpoint.items() if key != "channel_values"}
+        checkpoint_type, checkpoint_data = self.serde.dumps_typed(stored)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        # Sérialisation (et écriture des lignes) hors de la transaction
+        parent_id = config["configurable"].get("checkpoint_id")
+        blobs = [
+            (channel, str(version), *(self._dump(thread_id, parent_id, values[channel])
+                                      if channel in values else ("empty", b"")))
+            for channel, version in new_versions.items()
+        ]
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO channel_values VALUES (?, ?, ?, ?, ?, ?)",
+                    [(thread_id, checkpoint_ns, channel, version, type_, data) for channel, version, type_, data in blobs],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], parent_id,
+                     checkpoint_type, checkpoint_data, metadata_type, metadata_data),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        """Écrit les sorties d'une tâche (une seule fois par index)"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with closing(self._connect()) as conn:
+            existing = {
+                row["idx"] for row in conn.execute(
+                    "SELECT idx FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND task_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id),
+                )
+            }
+            rows = []
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                if write_idx >= 0 and write_idx in existing:
+                    continue
+                type_, data = self._dump(thread_id, checkpoint_id, value)
+                rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, data, task_path))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Supprime checkpoints, écritures et lignes d'un thread"""
+        with closing(self._connect()) as conn:
+            for table in ("checkpoints", "channel_values", "writes", "row_blobs"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+        with self._refs_lock:
+            for key in [key for key in self._row_refs if key[0] == thread_id]:
+                del self._row_refs[key]
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        """Version suivante d'un canal (compteur + suffixe aléatoire)"""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---- Variantes asynchrones (déléguées) -----------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Variante asynchrone de `get_tuple`"""
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        """Variante asynchrone de `list`"""
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        """Variante asynchrone de `put`"""
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        """Variante asynchrone de `put_writes`"""
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Variante asynchrone de `delete_thread`"""
+        return self.delete_thread(thread_id)
+
+# =============================================================================
+# INSTANCE PARTAGÉE
+# =============================================================================
+
+_checkpointer: Optional[SqliteCheckpointSaver] = None
+_checkpointer_lock = threading.Lock()
+
+def get_checkpointer() -> Optional[SqliteCheckpointSaver]:
+    """Checkpointer du processus (None si CHECKPOINT_ENABLED=false)"""
+    global _checkpointer
+    if not CHECKPOINT_ENABLED:
+        return None
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = SqliteCheckpointSaver(CHECKPOINT_DB_PATH)
+        return _checkpointer
@@ -0,0 +1,50 @@
+"""
+Limites de concurrence par type d'appel externe (LLM, API amont, Google)
+
+Quand plusieurs runs s'exécutent en parallèle (mode worker pool), chaque
+famille d'appels a son propre plafond pour ne pas saturer OpenAI, l'API
+source ou les quotas Google indépendamment du nombre de workers.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+CONCURRENCY_LIMITS = {
+    "llm": int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    "api": int(os.getenv("API_MAX_CONCURRENCY", "8")),
+    "google": int(os.getenv("GOOGLE_MAX_CONCURRENCY", "2")),
+}
+
+_semaphores: Dict[str, threading.BoundedSemaphore] = {
+    name: threading.BoundedSemaphore(max(1, value)) for name, value in CONCURRENCY_LIMITS.items()
+}
+_semaphores_lock = threading.Lock()
+
+# =============================================================================
+# API
+# =============================================================================
+
+def set_concurrency_limit(name: str, value: int) -> None:
+    """Redéfinit le plafond d'une famille d'appels (à faire avant le démarrage des workers)"""
+    with _semaphores_lock:
+        CONCURRENCY_LIMITS[name] = value
+        _semaphores[name] = threading.BoundedSemaphore(max(1, value))
+
+@contextmanager
+def concurrency_limit(name: str) -> Iterator[None]:
+    """Réserve un slot de la famille d'appels `name` pendant le bloc"""
+    semaphore = _semaphores.get(name)
+    if semaphore is None:
+        yield
+        return
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
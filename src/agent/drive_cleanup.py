@@ -0,0 +1,217 @@
+"""
+Moteur de nettoyage Google Drive (listing paginé, suppressions par batch)
+
+Utilisé par cleanup_sheets.py et cleanup_drive.py:
+- `iter_drive_files` suit `nextPageToken` jusqu'au bout (plus de fichiers
+  silencieusement oubliés au-delà de la première page);
+- `batch_delete_files` regroupe les suppressions en requêtes batch HTTP
+  Google (jusqu'à 100 par batch) exécutées avec un parallélisme borné,
+  sous le limiteur de débit partagé, et rapporte progression et débit.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Callable, Iterator, Iterable
+
+from agent.google_quota import (
+    rate_limiter,
+    quota_retry_delay,
+    READ,
+    WRITE,
+    PRIORITY_BACKGROUND,
+)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DRIVE_LIST_PAGE_SIZE = int(os.getenv("DRIVE_LIST_PAGE_SIZE", "1000"))
+DRIVE_BATCH_SIZE = min(100, int(os.getenv("DRIVE_BATCH_SIZE", "100")))  # Limite Google: 100
+DRIVE_BATCH_WORKERS = int(os.getenv("DRIVE_BATCH_WORKERS", "4"))
+DRIVE_BATCH_MAX_ATTEMPTS = int(os.getenv("DRIVE_BATCH_MAX_ATTEMPTS", "5"))
+
+# Requête des sheets exportés par l'agent
+API_DATA_SHEETS_QUERY = (
+    "name contains 'API_Data_' and "
+    "mimeType='application/vnd.google-apps.spreadsheet' and trashed=false"
+)
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# =============================================================================
+# LISTING PAGINÉ
+# =============================================================================
+
+def iter_drive_files(
+    service: Any,
+    query: Optional[str] = None,
+    fields: str = "id, name, createdTime",
+    order_by: Optional[str] = None,
+    page_size: int = DRIVE_LIST_PAGE_SIZE,
+    max_files: Optional[int] = None,
+    priority: int = PRIORITY_BACKGROUND,
+) -> Iterator[Dict[str, Any]]:
+    """Itère sur tous les fichiers correspondant à la requête, page par page"""
+    page_token = None
+    yielded = 0
+    while True:
+        kwargs = {
+            "fields": f"nextPageToken, files({fields})",
+            "pageSize": page_size if max_files is None else min(page_size, max_files - yielded),
+        }
+        if query:
+            kwargs["q"] = query
+        if order_by:
+            kwargs["orderBy"] = order_by
+        if page_token:
+            kwargs["pageToken"] = page_token
+
+        results = rate_limiter.execute(service.files().list(**kwargs), kind=READ, priority=priority)
+        for file in results.get("files", []):
+            yield file
+            yielded += 1
+            if max_files is not None and yielded >= max_files:
+                return
+
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return
+
+def list_drive_files(service: Any, query: Optional[str] = None, **kwargs: Any) -> List[Dict[str, Any]]:
+    """Liste complète (toutes pages) des fichiers correspondant à la requête"""
+    return list(iter_drive_files(service, query, **kwargs))
+
+# =============================================================================
+# SUPPRESSION PAR BATCH
+# =============================================================================
+
+def _chunks(items: List[str], size: int) -> Iterator[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class _ThreadLocalServices:
+    """Un client Drive par thread (httplib2 n'est pas thread-safe)"""
+
+    def __init__(self, service: Any, service_factory: Optional[Callable[[], Any]]):
+        self._service = service
+        self._factory = service_factory
+        self._local = threading.local()
+
+    def get(self) -> Any:
+        if self._factory is None:
+            return self._service
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self._factory()
+        return service
+
+def _delete_batch(service: Any, file_ids: List[str], priority: int) -> Dict[str, Any]:
+    """Supprime un lot de fichiers en une requête batch HTTP (réessais des 429 internes)"""
+    pending = list(file_ids)
+    deleted: List[str] = []
+    errors: Dict[str, str] = {}
+    attempt = 0
+
+    while pending:
+        throttled: List[str] = []
+        retry_delay = [0.0]
+
+        def callback(request_id: str, response: Any, exception: Optional[Exception]) -> None:
+            if exception is None:
+                deleted.append(request_id)
+                return
+            delay = quota_retry_delay(exception, attempt)
+            if delay is not None and attempt < DRIVE_BATCH_MAX_ATTEMPTS:
+                throttled.append(request_id)
+                retry_delay[0] = max(retry_delay[0], delay)
+            elif getattr(getattr(exception, "resp", None), "status", None) == 404:
+                # Déjà supprimé: l'objectif est atteint
+                deleted.append(request_id)
+            else:
+                errors[request_id] = str(exception)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for file_id in pending:
+            batch.add(service.files().delete(fileId=file_id), request_id=file_id)
+        rate_limiter.call(batch.execute, kind=WRITE, priority=priority, cost=len(pending))
+
+        pending = throttled
+        if pending:
+            attempt += 1
+            rate_limiter.buckets[WRITE].throttle(retry_delay[0])
+
+    return {"deleted": deleted, "errors": errors}
+
+def batch_delete_files(
+    service: Any,
+    file_ids: Iterable[str],
+    service_factory: Optional[Callable[[], Any]] = None,
+    batch_size: int = DRIVE_BATCH_SIZE,
+    max_workers: int = DRIVE_BATCH_WORKERS,
+    progress: Optional[ProgressCallback] = None,
+    priority: int = PRIORITY_BACKGROUND,
+) -> Dict[str, Any]:
+    """Supprime des fichiers par batchs HTTP de `batch_size` en parallèle borné
+
+    Sans `service_factory` (un client par thread), les batchs sont exécutés
+    séquentiellement sur `service`.
+    """
+    ids = list(dict.fromkeys(file_ids))
+    batch_size = max(1, min(100, batch_size))
+    workers = max(1, max_workers) if service_factory else 1
+    services = _ThreadLocalServices(service, service_factory)
+
+    report: Dict[str, Any] = {
+        "total": len(ids),
+        "deleted": 0,
+        "errors": {},
+        "batches": 0,
+        "elapsed_seconds": 0.0,
+        "files_per_second": 0.0,
+    }
+    started = time.monotonic()
+
+    def run(chunk: List[str]) -> Dict[str, Any]:
+        return _delete_batch(services.get(), chunk, priority)
+
+    def record(result: Dict[str, Any]) -> None:
+        report["deleted"] += len(result["deleted"])
+        report["errors"].update(result["errors"])
+        report["batches"] += 1
+        elapsed = time.monotonic() - started
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["files_per_second"] = round(report["deleted"] / elapsed, 2) if elapsed > 0 else 0.0
+        if progress:
+            progress(dict(report, done=report["deleted"] + len(report["errors"])))
+
+    def failed(chunk: List[str], error: Exception) -> Dict[str, Any]:
+        return {"deleted": [], "errors": {file_id: str(error) for file_id in chunk}}
+
+    chunks = list(_chunks(ids, batch_size))
+    if workers == 1:
+        for chunk in chunks:
+            try:
+                record(run(chunk))
+            except Exception as e:
+                record(failed(chunk, e))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    record(future.result())
+                except Exception as e:
+                    record(failed(futures[future], e))
+
+    return report
+
+def print_progress(report: Dict[str, Any]) -> None:
+    """Callback de progression pour les scripts en ligne de commande"""
+    print(
+        f"   🗑️  {report['done']}/{report['total']} traités "
+        f"({report['deleted']} supprimés, {len(report['errors'])} erreurs) "
+        f"- {report['files_per_second']:.1f} fichiers/s",
+        flush=True,
+    )
@@ -0,0 +1,117 @@
+"""
+Import Drive des gros exports (CSV converti en Google Sheet côté serveur)
+
+L'écriture par l'API values envoie les cellules en JSON dans le corps des
+requêtes: au-delà de quelques dizaines de milliers de lignes, elle est
+lente et bute sur la taille maximale des requêtes. Pour ces exports, les
+lignes sont sérialisées en CSV dans un tampon (`SpooledTemporaryFile`:
+en mémoire jusqu'à `DRIVE_UPLOAD_SPOOL_BYTES`, sur disque au-delà) puis
+envoyées en upload Drive resumable avec conversion en
+`application/vnd.google-apps.spreadsheet`: Google crée le classeur et
+convertit les données en une seule opération, par morceaux de
+`DRIVE_UPLOAD_CHUNK_BYTES` (un appel limité par morceau).
+
+`choose_write_path` choisit entre les deux chemins selon le nombre de
+lignes et de cellules (`DRIVE_UPLOAD_MODE=auto`), ou force l'un d'eux.
+À noter: la conversion CSV interprète les valeurs (nombres, dates) comme le
+ferait une saisie, là où l'API values en mode RAW les écrit telles quelles.
+"""
+
+import io
+import os
+import csv
+import tempfile
+from typing import Dict, Any, List, Optional
+
+from agent.google_quota import google_call, WRITE, PRIORITY_INTERACTIVE
+from agent.sinks import cell_value
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+WRITE_VALUES = "values"
+WRITE_UPLOAD = "upload"
+
+DRIVE_UPLOAD_MODE = os.getenv("DRIVE_UPLOAD_MODE", "auto")  # auto | values | upload
+DRIVE_UPLOAD_MIN_ROWS = int(os.getenv("DRIVE_UPLOAD_MIN_ROWS", "20000"))
+DRIVE_UPLOAD_MIN_CELLS = int(os.getenv("DRIVE_UPLOAD_MIN_CELLS", "200000"))
+# Les morceaux d'un upload resumable sont des multiples de 256 Kio (sauf le dernier)
+_CHUNK_UNIT = 256 * 1024
+DRIVE_UPLOAD_CHUNK_BYTES = max(1, int(os.getenv("DRIVE_UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024))) // _CHUNK_UNIT) * _CHUNK_UNIT
+DRIVE_UPLOAD_SPOOL_BYTES = int(os.getenv("DRIVE_UPLOAD_SPOOL_BYTES", str(16 * 1024 * 1024)))
+
+SPREADSHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+
+# Lignes sérialisées par passage dans le tampon CSV
+_CSV_BATCH_ROWS = 5000
+
+def upload_available() -> bool:
+    """Vrai si google-api-python-client (uploads Drive) est installé"""
+    try:
+        import googleapiclient.http  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def choose_write_path(rows: int, columns: int, mode: str = DRIVE_UPLOAD_MODE) -> str:
+    """Chemin d'écriture d'un export: API values ou import Drive"""
+    if mode == WRITE_VALUES or not upload_available():
+        return WRITE_VALUES
+    if mode == WRITE_UPLOAD:
+        return WRITE_UPLOAD
+    if rows >= DRIVE_UPLOAD_MIN_ROWS or rows * max(1, columns) >= DRIVE_UPLOAD_MIN_CELLS:
+        return WRITE_UPLOAD
+    return WRITE_VALUES
+
+# =============================================================================
+# SÉRIALISATION ET UPLOAD
+# =============================================================================
+
+def write_csv(processed_data: List[Dict[str, Any]], buffer: Any) -> int:
+    """Écrit en-têtes et lignes en CSV UTF-8 dans `buffer` (binaire); retourne la taille"""
+    if not processed_data:
+        return 0
+    headers = list(processed_data[0].keys())
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(headers)
+    size = 0
+    for start in range(0, len(processed_data), _CSV_BATCH_ROWS):
+        writer.writerows(
+            [cell_value(item.get(header, '')) for header in headers]
+            for item in processed_data[start:start + _CSV_BATCH_ROWS]
+        )
+        size += buffer.write(text.getvalue().encode("utf-8"))
+        text.seek(0)
+        text.truncate()
+    return size
+
+def upload_rows_as_spreadsheet(
+    drive_service: Any,
+    processed_data: List[Dict[str, Any]],
+    title: str,
+    parents: Optional[List[str]] = None,
+    chunk_bytes: int = DRIVE_UPLOAD_CHUNK_BYTES,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> Dict[str, Any]:
+    """Crée un Google Sheet à partir des lignes par upload resumable converti"""
+    from googleapiclient.http import MediaIoBaseUpload
+
+    body: Dict[str, Any] = {"name": title, "mimeType": SPREADSHEET_MIME_TYPE}
+    if parents:
+        body["parents"] = parents
+
+    with tempfile.SpooledTemporaryFile(max_size=DRIVE_UPLOAD_SPOOL_BYTES) as buffer:
+        size = write_csv(processed_data, buffer)
+        buffer.seek(0)
+        media = MediaIoBaseUpload(buffer, mimetype="text/csv", chunksize=chunk_bytes, resumable=True)
+        request = drive_service.files().create(body=body, media_body=media, fields="id, name, webViewLink")
+
+        # Un appel limité (et réessayé sur 429) par morceau
+        response, chunks = None, 0
+        while response is None:
+            _, response = google_call(request.next_chunk, kind=WRITE, priority=priority)
+            chunks += 1
+
+    return dict(response, rows=len(processed_data), size_bytes=size, chunks=chunks)
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Cache local des exports (format colonnaire compressé) et rejeu vers Sheets
+
+Avec `EXPORT_CACHE_ENABLED=true`, les lignes traitées de chaque export sont
+écrites dans un fichier colonnaire local pendant la création du classeur
+(effet `cache` du plan, voir agent.side_effects), indexé par la clé de la
+requête (URL + paramètres extraits):
+
+- si Google est indisponible ou limite le débit, le run n'échoue plus:
+  l'export passe `pending` et un rejoueur de fond le renvoie plus tard,
+  sous le limiteur de débit partagé, à priorité de fond (tant que l'export
+  est en cours, l'entrée reste `stored`: le rejoueur ne l'envoie pas en
+  même temps que le run);
+- une requête identique dans les `EXPORT_CACHE_TTL_SECONDS` est servie
+  depuis le fichier local, sans nouvelle récupération amont.
+
+Format `.agcol` (bibliothèque standard uniquement, pas de dépendance
+Arrow/Parquet): une colonne = un bloc JSON compressé zlib, suivi d'un pied
+JSON (noms, offsets, lignes sans valeur) et de sa taille sur 8 octets. Le
+fichier est lu par `mmap`; seules les colonnes demandées sont décompressées.
+
+Usage:
+    python -m agent.export_cache stats
+    python -m agent.export_cache list --limit 20
+    python -m agent.export_cache replay     # un passage du rejoueur
+"""
+
+import os
+import sys
+import json
+import mmap
+import zlib
+import struct
+import hashlib
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable
+
+from agent.metrics import inc as inc_metric
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+EXPORT_CACHE_ENABLED = os.getenv("EXPORT_CACHE_ENABLED", "false").lower() == "true"
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "./agent_export_cache")
+EXPORT_CACHE_TTL_SECONDS = float(os.getenv("EXPORT_CACHE_TTL_SECONDS", "600"))  # 0 = jamais servi depuis le cache
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+EXPORT_CACHE_COMPRESS_LEVEL = int(os.getenv("EXPORT_CACHE_COMPRESS_LEVEL", "1"))
+EXPORT_REPLAY_INTERVAL = float(os.getenv("EXPORT_REPLAY_INTERVAL", "60"))  # secondes, 0 = pas de rejeu de fond
+EXPORT_REPLAY_MAX_ATTEMPTS = int(os.getenv("EXPORT_REPLAY_MAX_ATTEMPTS", "10"))
+
+EXPORT_STORED = "stored"  # écrit localement, export en cours (non rejoué)
+EXPORT_PENDING = "pending"
+EXPORT_UPLOADED = "uploaded"
+EXPORT_FAILED = "failed"
+
+_MAGIC = b"AGCOL1\n\x00"
+_FOOTER_SIZE = struct.Struct("<Q")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exports (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    query TEXT,
+    rows INTEGER NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sheet_url TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    uploaded_at TEXT
+);
+CREATE INDEX IF NOT EXISTS exports_status_created ON exports (status, created_at);
+"""
+
+def _now() -> datetime:
+    return datetime.now()
+
+def export_key(api_url: str, params: Optional[Dict[str, Any]]) -> str:
+    """Clé stable d'une requête d'export (URL + paramètres extraits)"""
+    payload = json.dumps({"url": api_url, "params": params or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+# =============================================================================
+# FORMAT COLONNAIRE
+# =============================================================================
+
+def write_columnar(path: str, rows: List[Dict[str, Any]], level: int = EXPORT_CACHE_COMPRESS_LEVEL) -> int:
+    """Écrit les lignes colonne par colonne (écriture atomique); retourne la taille"""
+    columns: Dict[str, None] = {}
+    for row in rows:
+        for name in row:
+            columns.setdefault(name)
+
+    footer: Dict[str, Any] = {"rows": len(rows), "columns": []}
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_MAGIC)
+        offset = len(_MAGIC)
+        for name in columns:
+            values, missing = [], []
+            for index, row in enumerate(rows):
+                if name in row:
+                    values.append(row[name])
+                else:
+                    values.append(None)
+                    missing.append(index)
+            block = zlib.compress(json.dumps(values, separators=(",", ":"), default=str).encode("utf-8"), level)
+            f.write(block)
+            entry = {"name": name, "offset": offset, "length": len(block)}
+            if missing:
+                entry["missing"] = missing
+            footer["columns"].append(entry)
+            offset += len(block)
+        encoded = json.dumps(footer, separators=(",", ":")).encode("utf-8")
+        f.write(encoded)
+        f.write(_FOOTER_SIZE.pack(len(encoded)))
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+def read_columnar(path: str, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Relit les lignes (toutes les colonnes, ou seulement `columns`)"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if mapped[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"Fichier de cache invalide: {path}")
+        (footer_length,) = _FOOTER_SIZE.unpack(mapped[-_FOOTER_SIZE.size:])
+        footer_end = len(mapped) - _FOOTER_SIZE.size
+        footer = json.loads(mapped[footer_end - footer_length:footer_end])
+
+        rows: List[Dict[str, Any]] = [{} for _ in range(footer["rows"])]
+        for entry in footer["columns"]:
+            name = entry["name"]
+            if columns is not None and name not in columns:
+                continue
+            block = memoryview(mapped)[entry["offset"]:entry["offset"] + entry["length"]]
+            try:
+                values = json.loads(zlib.decompress(block))
+            finally:
+                block.release()
+            missing = set(entry.get("missing", ()))
+            for index, (row, value) in enumerate(zip(rows, values)):
+                if index not in missing:
+                    row[name] = value
+        return rows
+
+# =============================================================================
+# CACHE (FICHIERS + INDEX SQLITE)
+# =============================================================================
+
+class ExportCache:
+    """Exports locaux indexés par clé de requête"""
+
+    def __init__(
+        self,
+        directory: str = EXPORT_CACHE_DIR,
+        ttl_seconds: float = EXPORT_CACHE_TTL_SECONDS,
+        max_bytes: int = EXPORT_CACHE_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def put(self, key: str, rows: List[Dict[str, Any]], query: str = "") -> Dict[str, Any]:
+        """Enregistre les lignes d'un export en cours (statut `stored`)"""
+        path = os.path.join(self.directory, f"{key}.agcol")
+        size = write_columnar(path, rows)
+        created = _now().isoformat(timespec="seconds")
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO exports (key, path, query, rows, size_bytes, created_at, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, path, query, len(rows), size, created, EXPORT_STORED),
+            )
+        self.evict()
+        return {"key": key, "rows": len(rows), "size_bytes": size}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM exports WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def fresh_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Entrée d'un export identique encore frais (sans lire ses lignes), sinon None"""
+        entry = self.get(key)
+        if entry is None or self.ttl_seconds <= 0 or entry["status"] == EXPORT_FAILED:
+            return None
+        cutoff = (_now() - timedelta(seconds=self.ttl_seconds)).isoformat(timespec="seconds")
+        if entry["created_at"] < cutoff:
+            return None
+        return entry
+
+    def lookup(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Lignes d'un export identique encore frais, sinon None"""
+        entry = self.fresh_entry(key)
+        if entry is None:
+            return None
+        try:
+            rows = read_columnar(entry["path"])
+        except (OSError, ValueError):
+            return None
+        inc_metric("agent_export_cache_hits_total")
+        return rows
+
+    def mark_uploaded(self, key: str, sheet_url: str) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE exports SET status = ?, sheet_url = ?, uploaded_at = ?, last_error = NULL WHERE key = ?",
+                (EXPORT_UPLOADED, sheet_url, _now().isoformat(timespec="seconds"), key),
+            )
+
+    def mark_pending(self, key: str) -> None:
+        """Met un export en file de rejeu (envoi différé après un échec Google)"""
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE exports SET status = ?, attempts = 0 WHERE key = ?", (EXPORT_PENDING, key))
+
+    def mark_attempt_failed(self, key: str, error: str, max_attempts: int = EXPORT_REPLAY_MAX_ATTEMPTS) -> None:
+        """Échec d'envoi; abandon (`failed`) après `max_attempts` tentatives"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE exports SET attempts = attempts + 1, last_error = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN ? ELSE status END WHERE key = ?",
+                (error, max_attempts, EXPORT_FAILED, key),
+            )
+
+    def pending(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Exports en attente d'envoi, du plus ancien au plus récent"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM exports WHERE status = ? ORDER BY created_at, key LIMIT ?",
+                (EXPORT_PENDING, -1 if limit is None else limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM exports ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS count, SUM(size_bytes) AS size_bytes FROM exports GROUP BY status"
+            ).fetchall()
+        return {row["status"]: {"count": row["count"], "size_bytes": row["size_bytes"] or 0} for row in rows}
+
+    def evict(self) -> int:
+        """Supprime les plus anciens exports déjà envoyés au-delà de `max_bytes`"""
+        if self.max_bytes <= 0:
+            return 0
+        with closing(self._connect()) as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM exports").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            candidates = conn.execute(
+                "SELECT key, path, size_bytes FROM exports WHERE status NOT IN (?, ?) ORDER BY created_at, key",
+                (EXPORT_PENDING, EXPORT_STORED),
+            ).fetchall()
+            evicted = []
+            for row in candidates:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(row["path"])
+                except FileNotFoundError:
+                    pass
+                evicted.append(row["key"])
+                total -= row["size_bytes"]
+            conn.executemany("DELETE FROM exports WHERE key = ?", [(key,) for key in evicted])
+        return len(evicted)
+
+# =============================================================================
+# REJEU DES EXPORTS EN ATTENTE
+# =============================================================================
+
+# (lignes, entrée de l'index) -> URL du classeur créé
+UploadFunction = Callable[[List[Dict[str, Any]], Dict[str, Any]], str]
+
+class ExportReplayer:
+    """Renvoie vers Google les exports `pending`, ponctuellement ou en tâche de fond"""
+
+    def __init__(
+        self,
+        cache: ExportCache,
+        upload: UploadFunction,
+        interval: float = EXPORT_REPLAY_INTERVAL,
+        max_attempts: int = EXPORT_REPLAY_MAX_ATTEMPTS,
+    ):
+        self.cache = cache
+        self.upload = upload
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Dict[str, Any]:
+        """Un passage: envoie les exports en attente jusqu'au premier échec"""
+        report: Dict[str, Any] = {"uploaded": [], "failed": {}}
+        for entry in self.cache.pending():
+            try:
+                rows = read_columnar(entry["path"])
+                url = self.upload(rows, entry)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                self.cache.mark_attempt_failed(entry["key"], error, self.max_attempts)
+                report["failed"][entry["key"]] = error
+                inc_metric("agent_export_replay_total", outcome="failed")
+                # Google probablement encore indisponible: on réessaiera au prochain passage
+                break
+            self.cache.mark_uploaded(entry["key"], url)
+            report["uploaded"].append(entry["key"])
+            inc_metric("agent_export_replay_total", outcome="uploaded")
+        self.last_report = report
+        return report
+
+    def start(self) -> "ExportReplayer":
+        """Démarre le rejeu de fond (un passage toutes les `interval` secondes)"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="agent-export-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_report = {"error": f"{type(e).__name__}: {e}"}
+
+# =============================================================================
+# INTÉGRATION AVEC L'AGENT
+# =============================================================================
+
+_default_cache: Optional[ExportCache] = None
+_background_replayer: Optional[ExportReplayer] = None
+_init_lock = threading.Lock()
+
+def get_export_cache() -> Optional[ExportCache]:
+    """Cache partagé (créé à la première utilisation), None si désactivé"""
+    global _default_cache
+    if not EXPORT_CACHE_ENABLED:
+        return None
+    with _init_lock:
+        if _default_cache is None:
+            _default_cache = ExportCache()
+        return _default_cache
+
+def ensure_background_replayer(upload: UploadFunction) -> Optional[ExportReplayer]:
+    """Démarre (une fois) le rejeu de fond du processus"""
+    global _background_replayer
+    cache = get_export_cache()
+    if cache is None or EXPORT_REPLAY_INTERVAL <= 0:
+        return None
+    with _init_lock:
+        if _background_replayer is None:
+            _background_replayer = ExportReplayer(cache, upload).start()
+        return _background_replayer
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Cache local des exports et rejeu vers Google Sheets")
+    parser.add_argument("--dir", default=EXPORT_CACHE_DIR, help="Répertoire du cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Exports par statut")
+    listing = subparsers.add_parser("list", help="Derniers exports enregistrés")
+    listing.add_argument("--limit", type=int, default=20)
+    subparsers.add_parser("replay", help="Un passage du rejeu des exports en attente")
+
+    args = parser.parse_args(argv)
+    cache = ExportCache(args.dir)
+
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2, ensure_ascii=False))
+        return 0
+
+    if args.command == "list":
+        print(json.dumps(cache.list(args.limit), indent=2, ensure_ascii=False))
+        return 0
+
+    # Import tardif: le module graph initialise LLM et clients Google
+    from agent.graph import replay_export
+
+    report = ExportReplayer(cache, replay_export).run_once()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,819 @@
+#!/usr/bin/env python3
+"""
+Faux serveur Google Sheets v4 / Drive v3 pour tests et benchmarks hors ligne
+
+Implémente, en mémoire et sur localhost, le sous-ensemble de l'API REST
+utilisé par l'agent, les scripts de nettoyage et le serveur MCP:
+- Drive v3: files create/list/get/update/delete, emptyTrash, permissions,
+  about (storageQuota), requêtes batch HTTP (multipart/mixed), uploads
+  multipart et resumable (import CSV converti en spreadsheet);
+- Sheets v4: spreadsheets create/get/batchUpdate, values get/update/append/
+  batchUpdate.
+
+Latence et erreurs de quota (429 avec Retry-After) sont configurables. Les
+vrais clients (gspread, googleapiclient) y sont redirigés par
+`GOOGLE_API_ENDPOINT` (agent.google_endpoint).
+
+Usage:
+    python -m agent.fake_google --port 8765 --latency 0.05 --write-quota 60
+    GOOGLE_API_ENDPOINT=http://127.0.0.1:8765 langgraph dev
+"""
+
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+
+SPREADSHEET_MIME_TYPE = "application/vnd.google-apps.spreadsheet"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+DEFAULT_STORAGE_LIMIT = 15 * 1024 ** 3
+
+_WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+def _converted(value: str) -> Any:
+    """Valeur d'une cellule importée: nombres reconnus comme le fait la conversion Google"""
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+class FakeGoogleError(Exception):
+    """Erreur renvoyée au client au format des API Google"""
+
+    def __init__(self, status: int, message: str, reason: str = "", headers: Optional[Dict[str, str]] = None):
+        """Erreur HTTP `status` avec raison et en-têtes de réponse"""
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+
+    def body(self) -> Dict[str, Any]:
+        """Corps JSON de l'erreur, comme le renvoient les API Google"""
+        status_names = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED"}
+        return {
+            "error": {
+                "code": self.status,
+                "message": str(self),
+                "status": status_names.get(self.status, "UNKNOWN"),
+                "errors": [{"reason": self.reason or "error", "message": str(self)}],
+            }
+        }
+
+# =============================================================================
+# REQUÊTES DRIVE (q=...)
+# =============================================================================
+
+_CLAUSE_PATTERNS = [
+    (re.compile(r"^name\s+contains\s+'(.*)'$", re.S), lambda f, v: v in f["name"]),
+    (re.compile(r"^name\s*=\s*'(.*)'$", re.S), lambda f, v: f["name"] == v),
+    (re.compile(r"^mimeType\s*=\s*'(.*)'$", re.S), lambda f, v: f["mimeType"] == v),
+    (re.compile(r"^mimeType\s*!=\s*'(.*)'$", re.S), lambda f, v: f["mimeType"] != v),
+    (re.compile(r"^trashed\s*=\s*(true|false)$"), lambda f, v: f["trashed"] == (v == "true")),
+    (re.compile(r"^createdTime\s*<\s*'(.*)'$"), lambda f, v: f["createdTime"] < v),
+    (re.compile(r"^createdTime\s*>\s*'(.*)'$"), lambda f, v: f["createdTime"] > v),
+    (re.compile(r"^'(.*)'\s+in\s+parents$"), lambda f, v: v in f["parents"]),
+]
+
+def _unescape(value: str) -> str:
+    return value.replace("\\'", "'").replace("\\\\", "\\")
+
+def compile_drive_query(query: Optional[str]):
+    """Compile le sous-ensemble de la syntaxe `q` utilisé par le projet"""
+    if not query:
+        return lambda f: True
+    predicates = []
+    for clause in re.split(r"\s+and\s+(?=(?:[^']*'[^']*')*[^']*$)", query.strip()):
+        for pattern, predicate in _CLAUSE_PATTERNS:
+            match = pattern.match(clause.strip())
+            if match:
+                value = _unescape(match.group(1))
+                predicates.append(lambda f, p=predicate, v=value: p(f, v))
+                break
+        else:
+            raise FakeGoogleError(400, f"Invalid Value: clause non supportée: {clause}", "invalid")
+    return lambda f: all(predicate(f) for predicate in predicates)
+
+# =============================================================================
+# RÉFÉRENCES A1
+# =============================================================================
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+def _column_letters(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+def parse_a1_range(range_name: str) -> Tuple[Optional[str], int, int]:
+    """'Feuille'!B3:D9 -> (titre, ligne de départ, colonne de départ), base 0"""
+    title, _, cells = range_name.rpartition("!")
+    title = title.strip("'").replace("''", "'") if title else None
+    if not title and not re.match(r"^[A-Za-z]*\d*(:[A-Za-z]*\d*)?$", cells):
+        return cells.strip("'"), 0, 0  # nom de feuille seul
+    match = re.match(r"^([A-Za-z]*)(\d*)", cells)
+    column = _column_index(match.group(1)) if match and match.group(1) else 0
+    row = int(match.group(2)) - 1 if match and match.group(2) else 0
+    return title, row, column
+
+# =============================================================================
+# ÉTAT EN MÉMOIRE
+# =============================================================================
+
+class FakeGoogleBackend:
+    """Stockage en mémoire des fichiers Drive et des spreadsheets"""
+
+    def __init__(self, storage_limit: int = DEFAULT_STORAGE_LIMIT):
+        """Backend vide; `storage_limit` borne le quota Drive simulé (octets)"""
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.spreadsheets: Dict[str, Dict[str, Any]] = {}
+        self.storage_limit = storage_limit
+        self.lock = threading.RLock()
+
+    # ---- Drive -----------------------------------------------------------
+
+    def _file(self, file_id: str) -> Dict[str, Any]:
+        file = self.files.get(file_id)
+        if file is None:
+            raise FakeGoogleError(404, f"File not found: {file_id}.", "notFound")
+        return file
+
+    def _size(self, file_id: str) -> int:
+        spreadsheet = self.spreadsheets.get(file_id)
+        if spreadsheet is None:
+            return int(self.files[file_id].get("size", 0))
+        return sum(len(str(value)) for sheet in spreadsheet["sheets"] for row in sheet["values"] for value in row)
+
+    def _file_resource(self, file: Dict[str, Any]) -> Dict[str, Any]:
+        resource = {key: value for key, value in file.items() if key != "permissions"}
+        resource["size"] = str(self._size(file["id"]))
+        resource["quotaBytesUsed"] = resource["size"]
+        resource["webViewLink"] = (
+            f"https://docs.google.com/spreadsheets/d/{file['id']}/edit"
+            if file["mimeType"] == SPREADSHEET_MIME_TYPE
+            else f"https://drive.google.com/file/d/{file['id']}/view"
+        )
+        return resource
+
+    def create_file(self, body: Dict[str, Any], content: Optional[bytes] = None) -> Dict[str, Any]:
+        """Drive `files.create` (contenu optionnel: upload)"""
+        with self.lock:
+            file_id = uuid.uuid4().hex + uuid.uuid4().hex[:12]
+            file = {
+                "id": file_id,
+                "kind": "drive#file",
+                "name": body.get("name", "Untitled"),
+                "mimeType": body.get("mimeType", "application/octet-stream"),
+                "parents": list(body.get("parents") or ["root"]),
+                "createdTime": _timestamp(),
+                "modifiedTime": _timestamp(),
+                "trashed": False,
+                "permissions": [],
+            }
+            if content is not None:
+                file["size"] = len(content)
+                file["content"] = content.decode("utf-8", errors="replace")
+            self.files[file_id] = file
+            if file["mimeType"] == SPREADSHEET_MIME_TYPE:
+                self._new_spreadsheet(file_id, file["name"], rows=file.pop("content", None))
+            return self._file_resource(file)
+
+    def list_files(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """Drive `files.list` (sous-ensemble de la syntaxe `q`, pagination)"""
+        predicate = compile_drive_query(params.get("q"))
+        page_size = max(1, min(1000, int(params.get("pageSize", 100))))
+        start = int(params.get("pageToken") or 0)
+        with self.lock:
+            matches = [file for file in self.files.values() if predicate(file)]
+            order_by = params.get("orderBy", "")
+            if order_by:
+                key, _, direction = order_by.split(",")[0].strip().partition(" ")
+                matches.sort(key=lambda f: f.get(key, ""), reverse=direction.strip() == "desc")
+            page = [self._file_resource(file) for file in matches[start:start + page_size]]
+        result: Dict[str, Any] = {"kind": "drive#fileList", "files": page}
+        if start + page_size < len(matches):
+            result["nextPageToken"] = str(start + page_size)
+        return result
+
+    def get_file(self, file_id: str) -> Dict[str, Any]:
+        """Drive `files.get` (404 si absent)"""
+        with self.lock:
+            return self._file_resource(self._file(file_id))
+
+    def update_file(self, file_id: str, params: Dict[str, str], body: Dict[str, Any]) -> Dict[str, Any]:
+        """Drive `files.update` (nom, corbeille, parents ajoutés/retirés)"""
+        with self.lock:
+            file = self._file(file_id)
+            removed = set(filter(None, params.get("removeParents", "").split(",")))
+            added = [parent for parent in params.get("addParents", "").split(",") if parent]
+            file["parents"] = [parent for parent in file["parents"] if parent not in removed] + added
+            for key in ("name", "trashed"):
+                if key in body:
+                    file[key] = body[key]
+            file["modifiedTime"] = _timestamp()
+            return self._file_resource(file)
+
+    def delete_file(self, file_id: str) -> None:
+        """Drive `files.delete` (suppression définitive)"""
+        with self.lock:
+            self._file(file_id)
+            self.files.pop(file_id)
+            self.spreadsheets.pop(file_id, None)
+
+    def empty_trash(self) -> None:
+        """Drive `files.emptyTrash`"""
+        with self.lock:
+            for file_id in [file_id for file_id, file in self.files.items() if file["trashed"]]:
+                self.delete_file(file_id)
+
+    def add_permission(self, file_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Drive `permissions.create`"""
+        with self.lock:
+            file = self._file(file_id)
+            permission = dict(body, id=uuid.uuid4().hex[:20], kind="drive#permission")
+            file["permissions"].append(permission)
+            return permission
+
+    def about(self) -> Dict[str, Any]:
+        """Drive `about.get` (quota de stockage)"""
+        with self.lock:
+            usage = sum(self._size(file_id) for file_id in self.files)
+            trash = sum(self._size(file_id) for file_id, file in self.files.items() if file["trashed"])
+        return {
+            "kind": "drive#about",
+            "storageQuota": {
+                "limit": str(self.storage_limit),
+                "usage": str(usage),
+                "usageInDrive": str(usage),
+                "usageInDriveTrash": str(trash),
+            },
+        }
+
+    # ---- Sheets ----------------------------------------------------------
+
+    def _new_spreadsheet(self, spreadsheet_id: str, title: str, rows: Optional[str] = None) -> Dict[str, Any]:
+        values: List[List[Any]] = []
+        if rows:
+            # Import CSV (conversion Drive -> Google Sheets)
+            import csv
+            import io
+            values = [[_converted(value) for value in row] for row in csv.reader(io.StringIO(rows))]
+        spreadsheet = {
+            "spreadsheetId": spreadsheet_id,
+            "title": title,
+            "sheets": [self._new_sheet(0, "Sheet1", 0, values)],
+            "next_sheet_id": 1,
+        }
+        self.spreadsheets[spreadsheet_id] = spreadsheet
+        return spreadsheet
+
+    @staticmethod
+    def _new_sheet(sheet_id: int, title: str, index: int, values: Optional[List[List[Any]]] = None) -> Dict[str, Any]:
+        return {"sheetId": sheet_id, "title": title, "index": index, "values": values or [],
+                "rowCount": 1000, "columnCount": 26}
+
+    def _spreadsheet(self, spreadsheet_id: str) -> Dict[str, Any]:
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            raise FakeGoogleError(404, f"Requested entity was not found: {spreadsheet_id}", "notFound")
+        return spreadsheet
+
+    def _sheet(self, spreadsheet: Dict[str, Any], title: Optional[str]) -> Dict[str, Any]:
+        if title is None:
+            return spreadsheet["sheets"][0]
+        for sheet in spreadsheet["sheets"]:
+            if sheet["title"] == title:
+                return sheet
+        raise FakeGoogleError(400, f"Unable to parse range: {title}", "badRequest")
+
+    def spreadsheet_resource(self, spreadsheet_id: str) -> Dict[str, Any]:
+        """Ressource spreadsheet au format de l'API Sheets"""
+        with self.lock:
+            spreadsheet = self._spreadsheet(spreadsheet_id)
+            return {
+                "spreadsheetId": spreadsheet_id,
+                "properties": {"title": spreadsheet["title"], "locale": "fr_FR", "timeZone": "Europe/Paris"},
+                "sheets": [
+                    {
+                        "properties": {
+                            "sheetId": sheet["sheetId"],
+                            "title": sheet["title"],
+                            "index": sheet["index"],
+                            "sheetType": "GRID",
+                            "gridProperties": {
+                                "rowCount": max(sheet["rowCount"], len(sheet["values"])),
+                                "columnCount": sheet["columnCount"],
+                            },
+                        }
+                    }
+                    for sheet in spreadsheet["sheets"]
+                ],
+                "spreadsheetUrl": f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit",
+            }
+
+    def create_spreadsheet(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Sheets `spreadsheets.create` (fichier Drive associé compris)"""
+        title = (body.get("properties") or {}).get("title", "Untitled spreadsheet")
+        created = self.create_file({"name": title, "mimeType": SPREADSHEET_MIME_TYPE})
+        return self.spreadsheet_resource(created["id"])
+
+    def batch_update(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Sheets `batchUpdate` (ajout, renommage, redimensionnement de feuilles)"""
+        replies = []
+        with self.lock:
+            spreadsheet = self._spreadsheet(spreadsheet_id)
+            for request in body.get("requests", []):
+                reply: Dict[str, Any] = {}
+                if "addSheet" in request:
+                    properties = request["addSheet"].get("properties", {})
+                    sheet = self._new_sheet(
+                        spreadsheet["next_sheet_id"],
+                        properties.get("title", f"Sheet{spreadsheet['next_sheet_id'] + 1}"),
+                        len(spreadsheet["sheets"]),
+                    )
+                    spreadsheet["next_sheet_id"] += 1
+                    spreadsheet["sheets"].append(sheet)
+                    reply = {"addSheet": {"properties": {"sheetId": sheet["sheetId"], "title": sheet["title"], "index": sheet["index"]}}}
+                elif "deleteSheet" in request:
+                    sheet_id = request["deleteSheet"]["sheetId"]
+                    spreadsheet["sheets"] = [sheet for sheet in spreadsheet["sheets"] if sheet["sheetId"] != sheet_id]
+                elif "updateSpreadsheetProperties" in request:
+                    title = request["updateSpreadsheetProperties"].get("properties", {}).get("title")
+                    if title:
+                        spreadsheet["title"] = title
+                        self.files[spreadsheet_id]["name"] = title
+                elif "updateSheetProperties" in request:
+                    properties = request["updateSheetProperties"].get("properties", {})
+                    for sheet in spreadsheet["sheets"]:
+                        if sheet["sheetId"] == properties.get("sheetId"):
+                            sheet["title"] = properties.get("title", sheet["title"])
+                            grid = properties.get("gridProperties", {})
+                            sheet["rowCount"] = grid.get("rowCount", sheet["rowCount"])
+                            sheet["columnCount"] = grid.get("columnCount", sheet["columnCount"])
+                # Formatage et autres requêtes: acceptés sans effet
+                replies.append(reply)
+        return {"spreadsheetId": spreadsheet_id, "replies": replies}
+
+    def get_values(self, spreadsheet_id: str, range_name: str) -> Dict[str, Any]:
+        """Sheets `values.get`"""
+        with self.lock:
+            title, row, column = parse_a1_range(range_name)
+            sheet = self._sheet(self._spreadsheet(spreadsheet_id), title)
+            values = [list(r[column:]) for r in sheet["values"][row:]]
+        while values and not any(v != "" for v in values[-1]):
+            values.pop()
+        return {"range": range_name, "majorDimension": "ROWS", "values": values}
+
+    def update_values(self, spreadsheet_id: str, range_name: str, values: List[List[Any]]) -> Dict[str, Any]:
+        """Sheets `values.update`"""
+        with self.lock:
+            title, row, column = parse_a1_range(range_name)
+            sheet = self._sheet(self._spreadsheet(spreadsheet_id), title)
+            self._write(sheet, row, column, values)
+            return self._update_summary(spreadsheet_id, sheet, row, column, values)
+
+    def append_values(self, spreadsheet_id: str, range_name: str, values: List[List[Any]]) -> Dict[str, Any]:
+        """Sheets `values.append` (à la suite des lignes existantes)"""
+        with self.lock:
+            title, _, column = parse_a1_range(range_name)
+            sheet = self._sheet(self._spreadsheet(spreadsheet_id), title)
+            row = len(sheet["values"])
+            self._write(sheet, row, column, values)
+            summary = self._update_summary(spreadsheet_id, sheet, row, column, values)
+        return {"spreadsheetId": spreadsheet_id, "tableRange": f"'{sheet['title']}'!A1", "updates": summary}
+
+    @staticmethod
+    def _write(sheet: Dict[str, Any], row: int, column: int, values: List[List[Any]]) -> None:
+        grid = sheet["values"]
+        while len(grid) < row + len(values):
+            grid.append([])
+        for offset, new_row in enumerate(values):
+            target = grid[row + offset]
+            if len(target) < column + len(new_row):
+                target.extend([""] * (column + len(new_row) - len(target)))
+            target[column:column + len(new_row)] = new_row
+
+    @staticmethod
+    def _update_summary(spreadsheet_id: str, sheet: Dict[str, Any], row: int, column: int, values: List[List[Any]]) -> Dict[str, Any]:
+        width = max((len(r) for r in values), default=0)
+        end = f"{_column_letters(column + max(width, 1) - 1)}{row + max(len(values), 1)}"
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "updatedRange": f"'{sheet['title']}'!{_column_letters(column)}{row + 1}:{end}",
+            "updatedRows": len(values),
+            "updatedColumns": width,
+            "updatedCells": sum(len(r) for r in values),
+        }
+
+    def sheet_values(self, spreadsheet_id: str, index: int = 0) -> List[List[Any]]:
+        """Valeurs d'une feuille (assertions dans les tests)"""
+        with self.lock:
+            return [list(row) for row in self._spreadsheet(spreadsheet_id)["sheets"][index]["values"]]
+
+# =============================================================================
+# ROUTAGE REST
+# =============================================================================
+
+_ROUTES: List[Tuple[str, "re.Pattern[str]", str]] = [
+    ("POST", re.compile(r"^/batch/drive/v3$"), "drive_batch"),
+    ("POST", re.compile(r"^/(?:upload/)?drive/v3/files$"), "drive_create"),
+    ("PUT", re.compile(r"^/upload/drive/v3/files$"), "drive_upload_chunk"),
+    ("GET", re.compile(r"^/drive/v3/files$"), "drive_list"),
+    ("DELETE", re.compile(r"^/drive/v3/files/trash$"), "drive_empty_trash"),
+    ("GET", re.compile(r"^/drive/v3/about$"), "drive_about"),
+    ("POST", re.compile(r"^/drive/v3/files/([^/]+)/permissions$"), "drive_permission"),
+    ("GET", re.compile(r"^/drive/v3/files/([^/]+)$"), "drive_get"),
+    ("PATCH", re.compile(r"^/(?:upload/)?drive/v3/files/([^/]+)$"), "drive_update"),
+    ("DELETE", re.compile(r"^/drive/v3/files/([^/]+)$"), "drive_delete"),
+    ("POST", re.compile(r"^/v4/spreadsheets$"), "sheets_create"),
+    ("GET", re.compile(r"^/v4/spreadsheets/([^/:]+)$"), "sheets_get"),
+    ("POST", re.compile(r"^/v4/spreadsheets/([^/:]+):batchUpdate$"), "sheets_batch_update"),
+    ("POST", re.compile(r"^/v4/spreadsheets/([^/:]+)/values:batchUpdate$"), "values_batch_update"),
+    ("POST", re.compile(r"^/v4/spreadsheets/([^/:]+)/values/(.+):append$"), "values_append"),
+    ("GET", re.compile(r"^/v4/spreadsheets/([^/:]+)/values/(.+)$"), "values_get"),
+    ("PUT", re.compile(r"^/v4/spreadsheets/([^/:]+)/values/(.+)$"), "values_update"),
+]
+
+def _json_body(body: bytes) -> Dict[str, Any]:
+    return json.loads(body.decode("utf-8")) if body else {}
+
+def _multipart_related(headers: Dict[str, str], body: bytes) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """Upload Drive multipart/related: (métadonnées JSON, contenu)"""
+    content_type = headers.get("content-type", "")
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    parts = list(message.iter_parts())
+    metadata = json.loads(parts[0].get_payload(decode=True) or b"{}") if parts else {}
+    content = parts[1].get_payload(decode=True) if len(parts) > 1 else None
+    return metadata, content
+
+class FakeGoogleServer:
+    """Serveur HTTP local (thread) exposant le faux backend Google"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        quota_error_rate: float = 0.0,
+        quota_errors_every: int = 0,
+        read_quota_per_minute: int = 0,
+        write_quota_per_minute: int = 0,
+        retry_after: Optional[float] = None,
+        seed: Optional[int] = None,
+        backend: Optional[FakeGoogleBackend] = None,
+    ):
+        """Serveur non démarré; latence, quotas et 429 injectées configurables"""
+        self.backend = backend or FakeGoogleBackend()
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_error_rate = quota_error_rate
+        self.quota_errors_every = quota_errors_every
+        self.quotas = {"read": read_quota_per_minute, "write": write_quota_per_minute}
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.quota_errors = 0
+        self._windows = {"read": deque(), "write": deque()}
+        self._random = random.Random(seed)
+        self._counter_lock = threading.Lock()
+        self._requests = 0
+        self._uploads: Dict[str, Dict[str, Any]] = {}  # sessions d'upload resumable
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL de base à passer dans `GOOGLE_API_ENDPOINT`"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self) -> None:
+        """Remet à zéro les compteurs d'appels et d'erreurs de quota"""
+        with self._counter_lock:
+            self.calls.clear()
+            self.quota_errors = 0
+
+    # ---- Cycle de vie ----------------------------------------------------
+
+    def start(self) -> "FakeGoogleServer":
+        """Démarre le serveur dans un thread de fond"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-google", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Sert les requêtes au premier plan (jusqu'à `stop` ou une interruption)"""
+        self._httpd.serve_forever()
+
+    def close(self) -> None:
+        """Ferme la socket d'écoute"""
+        self._httpd.server_close()
+
+    def stop(self) -> None:
+        """Arrête le thread de fond et ferme la socket"""
+        self._httpd.shutdown()
+        self.close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeGoogleServer":
+        """Démarre le serveur (bloc `with`)"""
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        """Arrête le serveur en sortie de bloc"""
+        self.stop()
+
+    # ---- Simulation latence / quotas -------------------------------------
+
+    def _admit(self, method: str) -> None:
+        """Applique latence et quotas; lève une 429 si la requête est refusée"""
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self._random.uniform(0, self.jitter))
+
+        kind = "write" if method in _WRITE_METHODS else "read"
+        with self._counter_lock:
+            self._requests += 1
+            rejected = bool(self.quota_errors_every and self._requests % self.quota_errors_every == 0)
+            rejected = rejected or (self.quota_error_rate > 0 and self._random.random() < self.quota_error_rate)
+
+            limit = self.quotas[kind]
+            window = self._windows[kind]
+            now = time.monotonic()
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if not rejected and limit:
+                rejected = len(window) >= limit
+            if not rejected:
+                window.append(now)
+            else:
+                self.quota_errors += 1
+
+        if rejected:
+            headers = {}
+            if self.retry_after is not None:
+                headers["Retry-After"] = str(self.retry_after)
+            raise FakeGoogleError(
+                429,
+                f"Quota exceeded for quota metric '{kind.capitalize()} requests'.",
+                "rateLimitExceeded",
+                headers,
+            )
+
+    # ---- Dispatch ----------------------------------------------------------
+
+    def dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        """Traite une requête; retourne (statut, en-têtes, corps)"""
+        split = urlsplit(target)
+        path = unquote(split.path)
+        params = {key: values[-1] for key, values in parse_qs(split.query).items()}
+        method = method.upper()
+
+        for route_method, pattern, name in _ROUTES:
+            match = pattern.match(path) if route_method == method else None
+            if match:
+                break
+        else:
+            return self._error(FakeGoogleError(404, f"Route non supportée: {method} {path}", "notFound"))
+
+        with self._counter_lock:
+            self.calls[name] += 1
+
+        try:
+            if name == "drive_batch":
+                return self._batch(headers, body)
+            self._admit(method)
+            result = getattr(self, f"_op_{name}")(*match.groups(), params=params, headers=headers, body=body)
+        except FakeGoogleError as error:
+            return self._error(error)
+        except (ValueError, KeyError) as error:
+            return self._error(FakeGoogleError(400, f"Requête invalide: {error}", "badRequest"))
+
+        if result is None:
+            return 204, {}, b""
+        if isinstance(result, tuple):
+            return result
+        return 200, {"Content-Type": "application/json; charset=UTF-8"}, json.dumps(result).encode("utf-8")
+
+    @staticmethod
+    def _error(error: FakeGoogleError) -> Tuple[int, Dict[str, str], bytes]:
+        headers = dict(error.headers, **{"Content-Type": "application/json; charset=UTF-8"})
+        return error.status, headers, json.dumps(error.body()).encode("utf-8")
+
+    def _batch(self, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        """Requête batch HTTP Drive: chaque partie est traitée (et limitée) séparément"""
+        content_type = headers.get("content-type", "")
+        message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+
+        for part in message.iter_parts():
+            content_id = (part.get("Content-ID") or "").strip("<>")
+            raw = part.get_payload(decode=True) or b""
+            head, _, inner_body = raw.partition(b"\r\n\r\n")
+            if not _:
+                head, _, inner_body = raw.partition(b"\n\n")
+            lines = head.decode("utf-8").splitlines()
+            inner_method, inner_target = lines[0].split(" ")[:2]
+            inner_headers = {}
+            for line in lines[1:]:
+                key, _, value = line.partition(":")
+                inner_headers[key.strip().lower()] = value.strip()
+
+            status, response_headers, response_body = self.dispatch(inner_method, inner_target, inner_headers, inner_body)
+            reason = {200: "OK", 204: "No Content", 404: "Not Found", 429: "Too Many Requests"}.get(status, "Error")
+            response_headers = dict(response_headers, **{"Content-Length": str(len(response_body))})
+            header_lines = "".join(f"{key}: {value}\r\n" for key, value in response_headers.items())
+            chunks.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {reason}\r\n{header_lines}\r\n".encode("utf-8")
+                + response_body + b"\r\n"
+            )
+
+        payload = b"".join(chunks) + f"--{boundary}--\r\n".encode("utf-8")
+        return 200, {"Content-Type": f"multipart/mixed; boundary={boundary}"}, payload
+
+    # ---- Opérations Drive ---------------------------------------------------
+
+    def _op_drive_create(self, params, headers, body):
+        if params.get("uploadType") == "resumable":
+            # Ouverture de session: le contenu suit en PUT sur l'URL `Location`
+            upload_id = uuid.uuid4().hex
+            with self._counter_lock:
+                self._uploads[upload_id] = {"metadata": _json_body(body), "content": bytearray()}
+            location = f"{self.url}/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"
+            return 200, {"Location": location}, b""
+        if "multipart/related" in headers.get("content-type", ""):
+            metadata, content = _multipart_related(headers, body)
+        else:
+            metadata, content = _json_body(body), None
+        return self.backend.create_file(metadata, content)
+
+    def _op_drive_upload_chunk(self, params, headers, body):
+        """Morceau d'un upload resumable (`Content-Range: bytes a-b/total`)"""
+        session = self._uploads.get(params.get("upload_id", ""))
+        if session is None:
+            raise FakeGoogleError(404, "Upload session not found.", "notFound")
+        match = re.match(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)", headers.get("content-range", "bytes */*"))
+        if match is None:
+            raise ValueError(f"Content-Range invalide: {headers.get('content-range')}")
+        start, _, total = match.groups()
+        content = session["content"]
+        if start is not None:
+            if int(start) != len(content):
+                raise FakeGoogleError(400, "Chunk hors séquence.", "badRequest")
+            content.extend(body)
+        if total == "*" or len(content) < int(total):
+            headers = {"Range": f"bytes=0-{len(content) - 1}"} if content else {}
+            return 308, headers, b""
+        with self._counter_lock:
+            self._uploads.pop(params["upload_id"], None)
+        return self.backend.create_file(session["metadata"], bytes(content))
+
+    def _op_drive_list(self, params, headers, body):
+        return self.backend.list_files(params)
+
+    def _op_drive_get(self, file_id, params, headers, body):
+        return self.backend.get_file(file_id)
+
+    def _op_drive_update(self, file_id, params, headers, body):
+        return self.backend.update_file(file_id, params, _json_body(body))
+
+    def _op_drive_delete(self, file_id, params, headers, body):
+        self.backend.delete_file(file_id)
+
+    def _op_drive_empty_trash(self, params, headers, body):
+        self.backend.empty_trash()
+
+    def _op_drive_permission(self, file_id, params, headers, body):
+        return self.backend.add_permission(file_id, _json_body(body))
+
+    def _op_drive_about(self, params, headers, body):
+        return self.backend.about()
+
+    # ---- Opérations Sheets --------------------------------------------------
+
+    def _op_sheets_create(self, params, headers, body):
+        return self.backend.create_spreadsheet(_json_body(body))
+
+    def _op_sheets_get(self, spreadsheet_id, params, headers, body):
+        return self.backend.spreadsheet_resource(spreadsheet_id)
+
+    def _op_sheets_batch_update(self, spreadsheet_id, params, headers, body):
+        return self.backend.batch_update(spreadsheet_id, _json_body(body))
+
+    def _op_values_get(self, spreadsheet_id, range_name, params, headers, body):
+        return self.backend.get_values(spreadsheet_id, range_name)
+
+    def _op_values_update(self, spreadsheet_id, range_name, params, headers, body):
+        return self.backend.update_values(spreadsheet_id, range_name, _json_body(body).get("values", []))
+
+    def _op_values_append(self, spreadsheet_id, range_name, params, headers, body):
+        return self.backend.append_values(spreadsheet_id, range_name, _json_body(body).get("values", []))
+
+    def _op_values_batch_update(self, spreadsheet_id, params, headers, body):
+        responses = [
+            self.backend.update_values(spreadsheet_id, data["range"], data.get("values", []))
+            for data in _json_body(body).get("data", [])
+        ]
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "totalUpdatedCells": sum(r["updatedCells"] for r in responses),
+            "responses": responses,
+        }
+
+    # ---- Handler HTTP ----------------------------------------------------------
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                headers = {key.lower(): value for key, value in self.headers.items()}
+                status, response_headers, payload = server.dispatch(self.command, self.path, headers, body)
+                self.send_response(status)
+                for key, value in response_headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Lance le faux serveur Google au premier plan"""
+    parser = argparse.ArgumentParser(description="Faux serveur Google Sheets/Drive local")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence ajoutée par requête (secondes)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latence aléatoire supplémentaire maximale")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="Probabilité d'une 429 par requête")
+    parser.add_argument("--quota-errors-every", type=int, default=0, help="Une 429 toutes les N requêtes")
+    parser.add_argument("--read-quota", type=int, default=0, help="Lectures autorisées par minute (0 = illimité)")
+    parser.add_argument("--write-quota", type=int, default=0, help="Écritures autorisées par minute (0 = illimité)")
+    parser.add_argument("--retry-after", type=float, default=None, help="En-tête Retry-After des 429")
+    args = parser.parse_args(argv)
+
+    server = FakeGoogleServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        quota_error_rate=args.quota_error_rate,
+        quota_errors_every=args.quota_errors_every,
+        read_quota_per_minute=args.read_quota,
+        write_quota_per_minute=args.write_quota,
+        retry_after=args.retry_after,
+    )
+    print(f"🧪 Faux serveur Google sur {server.url}", file=sys.stderr)
+    print(f"   export GOOGLE_API_ENDPOINT={server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Arrêt du faux serveur Google", file=sys.stderr)
+    finally:
+        server.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Couche de récupération des données des sources d'API
+
+Choisit pour chaque source la stratégie de pagination et de cache déclarée
+dans le registre, pousse les filtres supportés côté serveur et applique les
+autres localement, page par page, en s'arrêtant dès que la limite est atteinte.
+
+`plan_source_fetch` estime la même récupération sans requête (mode plan):
+pages, requêtes, pages déjà en cache et octets, à partir du profil observé
+de chaque source (octets par ligne, nombre total de lignes).
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+import requests
+
+from agent.concurrency import concurrency_limit
+from agent.metrics import inc as inc_metric
+from agent.sources import (
+    ApiSource,
+    PAGINATION_NONE,
+    PAGINATION_PAGE,
+    PAGINATION_OFFSET,
+)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+API_TIMEOUT = int(os.getenv("API_TIMEOUT", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# Octets par ligne supposés pour une source jamais récupérée (mode plan)
+PLAN_DEFAULT_ROW_BYTES = int(os.getenv("PLAN_DEFAULT_ROW_BYTES", "300"))
+
+# =============================================================================
+# CACHE DES RÉPONSES (TTL PAR SOURCE)
+# =============================================================================
+
+_response_cache: Dict[Tuple[str, Tuple], Tuple[float, Any]] = {}
+_cache_lock = threading.Lock()
+
+def _cache_key(url: str, params: Dict[str, Any]) -> Tuple[str, Tuple]:
+    return url, tuple(sorted((k, str(v)) for k, v in params.items()))
+
+def _cache_get(key: Tuple[str, Tuple]) -> Optional[Any]:
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, payload = entry
+    if expires_at < time.monotonic():
+        with _cache_lock:
+            _response_cache.pop(key, None)
+        return None
+    return payload
+
+def _cache_put(key: Tuple[str, Tuple], payload: Any, ttl: int) -> None:
+    if RESPONSE_CACHE_MAX_ENTRIES <= 0:
+        return  # Cache désactivé
+    with _cache_lock:
+        if len(_response_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+            # Éviction du plus ancien (ordre d'insertion)
+            _response_cache.pop(next(iter(_response_cache)), None)
+        _response_cache[key] = (time.monotonic() + ttl, payload)
+
+def clear_response_cache() -> None:
+    """Vide le cache des réponses"""
+    with _cache_lock:
+        _response_cache.clear()
+
+# =============================================================================
+# REQUÊTES HTTP
+# =============================================================================
+
+def _get_json(url: str, params: Dict[str, Any], cache_ttl: int, stats: Dict[str, Any]) -> Any:
+    """GET JSON avec cache optionnel"""
+    key = _cache_key(url, params)
+    if cache_ttl > 0:
+        cached = _cache_get(key)
+        if cached is not None:
+            stats["cache_hits"] += 1
+            inc_metric("agent_upstream_cache_hits_total")
+            return cached
+
+    with concurrency_limit("api"):
+        response = requests.get(url, params=params or None, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    stats["requests"] += 1
+    stats["bytes"] += len(response.content)
+    inc_metric("agent_upstream_requests_total")
+    inc_metric("agent_upstream_bytes_total", len(response.content))
+    payload = response.json()
+
+    if cache_ttl > 0:
+        _cache_put(key, payload, cache_ttl)
+    return payload
+
+# =============================================================================
+# PROFIL OBSERVÉ DES SOURCES (MODE PLAN)
+# =============================================================================
+
+# nom de source → {"row_bytes": octets moyens par ligne, "total_rows": lignes de la source}
+_source_profiles: Dict[str, Dict[str, float]] = {}
+
+def _record_profile(source: ApiSource, stats: Dict[str, Any], scanned: int, total: Optional[int]) -> None:
+    profile = _source_profiles.setdefault(source.name, {})
+    if scanned and stats["requests"] and not stats["cache_hits"]:
+        row_bytes = stats["bytes"] / scanned
+        previous = profile.get("row_bytes")
+        profile["row_bytes"] = row_bytes if previous is None else 0.8 * previous + 0.2 * row_bytes
+    if total is not None:
+        profile["total_rows"] = total
+
+def source_profile(name: str) -> Dict[str, float]:
+    """Octets par ligne et nombre total de lignes observés pour une source"""
+    return dict(_source_profiles.get(name) or {})
+
+def _as_rows(payload: Any) -> List[Dict]:
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        return [payload]
+    return []
+
+def _new_stats() -> Dict[str, Any]:
+    return {"requests": 0, "bytes": 0, "cache_hits": 0, "pages": 0, "pushed_filters": [], "local_filters": []}
+
+# =============================================================================
+# FILTRES
+# =============================================================================
+
+def split_filters(source: ApiSource, filters: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Sépare les filtres poussables côté serveur des filtres à appliquer localement"""
+    pushed, local = {}, {}
+    for key, value in (filters or {}).items():
+        if not source.has_field(key):
+            continue
+        try:
+            value = source.coerce_filter_value(key, value)
+        except (TypeError, ValueError):
+            continue
+        if key in source.pushable_filters:
+            pushed[key] = value
+        else:
+            local[key] = value
+    return pushed, local
+
+def _query_value(value: Any) -> Any:
+    # JSONPlaceholder attend true/false en minuscules
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+def _matches(item: Dict, local_filters: Dict[str, Any]) -> bool:
+    return all(item.get(key) == value for key, value in local_filters.items())
+
+# =============================================================================
+# RÉCUPÉRATION PAR SOURCE
+# =============================================================================
+
+def fetch_source_rows(
+    source: ApiSource,
+    filters: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = None,
+    stop: Optional[Callable[[List[Dict]], bool]] = None,
+) -> Tuple[List[Dict], Dict[str, Any]]:
+    """Récupère les lignes d'une source selon sa stratégie de pagination
+
+    Retourne les lignes (au plus `limit`, toutes si None) et des statistiques
+    de récupération (requêtes, octets, hits de cache, pages). `stop`, appelé
+    après chaque page avec les lignes déjà lues, interrompt la pagination
+    (récupération spéculative annulée, voir agent.prefetch): `stats["stopped"]`.
+    """
+    stats = _new_stats()
+    pushed, local = split_filters(source, filters)
+    stats["pushed_filters"] = sorted(pushed)
+    stats["local_filters"] = sorted(local)
+
+    base_params = {key: _query_value(value) for key, value in pushed.items()}
+    rows: List[Dict] = []
+    scanned = 0
+    exhausted = False  # toute la source (ou la réponse filtrée côté serveur) a été lue
+
+    def collect(page_rows: List[Dict]) -> bool:
+        """Ajoute une page filtrée, retourne True quand la limite est atteinte"""
+        nonlocal scanned
+        scanned += len(page_rows)
+        for item in page_rows:
+            if not local or _matches(item, local):
+                rows.append(item)
+                if limit is not None and len(rows) >= limit:
+                    return True
+        return False
+
+    if source.pagination == PAGINATION_NONE:
+        payload = _get_json(source.url, base_params, source.cache_ttl, stats)
+        stats["pages"] = 1
+        collect(_as_rows(payload))
+        exhausted = True
+
+    elif source.pagination == PAGINATION_PAGE:
+        page = 1
+        while True:
+            params = dict(base_params, _page=page, _limit=source.page_size)
+            page_rows = _as_rows(_get_json(source.url, params, source.cache_ttl, stats))
+            stats["pages"] += 1
+            if collect(page_rows):
+                break
+            if len(page_rows) < source.page_size:
+                exhausted = True
+                break
+            if stop is not None and stop(rows):
+                stats["stopped"] = True
+                break
+            page += 1
+
+    elif source.pagination == PAGINATION_OFFSET:
+        start = 0
+        while True:
+            page_size = source.page_size
+            if limit is not None and not local:
+                # La limite peut être poussée telle quelle quand tout est filtré côté serveur
+                page_size = min(page_size, limit - len(rows))
+            params = dict(base_params, _start=start, _limit=page_size)
+            page_rows = _as_rows(_get_json(source.url, params, source.cache_ttl, stats))
+            stats["pages"] += 1
+            if collect(page_rows):
+                break
+            if len(page_rows) < page_size:
+                exhausted = True
+                break
+            if stop is not None and stop(rows):
+                stats["stopped"] = True
+                break
+            start += page_size
+
+    _record_profile(source, stats, scanned, scanned if exhausted and not pushed else None)
+    return rows, stats
+
+def _page_params(source: ApiSource, base_params: Dict[str, Any], index: int, limit: Optional[int], local: bool) -> Dict[str, Any]:
+    """Paramètres de la page `index` (mêmes que fetch_source_rows)"""
+    if source.pagination == PAGINATION_PAGE:
+        return dict(base_params, _page=index + 1, _limit=source.page_size)
+    start = index * source.page_size
+    page_size = source.page_size
+    if limit is not None and not local:
+        page_size = min(page_size, limit - start)
+    return dict(base_params, _start=start, _limit=page_size)
+
+def plan_source_fetch(
+    source: ApiSource,
+    filters: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Estime la récupération de fetch_source_rows sans requête
+
+    Le nombre de lignes lues n'est connu que si la limite suffit (aucun filtre
+    local) ou si le total de la source a déjà été observé; sinon `pages`,
+    `requests` et `bytes` valent None. `exact` indique que l'estimation repose
+    sur un profil observé plutôt que sur `PLAN_DEFAULT_ROW_BYTES`.
+    """
+    pushed, local = split_filters(source, filters)
+    profile = source_profile(source.name)
+    total = None if pushed else profile.get("total_rows")
+
+    if source.pagination == PAGINATION_NONE:
+        # Une seule requête qui renvoie toute la réponse
+        scanned = None if total is None else int(total)
+        exhausted = True
+    elif limit is not None and not local:
+        scanned = limit if total is None else min(limit, int(total))
+        exhausted = total is not None and limit >= total
+    else:
+        # Filtre local ou pas de limite: la source est lue jusqu'au bout (au pire)
+        scanned = None if total is None else int(total)
+        exhausted = True
+
+    if source.pagination == PAGINATION_NONE:
+        pages: Optional[int] = 1
+    elif scanned is None:
+        pages = None
+    else:
+        pages = max(1, -(-scanned // source.page_size))
+        if exhausted and scanned % source.page_size == 0:
+            pages += 1  # page courte (vide) qui termine la pagination
+
+    base_params = {key: _query_value(value) for key, value in pushed.items()}
+    cached = 0
+    if source.cache_ttl > 0 and pages:
+        if source.pagination == PAGINATION_NONE:
+            keys = [_cache_key(source.url, base_params)]
+        else:
+            keys = [_cache_key(source.url, _page_params(source, base_params, index, limit, bool(local)))
+                    for index in range(pages)]
+        cached = sum(1 for key in keys if _cache_get(key) is not None)
+
+    row_bytes = profile.get("row_bytes", PLAN_DEFAULT_ROW_BYTES)
+    bytes_estimate = None
+    if scanned is not None and pages:
+        bytes_estimate = int(scanned * row_bytes * (pages - cached) / pages)
+    rows = None
+    if not local:
+        rows = limit if scanned is None else (scanned if limit is None else min(scanned, limit))
+
+    return {
+        "source": source.name,
+        "pagination": source.pagination,
+        "pages": pages,
+        "requests": None if pages is None else pages - cached,
+        "cached_pages": cached,
+        "rows_scanned": scanned,
+        "rows": rows,
+        "bytes": bytes_estimate,
+        "pushed_filters": sorted(pushed),
+        "local_filters": sorted(local),
+        "exact": "row_bytes" in profile and (scanned is not None),
+    }
+
+def fetch_url_rows(url: str, limit: Optional[int] = None) -> Tuple[List[Dict], Dict[str, Any]]:
+    """Récupère une URL arbitraire (hors registre) en une seule requête"""
+    stats = _new_stats()
+    rows = _as_rows(_get_json(url, {}, 0, stats))
+    stats["pages"] = 1
+    if limit is not None:
+        rows = rows[:limit]
+    return rows, stats
@@ -0,0 +1,97 @@
+"""
+Construction des clients Google (gspread, Drive) avec endpoint configurable
+
+Par défaut les clients parlent aux API Google avec les credentials du compte
+de service. Si `GOOGLE_API_ENDPOINT` est défini (ex: http://127.0.0.1:8765,
+voir agent.fake_google), toutes les URL Google sont réécrites vers cet
+endpoint et aucune authentification n'est faite: l'export, les scripts de
+nettoyage et le serveur MCP tournent alors sans credentials ni réseau.
+"""
+
+import os
+from typing import Any, List, Optional
+
+import requests
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT", "").rstrip("/")
+
+# Hôtes réécrits vers l'endpoint configuré (Sheets v4, Drive v3, batch, upload)
+GOOGLE_API_HOSTS = (
+    "https://sheets.googleapis.com",
+    "https://www.googleapis.com",
+)
+
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive"]
+
+def get_google_endpoint() -> str:
+    """Endpoint Google courant ("" = API Google réelles)"""
+    return GOOGLE_API_ENDPOINT
+
+def set_google_endpoint(endpoint: Optional[str]) -> None:
+    """Redirige (ou rétablit avec None) les clients créés ensuite"""
+    global GOOGLE_API_ENDPOINT
+    GOOGLE_API_ENDPOINT = (endpoint or "").rstrip("/")
+
+def rewrite_url(url: str) -> str:
+    """Réécrit une URL d'API Google vers l'endpoint configuré"""
+    if GOOGLE_API_ENDPOINT:
+        for host in GOOGLE_API_HOSTS:
+            if url.startswith(host):
+                return GOOGLE_API_ENDPOINT + url[len(host):]
+    return url
+
+# =============================================================================
+# TRANSPORTS
+# =============================================================================
+
+class EndpointSession(requests.Session):
+    """Session requests (gspread) qui réécrit les URL Google"""
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> requests.Response:
+        return super().request(method, rewrite_url(url), *args, **kwargs)
+
+def _endpoint_http() -> Any:
+    """Transport httplib2 (googleapiclient) qui réécrit les URL Google, batch compris"""
+    import httplib2
+
+    class EndpointHttp(httplib2.Http):
+        def request(self, uri: str, *args: Any, **kwargs: Any) -> Any:
+            return super().request(rewrite_url(uri), *args, **kwargs)
+
+    http = EndpointHttp()
+    # Comme googleapiclient.http.build_http: 308 signale un upload resumable
+    # incomplet, pas une redirection
+    http.redirect_codes = http.redirect_codes - {308}
+    return http
+
+# =============================================================================
+# CLIENTS
+# =============================================================================
+
+def load_credentials(path: str, scopes: List[str]) -> Any:
+    """Credentials du compte de service (None avec un endpoint de test)"""
+    if GOOGLE_API_ENDPOINT:
+        return None
+    from google.oauth2.service_account import Credentials
+
+    return Credentials.from_service_account_file(path, scopes=scopes)
+
+def build_gspread_client(creds: Any) -> Any:
+    """Client gspread (authentifié, ou vers l'endpoint configuré)"""
+    import gspread
+
+    if GOOGLE_API_ENDPOINT:
+        return gspread.Client(None, session=EndpointSession())
+    return gspread.authorize(creds)
+
+def build_drive_service(creds: Any) -> Any:
+    """Service Drive v3 (authentifié, ou vers l'endpoint configuré)"""
+    from googleapiclient.discovery import build
+
+    if GOOGLE_API_ENDPOINT:
+        return build("drive", "v3", http=_endpoint_http(), cache_discovery=False, static_discovery=True)
+    return build("drive", "v3", credentials=creds, cache_discovery=False)
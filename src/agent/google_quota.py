@@ -0,0 +1,227 @@
+"""
+Limiteur de débit partagé pour les appels Google Sheets / Drive
+
+Sheets et Drive imposent des quotas de lecture et d'écriture par minute.
+Tous les appels Google (export, nettoyage) passent par un même limiteur:
+- un seau à jetons pour les lectures, un autre pour les écritures;
+- des files de priorité: un export interactif passe devant le nettoyage
+  de fond qui attend sur le même seau;
+- un backoff adaptatif: un 429 (ou Retry-After) met le seau en pause et
+  réduit son débit, qui remonte progressivement à chaque succès (AIMD).
+"""
+
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from agent.metrics import inc as inc_metric
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+GOOGLE_READ_REQUESTS_PER_MINUTE = float(os.getenv("GOOGLE_READ_REQUESTS_PER_MINUTE", "60"))
+GOOGLE_WRITE_REQUESTS_PER_MINUTE = float(os.getenv("GOOGLE_WRITE_REQUESTS_PER_MINUTE", "60"))
+GOOGLE_QUOTA_BURST = int(os.getenv("GOOGLE_QUOTA_BURST", "10"))
+GOOGLE_MAX_RETRIES = int(os.getenv("GOOGLE_MAX_RETRIES", "5"))
+GOOGLE_BACKOFF_BASE = float(os.getenv("GOOGLE_BACKOFF_BASE", "1.0"))
+GOOGLE_BACKOFF_MAX = float(os.getenv("GOOGLE_BACKOFF_MAX", "64.0"))
+
+READ = "read"
+WRITE = "write"
+
+# Plus petit = plus prioritaire
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Le débit adaptatif ne descend jamais sous cette fraction du quota configuré
+_MIN_RATE_FRACTION = 0.1
+# Remontée additive du débit après chaque succès (fraction du quota)
+_RATE_RECOVERY_STEP = 0.05
+
+# =============================================================================
+# SEAU À JETONS AVEC FILES DE PRIORITÉ
+# =============================================================================
+
+class TokenBucket:
+    """Seau à jetons thread-safe avec priorités et pause adaptative"""
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int = GOOGLE_QUOTA_BURST):
+        self.name = name
+        self.configured_rate = requests_per_minute / 60.0
+        self.rate = self.configured_rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self.stats = {"acquired": 0, "waited_seconds": 0.0, "throttled": 0}
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def _wait_time(self, now: float, cost: int) -> float:
+        """0 si les jetons sont disponibles (et consommés), sinon le délai à attendre
+
+        Un appel plus coûteux que la capacité du seau (batch HTTP) part dès que
+        le seau est plein et le laisse en dette: les appels suivants attendent
+        d'autant, ce qui maintient le débit moyen au niveau du quota.
+        """
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        needed = min(cost, self.capacity)
+        if self._tokens >= needed:
+            self._tokens -= cost
+            return 0.0
+        return (needed - self._tokens) / self.rate
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, cost: int = 1) -> float:
+        """Bloque jusqu'à l'obtention de `cost` jetons; retourne le temps attendu"""
+        started = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        wait = self._wait_time(time.monotonic(), cost)
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        self.stats["acquired"] += cost
+        self.stats["waited_seconds"] += waited
+        return waited
+
+    def throttle(self, delay: float) -> None:
+        """Réagit à un 429: pause du seau et division du débit par deux"""
+        with self._cond:
+            self.stats["throttled"] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self.rate = max(self.configured_rate * _MIN_RATE_FRACTION, self.rate / 2)
+            self._tokens = 0.0
+            self._cond.notify_all()
+
+    def record_success(self) -> None:
+        """Remonte progressivement le débit vers le quota configuré"""
+        if self.rate < self.configured_rate:
+            with self._cond:
+                self.rate = min(self.configured_rate, self.rate + self.configured_rate * _RATE_RECOVERY_STEP)
+
+# =============================================================================
+# DÉTECTION DES ERREURS DE QUOTA
+# =============================================================================
+
+def _error_status_and_retry_after(error: Exception) -> Tuple[Optional[int], Optional[str]]:
+    """Extrait (code HTTP, en-tête Retry-After) d'une erreur googleapiclient ou gspread"""
+    # googleapiclient.errors.HttpError
+    resp = getattr(error, "resp", None)
+    if resp is not None and hasattr(resp, "status"):
+        retry_after = resp.get("retry-after") if hasattr(resp, "get") else None
+        return int(resp.status), retry_after
+
+    # gspread.exceptions.APIError (requests.Response)
+    response = getattr(error, "response", None)
+    if response is not None and hasattr(response, "status_code"):
+        return int(response.status_code), response.headers.get("Retry-After")
+
+    return None, None
+
+def quota_retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Délai avant nouvel essai si l'erreur est un dépassement de quota, sinon None"""
+    status, retry_after = _error_status_and_retry_after(error)
+    if status == 429 or (status == 403 and "ratelimitexceeded" in str(error).lower()):
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        backoff = min(GOOGLE_BACKOFF_MAX, GOOGLE_BACKOFF_BASE * (2 ** attempt))
+        return backoff + random.uniform(0, backoff / 4)
+    return None
+
+# =============================================================================
+# LIMITEUR PARTAGÉ
+# =============================================================================
+
+class GoogleRateLimiter:
+    """Point de passage unique des appels Google (lecture/écriture, priorités)"""
+
+    def __init__(
+        self,
+        read_per_minute: float = GOOGLE_READ_REQUESTS_PER_MINUTE,
+        write_per_minute: float = GOOGLE_WRITE_REQUESTS_PER_MINUTE,
+        max_retries: int = GOOGLE_MAX_RETRIES,
+    ):
+        self.buckets = {
+            READ: TokenBucket(READ, read_per_minute),
+            WRITE: TokenBucket(WRITE, write_per_minute),
+        }
+        self.max_retries = max_retries
+
+    def call(self, fn: Callable[..., Any], *args: Any, kind: str = WRITE, priority: int = PRIORITY_INTERACTIVE, cost: int = 1, **kwargs: Any) -> Any:
+        """Exécute un appel Google sous quota, avec réessais sur 429
+
+        `cost` est le nombre de requêtes décomptées par Google (taille d'un batch).
+        """
+        bucket = self.buckets[kind]
+        attempt = 0
+        while True:
+            bucket.acquire(priority, cost)
+            inc_metric("agent_google_calls_total", cost, kind=kind)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as error:
+                delay = quota_retry_delay(error, attempt)
+                if delay is not None:
+                    inc_metric("agent_google_quota_errors_total", kind=kind)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                bucket.throttle(delay)
+                continue
+            bucket.record_success()
+            return result
+
+    def execute(self, request: Any, kind: str = READ, priority: int = PRIORITY_INTERACTIVE) -> Any:
+        """Exécute une requête googleapiclient (`request.execute()`) sous quota"""
+        return self.call(request.execute, kind=kind, priority=priority)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """État des seaux (débit courant, jetons, statistiques)"""
+        return {
+            name: {
+                "rate_per_minute": round(bucket.rate * 60, 2),
+                "configured_per_minute": round(bucket.configured_rate * 60, 2),
+                **bucket.stats,
+            }
+            for name, bucket in self.buckets.items()
+        }
+
+# Instance partagée par l'agent et les scripts de nettoyage
+rate_limiter = GoogleRateLimiter()
+
+def google_call(fn: Callable[..., Any], *args: Any, kind: str = WRITE, priority: int = PRIORITY_INTERACTIVE, cost: int = 1, **kwargs: Any) -> Any:
+    """Raccourci: appel gspread/Drive via le limiteur partagé"""
+    return rate_limiter.call(fn, *args, kind=kind, priority=priority, cost=cost, **kwargs)
+
+def google_execute(request: Any, kind: str = READ, priority: int = PRIORITY_INTERACTIVE) -> Any:
+    """Raccourci: `request.execute()` via le limiteur partagé"""
+    return rate_limiter.execute(request, kind=kind, priority=priority)
@@ -1,8 +1,7 @@
-import requests
 import os
-from typing import Dict, Any, List, Optional, Annotated
+from typing import Dict, Any, List, Optional, Annotated, Tuple
 from typing_extensions import TypedDict
-import re
+import uuid
 from datetime import datetime
 
 # Chargement des variables d'environnement
@@ -17,11 +16,69 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from langgraph.graph import StateGraph, END, START
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 import gspread
 from google.oauth2.service_account import Credentials
 
+from agent.sources import registry as source_registry, ApiSource
+from agent.keyword_matcher import KeywordMatcher, QueryScan
+from agent.blobs import store_rows, load_rows, row_count, release_rows, is_rows_handle
+from agent.concurrency import concurrency_limit
+from agent.google_quota import (
+    google_call,
+    google_execute,
+    READ as GOOGLE_READ,
+    WRITE as GOOGLE_WRITE,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BACKGROUND,
+    GOOGLE_WRITE_REQUESTS_PER_MINUTE,
+    GOOGLE_QUOTA_BURST,
+)
+from agent.fetcher import fetch_url_rows, plan_source_fetch, source_profile, PLAN_DEFAULT_ROW_BYTES
+from agent.retention import record_export, delete_exports, get_index as get_retention_index
+from agent.profiling import profile_run
+from agent.llm_parser import parse_query_params, estimate_parse_tokens
+from agent.metrics import instrument_node, start_metrics_server, inc as inc_metric
+from agent.checkpoints import get_checkpointer, CHECKPOINT_KEEP_COMPLETED
+from agent.prefetch import SPECULATIVE_PREFETCH, start_prefetch, claim_prefetch, discard_prefetch
+from agent.side_effects import SideEffectPlan, SideEffectError, SkipEffect, failed_effects
+from agent.sheet_pool import SheetPool, SHEET_POOL_SIZE
+from agent.export_cache import export_key, get_export_cache, ensure_background_replayer
+from agent.drive_upload import (
+    WRITE_UPLOAD,
+    DRIVE_UPLOAD_CHUNK_BYTES,
+    choose_write_path,
+    upload_rows_as_spreadsheet,
+)
+from agent.sinks import (
+    SINK_SHEETS,
+    SINK_KEYWORDS,
+    SINK_OVERSIZE_FALLBACK,
+    EXPORT_SINK,
+    resolve_sink,
+    detect_sink,
+    exceeds_sheet_limit,
+    write_file_sink,
+)
+from agent.google_endpoint import (
+    get_google_endpoint,
+    load_credentials as load_google_credentials,
+    build_gspread_client,
+    build_drive_service,
+)
+from agent.aggregation import (
+    detect_aggregate,
+    validate_aggregate_spec,
+    required_fields as aggregate_required_fields,
+    aggregate_rows,
+    describe_aggregate,
+)
+from agent.query_engine import (
+    execute_query,
+    build_join_specs,
+    validate_join_specs,
+    joined_field_name,
+)
+
 # =============================================================================
 # CONFIGURATION DEPUIS .ENV AVEC VALEURS PAR DÉFAUT
 # =============================================================================
@@ -172,16 +229,11 @@ else:
 # CONFIGURATION TECHNIQUE (CONSTANTES - RESTE DANS LE CODE)
 # =============================================================================
 
-# Champs API disponibles (LOGIQUE MÉTIER - dans le code)
-VALID_API_FIELDS = ["userId", "id", "title", "body"]
+# Champs API de la source par défaut (LOGIQUE MÉTIER - déclarés dans agent.sources)
+VALID_API_FIELDS = source_registry.default.fields[:]
 
-# Mots-clés pour le parsing (LOGIQUE MÉTIER - dans le code)
-FIELD_KEYWORDS = {
-    "title": ["title", "titre"],
-    "id": ["id", "identifiant"],
-    "userId": ["userid", "user", "utilisateur"],
-    "body": ["body", "contenu", "texte"]
-}
+# Mots-clés pour le parsing de la source par défaut (LOGIQUE MÉTIER - agent.sources)
+FIELD_KEYWORDS = source_registry.default.field_keywords
 
 RESTRICTION_KEYWORDS = ["avec", "seulement", "uniquement", "juste"]
 
@@ -191,10 +243,6 @@ GOOGLE_SCOPES = [
     'https://www.googleapis.com/auth/drive'
 ]
 
-# Patterns regex (TECHNIQUE - dans le code)
-JSON_EXTRACTION_PATTERN = r'\{.*\}'
-NUMBER_EXTRACTION_PATTERN = r'\b(\d+)\b'
-
 # =============================================================================
 # VALIDATION DES VARIABLES CRITIQUES
 # =============================================================================
@@ -227,6 +275,14 @@ class AgentState(TypedDict):
     processed_data: Optional[List[Dict]]
     sheets_url: str
     error: str
+    # Rapport par effet de bord de l'export (voir agent.side_effects)
+    export_effects: Optional[Dict[str, Dict[str, Any]]]
+    # Récupération spéculative en cours (voir agent.prefetch)
+    prefetch_id: Optional[str]
+    # Cache local de l'export: clé, servi depuis le cache, envoi différé (voir agent.export_cache)
+    export_cache: Optional[Dict[str, Any]]
+    # Export vers une sortie fichier: sortie, chemin, lignes (voir agent.sinks)
+    export_file: Optional[Dict[str, Any]]
 
 # =============================================================================
 # CONFIGURATION GOOGLE SHEETS
@@ -235,6 +291,11 @@ class AgentState(TypedDict):
 def setup_google_sheets():
     """Configuration de l'accès Google Sheets"""
     try:
+        # GOOGLE_API_ENDPOINT: faux serveur local (tests, benchmarks), sans credentials
+        if get_google_endpoint():
+            print(f"🧪 Google Sheets redirigé vers {get_google_endpoint()}")
+            return build_gspread_client(None)
+        
         if not os.path.exists(GOOGLE_CREDENTIALS_PATH):
             print(f"⚠️ Fichier credentials Google introuvable: {GOOGLE_CREDENTIALS_PATH}")
             return None
@@ -258,24 +319,34 @@ def log_debug(message: str):
     if DEBUG:
         print(f"🔍 DEBUG: {message}")
 
-def ensure_state_keys(state: AgentState) -> AgentState:
-    """S'assurer que toutes les clés nécessaires sont présentes dans l'état"""
-    default_state = {
-        "messages": [],
-        "api_url": DEFAULT_API_URL,
-        "user_query": "",
-        "extracted_params": None,
-        "api_data": None,
-        "processed_data": None,
-        "sheets_url": "",
-        "error": ""
-    }
-    
-    for key, default_value in default_state.items():
-        if key not in state:
-            state[key] = default_value
-    
-    return state
+_query_matcher: Tuple[int, Optional[KeywordMatcher]] = (-1, None)
+
+def get_query_matcher() -> KeywordMatcher:
+    """Matcher compilé depuis le registre (recompilé si une source change)"""
+    global _query_matcher
+    version, matcher = _query_matcher
+    if matcher is None or version != source_registry.version:
+        version = source_registry.version
+        matcher = KeywordMatcher(
+            source_registry.keywords(), {"restriction": RESTRICTION_KEYWORDS, "sink": list(SINK_KEYWORDS)}
+        )
+        _query_matcher = (version, matcher)
+    return matcher
+
+def analyze_query(user_query: str) -> QueryScan:
+    """Tokens, nombres et mots de restriction d'une requête, en une passe"""
+    return get_query_matcher().scan(user_query)
+
+def tokenize_query(user_query: str) -> List[str]:
+    """Découpe une requête en tokens minuscules pour les lookups d'index"""
+    return analyze_query(user_query).tokens
+
+def resolve_source(params: Dict[str, Any], tokens: List[str]) -> ApiSource:
+    """Détermine la source visée: mention explicite > proposition du LLM > défaut"""
+    source = source_registry.detect_source(tokens)
+    if source is None and isinstance(params, dict):
+        source = source_registry.get(params.get("source"))
+    return source or source_registry.default
 
 # =============================================================================
 # FONCTIONS PRINCIPALES (DÉFINIES AVANT build_graph)
@@ -303,11 +374,21 @@ def validate_extracted_params(params: Dict[str, Any], user_query: str) -> Dict[s
                 log_debug(f"Params invalide (type: {type(params)}), création d'un nouveau dict")
                 params = {}
             
+            # 0. RÉSOLUTION DE LA SOURCE (analyse lexicale en une passe)
+            scan = analyze_query(user_query)
+            tokens = scan.tokens
+            try:
+                source = resolve_source(params, tokens)
+            except Exception as source_error:
+                log_debug(f"Erreur résolution source: {source_error}")
+                source = source_registry.default
+            params["source"] = source.name
+            log_debug(f"Source retenue: {source.name}")
+            
             # 1. VALIDATION DU LIMIT
             try:
-                numbers = re.findall(NUMBER_EXTRACTION_PATTERN, user_query)
-                if numbers:
-                    limit = int(numbers[0])
+                if scan.numbers:
+                    limit = scan.first_number()
                     limit = max(MIN_LIMIT, min(limit, MAX_LIMIT))
                     params["limit"] = limit
                     log_debug(f"Limite corrigée: {params['limit']}")
@@ -318,36 +399,77 @@ def validate_extracted_params(params: Dict[str, Any], user_query: str) -> Dict[s
                 log_debug(f"Erreur validation limit: {limit_error}")
                 params["limit"] = DEFAULT_LIMIT
             
-            # 2. VALIDATION DES FIELDS
+            # 2. VALIDATION DES FIELDS (lookups d'index par token)
             try:
-                mentioned_fields = []
-                for field, keywords in FIELD_KEYWORDS.items():
-                    if any(f" {keyword} " in f" {user_query_lower} " or 
-                           user_query_lower.startswith(keyword + " ") or 
-                           user_query_lower.endswith(" " + keyword) for keyword in keywords):
-                        mentioned_fields.append(field)
-                
-                has_restriction_keywords = any(word in user_query_lower for word in RESTRICTION_KEYWORDS)
+                mentioned_fields = source_registry.match_fields(tokens, source)
+                has_restriction_keywords = scan.has("restriction")
                 
                 if mentioned_fields and has_restriction_keywords:
                     params["fields"] = mentioned_fields
                 elif not mentioned_fields:
-                    params["fields"] = VALID_API_FIELDS[:]
+                    params["fields"] = source.fields[:]
                 else:
                     if "fields" not in params or not isinstance(params.get("fields"), list):
-                        params["fields"] = VALID_API_FIELDS[:]
+                        params["fields"] = source.fields[:]
                     else:
-                        params["fields"] = [field for field in params["fields"] if field in VALID_API_FIELDS]
+                        params["fields"] = [field for field in params["fields"] if source.has_field(field)]
                         if not params["fields"]:
-                            params["fields"] = VALID_API_FIELDS[:]
+                            params["fields"] = source.fields[:]
             except Exception as fields_error:
                 log_debug(f"Erreur validation fields: {fields_error}")
-                params["fields"] = VALID_API_FIELDS[:]
+                params["fields"] = source.fields[:]
             
-            # 3. VALIDATION DES FILTERS
+            # 2 bis. VALIDATION DES JOINTURES (champs de sources liées)
+            try:
+                joins = validate_join_specs(source, params.get("joins"))
+                if not joins:
+                    joins = build_join_specs(source, source_registry.match_join_fields(tokens, source))
+                params["joins"] = joins
+                for spec in joins:
+                    params["fields"] += [
+                        joined_field_name(spec["source"], field) for field in spec["fields"]
+                    ]
+                if joins:
+                    log_debug(f"Jointures retenues: {joins}")
+            except Exception as joins_error:
+                log_debug(f"Erreur validation joins: {joins_error}")
+                params["joins"] = []
+            
+            # 2 ter. VALIDATION DE L'AGRÉGATION (group-by, count, sum...)
+            try:
+                aggregate = validate_aggregate_spec(params.get("aggregate"), source.has_field)
+                if aggregate is None:
+                    aggregate = detect_aggregate(
+                        tokens, lambda token: source_registry.field_for_token(token, source.name)
+                    )
+                params["aggregate"] = aggregate
+                if aggregate:
+                    for field in aggregate_required_fields(aggregate):
+                        if field not in params["fields"]:
+                            params["fields"].append(field)
+                    log_debug(f"Agrégation retenue: {describe_aggregate(aggregate)}")
+            except Exception as aggregate_error:
+                log_debug(f"Erreur validation aggregate: {aggregate_error}")
+                params["aggregate"] = None
+            
+            # 2 quater. SORTIE (mention explicite > proposition du LLM > EXPORT_SINK)
+            try:
+                params["sink"] = resolve_sink(detect_sink(scan.markers.get("sink", [])) or params.get("sink"))
+                if params["sink"] != SINK_SHEETS:
+                    log_debug(f"Sortie retenue: {params['sink']}")
+            except Exception as sink_error:
+                log_debug(f"Erreur validation sink: {sink_error}")
+                params["sink"] = SINK_SHEETS
+            
+            # 3. VALIDATION DES FILTERS (uniquement les champs de la source)
             try:
                 if "filters" not in params or not isinstance(params.get("filters"), dict):
                     params["filters"] = {}
+                else:
+                    params["filters"] = {
+                        key: value for key, value in params["filters"].items()
+                        if source.has_field(key)
+                    }
             except Exception as filters_error:
                 log_debug(f"Erreur validation filters: {filters_error}")
                 params["filters"] = {}
@@ -355,7 +477,7 @@ def validate_extracted_params(params: Dict[str, Any], user_query: str) -> Dict[s
             # 4. VALIDATION DE LA DESCRIPTION
             try:
                 if "description" not in params or not isinstance(params.get("description"), str):
-                    params["description"] = f"Récupération de {params['limit']} posts avec les champs {', '.join(params['fields'])}"
+                    params["description"] = f"Récupération de {params['limit']} {source.label} avec les champs {', '.join(params['fields'])}"
             except Exception as desc_error:
                 log_debug(f"Erreur validation description: {desc_error}")
                 params["description"] = f"Récupération de données"
@@ -369,18 +491,23 @@ def validate_extracted_params(params: Dict[str, Any], user_query: str) -> Dict[s
         log_debug(f"Erreur dans validate_extracted_params: {type(e).__name__}: {str(e)}")
         # En cas d'erreur, retourner des paramètres par défaut valides
         fallback_params = {
+            "source": source_registry.default.name,
             "limit": DEFAULT_LIMIT,
             "fields": VALID_API_FIELDS[:],
             "filters": {},
+            "joins": [],
+            "aggregate": None,
+            "sink": resolve_sink(None),
             "description": f"Paramètres par défaut suite à une erreur de validation"
         }
         log_debug(f"Retour de paramètres fallback: {fallback_params}")
         return fallback_params
 
-def parse_user_query(state: AgentState) -> AgentState:
+def parse_user_query(state: AgentState) -> Dict[str, Any]:
     """Parse la requête utilisateur pour extraire les paramètres"""
     
     log_debug(f"=== DÉBUT PARSE_USER_QUERY ===")
+    update: Dict[str, Any] = {}
     
     # ✅ CORRECTION : Pas de timeout
     trace_context = create_trace_context(
@@ -413,39 +540,25 @@ def parse_user_query(state: AgentState) -> AgentState:
             log_debug(f"Requête à analyser: '{user_query}'")
             
             if not llm:
-                state["error"] = "LLM non configuré - vérifiez OPENAI_API_KEY"
                 log_debug(f"=== FIN PARSE_USER_QUERY (erreur LLM) ===")
-                return state
+                return {"error": "LLM non configuré - vérifiez OPENAI_API_KEY"}
             
             if not user_query.strip():
-                state["error"] = "Requête utilisateur vide"
                 log_debug(f"=== FIN PARSE_USER_QUERY (requête vide) ===")
-                return state
+                return {"error": "Requête utilisateur vide"}
             
-            prompt = ChatPromptTemplate.from_template(
-                "Analyse la requête utilisateur et génère un JSON structuré pour requête API.\n"
-                "Requête: {user_query}\n"
-                "Réponds uniquement avec le JSON contenant les clés: limit, fields, filters, description."
-            )
-
-            parser = JsonOutputParser()
-
-            chain = prompt | llm | parser
-
+            # Sortie structurée, chaîne réutilisée, micro-batching optionnel (agent.llm_parser)
             log_debug("⚡ Appel du LLM pour parsing de la requête utilisateur")
-            params = chain.invoke({"user_query": user_query})
+            params = parse_query_params(llm, user_query, ", ".join(source_registry.names()))
+            log_debug(f"Paramètres bruts du LLM: {params}")
             
             # Validation et nettoyage des paramètres
             log_debug("Début validation des paramètres")
             validated_params = validate_extracted_params(params, user_query)
             log_debug("Fin validation des paramètres")
             
-            state["extracted_params"] = validated_params
-            state["user_query"] = user_query
-            
-            # Ne pas définir d'erreur si tout va bien
-            if "error" in state:
-                del state["error"]
+            # Pas d'erreur si tout va bien
+            update = {"extracted_params": validated_params, "user_query": user_query, "error": ""}
             
             safe_trace_update(trace_context,
                 outputs={
@@ -466,15 +579,16 @@ def parse_user_query(state: AgentState) -> AgentState:
             log_debug("Tentative de création de paramètres fallback d'urgence")
             params = create_fallback_params(user_query if 'user_query' in locals() else "récupérer des posts")
             validated_params = validate_extracted_params(params, user_query if 'user_query' in locals() else "")
-            state["extracted_params"] = validated_params
-            state["user_query"] = user_query if 'user_query' in locals() else ""
             log_debug(f"Paramètres fallback d'urgence créés: {validated_params}")
-            # Ne pas définir d'erreur si on a pu créer des paramètres
-            if "error" in state:
-                del state["error"]
+            # Pas d'erreur si on a pu créer des paramètres
+            update = {
+                "extracted_params": validated_params,
+                "user_query": user_query if 'user_query' in locals() else "",
+                "error": ""
+            }
         except Exception as fallback_error:
             log_debug(f"Erreur création fallback d'urgence: {fallback_error}")
-            state["error"] = error_msg
+            update = {"error": error_msg}
         
         safe_trace_update(trace_context,
             outputs={"error": error_msg, "parsing_success": False}
@@ -482,7 +596,7 @@ def parse_user_query(state: AgentState) -> AgentState:
         
         log_debug(f"=== FIN PARSE_USER_QUERY (erreur) ===")
     
-    return state
+    return update
 
 def create_fallback_params(user_query: str) -> Dict[str, Any]:
     """Crée des paramètres par défaut basés sur une analyse simple de la requête"""
@@ -490,32 +604,38 @@ def create_fallback_params(user_query: str) -> Dict[str, Any]:
     log_debug(f"Création de paramètres fallback pour: '{user_query}'")
     
     try:
-        # Analyse simple pour extraire le nombre
-        numbers = re.findall(r'\b(\d+)\b', user_query)
-        limit = int(numbers[0]) if numbers else DEFAULT_LIMIT
+        # Analyse lexicale en une passe (nombres, tokens, mots de restriction)
+        scan = analyze_query(user_query)
+        tokens = scan.tokens
+        limit = scan.first_number() if scan.numbers else DEFAULT_LIMIT
         limit = max(MIN_LIMIT, min(limit, MAX_LIMIT))
         
-        # Analyse simple pour les champs
-        user_query_lower = user_query.lower()
-        mentioned_fields = []
-        
-        for field, keywords in FIELD_KEYWORDS.items():
-            if any(keyword in user_query_lower for keyword in keywords):
-                mentioned_fields.append(field)
+        # Source et champs (lookups d'index par token)
+        source = source_registry.detect_source(tokens) or source_registry.default
+        mentioned_fields = source_registry.match_fields(tokens, source)
+        joins = build_join_specs(source, source_registry.match_join_fields(tokens, source))
         
         # Vérifier les mots de restriction
-        has_restriction = any(word in user_query_lower for word in RESTRICTION_KEYWORDS)
+        has_restriction = scan.has("restriction")
         
         if mentioned_fields and has_restriction:
             fields = mentioned_fields[:]  # Copie de la liste
         else:
-            fields = VALID_API_FIELDS[:]  # Copie de la liste
+            fields = source.fields[:]  # Copie de la liste
         
         params = {
+            "source": source.name,
             "limit": limit,
-            "fields": fields,
+            "fields": fields + [
+                joined_field_name(spec["source"], field) for spec in joins for field in spec["fields"]
+            ],
             "filters": {},
-            "description": f"Récupération de {limit} posts avec les champs {', '.join(fields)} (fallback)"
+            "joins": joins,
+            "aggregate": detect_aggregate(
+                tokens, lambda token: source_registry.field_for_token(token, source.name)
+            ),
+            "sink": resolve_sink(detect_sink(scan.markers.get("sink", []))),
+            "description": f"Récupération de {limit} {source.label} avec les champs {', '.join(fields)} (fallback)"
         }
         
         log_debug(f"Paramètres fallback créés: {params}")
@@ -525,14 +645,24 @@ def create_fallback_params(user_query: str) -> Dict[str, Any]:
         log_debug(f"Erreur dans create_fallback_params: {e}")
         # Paramètres d'urgence
         return {
+            "source": source_registry.default.name,
             "limit": DEFAULT_LIMIT,
             "fields": VALID_API_FIELDS[:],
             "filters": {},
+            "joins": [],
+            "aggregate": None,
+            "sink": resolve_sink(None),
             "description": "Paramètres d'urgence"
         }
 
-def fetch_api_data(state: AgentState) -> AgentState:
-    """Récupère les données depuis l'API"""
+def start_speculative_fetch(state: AgentState) -> Dict[str, Any]:
+    """Lance la récupération de la source présumée pendant le parsing LLM"""
+    prefetch_id = start_prefetch(state.get("api_url") or DEFAULT_API_URL, DEFAULT_API_URL)
+    log_debug(f"Récupération spéculative lancée: {state.get('api_url') or DEFAULT_API_URL}")
+    return {"prefetch_id": prefetch_id}
+
+def fetch_api_data(state: AgentState) -> Dict[str, Any]:
+    """Récupère les données depuis l'API (grands volumes hors état, voir agent.blobs)"""
     
     trace_context = None
     if langsmith_client:
@@ -545,66 +675,101 @@ def fetch_api_data(state: AgentState) -> AgentState:
         except:
             pass
     
+    update: Dict[str, Any] = {}
     try:
-        state = ensure_state_keys(state)
-        
         if state.get("error"):
+            discard_prefetch(state.get("prefetch_id"))
             if trace_context:
                 trace_context.update(outputs={"skipped": True, "reason": "previous_error"})
-            return state
+            return update
         
-        if "api_url" not in state or not state["api_url"]:
-            state["api_url"] = DEFAULT_API_URL
+        api_url = state.get("api_url") or DEFAULT_API_URL
         
         if trace_context:
             trace_context.update(inputs={
-                "api_url": state["api_url"],
+                "api_url": api_url,
                 "extracted_params": state.get("extracted_params", {})
             })
         
-        log_debug(f"Appel API: {state['api_url']}")
-        response = requests.get(state["api_url"], timeout=API_TIMEOUT)
-        response.raise_for_status()
+        params = state.get("extracted_params") or {}
+        limit = params.get("limit", DEFAULT_LIMIT)
+        if params.get("aggregate"):
+            # L'agrégation porte sur toutes les lignes de la source
+            limit = None
+        filters = params.get("filters") or {}
         
-        all_data = response.json()
+        # Une URL personnalisée l'emporte sur la source déduite de la requête
+        custom_url = api_url != DEFAULT_API_URL
+        if custom_url:
+            source = source_registry.find_by_url(api_url)
+        else:
+            source = source_registry.get(params.get("source")) or source_registry.default
         
-        # Application des filtres
-        if state.get("extracted_params") and "filters" in state["extracted_params"]:
-            filters = state["extracted_params"]["filters"]
+        # Export identique récent: lignes traitées relues depuis le cache local
+        export_cache = get_export_cache()
+        cache_key = export_key(api_url, params) if export_cache else None
+        cached = export_cache.lookup(cache_key) if export_cache else None
+        if cached is not None:
+            discard_prefetch(state.get("prefetch_id"))
+            log_debug(f"Export servi depuis le cache local: {len(cached)} lignes (clé {cache_key})")
+            if trace_context:
+                trace_context.update(outputs={"success": True, "export_cache_hit": True, "rows": len(cached)})
+            return {
+                "api_url": api_url,
+                "api_data": None,
+                "processed_data": store_rows(cached),
+                "prefetch_id": None,
+                "export_cache": {"key": cache_key, "hit": True},
+            }
+        
+        # Lignes déjà récupérées pendant le parsing si la spéculation couvre la demande
+        prefetched = claim_prefetch(state.get("prefetch_id"), source, api_url, filters, limit)
+        if prefetched:
+            log_debug(f"Récupération spéculative réutilisée: {len(prefetched[0])} lignes")
+        
+        if source:
+            log_debug(f"Appel API: source '{source.name}' ({source.url}, pagination={source.pagination})")
+            api_data, fetch_stats = execute_query(source, filters, limit, params.get("joins"), primary=prefetched)
+        else:
+            # URL hors registre: requête unique puis filtrage local
+            log_debug(f"Appel API: {api_url}")
+            all_data, fetch_stats = prefetched or fetch_url_rows(api_url)
             for key, value in filters.items():
                 if key in ["userId", "id"]:
                     all_data = [item for item in all_data if item.get(key) == int(value)]
+            api_data = all_data[:limit] if limit is not None else all_data
         
-        # Limitation du nombre de résultats
-        limit = state["extracted_params"].get("limit", DEFAULT_LIMIT) if state.get("extracted_params") else DEFAULT_LIMIT
-        state["api_data"] = all_data[:limit]
+        update = {"api_url": api_url, "api_data": store_rows(api_data), "prefetch_id": None}
+        if cache_key:
+            update["export_cache"] = {"key": cache_key, "hit": False}
         
         if trace_context:
             trace_context.update(outputs={
                 "success": True,
-                "total_items": len(all_data),
-                "filtered_items": len(state["api_data"]),
-                "limit_applied": limit
+                "source": source.name if source else None,
+                "filtered_items": len(api_data),
+                "limit_applied": limit,
+                "fetch_stats": fetch_stats
             })
         
-        log_debug(f"Données API récupérées: {len(state['api_data'])} éléments")
+        log_debug(f"Données API récupérées: {len(api_data)} éléments")
         
     except Exception as e:
         error_msg = f"Erreur lors de la récupération API: {str(e)}"
-        state["error"] = error_msg
+        update = {"error": error_msg}
         
         if trace_context:
             trace_context.update(outputs={"success": False, "error": error_msg})
-        print(f"Erreur: {state['error']}")
+        print(f"Erreur: {error_msg}")
     
     finally:
         if trace_context:
             trace_context.__exit__(None, None, None)
     
-    return state
+    return update
 
-def process_data(state: AgentState) -> AgentState:
-    """Traite et filtre les données selon les champs demandés"""
+def process_data(state: AgentState) -> Dict[str, Any]:
+    """Traite et filtre les données selon les champs demandés (les lignes brutes sont libérées)"""
     
     trace_context = None
     if langsmith_client:
@@ -617,13 +782,12 @@ def process_data(state: AgentState) -> AgentState:
         except:
             pass
     
+    update: Dict[str, Any] = {}
     try:
-        state = ensure_state_keys(state)
-        
-        if state.get("error") or not state.get("api_data"):
+        if state.get("error") or not row_count(state.get("api_data")):
             if trace_context:
                 trace_context.update(outputs={"skipped": True, "reason": "no_data_or_error"})
-            return state
+            return update
         
         fields = VALID_API_FIELDS
         if state.get("extracted_params") and "fields" in state["extracted_params"]:
@@ -631,19 +795,24 @@ def process_data(state: AgentState) -> AgentState:
         
         if trace_context:
             trace_context.update(inputs={
-                "raw_data_count": len(state["api_data"]),
+                "raw_data_count": row_count(state["api_data"]),
                 "fields_to_extract": fields
             })
         
-        processed_data = []
-        for item in state["api_data"]:
-            filtered_item = {}
-            for field in fields:
-                if field in item:
-                    filtered_item[field] = item[field]
-            processed_data.append(filtered_item)
+        raw = state["api_data"]
+        if is_rows_handle(raw):
+            # Lignes hors état (appartenant au run): projection en place, chaque
+            # ligne brute est libérée dès qu'elle est remplacée, sans seconde liste
+            processed_data = load_rows(raw)
+            for index, item in enumerate(processed_data):
+                processed_data[index] = {field: item[field] for field in fields if field in item}
+            processed = raw
+        else:
+            processed_data = [{field: item[field] for field in fields if field in item} for item in raw]
+            processed = store_rows(processed_data)
         
-        state["processed_data"] = processed_data
+        # Les lignes brutes ne servent plus: retirées de l'état
+        update = {"processed_data": processed, "api_data": None}
         
         if trace_context:
             trace_context.update(outputs={
@@ -656,19 +825,302 @@ def process_data(state: AgentState) -> AgentState:
         
     except Exception as e:
         error_msg = f"Erreur lors du traitement: {str(e)}"
-        state["error"] = error_msg
+        update = {"error": error_msg}
         
         if trace_context:
             trace_context.update(outputs={"success": False, "error": error_msg})
-        print(f"Erreur: {state['error']}")
+        print(f"Erreur: {error_msg}")
     
     finally:
         if trace_context:
             trace_context.__exit__(None, None, None)
     
-    return state
+    return update
+
+def aggregate_data(state: AgentState) -> Dict[str, Any]:
+    """Agrège les données traitées si la requête demande une synthèse"""
+    
+    trace_context = create_trace_context(
+        name="aggregate_data",
+        tags=["processing", "aggregation"],
+        metadata={"step": "3.5", "component": "data_aggregator"}
+    )
+    
+    update: Dict[str, Any] = {}
+    try:
+        with trace_context or DummyContext():
+            params = state.get("extracted_params") or {}
+            aggregate = params.get("aggregate")
+            
+            # Lignes servies depuis le cache local: déjà agrégées
+            if (state.get("export_cache") or {}).get("hit"):
+                aggregate = None
+            
+            if state.get("error") or not row_count(state.get("processed_data")) or not aggregate:
+                safe_trace_update(trace_context, outputs={"skipped": True, "reason": "no_aggregation"})
+                return update
+            
+            raw_count = row_count(state["processed_data"])
+            safe_trace_update(trace_context, inputs={"rows": raw_count, "aggregate": aggregate})
+            
+            groups = aggregate_rows(load_rows(state["processed_data"]), aggregate)
+            release_rows(state["processed_data"])
+            update = {"processed_data": store_rows(groups)}
+            
+            safe_trace_update(trace_context, outputs={
+                "success": True,
+                "input_rows": raw_count,
+                "groups": len(groups)
+            })
+            
+            log_debug(f"Agrégation {describe_aggregate(aggregate)}: {raw_count} lignes → {len(groups)} groupes")
+    
+    except Exception as e:
+        error_msg = f"Erreur lors de l'agrégation: {str(e)}"
+        update = {"error": error_msg}
+        safe_trace_update(trace_context, outputs={"success": False, "error": error_msg})
+        print(f"Erreur: {error_msg}")
+    
+    return update
+
+# =============================================================================
+# EFFETS DE BORD DE L'EXPORT GOOGLE
+# =============================================================================
+
+def resolve_sheets_folder(priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+    """Dossier Drive des exports (recherché ou créé), avec le service Drive utilisé"""
+    try:
+        log_debug(f"Chargement des credentials depuis: {GOOGLE_CREDENTIALS_PATH}")
+        creds = load_google_credentials(GOOGLE_CREDENTIALS_PATH, GOOGLE_SCOPES)
+        drive_service = build_drive_service(creds)
+    except ImportError:
+        raise SkipEffect("google-api-python-client non installé (pip install google-api-python-client)")
+    except FileNotFoundError:
+        raise SkipEffect(f"fichier credentials non trouvé: {GOOGLE_CREDENTIALS_PATH}")
+    log_debug("✅ Service Drive API initialisé")
+    
+    search_query = f"name='{SHEETS_FOLDER_NAME}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
+    results = google_execute(drive_service.files().list(
+        q=search_query,
+        fields="files(id, name, parents)"
+    ), kind=GOOGLE_READ, priority=priority)
+    
+    folders = results.get('files', [])
+    if folders:
+        folder_id = folders[0]['id']
+        log_debug(f"✅ Dossier trouvé: {SHEETS_FOLDER_NAME} (ID: {folder_id})")
+        return {"folder_id": folder_id, "drive_service": drive_service}
+    
+    log_debug(f"🔧 Création du dossier '{SHEETS_FOLDER_NAME}'...")
+    folder = google_execute(drive_service.files().create(
+        body={'name': SHEETS_FOLDER_NAME, 'mimeType': 'application/vnd.google-apps.folder'},
+        fields='id'
+    ), kind=GOOGLE_WRITE, priority=priority)
+    folder_id = folder.get('id')
+    log_debug(f"✅ Dossier créé: {SHEETS_FOLDER_NAME} (ID: {folder_id})")
+    
+    # Partager le dossier avec l'email personnel
+    if GOOGLE_PERSONAL_EMAIL:
+        try:
+            google_execute(drive_service.permissions().create(
+                fileId=folder_id,
+                body={'type': 'user', 'role': 'writer', 'emailAddress': GOOGLE_PERSONAL_EMAIL},
+                sendNotificationEmail=False
+            ), kind=GOOGLE_WRITE, priority=priority)
+            log_debug(f"✅ Dossier partagé avec {GOOGLE_PERSONAL_EMAIL}")
+        except Exception as share_error:
+            log_debug(f"⚠️ Erreur partage dossier: {share_error}")
+    
+    return {"folder_id": folder_id, "drive_service": drive_service}
+
+def move_sheet_to_folder(folder: Dict[str, Any], sheet_id: str, priority: int = PRIORITY_INTERACTIVE) -> List[str]:
+    """Déplace le classeur dans le dossier des exports; retourne ses nouveaux parents"""
+    drive_service = folder["drive_service"]
+    file_metadata = google_execute(drive_service.files().get(
+        fileId=sheet_id,
+        fields='parents'
+    ), kind=GOOGLE_READ, priority=priority)
+    previous_parents = ",".join(file_metadata.get('parents', []))
+    
+    updated = google_execute(drive_service.files().update(
+        fileId=sheet_id,
+        addParents=folder["folder_id"],
+        removeParents=previous_parents,
+        fields='id, parents'
+    ), kind=GOOGLE_WRITE, priority=priority)
+    log_debug(f"✅ Sheet déplacé dans le dossier '{SHEETS_FOLDER_NAME}' (parents: {updated.get('parents', [])})")
+    return updated.get('parents', [])
+
+def write_sheet_rows(sheet: Any, processed_data: List[Dict[str, Any]],
+                     priority: int = PRIORITY_INTERACTIVE) -> List[List[Any]]:
+    """Écrit en-têtes et données dans la première feuille; retourne les lignes écrites"""
+    worksheet = google_call(sheet.get_worksheet, 0, kind=GOOGLE_READ, priority=priority)
+    if not processed_data:
+        return []
+    # En-têtes + données en un seul appel d'écriture (une ligne par
+    # appel épuiserait le quota d'écriture par minute)
+    headers = list(processed_data[0].keys())
+    rows = [headers]
+    for item in processed_data:
+        rows.append([item.get(header, '') for header in headers])
+    google_call(worksheet.append_rows, rows, value_input_option='RAW', kind=GOOGLE_WRITE, priority=priority)
+    log_debug(f"✅ En-têtes {headers} et {len(processed_data)} lignes de données ajoutés")
+    return rows
+
+def upload_sheet_rows(processed_data: List[Dict[str, Any]], sheet_title: str,
+                      priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+    """Crée le classeur par import Drive d'un CSV (gros exports, voir agent.drive_upload)"""
+    drive_service = build_drive_service(load_google_credentials(GOOGLE_CREDENTIALS_PATH, GOOGLE_SCOPES))
+    uploaded = upload_rows_as_spreadsheet(drive_service, processed_data, sheet_title, priority=priority)
+    log_debug(f"✅ {uploaded['rows']} lignes importées via Drive ({uploaded['size_bytes']} octets, "
+              f"{uploaded['chunks']} morceau(x))")
+    return uploaded
+
+def share_sheet_personal(sheet: Any, priority: int = PRIORITY_INTERACTIVE) -> Any:
+    """Partage en écriture avec GOOGLE_PERSONAL_EMAIL"""
+    return google_call(sheet.share, GOOGLE_PERSONAL_EMAIL, perm_type='user', role='writer',
+                       kind=GOOGLE_WRITE, priority=priority)
+
+def share_sheet_public(sheet: Any, priority: int = PRIORITY_INTERACTIVE) -> Any:
+    """Partage en lecture avec toute personne disposant du lien"""
+    return google_call(sheet.share, '', perm_type='anyone', role='reader', kind=GOOGLE_WRITE, priority=priority)
+
+def share_sheet(sheet: Any, priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+    """Partages configurés du classeur (email personnel, lecture publique)"""
+    shared: Dict[str, Any] = {}
+    if GOOGLE_PERSONAL_EMAIL:
+        shared["personal"] = share_sheet_personal(sheet, priority=priority)
+    if SHEETS_SHARE_PUBLICLY:
+        shared["public"] = share_sheet_public(sheet, priority=priority)
+    return shared
 
-def create_google_sheet(state: AgentState) -> AgentState:
+# =============================================================================
+# POOL DE CLASSEURS PRÉ-CRÉÉS (voir agent.sheet_pool)
+# =============================================================================
+
+def prepare_pooled_sheet() -> Dict[str, Any]:
+    """Classeur vide prêt pour un export: créé, rangé et partagé à priorité de fond"""
+    title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_pool_{uuid.uuid4().hex[:12]}"
+    sheet = google_call(gc.create, title, kind=GOOGLE_WRITE, priority=PRIORITY_BACKGROUND)
+    # Indexé dès sa création: un classeur du pool perdu (arrêt du processus,
+    # erreur ci-dessous) est supprimé par le GC de rétention
+    record_export(sheet.id, title, "", [])
+    folder_id = None
+    try:
+        folder = resolve_sheets_folder(priority=PRIORITY_BACKGROUND)
+        move_sheet_to_folder(folder, sheet.id, priority=PRIORITY_BACKGROUND)
+        folder_id = folder["folder_id"]
+    except SkipEffect as skip:
+        log_debug(f"⚠️ Classeur du pool laissé à la racine: {skip}")
+    share_sheet(sheet, priority=PRIORITY_BACKGROUND)
+    log_debug(f"🧊 Classeur ajouté au pool: {title} (ID: {sheet.id})")
+    return {"sheet": sheet, "folder_id": folder_id}
+
+def discard_pooled_sheets(items: List[Dict[str, Any]]) -> None:
+    """Supprime les classeurs d'un pool inactif (batch Drive, index de rétention)"""
+    drive_service = build_drive_service(load_google_credentials(GOOGLE_CREDENTIALS_PATH, GOOGLE_SCOPES))
+    result = delete_exports(drive_service, [item["sheet"].id for item in items], get_retention_index())
+    log_debug(f"🧹 Pool inactif: {result['deleted']} classeur(s) supprimé(s)")
+
+def rename_pooled_sheet(sheet: Any, title: str) -> str:
+    """Donne au classeur du pool le titre de l'export"""
+    google_call(sheet.update_title, title, kind=GOOGLE_WRITE)
+    return title
+
+# =============================================================================
+# PLAN D'EXPORT ET REJEU (voir agent.side_effects, agent.export_cache)
+# =============================================================================
+
+def export_write_path(processed_data: List[Dict[str, Any]]) -> str:
+    """Écriture par l'API values ou import Drive, selon la taille de l'export"""
+    columns = len(processed_data[0]) if processed_data else 0
+    return choose_write_path(len(processed_data), columns)
+
+def build_export_plan(processed_data: List[Dict[str, Any]], sheet_title: str,
+                      pooled: Optional[Dict[str, Any]] = None,
+                      priority: int = PRIORITY_INTERACTIVE,
+                      write_path: Optional[str] = None) -> SideEffectPlan:
+    """Effets de bord d'un export: classeur, dossier, partages et écriture des données
+    
+    Le dossier est résolu pendant la création du classeur; dès que l'ID du
+    classeur est connu, déplacement, partages et écriture partent en parallèle.
+    Avec un classeur du pool (déjà rangé et partagé), il ne reste que le
+    renommage et l'écriture. En import Drive, le classeur est créé avec ses
+    données (effet `upload`), sans écriture séparée.
+    """
+    write_path = write_path or export_write_path(processed_data)
+    if write_path == WRITE_UPLOAD:
+        pooled = None
+    plan = SideEffectPlan()
+    if write_path == WRITE_UPLOAD:
+        plan.add("folder", lambda done: resolve_sheets_folder(priority=priority))
+        plan.add("upload", lambda done: upload_sheet_rows(processed_data, sheet_title, priority=priority),
+                 required=True)
+        plan.add("sheet", lambda done: google_call(gc.open_by_key, done["upload"]["id"],
+                                                   kind=GOOGLE_READ, priority=priority),
+                 after=("upload",), required=True)
+    elif pooled:
+        plan.add("sheet", lambda done: pooled["sheet"], required=True)
+        plan.add("rename", lambda done: rename_pooled_sheet(done["sheet"], sheet_title),
+                 after=("sheet",), required=True)
+    else:
+        plan.add("folder", lambda done: resolve_sheets_folder(priority=priority))
+        plan.add("sheet", lambda done: google_call(gc.create, sheet_title, kind=GOOGLE_WRITE, priority=priority),
+                 required=True)
+    if not pooled:
+        plan.add("move", lambda done: move_sheet_to_folder(done["folder"], done["sheet"].id, priority=priority),
+                 after=("folder", "sheet"))
+        # Mêmes partages que share_sheet, en effets distincts pour partir en parallèle
+        if GOOGLE_PERSONAL_EMAIL:
+            plan.add("share_personal", lambda done: share_sheet_personal(done["sheet"], priority=priority),
+                     after=("sheet",))
+        if SHEETS_SHARE_PUBLICLY:
+            plan.add("share_public", lambda done: share_sheet_public(done["sheet"], priority=priority),
+                     after=("sheet",))
+    if write_path != WRITE_UPLOAD:
+        plan.add("write", lambda done: write_sheet_rows(done["sheet"], processed_data, priority=priority),
+                 after=("sheet",), required=True)
+    inc_metric("agent_export_write_total", path=write_path)
+    return plan
+
+def estimate_google_calls(csv_bytes: int, write_path: str, pooled: bool) -> Dict[str, int]:
+    """Appels Google de build_export_plan (dossier des exports supposé existant)"""
+    shares = int(bool(GOOGLE_PERSONAL_EMAIL)) + int(bool(SHEETS_SHARE_PUBLICLY))
+    if write_path == WRITE_UPLOAD:
+        # dossier, open_by_key, move (get) / ouverture de session + morceaux, move (update), partages
+        chunks = max(1, -(-csv_bytes // DRIVE_UPLOAD_CHUNK_BYTES))
+        return {"read": 3, "write": 1 + chunks + 1 + shares}
+    if pooled:
+        # get_worksheet / renommage, append_rows
+        return {"read": 1, "write": 2}
+    # dossier, move (get), get_worksheet / création, move (update), partages, append_rows
+    return {"read": 3, "write": 1 + 1 + shares + 1}
+
+def record_sheet_export(effects: Dict[str, Any], sheet_title: str, query: str) -> None:
+    """Index de rétention d'un export terminé (écriture values ou import Drive)"""
+    uploaded = effects.get("upload")
+    if uploaded:
+        record_export(effects["sheet"].id, sheet_title, query, [],
+                      row_count=uploaded["rows"], size_bytes=uploaded["size_bytes"])
+    else:
+        record_export(effects["sheet"].id, sheet_title, query, effects["write"])
+
+def replay_export(rows: List[Dict[str, Any]], entry: Dict[str, Any]) -> str:
+    """Envoie vers Google un export resté en cache local; retourne l'URL du classeur"""
+    if not gc:
+        raise RuntimeError("Google Sheets non configuré")
+    sheet_title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    with concurrency_limit("google"):
+        effects, _ = build_export_plan(rows, sheet_title, priority=PRIORITY_BACKGROUND).run()
+    sheet = effects["sheet"]
+    try:
+        record_sheet_export(effects, sheet_title, entry.get("query") or "")
+    except Exception as retention_error:
+        log_debug(f"⚠️ Erreur enregistrement rétention: {retention_error}")
+    log_debug(f"📤 Export différé envoyé: {sheet_title} ({len(rows)} lignes, clé {entry['key']})")
+    return sheet.url
+
+def create_google_sheet(state: AgentState) -> Dict[str, Any]:
     """Crée un Google Sheet et y ajoute les données dans un dossier organisé"""
     
     # ✅ CORRECTION : Supprimer le paramètre timeout
@@ -678,263 +1130,234 @@ def create_google_sheet(state: AgentState) -> AgentState:
         metadata={"step": "4", "component": "sheets_creator"}
     )
     
+    update: Dict[str, Any] = {}
     try:
         with trace_context or DummyContext():
-            state = ensure_state_keys(state)
-            
-            if state.get("error") or not state.get("processed_data") or not gc:
+            if state.get("error") or not row_count(state.get("processed_data")) or not gc:
                 if not gc:
                     error_msg = "Google Sheets non configuré"
-                    state["error"] = error_msg
+                    update = {"error": error_msg}
                     safe_trace_update(trace_context, outputs={"success": False, "error": error_msg})
                 else:
                     safe_trace_update(trace_context, outputs={"skipped": True, "reason": "no_data_or_error"})
-                return state
+                return update
             
-            processed_data = state["processed_data"]
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            sheet_title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_{timestamp}"
+            # Un slot Google par export en cours (mode worker pool)
+            with concurrency_limit("google"):
+                processed_data = load_rows(state["processed_data"])
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                sheet_title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_{timestamp}"
             
-            safe_trace_update(trace_context, inputs={
-                "data_count": len(processed_data),
-                "sheet_title": sheet_title,
-                "folder_name": SHEETS_FOLDER_NAME
-            })
+                safe_trace_update(trace_context, inputs={
+                    "data_count": len(processed_data),
+                    "sheet_title": sheet_title,
+                    "folder_name": SHEETS_FOLDER_NAME
+                })
             
-            log_debug(f"Création du sheet: {sheet_title}")
+                log_debug(f"Création du sheet: {sheet_title}")
             
-            # =================================================================
-            # 1. SETUP DES CREDENTIALS POUR DRIVE API
-            # =================================================================
-            folder_id = None
-            drive_service = None
-            
-            try:
-                from googleapiclient.discovery import build
-                from google.oauth2.service_account import Credentials
-                
-                log_debug(f"Chargement des credentials depuis: {GOOGLE_CREDENTIALS_PATH}")
-                
-                # Créer les credentials avec les scopes Drive
-                creds = Credentials.from_service_account_file(
-                    GOOGLE_CREDENTIALS_PATH, 
-                    scopes=GOOGLE_SCOPES
-                )
-                
-                # Créer le service Drive
-                drive_service = build('drive', 'v3', credentials=creds)
-                log_debug("✅ Service Drive API initialisé")
-                
                 # =================================================================
-                # 2. RECHERCHER/CRÉER LE DOSSIER
+                # EFFETS DE BORD EN DAG (voir agent.side_effects)
                 # =================================================================
-                log_debug(f"Recherche du dossier '{SHEETS_FOLDER_NAME}'...")
+                # Les gros exports sont importés par Drive: pas de classeur du pool
+                write_path = export_write_path(processed_data)
+                pooled = sheet_pool.claim() if sheet_pool and write_path != WRITE_UPLOAD else None
+                plan = build_export_plan(processed_data, sheet_title, pooled, write_path=write_path)
+                
+                # Copie locale des lignes en parallèle des appels Google: un
+                # échec Google diffère l'envoi au lieu de perdre le run
+                export_cache = get_export_cache()
+                cache_state = state.get("export_cache") or {}
+                cache_key = cache_state.get("key") if export_cache else None
+                if cache_key and not cache_state.get("hit"):
+                    plan.add("cache", lambda done: export_cache.put(cache_key, processed_data, state.get("user_query", "")))
                 
-                # Rechercher si le dossier existe déjà
-                search_query = f"name='{SHEETS_FOLDER_NAME}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-                results = drive_service.files().list(
-                    q=search_query,
-                    fields="files(id, name, parents)"
-                ).execute()
+                try:
+                    effects, effects_report = plan.run()
+                except SideEffectError as effect_error:
+                    safe_trace_update(trace_context, outputs={"success": False, "side_effects": effect_error.report})
+                    if cache_key and (cache_state.get("hit") or "cache" in effect_error.results):
+                        export_cache.mark_pending(cache_key)
+                        ensure_background_replayer(replay_export)
+                        log_debug(f"⏳ Envoi Google différé ({effect_error}), export en cache local: {cache_key}")
+                        return {
+                            "export_effects": effect_error.report,
+                            "export_cache": dict(cache_state, deferred=True, reason=str(effect_error)),
+                        }
+                    return {
+                        "error": f"Erreur lors de la création du Google Sheet: {effect_error}",
+                        "export_effects": effect_error.report,
+                    }
                 
-                folders = results.get('files', [])
-                log_debug(f"Dossiers trouvés: {len(folders)}")
+                for name, effect_error in failed_effects(effects_report).items():
+                    log_debug(f"⚠️ Effet '{name}' en échec: {effect_error}")
                 
-                if folders:
-                    folder_id = folders[0]['id']
-                    log_debug(f"✅ Dossier trouvé: {SHEETS_FOLDER_NAME} (ID: {folder_id})")
+                sheet = effects["sheet"]
+                sheet_id = sheet.id
+                if pooled:
+                    folder_id = pooled["folder_id"]
+                    moved = folder_id is not None
                 else:
-                    # Créer le dossier s'il n'existe pas
-                    log_debug(f"🔧 Création du dossier '{SHEETS_FOLDER_NAME}'...")
-                    folder_metadata = {
-                        'name': SHEETS_FOLDER_NAME,
-                        'mimeType': 'application/vnd.google-apps.folder'
-                    }
-                    
-                    folder = drive_service.files().create(
-                        body=folder_metadata,
-                        fields='id'
-                    ).execute()
-                    
-                    folder_id = folder.get('id')
-                    log_debug(f"✅ Dossier créé: {SHEETS_FOLDER_NAME} (ID: {folder_id})")
-                    
-                    # Partager le dossier avec l'email personnel
-                    if GOOGLE_PERSONAL_EMAIL:
-                        try:
-                            permission = {
-                                'type': 'user',
-                                'role': 'writer',
-                                'emailAddress': GOOGLE_PERSONAL_EMAIL
-                            }
-                            drive_service.permissions().create(
-                                fileId=folder_id,
-                                body=permission,
-                                sendNotificationEmail=False
-                            ).execute()
-                            log_debug(f"✅ Dossier partagé avec {GOOGLE_PERSONAL_EMAIL}")
-                        except Exception as share_error:
-                            log_debug(f"⚠️ Erreur partage dossier: {share_error}")
-                    
-            except ImportError:
-                log_debug("❌ google-api-python-client non installé")
-                log_debug("📝 Installez avec: pip install google-api-python-client")
-                drive_service = None
-            except FileNotFoundError:
-                log_debug(f"❌ Fichier credentials non trouvé: {GOOGLE_CREDENTIALS_PATH}")
-                drive_service = None
-            except Exception as drive_error:
-                log_debug(f"⚠️ Erreur lors de la configuration Drive API: {drive_error}")
-                log_debug("📝 Le sheet sera créé à la racine de Drive")
-                drive_service = None
-            
-            # =================================================================
-            # 3. CRÉER LE GOOGLE SHEET
-            # =================================================================
-            log_debug("Création du Google Sheet...")
-            sheet = gc.create(sheet_title)
-            sheet_id = sheet.id
-            log_debug(f"✅ Sheet créé: {sheet_title} (ID: {sheet_id})")
+                    folder_id = (effects.get("folder") or {}).get("folder_id")
+                    moved = "move" in effects
+                log_debug(f"✅ Sheet créé: {sheet_title} (ID: {sheet_id}), {len(processed_data)} lignes écrites")
             
-            # =================================================================
-            # 4. DÉPLACER LE SHEET DANS LE DOSSIER
-            # =================================================================
-            if folder_id and drive_service:
-                try:
-                    log_debug(f"🔧 Déplacement du sheet dans le dossier '{SHEETS_FOLDER_NAME}'...")
-                    
-                    # Récupérer les parents actuels du fichier
-                    file_metadata = drive_service.files().get(
-                        fileId=sheet_id, 
-                        fields='parents'
-                    ).execute()
-                    
-                    previous_parents = ",".join(file_metadata.get('parents', []))
-                    log_debug(f"Parents actuels: {previous_parents}")
-                    
-                    # Déplacer le fichier vers le nouveau dossier
-                    drive_service.files().update(
-                        fileId=sheet_id,
-                        addParents=folder_id,
-                        removeParents=previous_parents,
-                        fields='id, parents'
-                    ).execute()
-                    
-                    log_debug(f"✅ Sheet déplacé dans le dossier '{SHEETS_FOLDER_NAME}'")
-                    
-                    # Vérifier le déplacement
-                    updated_file = drive_service.files().get(
-                        fileId=sheet_id,
-                        fields='parents'
-                    ).execute()
-                    log_debug(f"Nouveaux parents: {updated_file.get('parents', [])}")
-                    
-                except Exception as move_error:
-                    log_debug(f"⚠️ Erreur lors du déplacement: {move_error}")
-                    log_debug("📝 Le sheet reste à la racine mais est utilisable")
-            else:
-                if not folder_id:
-                    log_debug("⚠️ Pas de folder_id - sheet créé à la racine")
-                if not drive_service:
-                    log_debug("⚠️ Pas de drive_service - sheet créé à la racine")
-            
-            # =================================================================
-            # 5. PARTAGER LE SHEET
-            # =================================================================
-            if GOOGLE_PERSONAL_EMAIL:
-                try:
-                    sheet.share(GOOGLE_PERSONAL_EMAIL, perm_type='user', role='writer')
-                    log_debug(f"✅ Sheet partagé avec {GOOGLE_PERSONAL_EMAIL}")
-                except Exception as share_error:
-                    log_debug(f"⚠️ Erreur partage sheet: {share_error}")
+                # =================================================================
+                # URL FINALE ET RÉTENTION
+                # =================================================================
+                update = {"sheets_url": sheet.url, "export_effects": effects_report}
+                if cache_key:
+                    export_cache.mark_uploaded(cache_key, sheet.url)
             
-            # Partage public si configuré
-            if SHEETS_SHARE_PUBLICLY:
+                # Index de rétention (GC de fond des anciens exports)
                 try:
-                    sheet.share('', perm_type='anyone', role='reader')
-                    log_debug("✅ Sheet partagé publiquement en lecture")
-                except Exception as public_error:
-                    log_debug(f"⚠️ Impossible de partager publiquement: {public_error}")
+                    record_sheet_export(effects, sheet_title, state.get("user_query", ""))
+                except Exception as retention_error:
+                    log_debug(f"⚠️ Erreur enregistrement rétention: {retention_error}")
             
-            # =================================================================
-            # 6. AJOUTER LES DONNÉES
-            # =================================================================
-            worksheet = sheet.get_worksheet(0)
-            
-            if processed_data:
-                # En-têtes
-                headers = list(processed_data[0].keys())
-                worksheet.append_row(headers)
-                log_debug(f"✅ En-têtes ajoutés: {headers}")
-                
-                # Données
-                for item in processed_data:
-                    row_values = [item.get(header, '') for header in headers]
-                    worksheet.append_row(row_values)
-                
-                log_debug(f"✅ {len(processed_data)} lignes de données ajoutées")
+                # Construire l'URL du dossier si disponible
+                folder_url = None
+                if folder_id and moved:
+                    folder_url = f"https://drive.google.com/drive/folders/{folder_id}"
+                    log_debug(f"📁 Dossier Google Drive: {folder_url}")
+                    log_debug(f"📊 Google Sheet: {sheet.url}")
+                    log_debug(f"🎯 Le sheet a été organisé dans le dossier '{SHEETS_FOLDER_NAME}'")
+                else:
+                    log_debug(f"📊 Google Sheet (racine Drive): {sheet.url}")
             
-            # =================================================================
-            # 7. CONSTRUIRE L'URL FINALE
-            # =================================================================
-            state["sheets_url"] = sheet.url
+                safe_trace_update(trace_context, outputs={
+                    "success": True,
+                    "sheet_url": sheet.url,
+                    "sheet_id": sheet_id,
+                    "folder_id": folder_id,
+                    "folder_url": folder_url,
+                    "rows_added": len(processed_data),
+                    "moved_to_folder": moved,
+                    "pooled_sheet": bool(pooled),
+                    "write_path": write_path,
+                    "side_effects": effects_report
+                })
             
-            # Construire l'URL du dossier si disponible
-            folder_url = None
-            if folder_id:
-                folder_url = f"https://drive.google.com/drive/folders/{folder_id}"
-                log_debug(f"📁 Dossier Google Drive: {folder_url}")
-                log_debug(f"📊 Google Sheet: {sheet.url}")
-                log_debug(f"🎯 Le sheet a été organisé dans le dossier '{SHEETS_FOLDER_NAME}'")
-            else:
-                log_debug(f"📊 Google Sheet (racine Drive): {sheet.url}")
-            
-            safe_trace_update(trace_context, outputs={
-                "success": True,
-                "sheet_url": sheet.url,
-                "sheet_id": sheet_id,
-                "folder_id": folder_id,
-                "folder_url": folder_url,
-                "rows_added": len(processed_data),
-                "moved_to_folder": bool(folder_id and drive_service)
-            })
-            
-            log_debug(f"Google Sheet créé avec succès: {sheet.url}")
+                log_debug(f"Google Sheet créé avec succès: {sheet.url}")
             
     except Exception as e:
         error_msg = f"Erreur lors de la création du Google Sheet: {str(e)}"
-        state["error"] = error_msg
+        update = {"error": error_msg}
         
         safe_trace_update(trace_context, outputs={"success": False, "error": error_msg})
-        log_debug(f"❌ Erreur: {state['error']}")
+        log_debug(f"❌ Erreur: {error_msg}")
         
         # Debug détaillé
         import traceback
         log_debug(f"Stack trace: {traceback.format_exc()}")
     
-    return state
+    return update
+
+def output_sink(state: AgentState) -> str:
+    """Sortie effective: celle de la requête, ou la sortie fichier de repli si Sheets ne peut pas tout contenir"""
+    sink = (state.get("extracted_params") or {}).get("sink") or EXPORT_SINK
+    if sink == SINK_SHEETS and SINK_OVERSIZE_FALLBACK:
+        rows = load_rows(state.get("processed_data"))
+        if rows and exceeds_sheet_limit(len(rows), len(rows[0])):
+            return SINK_OVERSIZE_FALLBACK
+    return sink
+
+def route_export(state: AgentState) -> str:
+    """Nœud de sortie: classeur Google ou fichier local"""
+    if state.get("error") or not row_count(state.get("processed_data")):
+        return "create_sheet"
+    return "create_sheet" if output_sink(state) == SINK_SHEETS else "write_file"
+
+def write_file_export(state: AgentState) -> Dict[str, Any]:
+    """Écrit les données dans une sortie fichier (CSV, Parquet, SQLite)"""
+    
+    trace_context = create_trace_context(
+        name="write_file_export",
+        tags=["export", "file_sink"],
+        metadata={"step": "4", "component": "file_sink"}
+    )
+    
+    update: Dict[str, Any] = {}
+    try:
+        with trace_context or DummyContext():
+            sink = output_sink(state)
+            requested = (state.get("extracted_params") or {}).get("sink")
+            if requested == SINK_SHEETS and sink != SINK_SHEETS:
+                log_debug(f"⚠️ Export trop volumineux pour Google Sheets: redirigé vers {sink}")
+            
+            title = f"{SHEETS_DEFAULT_TITLE_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            safe_trace_update(trace_context, inputs={
+                "sink": sink,
+                "rows": row_count(state.get("processed_data")),
+                "title": title
+            })
+            
+            # Lignes consommées par lots, écrivain à mémoire constante
+            export_file = write_file_sink(sink, load_rows(state["processed_data"]), title)
+            update = {"export_file": export_file}
+            
+            safe_trace_update(trace_context, outputs={"success": True, **export_file})
+            log_debug(f"📁 Export {sink}: {export_file['rows']} lignes dans {export_file['path']}")
+    
+    except Exception as e:
+        error_msg = f"Erreur lors de l'export fichier: {str(e)}"
+        update = {"error": error_msg}
+        safe_trace_update(trace_context, outputs={"success": False, "error": error_msg})
+        log_debug(f"❌ Erreur: {error_msg}")
+    
+    return update
 
-def generate_response(state: AgentState) -> AgentState:
+def generate_response(state: AgentState) -> Dict[str, Any]:
     """Génère la réponse finale avec lien vers les stats LangSmith"""
     
-    state = ensure_state_keys(state)
-    
     if state.get("error"):
         response = f"❌ Erreur: {state['error']}"
     else:
-        params = state.get("extracted_params", {})
+        params = state.get("extracted_params") or {}
+        source = source_registry.get(params.get("source")) or source_registry.default
+        
+        if params.get("aggregate"):
+            rows_summary = f"{row_count(state.get('processed_data'))} lignes de synthèse ({describe_aggregate(params['aggregate'])}) sur les {source.label}"
+            limit_summary = "aucune (agrégation sur toutes les lignes)"
+        else:
+            rows_summary = f"{row_count(state.get('processed_data'))} {source.label} traités"
+            limit_summary = params.get('limit', DEFAULT_LIMIT)
+        
+        cache_state = state.get("export_cache") or {}
+        if cache_state.get("hit"):
+            rows_summary += " (depuis le cache local)"
+        
+        export_file = state.get("export_file")
+        if export_file:
+            location = export_file["path"]
+            if export_file.get("table"):
+                location += f" (table {export_file['table']})"
+            output_summary = f"""📁 **Fichier exporté ({export_file['sink']}):**
+{location}"""
+        elif cache_state.get("deferred"):
+            output_summary = f"""📋 **Google Sheet:**
+⏳ Google Sheets indisponible pour le moment: l'export est conservé localement et sera envoyé automatiquement (clé {cache_state['key']})."""
+        else:
+            output_summary = f"""📋 **Google Sheet créé:**
+{state.get('sheets_url', 'Non disponible')}
+
+🔗 Vous pouvez maintenant accéder à vos données dans le Google Sheet via le lien ci-dessus."""
         
         response = f"""✅ Tâche terminée avec succès !
 
 📊 **Données récupérées:**
-- {len(state.get('processed_data', []))} posts traités
+- {rows_summary}
 - Champs extraits: {', '.join(params.get('fields', ['tous']))}
-- Limite appliquée: {params.get('limit', DEFAULT_LIMIT)}
+- Limite appliquée: {limit_summary}
 
-📋 **Google Sheet créé:**
-{state.get('sheets_url', 'Non disponible')}
-
-🔗 Vous pouvez maintenant accéder à vos données dans le Google Sheet via le lien ci-dessus."""
+{output_summary}"""
+        
+        # Effets secondaires en échec (dossier, partages): le sheet reste utilisable
+        warnings = failed_effects(state.get("export_effects"))
+        if warnings:
+            response += "\n\n⚠️ **Étapes non abouties:**\n" + "\n".join(
+                f"- {name}: {error}" for name, error in warnings.items()
+            )
         
         # Ajouter le lien LangSmith si disponible
         if langsmith_available:
@@ -945,37 +1368,55 @@ def generate_response(state: AgentState) -> AgentState:
 🔗 {project_url}
 """
     
-    state["messages"].append(AIMessage(content=response))
-       
-    return state
+    return {"messages": list(state.get("messages") or []) + [AIMessage(content=response)]}
 # =============================================================================
 # CONSTRUCTION DU GRAPHE (APRÈS DÉFINITION DES FONCTIONS)
 # =============================================================================
 
-def build_graph() -> StateGraph:
-    """Construit le graphe LangGraph"""
+def build_graph(checkpointer: Any = None, speculative_prefetch: bool = SPECULATIVE_PREFETCH) -> StateGraph:
+    """Construit le graphe LangGraph (checkpointer optionnel, voir agent.checkpoints)
+    
+    `speculative_prefetch`: nœud `prefetch` en tête, qui lance la récupération
+    de la source pendant le parsing LLM (voir agent.prefetch).
+    """
     
     workflow = StateGraph(AgentState)
     
-    # Ajout des nœuds
-    workflow.add_node("parse_query", parse_user_query)
-    workflow.add_node("fetch_data", fetch_api_data)
-    workflow.add_node("process_data", process_data)
-    workflow.add_node("create_sheet", create_google_sheet)
-    workflow.add_node("respond", generate_response)
+    # Ajout des nœuds (instrumentés: latence, erreurs, lignes, voir agent.metrics)
+    workflow.add_node("parse_query", instrument_node("parse_query", parse_user_query))
+    workflow.add_node("fetch_data", instrument_node("fetch_data", fetch_api_data))
+    workflow.add_node("process_data", instrument_node("process_data", process_data))
+    workflow.add_node("aggregate", instrument_node("aggregate", aggregate_data))
+    workflow.add_node("create_sheet", instrument_node("create_sheet", create_google_sheet))
+    workflow.add_node("write_file", instrument_node("write_file", write_file_export))
+    workflow.add_node("respond", instrument_node("respond", generate_response))
     
     # Définition des connexions
-    workflow.add_edge(START, "parse_query")
+    if speculative_prefetch:
+        workflow.add_node("prefetch", instrument_node("prefetch", start_speculative_fetch))
+        workflow.add_edge(START, "prefetch")
+        workflow.add_edge("prefetch", "parse_query")
+    else:
+        workflow.add_edge(START, "parse_query")
     workflow.add_edge("parse_query", "fetch_data")
     workflow.add_edge("fetch_data", "process_data")
-    workflow.add_edge("process_data", "create_sheet")
+    workflow.add_edge("process_data", "aggregate")
+    workflow.add_conditional_edges("aggregate", route_export, ["create_sheet", "write_file"])
     workflow.add_edge("create_sheet", "respond")
+    workflow.add_edge("write_file", "respond")
     workflow.add_edge("respond", END)
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+# Instance du graphe pour l'export (checkpoints SQLite si CHECKPOINT_ENABLED)
+checkpointer = get_checkpointer()
+graph = build_graph(checkpointer)
+
+# Classeurs pré-créés pour les exports (SHEET_POOL_SIZE > 0)
+sheet_pool = SheetPool(prepare_pooled_sheet, discard_pooled_sheets).start() if SHEET_POOL_SIZE > 0 and gc else None
 
-# Instance du graphe pour l'export
-graph = build_graph()
+# Endpoint Prometheus optionnel (METRICS_PORT)
+start_metrics_server()
 
 # =============================================================================
 # UTILITAIRES D'ÉTAT
@@ -991,15 +1432,157 @@ def get_initial_state() -> AgentState:
         "api_data": None,
         "processed_data": None,
         "sheets_url": "",
-        "error": ""
+        "error": "",
+        "export_effects": None,
+        "prefetch_id": None,
+        "export_cache": None,
+        "export_file": None
     }
 
+def invoke_graph(initial_state: AgentState, thread_id: Optional[str] = None,
+                 run_name: Optional[str] = None) -> AgentState:
+    """Exécute le graphe; avec checkpoints, reprend le thread s'il est inachevé"""
+    config: Dict[str, Any] = {"run_name": run_name} if run_name else {}
+    if checkpointer is None or not thread_id:
+        return graph.invoke(initial_state, config=config)
+    
+    config["configurable"] = {"thread_id": thread_id}
+    pending = graph.get_state(config).next
+    if pending:
+        # Crash d'un run précédent: les nœuds terminés ne sont pas rejoués
+        log_debug(f"Reprise du thread {thread_id} à {', '.join(pending)}")
+        initial_state = None
+    # durability="sync": process_data projette les lignes en place, le
+    # checkpoint d'un nœud doit être écrit avant que le suivant ne démarre
+    result = graph.invoke(initial_state, config=config, durability="sync")
+    if not CHECKPOINT_KEEP_COMPLETED and not result.get("error"):
+        checkpointer.delete_thread(thread_id)
+    return result
+
+# =============================================================================
+# MODE PLAN (DRY-RUN): COÛT ESTIMÉ AVANT EXÉCUTION
+# =============================================================================
+
+def _total(values: List[Optional[int]]) -> Optional[int]:
+    """Somme, ou None si une des valeurs est inconnue"""
+    return None if any(value is None for value in values) else sum(values)
+
+def build_run_plan(state: AgentState) -> Dict[str, Any]:
+    """Coût estimé d'un run à partir des paramètres extraits
+    
+    Même résolution que fetch_api_data et output_sink, sans requête amont, ni
+    appel Google, ni écriture: pages et octets amont, caches qui serviraient,
+    cellules et appels Google de l'export, tokens du parsing LLM. Les valeurs
+    inconnues avant exécution (total d'une source jamais lue, groupes d'une
+    agrégation) valent None.
+    """
+    params = state.get("extracted_params") or {}
+    api_url = state.get("api_url") or DEFAULT_API_URL
+    limit = None if params.get("aggregate") else params.get("limit", DEFAULT_LIMIT)
+    filters = params.get("filters") or {}
+    if api_url != DEFAULT_API_URL:
+        source = source_registry.find_by_url(api_url)
+    else:
+        source = source_registry.get(params.get("source")) or source_registry.default
+    
+    caches: Dict[str, Any] = {}
+    export_cache = get_export_cache()
+    cached_export = export_cache.fresh_entry(export_key(api_url, params)) if export_cache else None
+    caches["export_cache"] = "disabled" if not export_cache else ("hit" if cached_export else "miss")
+    
+    fetches: List[Dict[str, Any]] = []
+    if cached_export is None and source:
+        fetches.append(plan_source_fetch(source, filters, limit))
+        for spec in params.get("joins") or []:
+            joined = source_registry.get(spec.get("source"))
+            if joined:
+                fetches.append(plan_source_fetch(joined))
+    elif cached_export is None:
+        # URL hors registre: une requête, taille inconnue
+        fetches.append({"source": None, "url": api_url, "pages": 1, "requests": 1, "cached_pages": 0,
+                        "rows_scanned": None, "rows": limit, "bytes": None, "exact": False})
+    upstream = {
+        "requests": _total([fetch["requests"] for fetch in fetches]),
+        "pages": _total([fetch["pages"] for fetch in fetches]),
+        "bytes": _total([fetch["bytes"] for fetch in fetches]),
+        "cached_pages": sum(fetch["cached_pages"] for fetch in fetches),
+        "fetches": fetches,
+    }
+    caches["upstream_cached_pages"] = upstream["cached_pages"]
+    
+    if cached_export is not None:
+        rows = cached_export["rows"]
+    elif params.get("aggregate") or not fetches:
+        rows = None
+    else:
+        rows = fetches[0]["rows"]
+    columns = len(params.get("fields") or (source.fields if source else VALID_API_FIELDS))
+    
+    sink = params.get("sink") or EXPORT_SINK
+    if sink == SINK_SHEETS and SINK_OVERSIZE_FALLBACK and rows is not None and exceeds_sheet_limit(rows, columns):
+        sink = SINK_OVERSIZE_FALLBACK
+    output: Dict[str, Any] = {
+        "sink": sink,
+        "rows": rows,
+        "columns": columns,
+        "cells": None if rows is None else (rows + 1) * columns,
+        "google_calls": {"read": 0, "write": 0},
+    }
+    if sink == SINK_SHEETS:
+        write_path = choose_write_path(rows or 0, columns)
+        pooled = write_path != WRITE_UPLOAD and sheet_pool is not None and len(sheet_pool) > 0
+        # Taille CSV ≈ octets JSON par ligne de la source, au prorata des colonnes exportées
+        row_bytes = source_profile(source.name).get("row_bytes", PLAN_DEFAULT_ROW_BYTES) if source else PLAN_DEFAULT_ROW_BYTES
+        field_count = len(source.fields) if source else columns
+        csv_bytes = int((rows or 0) * row_bytes * columns / max(1, field_count))
+        calls = estimate_google_calls(csv_bytes, write_path, pooled)
+        output.update(
+            write_path=write_path,
+            google_calls=calls,
+            min_quota_seconds=round(max(0, calls["write"] - GOOGLE_QUOTA_BURST) * 60 / GOOGLE_WRITE_REQUESTS_PER_MINUTE, 2),
+            configured=bool(gc),
+        )
+        caches["sheet_pool"] = "hit" if pooled else ("miss" if sheet_pool is not None else "disabled")
+    
+    llm_tokens = estimate_parse_tokens(state.get("user_query", ""), ", ".join(source_registry.names()))
+    return {
+        "query": state.get("user_query", ""),
+        "api_url": api_url,
+        "params": params,
+        "upstream": upstream,
+        "output": output,
+        "llm": dict(llm_tokens, calls=1),
+        "caches": caches,
+    }
+
+def plan_agent_run(user_input: str, api_url: Optional[str] = None) -> Dict[str, Any]:
+    """Mode plan: parsing de la requête puis coût estimé du run, sans l'exécuter"""
+    state = get_initial_state()
+    state["messages"] = [HumanMessage(content=user_input)]
+    if api_url:
+        state["api_url"] = api_url
+    parsed = parse_user_query(state)
+    if parsed.get("error"):
+        return {"error": parsed["error"]}
+    state.update(parsed)
+    return build_run_plan(state)
+
 # =============================================================================
 # FONCTION D'EXÉCUTION AVEC TRACING GLOBAL
 # =============================================================================
 
-def run_agent_with_tracing(user_input: str, run_name: str = None) -> AgentState:
-    """Exécute l'agent avec un tracing global de la session"""
+def run_agent_with_tracing(user_input: str, run_name: str = None, thread_id: str = None,
+                           api_url: Optional[str] = None, keep_rows: bool = False) -> AgentState:
+    """Exécute l'agent avec un tracing global de la session
+    
+    Avec CHECKPOINT_ENABLED, `thread_id` identifie l'export: un nouvel appel
+    avec le même identifiant reprend un run interrompu. Sans `thread_id`, le
+    run a son propre thread (uuid) et ne reprend jamais celui d'un autre appel.
+    `api_url` remplace la source par défaut (comme `state["api_url"]`).
+    Les lignes exportées sont relâchées en fin de run (`row_count` reste
+    utilisable sur le résultat); `keep_rows=True` les garde pour `load_rows`,
+    à charge pour l'appelant d'appeler `release_rows`.
+    """
     
     if run_name is None:
         run_name = f"agent_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -1015,27 +1598,35 @@ def run_agent_with_tracing(user_input: str, run_name: str = None) -> AgentState:
         except:
             pass
     
+    result: Optional[AgentState] = None
     try:
         # État initial
         initial_state = get_initial_state()
         initial_state["messages"] = [HumanMessage(content=user_input)]
+        if api_url:
+            initial_state["api_url"] = api_url
         
         if trace_context:
             trace_context.update(inputs={"user_input": user_input})
         
         log_debug(f"Démarrage de l'agent avec input: {user_input}")
         
-        # Exécution du graphe
-        result = graph.invoke(initial_state)
+        # Exécution du graphe (profilée si PROFILING_ENABLED, voir agent.profiling)
+        with profile_run(run_name) as profile:
+            result = invoke_graph(initial_state, thread_id or uuid.uuid4().hex)
+        if profile.summary:
+            result["profile"] = profile.summary
+            log_debug(f"Profil du run écrit: {profile.summary['collapsed_path']}")
         
         if trace_context:
             trace_context.update(outputs={
                 "success": True,
                 "final_state": {
                     "sheets_url": result.get("sheets_url"),
-                    "processed_data_count": len(result.get("processed_data", [])),
+                    "processed_data_count": row_count(result.get("processed_data")),
                     "error": result.get("error")
-                }
+                },
+                "profile": result.get("profile")
             })
         
         return result
@@ -1048,6 +1639,9 @@ def run_agent_with_tracing(user_input: str, run_name: str = None) -> AgentState:
         raise
     
     finally:
+        if result is not None and not keep_rows:
+            # Export terminé: le blob ne reste pas épinglé dans le magasin
+            release_rows(result.get("processed_data"))
         if trace_context:
             trace_context.__exit__(None, None, None)
 
@@ -1107,9 +1701,11 @@ __all__ = [
     'AgentState', 
     'get_initial_state',
     'run_agent_with_tracing',
+    'invoke_graph',
     'parse_user_query',
     'fetch_api_data',
     'process_data', 
+    'aggregate_data',
     'create_google_sheet',
     'generate_response'
 ]
@@ -1143,6 +1739,24 @@ GRAPH_METADATA = {
             "LANGSMITH_API_KEY",
             "GOOGLE_PERSONAL_EMAIL",
             "DEFAULT_API_URL",
+            "API_BASE_URL",
+            "DEFAULT_SOURCE",
+            "RETENTION_MAX_AGE_DAYS",
+            "RETENTION_MAX_SHEETS",
+            "GOOGLE_API_ENDPOINT",
+            "METRICS_ENABLED",
+            "METRICS_PORT",
+            "PROFILING_ENABLED",
+            "PARSE_BATCH_WINDOW_MS",
+            "BLOB_INLINE_MAX_ROWS",
+            "CHECKPOINT_ENABLED",
+            "CHECKPOINT_DB_PATH",
+            "SIDE_EFFECT_WORKERS",
+            "SPECULATIVE_PREFETCH",
+            "SHEET_POOL_SIZE",
+            "EXPORT_CACHE_ENABLED",
+            "EXPORT_SINK",
+            "DRIVE_UPLOAD_MODE",
             "DEBUG"
         ]
     }
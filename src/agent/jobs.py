@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Mode service: file de jobs d'export SQLite et pool de workers
+
+Les appelants soumettent des requêtes d'export sans bloquer; un pool de
+workers exécute le graphe avec une concurrence bornée, les appels LLM,
+API amont et Google restant plafonnés séparément (agent.concurrency).
+
+Usage:
+    python -m agent.jobs serve --workers 4
+    python -m agent.jobs submit "récupère 5 posts avec title et id"
+    python -m agent.jobs status <job_id>
+    python -m agent.jobs list
+
+Chaque job réservé porte un bail: identifiant du worker (`JOBS_WORKER_ID`)
+et date d'expiration, prolongée par un battement de cœur tant que le job
+tourne. Au démarrage, seuls les jobs dont le bail a expiré (serveur arrêté
+ou planté) ou qui appartenaient à ce même worker avant son redémarrage sont
+remis en file: un second serveur sur la même base ne reprend pas les jobs
+qu'un autre processus exécute encore.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+from agent.blobs import row_count, release_rows
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "./agent_jobs.sqlite3")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "0.5"))
+# Identifiant stable d'un serveur (à fixer pour reprendre ses jobs après redémarrage)
+JOBS_WORKER_ID = os.getenv("JOBS_WORKER_ID", "")
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+JOB_FINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    api_url TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    worker_id TEXT,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+# Colonnes ajoutées aux bases créées avant les baux
+_LEASE_COLUMNS = {"worker_id": "TEXT", "lease_expires": "REAL"}
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="milliseconds")
+
+# =============================================================================
+# FILE DE JOBS (SQLITE)
+# =============================================================================
+
+class JobStore:
+    """File de jobs persistante, partagée entre threads et processus"""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, worker_id: str = JOBS_WORKER_ID,
+                 lease_seconds: float = JOBS_LEASE_SECONDS):
+        self.db_path = db_path
+        # Sans identifiant fixé: unique par processus (jamais repris comme « précédent »)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in _LEASE_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, query: str, api_url: Optional[str] = None) -> str:
+        """Ajoute un job en file et retourne son identifiant"""
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, query, api_url, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, query, api_url, JOB_QUEUED, _now()),
+            )
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Réserve atomiquement le plus ancien job en file (None si vide)"""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (JOB_QUEUED,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, "
+                    "worker_id = ?, lease_expires = ? WHERE id = ?",
+                    (JOB_RUNNING, _now(), self.worker_id, time.time() + self.lease_seconds, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = dict(row)
+        job.update(status=JOB_RUNNING, worker_id=self.worker_id)
+        return job
+
+    def heartbeat(self) -> int:
+        """Prolonge le bail des jobs en cours de ce worker; retourne leur nombre"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE status = ? AND worker_id = ?",
+                (time.time() + self.lease_seconds, JOB_RUNNING, self.worker_id),
+            )
+            return cursor.rowcount
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> bool:
+        """Marque un job comme réussi (ou échoué si le run a retourné une erreur)
+
+        Retourne False si ce worker n'a plus le bail (job repris par un autre):
+        le résultat du nouveau propriétaire n'est pas écrasé.
+        """
+        status = JOB_FAILED if result.get("error") else JOB_SUCCEEDED
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND worker_id = ?",
+                (status, _now(), json.dumps(result, default=str), result.get("error") or None,
+                 job_id, JOB_RUNNING, self.worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: str, error: str) -> bool:
+        """Marque un job comme échoué; False si ce worker n'a plus le bail"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND worker_id = ?",
+                (JOB_FAILED, _now(), error, job_id, JOB_RUNNING, self.worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def requeue_running(self) -> int:
+        """Remet en file les jobs interrompus: bail expiré ou précédente instance de ce worker"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, worker_id = NULL, lease_expires = NULL "
+                "WHERE status = ? AND (lease_expires IS NULL OR lease_expires < ? OR worker_id = ?)",
+                (JOB_QUEUED, JOB_RUNNING, time.time(), self.worker_id),
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Statut et résultat d'un job"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Jobs les plus récents (résumé sans résultat)"""
+        query = "SELECT id, query, status, created_at, started_at, finished_at, error FROM jobs"
+        args: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            args = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, args + (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Nombre de jobs par statut"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll_interval: float = JOBS_POLL_INTERVAL) -> Optional[Dict[str, Any]]:
+        """Attend la fin d'un job (None si le timeout expire)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job and job["status"] in JOB_FINAL_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+# =============================================================================
+# EXÉCUTION D'UN JOB
+# =============================================================================
+
+def summarize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Résumé sérialisable de l'état final du graphe"""
+    messages = result.get("messages") or []
+    final_answer = ""
+    if messages:
+        last = messages[-1]
+        final_answer = last.get("content", "") if isinstance(last, dict) else getattr(last, "content", "")
+
+    return {
+        "sheets_url": result.get("sheets_url") or "",
+        "error": result.get("error") or "",
+        "extracted_params": result.get("extracted_params"),
+        "rows": row_count(result.get("processed_data")),
+        "export_effects": result.get("export_effects"),
+        "export_cache": result.get("export_cache"),
+        "export_file": result.get("export_file"),
+        "final_answer": final_answer,
+    }
+
+def run_export_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Exécute le graphe pour un job et retourne le résumé du résultat"""
+    # Import tardif: le module graph initialise LLM et clients Google
+    from langchain_core.messages import HumanMessage
+    from agent.graph import invoke_graph, get_initial_state
+    from agent.profiling import profile_run
+
+    initial_state = get_initial_state()
+    initial_state["messages"] = [HumanMessage(content=job["query"])]
+    if job.get("api_url"):
+        initial_state["api_url"] = job["api_url"]
+
+    run_name = f"job_{job['id']}"
+    # thread_id = job: un job remis en file après un crash reprend là où il s'était arrêté
+    with profile_run(run_name) as profile:
+        result = invoke_graph(initial_state, thread_id=run_name, run_name=run_name)
+    summary = summarize_result(result)
+    # Les lignes exportées ne sont plus utiles une fois le job résumé
+    release_rows(result.get("processed_data"))
+    if profile.summary:
+        summary["profile"] = profile.summary
+    return summary
+
+# =============================================================================
+# POOL DE WORKERS
+# =============================================================================
+
+class JobRunner:
+    """Pool de workers (threads) qui consomment la file de jobs"""
+
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        workers: int = JOBS_WORKERS,
+        executor: Callable[[Dict[str, Any]], Dict[str, Any]] = run_export_job,
+        poll_interval: float = JOBS_POLL_INTERVAL,
+    ):
+        self.store = store or JobStore()
+        self.workers = max(1, workers)
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "JobRunner":
+        """Démarre les workers (les jobs interrompus sont remis en file)"""
+        requeued = self.store.requeue_running()
+        if requeued:
+            print(f"♻️ {requeued} job(s) interrompu(s) remis en file", file=sys.stderr)
+
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"agent-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="agent-job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Arrête les workers après leur job en cours"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            job = self.store.claim()
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                recorded = self.store.complete(job["id"], self.executor(job))
+            except Exception as e:
+                recorded = self.store.fail(job["id"], f"{type(e).__name__}: {e}")
+            if not recorded:
+                print(f"⚠️ Bail perdu pour le job {job['id']}: résultat ignoré", file=sys.stderr)
+
+    def _heartbeat_loop(self) -> None:
+        # Trois battements par bail: un battement manqué ne fait pas expirer les jobs
+        while not self._stop.wait(self.store.lease_seconds / 3):
+            try:
+                self.store.heartbeat()
+            except sqlite3.Error as e:
+                print(f"⚠️ Bail des jobs non prolongé: {e}", file=sys.stderr)
+
+    def __enter__(self) -> "JobRunner":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="File de jobs d'export API → Google Sheets")
+    parser.add_argument("--db", default=JOBS_DB_PATH, help="Chemin de la base SQLite des jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Démarre le pool de workers")
+    serve.add_argument("--workers", type=int, default=JOBS_WORKERS)
+
+    submit = subparsers.add_parser("submit", help="Soumet un job d'export")
+    submit.add_argument("query")
+    submit.add_argument("--api-url", default=None)
+    submit.add_argument("--wait", type=float, default=None, help="Attendre le résultat (secondes)")
+
+    status = subparsers.add_parser("status", help="Statut et résultat d'un job")
+    status.add_argument("job_id")
+
+    listing = subparsers.add_parser("list", help="Derniers jobs")
+    listing.add_argument("--status", default=None)
+    listing.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args(argv)
+    store = JobStore(args.db)
+
+    if args.command == "serve":
+        runner = JobRunner(store, workers=args.workers).start()
+        print(f"🚀 Pool de {runner.workers} worker(s) démarré sur {args.db}", file=sys.stderr)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print("🛑 Arrêt des workers...", file=sys.stderr)
+            runner.stop()
+        return 0
+
+    if args.command == "submit":
+        job_id = store.submit(args.query, args.api_url)
+        if args.wait is None:
+            print(job_id)
+            return 0
+        job = store.wait(job_id, timeout=args.wait)
+        print(json.dumps(job or store.get(job_id), indent=2, ensure_ascii=False, default=str))
+        return 0 if job and job["status"] == JOB_SUCCEEDED else 1
+
+    if args.command == "status":
+        job = store.get(args.job_id)
+        if job is None:
+            print(f"❌ Job introuvable: {args.job_id}", file=sys.stderr)
+            return 1
+        print(json.dumps(job, indent=2, ensure_ascii=False, default=str))
+        return 0
+
+    if args.command == "list":
+        print(json.dumps({"counts": store.counts(), "jobs": store.list(args.status, args.limit)}, indent=2, ensure_ascii=False))
+        return 0
+
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
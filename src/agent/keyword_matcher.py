@@ -0,0 +1,84 @@
+"""
+Analyse lexicale des requêtes en une seule passe
+
+Un `KeywordMatcher` est compilé une fois à partir des tables de mots-clés
+(sources, champs, mots de restriction). `scan` parcourt la requête une seule
+fois avec une regex combinée et en extrait en même temps:
+
+- les tokens (les expressions de plusieurs mots du vocabulaire, comme
+  « adresse email », ressortent en un seul token normalisé);
+- les nombres;
+- les marqueurs (mots de restriction, etc.) regroupés par type.
+
+Les lookups mot-clé → source/champ restent des accès dict par token
+(agent.sources): seules les expressions multi-mots passent par la regex.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+class QueryScan:
+    """Résultat de l'analyse d'une requête"""
+
+    __slots__ = ("tokens", "numbers", "markers")
+
+    def __init__(self, tokens: List[str], numbers: List[int], markers: Dict[str, List[str]]):
+        self.tokens = tokens
+        self.numbers = numbers
+        self.markers = markers
+
+    def has(self, kind: str) -> bool:
+        """Vrai si au moins un marqueur de ce type est présent"""
+        return bool(self.markers.get(kind))
+
+    def first_number(self) -> Optional[int]:
+        return self.numbers[0] if self.numbers else None
+
+    def __repr__(self) -> str:
+        return f"QueryScan(tokens={self.tokens!r}, numbers={self.numbers!r}, markers={self.markers!r})"
+
+class KeywordMatcher:
+    """Regex combinée précompilée: expressions multi-mots | mots"""
+
+    def __init__(self, phrases: Iterable[str] = (), markers: Optional[Dict[str, Iterable[str]]] = None):
+        self._markers: Dict[str, str] = {}
+        for kind, words in (markers or {}).items():
+            for word in words:
+                self._markers[" ".join(word.lower().split())] = kind
+
+        multi_word = {" ".join(phrase.lower().split()) for phrase in phrases}
+        multi_word.update(word for word in self._markers if " " in word)
+        multi_word = {phrase for phrase in multi_word if " " in phrase}
+
+        # Les plus longues d'abord: « adresse email pro » avant « adresse email »
+        alternatives = [
+            r"\s+".join(re.escape(word) for word in phrase.split())
+            for phrase in sorted(multi_word, key=len, reverse=True)
+        ]
+        if alternatives:
+            pattern = r"(?<!\w)(?P<phrase>" + "|".join(alternatives) + r")(?!\w)|\w+"
+        else:
+            pattern = r"\w+"
+        self._pattern = re.compile(pattern)
+        self.phrase_count = len(multi_word)
+
+    def scan(self, text: str) -> QueryScan:
+        """Tokens, nombres et marqueurs de `text` en une passe"""
+        tokens: List[str] = []
+        numbers: List[int] = []
+        markers: Dict[str, List[str]] = {}
+        marker_kinds = self._markers
+
+        for match in self._pattern.finditer(text.lower()):
+            if match.lastgroup == "phrase":
+                token = " ".join(match.group().split())
+            else:
+                token = match.group()
+                if token.isdecimal():
+                    numbers.append(int(token))
+            tokens.append(token)
+            kind = marker_kinds.get(token)
+            if kind:
+                markers.setdefault(kind, []).append(token)
+
+        return QueryScan(tokens, numbers, markers)
@@ -0,0 +1,346 @@
+"""
+Parsing LLM des requêtes en mode sortie structurée
+
+Le LLM est appelé en tool-calling forcé sur un schéma typé (`QueryParams`)
+au lieu d'un JSON libre: la sortie est bornée par le schéma, `max_tokens`
+est plafonné à ce qu'il faut pour le remplir, et le prompt n'a plus à
+décrire le format attendu. La chaîne (prompt | llm lié à l'outil) est
+construite une seule fois par instance de LLM et réutilisée.
+
+La sortie reste un dict brut: `validate_extracted_params` (agent.graph)
+garde la main sur la résolution de la source, des champs et des limites.
+
+Micro-batching (`PARSE_BATCH_WINDOW_MS` > 0): les requêtes arrivant dans la
+même fenêtre (jusqu'à `PARSE_BATCH_MAX_SIZE`) partent en un seul appel LLM
+avec un prompt multi-requêtes (outil `QueryParamsBatch`), puis les
+paramètres sont redistribués aux runs en attente. Le premier run d'un lot
+en est le meneur: pas de thread de fond.
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from agent.concurrency import concurrency_limit
+from agent.metrics import inc as inc_metric, observe as observe_metric
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Le schéma le plus bavard (jointure + agrégation + filtres) tient sous ~200 tokens
+PARSE_MAX_TOKENS = int(os.getenv("PARSE_MAX_TOKENS", "256"))
+
+# Fenêtre de regroupement des requêtes concurrentes (0 = pas de micro-batching)
+PARSE_BATCH_WINDOW_MS = float(os.getenv("PARSE_BATCH_WINDOW_MS", "0"))
+PARSE_BATCH_MAX_SIZE = int(os.getenv("PARSE_BATCH_MAX_SIZE", "8"))
+
+PARSE_PROMPT = (
+    "Extrais les paramètres d'export de la requête.\n"
+    "Sources: {sources}\n"
+    "Requête: {user_query}"
+)
+
+PARSE_BATCH_PROMPT = (
+    "Extrais les paramètres d'export de chaque requête, un élément par requête, dans l'ordre.\n"
+    "Sources: {sources}\n"
+    "Requêtes:\n{queries}"
+)
+
+# =============================================================================
+# SCHÉMA DES PARAMÈTRES
+# =============================================================================
+
+class JoinParams(BaseModel):
+    """Jointure vers une source liée"""
+
+    source: str = Field(description="Source liée")
+    fields: List[str] = Field(default_factory=list, description="Champs de la source liée")
+    left_key: Optional[str] = None
+    right_key: Optional[str] = None
+
+class MetricParams(BaseModel):
+    """Métrique d'agrégation"""
+
+    op: str = Field(description="count, sum, avg, min ou max")
+    field: Optional[str] = None
+    alias: Optional[str] = None
+
+class AggregateParams(BaseModel):
+    """Agrégation (group-by + métriques)"""
+
+    group_by: List[str] = Field(default_factory=list)
+    metrics: List[MetricParams] = Field(default_factory=list)
+
+class QueryParams(BaseModel):
+    """Paramètres d'export extraits de la requête utilisateur"""
+
+    source: Optional[str] = Field(default=None, description="Nom de la source")
+    limit: Optional[int] = Field(default=None, description="Nombre d'éléments")
+    fields: Optional[List[str]] = Field(default=None, description="Champs demandés")
+    filters: Optional[Dict[str, Any]] = Field(default=None, description="Filtres champ -> valeur")
+    joins: Optional[List[JoinParams]] = None
+    aggregate: Optional[AggregateParams] = None
+    sink: Optional[str] = Field(default=None, description="Sortie: sheets, csv, parquet ou sqlite")
+    description: Optional[str] = Field(default=None, description="Résumé court")
+
+class QueryParamsBatch(BaseModel):
+    """Paramètres de plusieurs requêtes, dans l'ordre des requêtes"""
+
+    items: List[QueryParams]
+
+# =============================================================================
+# CHAÎNE RÉUTILISÉE
+# =============================================================================
+
+_chain_lock = threading.Lock()
+_chain_cache: Dict[Any, Tuple[Any, Any]] = {}  # clé -> (llm, chaîne)
+
+def build_parse_chain(llm: Any) -> Any:
+    """prompt | llm forcé sur l'outil QueryParams, sortie plafonnée"""
+    prompt = ChatPromptTemplate.from_template(PARSE_PROMPT)
+    bound = llm.bind_tools([QueryParams], tool_choice=QueryParams.__name__, max_tokens=PARSE_MAX_TOKENS)
+    return prompt | bound
+
+def build_batch_parse_chain(llm: Any, size: int) -> Any:
+    """prompt multi-requêtes | llm forcé sur QueryParamsBatch"""
+    prompt = ChatPromptTemplate.from_template(PARSE_BATCH_PROMPT)
+    bound = llm.bind_tools([QueryParamsBatch], tool_choice=QueryParamsBatch.__name__,
+                           max_tokens=PARSE_MAX_TOKENS * size)
+    return prompt | bound
+
+def _cached_chain(llm: Any, key: Any, builder: Any) -> Any:
+    cached = _chain_cache.get(key)
+    if cached is not None and cached[0] is llm:
+        return cached[1]
+    with _chain_lock:
+        cached = _chain_cache.get(key)
+        if cached is None or cached[0] is not llm:
+            cached = _chain_cache[key] = (llm, builder())
+        return cached[1]
+
+def get_parse_chain(llm: Any) -> Any:
+    """Chaîne de parsing pour ce LLM (reconstruite seulement si le LLM change)"""
+    return _cached_chain(llm, "single", lambda: build_parse_chain(llm))
+
+def get_batch_parse_chain(llm: Any, size: int) -> Any:
+    """Chaîne multi-requêtes pour un lot de `size` requêtes"""
+    return _cached_chain(llm, ("batch", size), lambda: build_batch_parse_chain(llm, size))
+
+# =============================================================================
+# EXTRACTION DE LA SORTIE
+# =============================================================================
+
+def message_to_params(message: Any) -> Dict[str, Any]:
+    """Paramètres depuis l'appel d'outil (ou un JSON en contenu, en dernier recours)"""
+    raw: Any = None
+    for call in getattr(message, "tool_calls", None) or []:
+        if call.get("name") == QueryParams.__name__:
+            raw = call.get("args")
+            break
+    if raw is None:
+        content = message.content if isinstance(message, AIMessage) else message
+        raw = json.loads(content) if isinstance(content, str) and content.strip() else {}
+    return _validated(raw)
+
+def _validated(raw: Any) -> Dict[str, Any]:
+    try:
+        return QueryParams.model_validate(raw).model_dump(exclude_none=True)
+    except ValidationError:
+        # Schéma partiellement respecté: la validation métier fera le tri
+        return raw if isinstance(raw, dict) else {}
+
+_schema_chars: Optional[int] = None
+
+def estimate_parse_tokens(user_query: str, sources: str) -> Dict[str, int]:
+    """Tokens d'un appel de parsing, estimés sans appel (≈ 4 caractères par token)
+
+    L'entrée compte le prompt et le schéma de l'outil QueryParams envoyé avec
+    chaque appel; la sortie est plafonnée par PARSE_MAX_TOKENS.
+    """
+    global _schema_chars
+    if _schema_chars is None:
+        _schema_chars = len(json.dumps(QueryParams.model_json_schema(), ensure_ascii=False))
+    prompt = PARSE_PROMPT.format(sources=sources, user_query=user_query)
+    return {"input_tokens": (len(prompt) + _schema_chars) // 4 + 1, "output_tokens_max": PARSE_MAX_TOKENS}
+
+def record_token_usage(message: Any, operation: str) -> Dict[str, int]:
+    """Reporte l'usage de tokens du message dans les métriques"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    for direction in ("input", "output"):
+        tokens = usage.get(f"{direction}_tokens") or 0
+        if tokens:
+            inc_metric("agent_llm_tokens_total", tokens, operation=operation, direction=direction)
+    return dict(usage)
+
+def batch_message_to_params(message: Any, expected: int) -> Optional[List[Dict[str, Any]]]:
+    """Paramètres par requête depuis l'appel QueryParamsBatch (None si incohérent)"""
+    for call in getattr(message, "tool_calls", None) or []:
+        if call.get("name") == QueryParamsBatch.__name__:
+            items = (call.get("args") or {}).get("items")
+            if isinstance(items, list) and len(items) == expected:
+                return [_validated(item) for item in items]
+    return None
+
+# =============================================================================
+# APPELS LLM
+# =============================================================================
+
+def _invoke(chain: Any, inputs: Dict[str, Any]) -> Any:
+    """Un appel LLM réel (plafond de concurrence, métriques, tokens)"""
+    started = time.perf_counter()
+    try:
+        with concurrency_limit("llm"):
+            message = chain.invoke(inputs)
+    finally:
+        inc_metric("agent_llm_calls_total", operation="parse_query")
+        observe_metric("agent_llm_duration_seconds", time.perf_counter() - started, operation="parse_query")
+    record_token_usage(message, "parse_query")
+    return message
+
+def parse_single(llm: Any, user_query: str, sources: str) -> Dict[str, Any]:
+    """Parsing d'une requête par un appel dédié"""
+    message = _invoke(get_parse_chain(llm), {"user_query": user_query, "sources": sources})
+    return message_to_params(message)
+
+def parse_many(llm: Any, queries: List[str], sources: str) -> List[Any]:
+    """Parsing de plusieurs requêtes en un appel (repli requête par requête)
+
+    Retourne, dans l'ordre, un dict de paramètres ou l'exception levée.
+    """
+    if len(queries) == 1:
+        try:
+            return [parse_single(llm, queries[0], sources)]
+        except Exception as e:
+            return [e]
+
+    numbered = "\n".join(f"{i}. {query}" for i, query in enumerate(queries, 1))
+    try:
+        message = _invoke(get_batch_parse_chain(llm, len(queries)), {"queries": numbered, "sources": sources})
+        params = batch_message_to_params(message, len(queries))
+        if params is not None:
+            return params
+        inc_metric("agent_llm_batch_fallbacks_total")
+    except Exception:
+        inc_metric("agent_llm_batch_fallbacks_total")
+
+    results: List[Any] = []
+    for query in queries:
+        try:
+            results.append(parse_single(llm, query, sources))
+        except Exception as e:
+            results.append(e)
+    return results
+
+# =============================================================================
+# MICRO-BATCHING
+# =============================================================================
+
+class _Pending:
+    __slots__ = ("user_query", "done", "result", "error")
+
+    def __init__(self, user_query: str):
+        self.user_query = user_query
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+class _Batch:
+    __slots__ = ("llm", "sources", "items", "closed")
+
+    def __init__(self, llm: Any, sources: str):
+        self.llm = llm
+        self.sources = sources
+        self.items: List[_Pending] = []
+        self.closed = False
+
+class ParseBatcher:
+    """Regroupe les requêtes concurrentes en lots envoyés en un appel LLM"""
+
+    def __init__(self, window: float = PARSE_BATCH_WINDOW_MS / 1000.0, max_size: int = PARSE_BATCH_MAX_SIZE):
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._cond = threading.Condition()
+        self._open: Dict[Tuple[int, str], _Batch] = {}
+        self.stats = {"batches": 0, "queries": 0}
+
+    def fill_ratio(self) -> float:
+        """Remplissage moyen des lots (1.0 = lots pleins)"""
+        if not self.stats["batches"]:
+            return 0.0
+        return self.stats["queries"] / (self.stats["batches"] * self.max_size)
+
+    def submit(self, llm: Any, user_query: str, sources: str) -> Dict[str, Any]:
+        """Paramètres bruts pour `user_query` (bloque le temps de la fenêtre)"""
+        pending = _Pending(user_query)
+        key = (id(llm), sources)
+        with self._cond:
+            batch = self._open.get(key)
+            leader = batch is None or batch.closed or len(batch.items) >= self.max_size
+            if leader:
+                batch = self._open[key] = _Batch(llm, sources)
+            batch.items.append(pending)
+            if len(batch.items) >= self.max_size:
+                self._cond.notify_all()
+
+        if leader:
+            self._lead(key, batch)
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _lead(self, key: Tuple[int, str], batch: _Batch) -> None:
+        deadline = time.monotonic() + self.window
+        with self._cond:
+            while len(batch.items) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch.closed = True
+            if self._open.get(key) is batch:
+                del self._open[key]
+            items = list(batch.items)
+            self.stats["batches"] += 1
+            self.stats["queries"] += len(items)
+
+        inc_metric("agent_llm_batches_total")
+        inc_metric("agent_llm_batched_queries_total", len(items))
+        observe_metric("agent_llm_batch_fill_ratio", len(items) / self.max_size)
+
+        try:
+            results = parse_many(batch.llm, [item.user_query for item in items], batch.sources)
+        except BaseException as e:
+            results = [e] * len(items)
+        for item, result in zip(items, results):
+            if isinstance(result, BaseException):
+                item.error = result
+            else:
+                item.result = result
+            item.done.set()
+
+_batcher: Optional[ParseBatcher] = None
+_batcher_lock = threading.Lock()
+
+def get_batcher() -> ParseBatcher:
+    """Batcher partagé du processus (configuré par l'environnement)"""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = ParseBatcher()
+    return _batcher
+
+def parse_query_params(llm: Any, user_query: str, sources: str) -> Dict[str, Any]:
+    """Paramètres bruts d'une requête, micro-batchés si la fenêtre est active"""
+    if PARSE_BATCH_WINDOW_MS > 0 and PARSE_BATCH_MAX_SIZE > 1:
+        return get_batcher().submit(llm, user_query, sources)
+    return parse_single(llm, user_query, sources)
@@ -0,0 +1,415 @@
+"""
+Transport HTTP (streamable HTTP / SSE) du serveur MCP, sur asyncio
+
+Le transport stdio de `server.py` lance un processus Python par client:
+chacun réimporte `agent.graph`, réautorise Google et repart de caches
+vides. Ce transport sert tous les clients depuis un seul processus
+long-vivant qui partage le client LLM, les sessions HTTP amont, les
+clients Google (limiteur de débit compris) et les caches déjà chauds.
+
+- `POST /mcp`: un message JSON-RPC (ou un lot). Réponse `application/json`,
+  ou flux SSE (`text/event-stream`) si le client l'accepte et appelle un
+  outil: des commentaires `: ping` gardent la connexion ouverte pendant
+  l'exécution, puis le résultat est envoyé en un événement `message`.
+  Les notifications seules reçoivent `202 Accepted`.
+- `initialize` ouvre une session (en-tête `Mcp-Session-Id`), `DELETE /mcp`
+  la ferme; un identifiant inconnu ou expiré reçoit 404.
+- Les outils sont bloquants (agent, API, Google): ils s'exécutent dans un
+  pool de `MCP_HTTP_WORKERS` threads, la boucle asyncio ne fait que l'I/O.
+- Chaque client (session, sinon adresse IP) a au plus
+  `MCP_HTTP_MAX_PER_CLIENT` messages en cours (chaque message d'un lot
+  compte); au-delà, 429 avec `Retry-After`, sans occuper de thread. Une adresse ouvre au plus
+  `MCP_HTTP_MAX_SESSIONS_PER_CLIENT` sessions, le serveur au plus
+  `MCP_HTTP_MAX_SESSIONS`: un nouvel `initialize` remplace la plus ancienne
+  session inactive, sinon il reçoit 429 (rappeler `initialize` ne
+  contourne pas les limites).
+- `GET /health`: sessions ouvertes et requêtes en cours.
+
+Pas de flux serveur → client hors requête (`GET /mcp` répond 405), ni de
+corps de requête `chunked`.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from agent.metrics import inc as inc_metric
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+MCP_HTTP_HOST = os.getenv("MCP_HTTP_HOST", "127.0.0.1")
+MCP_HTTP_PORT = int(os.getenv("MCP_HTTP_PORT", "8766"))  # 8765: faux serveur Google (fake_google)
+MCP_HTTP_PATH = os.getenv("MCP_HTTP_PATH", "/mcp")
+MCP_HTTP_WORKERS = int(os.getenv("MCP_HTTP_WORKERS", "16"))  # threads pour les outils
+MCP_HTTP_MAX_PER_CLIENT = int(os.getenv("MCP_HTTP_MAX_PER_CLIENT", "4"))  # requêtes simultanées par client
+MCP_HTTP_MAX_BODY_BYTES = int(os.getenv("MCP_HTTP_MAX_BODY_BYTES", str(1024 * 1024)))
+MCP_HTTP_SESSION_TTL = float(os.getenv("MCP_HTTP_SESSION_TTL", "3600"))  # secondes d'inactivité
+MCP_HTTP_MAX_SESSIONS = int(os.getenv("MCP_HTTP_MAX_SESSIONS", "1024"))
+MCP_HTTP_MAX_SESSIONS_PER_CLIENT = int(os.getenv("MCP_HTTP_MAX_SESSIONS_PER_CLIENT", "32"))  # par adresse IP
+MCP_HTTP_SSE_PING = float(os.getenv("MCP_HTTP_SSE_PING", "15"))  # secondes entre deux pings SSE
+
+SESSION_HEADER = "mcp-session-id"
+
+_REASONS = {
+    200: "OK", 202: "Accepted", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+    429: "Too Many Requests", 500: "Internal Server Error",
+}
+
+class HttpError(Exception):
+    """Erreur HTTP renvoyée telle quelle au client (statut + message)"""
+    def __init__(self, status: int, message: str = ""):
+        self.status = status
+        super().__init__(message or _REASONS.get(status, ""))
+
+def _jsonrpc_error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+# =============================================================================
+# SESSIONS ET LIMITES PAR CLIENT
+# =============================================================================
+
+class ClientSession:
+    """Session MCP: limite de requêtes simultanées et dernière activité"""
+
+    def __init__(self, session_id: str, max_inflight: int, address: str = ""):
+        self.id = session_id
+        self.address = address
+        self.max_inflight = max(1, max_inflight)
+        self.inflight = 0
+        self.last_seen = time.monotonic()
+
+    def try_acquire(self, count: int = 1) -> bool:
+        """Réserve `count` slots (un par message), False si la limite serait dépassée"""
+        # Appelé depuis la boucle asyncio uniquement: pas de verrou nécessaire
+        self.last_seen = time.monotonic()
+        if self.inflight + count > self.max_inflight:
+            return False
+        self.inflight += count
+        return True
+
+    def release(self, count: int = 1) -> None:
+        """Libère `count` slots"""
+        self.inflight -= count
+        self.last_seen = time.monotonic()
+
+# =============================================================================
+# SERVEUR
+# =============================================================================
+
+class McpHttpServer:
+    """Serveur HTTP/1.1 minimal (keep-alive) devant une fonction `dispatch` MCP"""
+
+    def __init__(
+        self,
+        dispatch: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+        host: str = MCP_HTTP_HOST,
+        port: int = MCP_HTTP_PORT,
+        path: str = MCP_HTTP_PATH,
+        workers: int = MCP_HTTP_WORKERS,
+        max_per_client: int = MCP_HTTP_MAX_PER_CLIENT,
+        session_ttl: float = MCP_HTTP_SESSION_TTL,
+        sse_ping: float = MCP_HTTP_SSE_PING,
+        max_sessions: int = MCP_HTTP_MAX_SESSIONS,
+        max_sessions_per_client: int = MCP_HTTP_MAX_SESSIONS_PER_CLIENT,
+    ):
+        self.dispatch = dispatch
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_per_client = max_per_client
+        self.session_ttl = session_ttl
+        self.sse_ping = sse_ping
+        self.max_sessions = max(1, max_sessions)
+        self.max_sessions_per_client = max(1, max_sessions_per_client)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="mcp-http")
+        self.sessions: Dict[str, ClientSession] = {}
+        # Clients sans session (avant initialize): limite par adresse IP
+        self.anonymous: Dict[str, ClientSession] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> "McpHttpServer":
+        """Ouvre le socket d'écoute (port réel si port=0)"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self) -> None:
+        """Sert les connexions jusqu'à annulation"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Ferme le socket d'écoute et le pool de workers"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    @property
+    def url(self) -> str:
+        """URL de l'endpoint MCP"""
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    # -------------------------------------------------------------------------
+    # Connexions HTTP
+    # -------------------------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = (writer.get_extra_info("peername") or ("?",))[0]
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    await self._send(writer, e.status, {"Connection": "close"}, _jsonrpc_error(None, -32600, str(e)))
+                    return
+                if request is None:
+                    return
+                method, path, headers, body, keep_alive = request
+                keep_alive = await self._route(writer, peer, method, path, headers, body) and keep_alive
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes, bool]]:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Ligne de requête invalide")
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(411, "Corps chunked non supporté")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "Content-Length invalide")
+        if length < 0:
+            raise HttpError(400, "Content-Length invalide")
+        if length > MCP_HTTP_MAX_BODY_BYTES:
+            raise HttpError(413)
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+        return method.upper(), target.split("?", 1)[0], headers, body, keep_alive
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, headers: Optional[Dict[str, str]] = None,
+                    payload: Any = None) -> None:
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Length: {len(body)}"]
+        if payload is not None:
+            head.append("Content-Type: application/json")
+        head.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _route(self, writer: asyncio.StreamWriter, peer: str, method: str, path: str,
+                     headers: Dict[str, str], body: bytes) -> bool:
+        """Traite une requête HTTP; retourne False si la connexion doit être fermée"""
+        if path == "/health" and method == "GET":
+            await self._send(writer, 200, payload=self.describe())
+            return True
+        if path != self.path:
+            await self._send(writer, 404, payload=_jsonrpc_error(None, -32601, f"Chemin inconnu: {path}"))
+            return True
+        if method == "DELETE":
+            session = self.sessions.pop(headers.get(SESSION_HEADER, ""), None)
+            await self._send(writer, 204 if session else 404)
+            return True
+        if method != "POST":
+            await self._send(writer, 405, {"Allow": "POST, DELETE"})
+            return True
+        return await self._handle_post(writer, peer, headers, body)
+
+    # -------------------------------------------------------------------------
+    # Messages JSON-RPC
+    # -------------------------------------------------------------------------
+
+    def _client(self, peer: str, headers: Dict[str, str]) -> Optional[ClientSession]:
+        """Session du client, session anonyme par IP, ou None si la session est inconnue"""
+        session_id = headers.get(SESSION_HEADER)
+        if session_id:
+            return self.sessions.get(session_id)
+        client = self.anonymous.get(peer)
+        if client is None:
+            client = self.anonymous[peer] = ClientSession(peer, self.max_per_client)
+        return client
+
+    def _expire_sessions(self) -> None:
+        deadline = time.monotonic() - self.session_ttl
+        for registry in (self.sessions, self.anonymous):
+            for key in [key for key, client in registry.items() if client.last_seen < deadline and not client.inflight]:
+                del registry[key]
+
+    def _open_session(self, peer: str) -> Optional[ClientSession]:
+        """Nouvelle session pour `peer`, dans les plafonds par adresse et total (None sinon)"""
+        self._expire_sessions()
+        for scope, limit in (([client for client in self.sessions.values() if client.address == peer],
+                              self.max_sessions_per_client),
+                             (list(self.sessions.values()), self.max_sessions)):
+            if len(scope) < limit:
+                continue
+            # Plafond atteint: la plus ancienne session inactive laisse sa place
+            idle = [client for client in scope if not client.inflight]
+            if not idle:
+                return None
+            del self.sessions[min(idle, key=lambda client: client.last_seen).id]
+        client = ClientSession(uuid.uuid4().hex, self.max_per_client, peer)
+        self.sessions[client.id] = client
+        return client
+
+    async def _handle_post(self, writer: asyncio.StreamWriter, peer: str, headers: Dict[str, str], body: bytes) -> bool:
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            await self._send(writer, 400, payload=_jsonrpc_error(None, -32700, "JSON invalide"))
+            return True
+        messages: List[Any] = payload if isinstance(payload, list) else [payload]
+        if not messages or not all(isinstance(message, dict) for message in messages):
+            await self._send(writer, 400, payload=_jsonrpc_error(None, -32600, "Requête JSON-RPC invalide"))
+            return True
+
+        response_headers: Dict[str, str] = {}
+        if any(message.get("method") == "initialize" for message in messages):
+            # Nouvelle session (les clients locaux partagent tous la même IP)
+            client: Optional[ClientSession] = self._open_session(peer)
+            if client is None:
+                inc_metric("agent_mcp_http_requests_total", outcome="throttled")
+                await self._send(writer, 429, {"Retry-After": "1"},
+                                 _jsonrpc_error(messages[0].get("id"), -32000, "Trop de sessions ouvertes pour ce client"))
+                return True
+            response_headers["Mcp-Session-Id"] = client.id
+        else:
+            client = self._client(peer, headers)
+        if client is None:
+            inc_metric("agent_mcp_http_requests_total", outcome="unknown_session")
+            await self._send(writer, 404, payload=_jsonrpc_error(None, -32001, "Session inconnue ou expirée"))
+            return True
+        # Un slot par message: un lot ne peut pas occuper plus de threads que la limite du client
+        if not client.try_acquire(len(messages)):
+            inc_metric("agent_mcp_http_requests_total", outcome="throttled")
+            await self._send(writer, 429, {"Retry-After": "1"},
+                             _jsonrpc_error(messages[0].get("id"), -32000, "Trop de requêtes simultanées pour ce client"))
+            return True
+
+        try:
+            requests = [message for message in messages if "id" in message and "method" in message]
+            loop = asyncio.get_running_loop()
+            pending = asyncio.gather(*(
+                loop.run_in_executor(self.executor, self._dispatch, message) for message in messages
+            ))
+            if not requests:
+                await pending
+                inc_metric("agent_mcp_http_requests_total", outcome="notification")
+                await self._send(writer, 202, response_headers)
+                return True
+
+            streaming = "text/event-stream" in headers.get("accept", "") and any(
+                message.get("method") == "tools/call" for message in requests
+            )
+            if streaming:
+                await self._stream(writer, response_headers, pending, batch=isinstance(payload, list))
+                inc_metric("agent_mcp_http_requests_total", outcome="sse")
+                return False
+            responses = [response for response in await pending if response is not None]
+            inc_metric("agent_mcp_http_requests_total", outcome="json")
+            await self._send(writer, 200, response_headers, responses if isinstance(payload, list) else responses[0])
+            return True
+        finally:
+            client.release(len(messages))
+
+    def _dispatch(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            return self.dispatch(message)
+        except Exception as e:
+            if "id" not in message:
+                return None
+            return _jsonrpc_error(message.get("id"), -32603, f"Erreur interne: {type(e).__name__}: {e}")
+
+    async def _stream(self, writer: asyncio.StreamWriter, response_headers: Dict[str, str],
+                      pending: "asyncio.Future[List[Optional[Dict[str, Any]]]]", batch: bool) -> None:
+        """Réponse SSE: pings pendant l'exécution, puis un événement `message`"""
+        head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream", "Cache-Control: no-cache", "Connection: close"]
+        head.extend(f"{name}: {value}" for name, value in response_headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=self.sse_ping)
+            if done:
+                break
+            writer.write(b": ping\n\n")
+            await writer.drain()
+        responses = [response for response in pending.result() if response is not None]
+        data = json.dumps(responses if batch else responses[0], ensure_ascii=False)
+        writer.write(f"event: message\ndata: {data}\n\n".encode("utf-8"))
+        await writer.drain()
+
+    def describe(self) -> Dict[str, Any]:
+        """État du serveur pour l'endpoint de santé"""
+        return {
+            "status": "ok",
+            "sessions": len(self.sessions),
+            "inflight": sum(client.inflight for registry in (self.sessions, self.anonymous)
+                            for client in registry.values()),
+            "max_per_client": self.max_per_client,
+        }
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Serveur MCP de l'agent sur HTTP (streamable HTTP / SSE)")
+    parser.add_argument("--host", default=MCP_HTTP_HOST)
+    parser.add_argument("--port", type=int, default=MCP_HTTP_PORT)
+    parser.add_argument("--workers", type=int, default=MCP_HTTP_WORKERS, help="Threads d'exécution des outils")
+    parser.add_argument("--max-per-client", type=int, default=MCP_HTTP_MAX_PER_CLIENT,
+                        help="Requêtes simultanées par client")
+    parser.add_argument("--max-sessions-per-client", type=int, default=MCP_HTTP_MAX_SESSIONS_PER_CLIENT,
+                        help="Sessions ouvertes par adresse IP")
+    args = parser.parse_args(argv)
+
+    # Import unique (agent, clients LLM/Google, caches) partagé par tous les clients
+    from agent.mcp.server import dispatch
+
+    async def serve() -> None:
+        server = await McpHttpServer(dispatch, args.host, args.port, workers=args.workers,
+                                     max_per_client=args.max_per_client,
+                                     max_sessions_per_client=args.max_sessions_per_client).start()
+        print(f"🚀 Serveur MCP HTTP sur {server.url}", file=sys.stderr)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Serveur arrêté", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
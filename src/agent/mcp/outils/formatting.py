@@ -9,13 +9,14 @@ def format_success_response(result: Dict[str, Any]) -> str:
     """Formate une réponse de succès pour MCP"""
     
     params = result.get("extracted_params", {})
-    processed_data = result.get("processed_data", [])
+    from agent.blobs import row_count
+    processed_count = row_count(result.get("processed_data"))
     sheets_url = result.get("sheets_url", "Non disponible")
     
     return f"""✅ Tâche terminée avec succès !
 
 📊 **Données récupérées:**
-- {len(processed_data)} éléments traités
+- {processed_count} éléments traités
 - Champs extraits: {', '.join(params.get('fields', ['tous']))}
 - Limite appliquée: {params.get('limit', 10)}
 
@@ -38,6 +39,38 @@ def format_validation_response(params: Dict[str, Any], query: str) -> str:
 🎯 **Requête originale:** "{query}"
 """
 
+def _estimate(value: Any, unit: str = "") -> str:
+    return "inconnu" if value is None else f"{value}{unit}"
+
+def format_plan_response(plan: Dict[str, Any], query: str) -> str:
+    """Formate le plan (coût estimé) d'un export pour MCP"""
+    
+    upstream = plan.get("upstream", {})
+    output = plan.get("output", {})
+    llm = plan.get("llm", {})
+    calls = output.get("google_calls", {})
+    
+    return f"""🧮 **Plan d'exécution (rien n'a été exécuté)**
+
+🌐 **Récupération amont:**
+- Requêtes: {_estimate(upstream.get('requests'))} ({upstream.get('cached_pages', 0)} pages déjà en cache)
+- Volume estimé: {_estimate(upstream.get('bytes'), ' octets')}
+
+📋 **Export ({output.get('sink', 'N/A')}):**
+- Lignes: {_estimate(output.get('rows'))}, colonnes: {output.get('columns', 0)}, cellules: {_estimate(output.get('cells'))}
+- Appels Google: {calls.get('write', 0)} écritures, {calls.get('read', 0)} lectures
+
+🤖 **LLM:** {llm.get('calls', 0)} appel, ~{llm.get('input_tokens', 0)} tokens en entrée
+
+🗄️ **Caches:** {json.dumps(plan.get('caches', {}), ensure_ascii=False)}
+
+🎯 **Requête originale:** "{query}"
+
+```json
+{json.dumps(plan, indent=2, ensure_ascii=False, default=str)}
+```
+"""
+
 def format_status_response(status_data: Dict[str, Any]) -> str:
     """Formate une réponse de statut pour MCP"""
     
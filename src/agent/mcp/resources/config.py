@@ -1,14 +1,35 @@
 """
 Ressources de configuration MCP
+
+Les corps JSON sont mémorisés par URI avec une empreinte de ce dont ils
+dépendent (variables d'environnement, fichier de credentials, version du
+registre des sources): une lecture répétée ne reconstruit rien tant que
+l'empreinte est inchangée. `metrics://agent` change à chaque requête et
+n'est jamais mémorisée.
 """
 
 import json
 import os
-from typing import List
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
 from mcp.types import Resource
 
+def _file_stamp(path: str) -> Optional[Tuple[float, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
+
 class ConfigResources:
+    """Ressources de configuration MCP, corps mémorisés par empreinte"""
+    
+    # URI → (empreinte, corps JSON)
+    _cache: Dict[str, Tuple[Hashable, str]] = {}
+    _lock = threading.Lock()
+    
     def __init__(self, server):
+        """Lié au serveur MCP (les handlers sont enregistrés par server.py)"""
         self.server = server
         # Note: On n'enregistre pas les handlers ici pour éviter les conflits
     
@@ -33,71 +54,114 @@ class ConfigResources:
                 name="État actuel",
                 description="État actuel de l'agent (dernière exécution)",
                 mimeType="application/json"
+            ),
+            Resource(
+                uri="metrics://agent",
+                name="Métriques de l'agent",
+                description="Latences par nœud, lignes, octets, appels Google/LLM et erreurs (JSON + texte Prometheus)",
+                mimeType="application/json"
             )
         ]
     
     @staticmethod
-    def read_resource(uri: str) -> str:
-        """Lit le contenu d'une ressource"""
-        try:
-            # Import dynamique pour éviter les erreurs circulaires
-            from agent.graph import (
-                DEFAULT_API_URL, DEFAULT_LIMIT, VALID_API_FIELDS,
-                OPENAI_MODEL, OPENAI_TEMPERATURE
+    def fingerprint(uri: str) -> Optional[Hashable]:
+        """Empreinte des dépendances d'une ressource (None: jamais mémorisée)"""
+        from agent.sources import registry
+        
+        if uri == "config://agent-config":
+            return (
+                bool(os.getenv("OPENAI_API_KEY")),
+                bool(os.getenv("LANGSMITH_API_KEY")),
+                os.getenv("GOOGLE_CREDENTIALS_PATH", ""),
+                _file_stamp(os.getenv("GOOGLE_CREDENTIALS_PATH", "")),
             )
-            
-            if uri == "config://agent-config":
-                config = {
-                    "default_api_url": DEFAULT_API_URL,
-                    "default_limit": DEFAULT_LIMIT,
-                    "valid_fields": VALID_API_FIELDS,
-                    "model": OPENAI_MODEL,
-                    "temperature": OPENAI_TEMPERATURE,
-                    "environment_variables": {
-                        "OPENAI_API_KEY": "✅" if os.getenv("OPENAI_API_KEY") else "❌",
-                        "GOOGLE_CREDENTIALS_PATH": "✅" if os.path.exists(os.getenv("GOOGLE_CREDENTIALS_PATH", "")) else "❌",
-                        "LANGSMITH_API_KEY": "✅" if os.getenv("LANGSMITH_API_KEY") else "❌"
-                    }
-                }
-                return json.dumps(config, indent=2)
-            
-            elif uri == "config://api-fields":
-                fields_info = {
-                    "valid_fields": VALID_API_FIELDS,
-                    "field_descriptions": {
-                        "userId": "ID de l'utilisateur",
-                        "id": "ID unique du post",
-                        "title": "Titre du post",
-                        "body": "Contenu du post"
-                    },
-                    "usage_examples": [
-                        "récupère 5 posts avec title et id",
-                        "obtiens 10 posts avec tous les champs",
-                        "prends 3 posts avec seulement le title"
-                    ]
-                }
-                return json.dumps(fields_info, indent=2)
-            
-            elif uri == "state://current-state":
-                from agent.graph import get_initial_state
-                initial_state = get_initial_state()
-                # Convertir en dict sérialisable
-                serializable_state = {}
-                for key, value in initial_state.items():
-                    try:
-                        json.dumps(value)  # Test de sérialisation
-                        serializable_state[key] = value
-                    except:
-                        serializable_state[key] = str(value)
-                
-                return json.dumps(serializable_state, indent=2, default=str)
-            
-            else:
-                raise ValueError(f"Ressource inconnue: {uri}")
-                
+        if uri in ("config://api-fields", "state://current-state"):
+            return registry.version
+        return None
+    
+    @classmethod
+    def read_resource(cls, uri: str) -> str:
+        """Lit le contenu d'une ressource (mémorisé tant que ses dépendances sont inchangées)"""
+        try:
+            key = cls.fingerprint(uri)
+        except Exception:
+            key = None
+        if key is not None:
+            cached = cls._cache.get(uri)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        try:
+            body = cls.render_resource(uri)
         except Exception as e:
             error_response = {
                 "error": f"Erreur lors de la lecture de la ressource: {str(e)}",
                 "uri": uri
             }
-            return json.dumps(error_response, indent=2)
\ No newline at end of file
+            return json.dumps(error_response, indent=2)
+        if key is not None:
+            with cls._lock:
+                cls._cache[uri] = (key, body)
+        return body
+    
+    @staticmethod
+    def render_resource(uri: str) -> str:
+        """Construit le contenu d'une ressource"""
+        # Import dynamique pour éviter les erreurs circulaires
+        from agent.graph import (
+            DEFAULT_API_URL, DEFAULT_LIMIT, VALID_API_FIELDS,
+            OPENAI_MODEL, OPENAI_TEMPERATURE
+        )
+        
+        if uri == "config://agent-config":
+            config = {
+                "default_api_url": DEFAULT_API_URL,
+                "default_limit": DEFAULT_LIMIT,
+                "valid_fields": VALID_API_FIELDS,
+                "model": OPENAI_MODEL,
+                "temperature": OPENAI_TEMPERATURE,
+                "environment_variables": {
+                    "OPENAI_API_KEY": "✅" if os.getenv("OPENAI_API_KEY") else "❌",
+                    "GOOGLE_CREDENTIALS_PATH": "✅" if os.path.exists(os.getenv("GOOGLE_CREDENTIALS_PATH", "")) else "❌",
+                    "LANGSMITH_API_KEY": "✅" if os.getenv("LANGSMITH_API_KEY") else "❌"
+                }
+            }
+            return json.dumps(config, indent=2)
+        
+        elif uri == "config://api-fields":
+            from agent.sources import registry
+            fields_info = {
+                "valid_fields": VALID_API_FIELDS,
+                "field_descriptions": registry.default.field_descriptions,
+                "sources": {source.name: source.to_dict() for source in registry},
+                "usage_examples": [
+                    "récupère 5 posts avec title et id",
+                    "obtiens 10 posts avec tous les champs",
+                    "prends 3 posts avec seulement le title",
+                    "récupère 5 utilisateurs avec seulement name et email"
+                ]
+            }
+            return json.dumps(fields_info, indent=2)
+        
+        elif uri == "state://current-state":
+            from agent.graph import get_initial_state
+            initial_state = get_initial_state()
+            # Convertir en dict sérialisable
+            serializable_state = {}
+            for key, value in initial_state.items():
+                try:
+                    json.dumps(value)  # Test de sérialisation
+                    serializable_state[key] = value
+                except:
+                    serializable_state[key] = str(value)
+            
+            return json.dumps(serializable_state, indent=2, default=str)
+        
+        elif uri == "metrics://agent":
+            from agent.metrics import metrics
+            return json.dumps({
+                "snapshot": metrics.snapshot(),
+                "prometheus": metrics.render_prometheus()
+            }, indent=2)
+        
+        else:
+            raise ValueError(f"Ressource inconnue: {uri}")
\ No newline at end of file
@@ -9,7 +9,7 @@ import json
 import requests
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 
 # Ajouter le path du projet
 current_file = Path(__file__).resolve()
@@ -18,11 +18,17 @@ src_path = project_root / "src"
 sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(src_path))
 
+# Canal du protocole stdio: la vraie sortie standard, capturée au démarrage
+# de `main` (sys.stdout est alors redirigé vers stderr pour tout le processus)
+_protocol_stdout = sys.stdout
+
 def send_message(message: dict):
+    """Écrit un message JSON-RPC sur le canal du protocole"""
     json_str = json.dumps(message)
-    print(json_str, flush=True)
+    print(json_str, file=_protocol_stdout, flush=True)
 
 def log_to_stderr(message: str):
+    """Trace de debug sur stderr"""
     print(f"[DEBUG] {message}", file=sys.stderr, flush=True)
 
 # Import de l'agent LangGraph
@@ -73,16 +79,50 @@ except ImportError as e:
     GOOGLE_SHEETS_AVAILABLE = False
     log_to_stderr(f"❌ Google Sheets non disponible: {e}")
 
+# Outils et ressources de l'agent (définitions issues du SDK MCP)
+try:
+    from agent.mcp.tools.basic import BasicTools
+    from agent.mcp.resources.config import ConfigResources
+    log_to_stderr("✅ Outils et ressources MCP chargés")
+except ImportError as e:
+    BasicTools = None
+    ConfigResources = None
+    log_to_stderr(f"❌ Outils et ressources MCP non disponibles: {e}")
+
 def check_google_credentials():
-    """Vérifie si les credentials Google sont disponibles"""
+    """Vérifie si les credentials Google sont disponibles (ou un endpoint de test)"""
+    if os.getenv("GOOGLE_API_ENDPOINT"):
+        return True
     credentials_path = os.getenv("GOOGLE_CREDENTIALS_PATH", "google-credentials.json")
     full_path = project_root / credentials_path
     return full_path.exists()
 
+def create_simple_sheet(title: str) -> Dict[str, Any]:
+    """Crée une feuille Google Sheets vide (partagée avec l'email personnel si configuré)"""
+    from agent.google_endpoint import load_credentials, build_gspread_client
+    from agent.google_quota import google_call, WRITE
+    
+    credentials_path = project_root / os.getenv("GOOGLE_CREDENTIALS_PATH", "google-credentials.json")
+    creds = load_credentials(str(credentials_path), [
+        "https://www.googleapis.com/auth/spreadsheets",
+        "https://www.googleapis.com/auth/drive",
+    ])
+    client = build_gspread_client(creds)
+    sheet = google_call(client.create, title, kind=WRITE)
+    
+    personal_email = os.getenv("GOOGLE_PERSONAL_EMAIL")
+    if personal_email:
+        google_call(sheet.share, personal_email, perm_type="user", role="writer", kind=WRITE)
+    
+    return {"id": sheet.id, "url": sheet.url, "title": title}
+
 def make_api_request(endpoint: str, limit: int = 10) -> List[Dict]:
-    """Requête API simple vers JSONPlaceholder"""
+    """Requête API simple vers une source du registre"""
     try:
-        url = f"https://jsonplaceholder.typicode.com/{endpoint}"
+        from agent.sources import registry, API_BASE_URL
+        
+        source = registry.get(endpoint)
+        url = source.url if source else f"{API_BASE_URL}/{endpoint}"
         response = requests.get(url, params={'_limit': limit}, timeout=10)
         response.raise_for_status()
         data = response.json()
@@ -104,154 +144,30 @@ def run_agent_safely(query: str) -> dict:
         return {"error": "Agent LangGraph non disponible"}
     
     try:
-        # Rediriger stdout pendant l'exécution de l'agent
-        original_stdout = sys.stdout
-        sys.stdout = sys.stderr
-        
         log_to_stderr(f"🤖 Exécution agent avec: {query}")
         
         # Exécuter l'agent
         run_agent_func = getattr(agent_module, 'run_agent_with_tracing')
         result = run_agent_func(query)
         
-        # Restaurer stdout
-        sys.stdout = original_stdout
-        
         log_to_stderr("✅ Agent exécuté avec succès")
         
         return {"success": True, "result": result}
         
     except Exception as e:
-        sys.stdout = original_stdout
         log_to_stderr(f"❌ Erreur agent: {e}")
         return {"error": str(e)}
 
-async def handle_request(request: dict) -> dict:
-    """Traite une requête MCP"""
-    method = request.get("method")
-    request_id = request.get("id")
-    
-    log_to_stderr(f"Requête reçue: {method}")
-    
-    if method == "initialize":
-        return {
-            "jsonrpc": "2.0",
-            "id": request_id,
-            "result": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {
-                    "tools": {"listChanged": False}
-                },
-                "serverInfo": {
-                    "name": "api-sheets-agent",
-                    "version": "1.0.0"
-                }
-            }
-        }
-    
-    elif method == "notifications/initialized":
-        log_to_stderr("Initialized notification reçue")
-        return None
-    
-    elif method == "tools/list":
-        tools = [
-            {
-                "name": "hello",
-                "description": "Test de connexion MCP avec status complet",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            },
-            {
-                "name": "get_posts",
-                "description": "Récupère des posts depuis JSONPlaceholder",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "limit": {
-                            "type": "integer",
-                            "description": "Nombre de posts (1-20)",
-                            "default": 5,
-                            "minimum": 1,
-                            "maximum": 20
-                        }
-                    },
-                    "required": []
-                }
-            },
-            {
-                "name": "get_users",
-                "description": "Récupère des utilisateurs depuis JSONPlaceholder",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "limit": {
-                            "type": "integer",
-                            "description": "Nombre d'utilisateurs (1-10)",
-                            "default": 5,
-                            "minimum": 1,
-                            "maximum": 10
-                        }
-                    },
-                    "required": []
-                }
-            }
-        ]
-        
-        # Ajouter l'outil agent si disponible
-        if AGENT_AVAILABLE and 'run_agent_with_tracing' in available_functions:
-            tools.append({
-                "name": "run_agent",
-                "description": "Exécute l'agent LangGraph complet pour traiter une requête complexe (API + Google Sheets)",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "Requête à traiter par l'agent (ex: 'récupère 5 posts et sauvegarde dans une feuille')"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            })
-        
-        # Ajouter les outils Google Sheets si disponibles
-        if GOOGLE_SHEETS_AVAILABLE and check_google_credentials():
-            tools.append({
-                "name": "create_sheet",
-                "description": "Crée une feuille Google Sheets simple",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "title": {
-                            "type": "string",
-                            "description": "Titre de la feuille"
-                        }
-                    },
-                    "required": ["title"]
-                }
-            })
-        
-        return {
-            "jsonrpc": "2.0",
-            "id": request_id,
-            "result": {"tools": tools}
-        }
+# =============================================================================
+# OUTILS HISTORIQUES DU SERVEUR
+# =============================================================================
+
+def tool_hello(arguments: Dict[str, Any]) -> str:
+    """Outil `hello`: état du serveur et commandes disponibles"""
+    agent_status = "✅ Disponible" if AGENT_AVAILABLE else "❌ Non disponible"
+    google_status = "✅ Configuré" if (GOOGLE_SHEETS_AVAILABLE and check_google_credentials()) else "❌ Non configuré"
     
-    elif method == "tools/call":
-        params = request.get("params", {})
-        tool_name = params.get("name")
-        arguments = params.get("arguments", {})
-        
-        log_to_stderr(f"Appel outil: {tool_name} avec {arguments}")
-        
-        if tool_name == "hello":
-            agent_status = "✅ Disponible" if AGENT_AVAILABLE else "❌ Non disponible"
-            google_status = "✅ Configuré" if (GOOGLE_SHEETS_AVAILABLE and check_google_credentials()) else "❌ Non configuré"
-            
-            content = f"""🎉 **SERVEUR MCP COMPLET OPÉRATIONNEL !**
+    return f"""🎉 **SERVEUR MCP COMPLET OPÉRATIONNEL !**
 
 ✅ **Serveur MCP:** Opérationnel
 🤖 **Agent LangGraph:** {agent_status}
@@ -267,123 +183,290 @@ async def handle_request(request: dict) -> dict:
 {'- `create_sheet title="Test"` - Créer une feuille simple' if (GOOGLE_SHEETS_AVAILABLE and check_google_credentials()) else ''}
 
 🚀 **Agent LangGraph intégré:** Pipeline complet API → Google Sheets disponible !"""
-            
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "content": [{"type": "text", "text": content}]
-                }
-            }
-        
-        elif tool_name == "get_posts":
-            limit = arguments.get("limit", 5)
-            posts = make_api_request("posts", limit=limit)
-            
-            if not posts:
-                content = "❌ Impossible de récupérer les posts"
-            else:
-                content = f"📝 **{len(posts)} posts récupérés:**\n\n"
-                for i, post in enumerate(posts, 1):
-                    content += f"**{i}. Post {post.get('id')}**\n"
-                    content += f"   📝 {post.get('title', '')[:60]}...\n"
-                    content += f"   👤 User ID: {post.get('userId', 'N/A')}\n\n"
-                
-                if AGENT_AVAILABLE:
-                    content += f"\n💡 **Astuce:** Utilisez `run_agent query=\"sauvegarde ces {len(posts)} posts dans une feuille Google Sheets\"` pour les exporter automatiquement !"
-            
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "content": [{"type": "text", "text": content}]
-                }
-            }
-        
-        elif tool_name == "get_users":
-            limit = arguments.get("limit", 5)
-            users = make_api_request("users", limit=limit)
-            
-            if not users:
-                content = "❌ Impossible de récupérer les utilisateurs"
-            else:
-                content = f"👥 **{len(users)} utilisateurs récupérés:**\n\n"
-                for i, user in enumerate(users, 1):
-                    content += f"**{i}. {user.get('name')}**\n"
-                    content += f"   📧 {user.get('email')}\n"
-                    content += f"   🌐 {user.get('website', 'Pas de site')}\n\n"
-            
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "content": [{"type": "text", "text": content}]
-                }
-            }
-        
-        elif tool_name == "run_agent":
-            query = arguments.get("query", "")
-            
-            if not query:
-                content = "❌ Veuillez fournir une requête pour l'agent"
-            else:
-                result = run_agent_safely(query)
-                
-                if result.get("success"):
-                    agent_result = result["result"]
-                    
-                    if isinstance(agent_result, dict):
-                        final_answer = agent_result.get('final_answer', str(agent_result))
-                        sheets_url = agent_result.get('sheets_url', '')
-                        
-                        content = f"""🤖 **AGENT LANGGRAPH EXÉCUTÉ AVEC SUCCÈS !**
+
+def tool_get_posts(arguments: Dict[str, Any]) -> str:
+    """Outil `get_posts`: aperçu des posts JSONPlaceholder"""
+    limit = arguments.get("limit", 5)
+    posts = make_api_request("posts", limit=limit)
+    
+    if not posts:
+        return "❌ Impossible de récupérer les posts"
+    content = f"📝 **{len(posts)} posts récupérés:**\n\n"
+    for i, post in enumerate(posts, 1):
+        content += f"**{i}. Post {post.get('id')}**\n"
+        content += f"   📝 {post.get('title', '')[:60]}...\n"
+        content += f"   👤 User ID: {post.get('userId', 'N/A')}\n\n"
+    
+    if AGENT_AVAILABLE:
+        content += f"\n💡 **Astuce:** Utilisez `run_agent query=\"sauvegarde ces {len(posts)} posts dans une feuille Google Sheets\"` pour les exporter automatiquement !"
+    return content
+
+def tool_get_users(arguments: Dict[str, Any]) -> str:
+    """Outil `get_users`: aperçu des utilisateurs JSONPlaceholder"""
+    limit = arguments.get("limit", 5)
+    users = make_api_request("users", limit=limit)
+    
+    if not users:
+        return "❌ Impossible de récupérer les utilisateurs"
+    content = f"👥 **{len(users)} utilisateurs récupérés:**\n\n"
+    for i, user in enumerate(users, 1):
+        content += f"**{i}. {user.get('name')}**\n"
+        content += f"   📧 {user.get('email')}\n"
+        content += f"   🌐 {user.get('website', 'Pas de site')}\n\n"
+    return content
+
+def tool_run_agent(arguments: Dict[str, Any]) -> str:
+    """Outil `run_agent`: pipeline complet de l'agent"""
+    query = arguments.get("query", "")
+    
+    if not query:
+        return "❌ Veuillez fournir une requête pour l'agent"
+    result = run_agent_safely(query)
+    
+    if not result.get("success"):
+        return f"❌ **Erreur de l'agent:** {result.get('error')}"
+    agent_result = result["result"]
+    
+    if not isinstance(agent_result, dict):
+        return f"🤖 **Résultat de l'agent:**\n\n{str(agent_result)}"
+    final_answer = agent_result.get('final_answer', str(agent_result))
+    sheets_url = agent_result.get('sheets_url', '')
+    
+    content = f"""🤖 **AGENT LANGGRAPH EXÉCUTÉ AVEC SUCCÈS !**
 
 📋 **Résultat:**
 {final_answer}"""
-                        
-                        if sheets_url:
-                            content += f"""
+    
+    if sheets_url:
+        content += f"""
 
 🔗 **Feuille Google Sheets créée:**
 {sheets_url}
 
 ✅ **Pipeline complet réalisé:** API → Traitement → Google Sheets"""
-                    else:
-                        content = f"🤖 **Résultat de l'agent:**\n\n{str(agent_result)}"
-                        
-                else:
-                    content = f"❌ **Erreur de l'agent:** {result.get('error')}"
-            
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "content": [{"type": "text", "text": content}]
+    return content
+
+def tool_create_sheet(arguments: Dict[str, Any]) -> str:
+    """Outil `create_sheet`: classeur de test"""
+    title = arguments.get("title", "").strip()
+    
+    if not title:
+        return "❌ Titre requis"
+    try:
+        sheet = create_simple_sheet(title)
+        return f"✅ **Feuille créée:** {sheet['title']}\n\n📋 {sheet['url']}"
+    except Exception as e:
+        log_to_stderr(f"❌ Erreur création feuille: {e}")
+        return f"❌ Erreur lors de la création de la feuille: {e}"
+
+LEGACY_TOOLS = [
+    ({
+        "name": "hello",
+        "description": "Test de connexion MCP avec status complet",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    }, tool_hello),
+    ({
+        "name": "get_posts",
+        "description": "Récupère des posts depuis JSONPlaceholder",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": "Nombre de posts (1-20)",
+                    "default": 5,
+                    "minimum": 1,
+                    "maximum": 20
                 }
-            }
-        
-        elif tool_name == "create_sheet":
-            content = "❌ Fonctionnalité Google Sheets en cours de correction (problème OAuth)\n\n💡 **Alternative:** Utilisez `run_agent` qui inclut la création de feuilles avec votre agent LangGraph complet !"
-            
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "content": [{"type": "text", "text": content}]
+            },
+            "required": []
+        }
+    }, tool_get_posts),
+    ({
+        "name": "get_users",
+        "description": "Récupère des utilisateurs depuis JSONPlaceholder",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": "Nombre d'utilisateurs (1-10)",
+                    "default": 5,
+                    "minimum": 1,
+                    "maximum": 10
                 }
+            },
+            "required": []
+        }
+    }, tool_get_users),
+]
+
+RUN_AGENT_TOOL = {
+    "name": "run_agent",
+    "description": "Exécute l'agent LangGraph complet pour traiter une requête complexe (API + Google Sheets)",
+    "inputSchema": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Requête à traiter par l'agent (ex: 'récupère 5 posts et sauvegarde dans une feuille')"
             }
-        
-        else:
-            return {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "error": {
-                    "code": -32601,
-                    "message": f"Outil inconnu: {tool_name}"
-                }
+        },
+        "required": ["query"]
+    }
+}
+
+CREATE_SHEET_TOOL = {
+    "name": "create_sheet",
+    "description": "Crée une feuille Google Sheets simple",
+    "inputSchema": {
+        "type": "object",
+        "properties": {
+            "title": {
+                "type": "string",
+                "description": "Titre de la feuille"
             }
+        },
+        "required": ["title"]
+    }
+}
+
+# =============================================================================
+# REGISTRE DES OUTILS ET RESSOURCES
+# =============================================================================
+
+class UnknownTool(KeyError):
+    """Outil absent du registre"""
+
+class UnknownResource(KeyError):
+    """Ressource absente (support MCP non installé)"""
+
+class ToolRegistry:
+    """Outils MCP: définitions et fonctions d'appel
+    
+    La réponse de `tools/list` est construite une fois (au premier appel
+    après un enregistrement) puis servie telle quelle.
+    """
+    
+    def __init__(self):
+        """Registre vide (voir `build_tool_registry`)"""
+        self._definitions: Dict[str, Dict[str, Any]] = {}
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], str]] = {}
+        self._listing: Optional[Dict[str, Any]] = None
+    
+    def register(self, definition: Dict[str, Any], handler: Callable[[Dict[str, Any]], str]) -> None:
+        """Ajoute (ou remplace) un outil: définition MCP et fonction d'appel"""
+        self._definitions[definition["name"]] = definition
+        self._handlers[definition["name"]] = handler
+        self._listing = None
+    
+    def __contains__(self, name: str) -> bool:
+        """Vrai si l'outil est enregistré"""
+        return name in self._handlers
+    
+    def listing(self) -> Dict[str, Any]:
+        """Réponse de `tools/list` (précalculée)"""
+        if self._listing is None:
+            self._listing = {"tools": list(self._definitions.values())}
+        return self._listing
     
-    else:
+    def call(self, name: str, arguments: Dict[str, Any]) -> str:
+        """Appelle un outil et retourne son texte (UnknownTool si absent)"""
+        handler = self._handlers.get(name)
+        if handler is None:
+            raise UnknownTool(name)
+        # Pas de redirection ici: sys.stdout est global au processus et les
+        # appels HTTP s'exécutent en parallèle (voir `main` pour stdio)
+        return handler(arguments)
+
+def build_tool_registry() -> ToolRegistry:
+    """Outils historiques, outils de l'agent (BasicTools) selon la configuration"""
+    registry = ToolRegistry()
+    for definition, handler in LEGACY_TOOLS:
+        registry.register(definition, handler)
+    if AGENT_AVAILABLE and 'run_agent_with_tracing' in available_functions:
+        registry.register(RUN_AGENT_TOOL, tool_run_agent)
+    if GOOGLE_SHEETS_AVAILABLE and check_google_credentials():
+        registry.register(CREATE_SHEET_TOOL, tool_create_sheet)
+    if AGENT_AVAILABLE and BasicTools is not None:
+        basic_tools = BasicTools(None)
+        handlers = basic_tools.handlers()
+        for tool in basic_tools.get_tools():
+            registry.register(tool.model_dump(by_alias=True, exclude_none=True), handlers[tool.name])
+    return registry
+
+def build_resource_listing() -> Dict[str, Any]:
+    """Réponse de `resources/list` (construite une fois)"""
+    if ConfigResources is None:
+        return {"resources": []}
+    return {"resources": [
+        resource.model_dump(by_alias=True, exclude_none=True, mode="json")
+        for resource in ConfigResources.get_resources()
+    ]}
+
+tools = build_tool_registry()
+resource_listing = build_resource_listing()
+
+# =============================================================================
+# DISPATCH JSON-RPC
+# =============================================================================
+
+def handle_initialize(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Méthode `initialize`: capacités et identité du serveur"""
+    return {
+        "protocolVersion": "2024-11-05",
+        "capabilities": {
+            "tools": {"listChanged": False},
+            "resources": {"listChanged": False}
+        },
+        "serverInfo": {
+            "name": "api-sheets-agent",
+            "version": "1.0.0"
+        }
+    }
+
+def handle_tools_call(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Méthode `tools/call` (UnknownTool si l'outil n'existe pas)"""
+    tool_name = params.get("name")
+    arguments = params.get("arguments") or {}
+    log_to_stderr(f"Appel outil: {tool_name} avec {arguments}")
+    return {"content": [{"type": "text", "text": tools.call(tool_name, arguments)}]}
+
+def handle_resources_read(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Méthode `resources/read` (UnknownResource si la ressource n'existe pas)"""
+    uri = params.get("uri", "")
+    if ConfigResources is None:
+        raise UnknownResource(uri)
+    return {"contents": [{"uri": uri, "mimeType": "application/json", "text": ConfigResources.read_resource(uri)}]}
+
+METHODS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "initialize": handle_initialize,
+    "tools/list": lambda params: tools.listing(),
+    "tools/call": handle_tools_call,
+    "resources/list": lambda params: resource_listing,
+    "resources/read": handle_resources_read,
+}
+
+def dispatch(request: dict) -> Optional[dict]:
+    """Traite une requête MCP (bloquant: les outils appellent l'agent et les API)
+    
+    Partagé par les transports stdio (ci-dessous) et HTTP (agent.mcp.http_server).
+    """
+    method = request.get("method")
+    request_id = request.get("id")
+    
+    log_to_stderr(f"Requête reçue: {method}")
+    
+    if method and method.startswith("notifications/"):
+        log_to_stderr(f"Notification reçue: {method}")
+        return None
+    
+    handler = METHODS.get(method)
+    if handler is None:
         return {
             "jsonrpc": "2.0",
             "id": request_id,
@@ -392,9 +475,56 @@ async def handle_request(request: dict) -> dict:
                 "message": "Méthode non trouvée"
             }
         }
+    
+    try:
+        result = handler(request.get("params") or {})
+    except UnknownTool as e:
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {
+                "code": -32601,
+                "message": f"Outil inconnu: {e.args[0]}"
+            }
+        }
+    except UnknownResource as e:
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {
+                "code": -32002,
+                "message": f"Ressource inconnue: {e.args[0]}"
+            }
+        }
+    except Exception as e:
+        # Toute requête reçoit une réponse, même si l'outil échoue
+        log_to_stderr(f"❌ Erreur interne ({method}): {type(e).__name__}: {e}")
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {
+                "code": -32603,
+                "message": f"Erreur interne: {type(e).__name__}: {e}"
+            }
+        }
+    
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": result
+    }
+
+async def handle_request(request: dict) -> Optional[dict]:
+    """Traite une requête MCP (transport stdio)"""
+    return dispatch(request)
 
 async def main():
     """Boucle principale du serveur"""
+    global _protocol_stdout
+    # stdout est le canal du protocole: les prints de l'agent et des API
+    # partent sur stderr, une fois pour toutes (appels concurrents sûrs)
+    _protocol_stdout = sys.stdout
+    sys.stdout = sys.stderr
     log_to_stderr("🚀 Serveur MCP COMPLET avec Agent LangGraph démarré")
     log_to_stderr(f"📁 Projet: {project_root}")
     log_to_stderr(f"🤖 Agent: {'✅' if AGENT_AVAILABLE else '❌'}")
@@ -1,18 +1,35 @@
 """
 Outils MCP niveau utilisateur final
 Interface simple pour les cas d'usage courants
+
+`handlers()` associe chaque outil à sa fonction d'appel (arguments → texte);
+le registre de `server.py` les charge avec leurs définitions.
+`validate_api_query` n'exécute que le parsing (LLM ou repli local): ni
+récupération amont, ni appel Google. `plan_export` y ajoute le coût estimé
+du run (voir agent.graph.plan_agent_run), toujours sans l'exécuter.
 """
 
 import asyncio
 import json
 import logging
-from typing import List
+from typing import Any, Callable, Dict, List
 from mcp.types import Tool, TextContent
 
+from agent.mcp.outils.formatting import (
+    format_success_response,
+    format_validation_response,
+    format_plan_response,
+    format_status_response,
+    format_error_response,
+)
+
 logger = logging.getLogger("mcp.tools.basic")
 
 class BasicTools:
+    """Outils MCP de l'agent: définitions (`get_tools`) et fonctions d'appel (`handlers`)"""
+    
     def __init__(self, server):
+        """Lié au serveur MCP (les handlers sont enregistrés par server.py)"""
         self.server = server
         # Note: On n'enregistre pas les handlers ici pour éviter les conflits
         # Les handlers sont définis directement dans server.py
@@ -54,6 +71,24 @@ class BasicTools:
                     "required": ["query"]
                 }
             ),
+            Tool(
+                name="plan_export",
+                description="Estime le coût d'un export (requêtes amont, appels Google, cellules, tokens, caches) sans l'exécuter",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Requête en langage naturel à planifier"
+                        },
+                        "api_url": {
+                            "type": "string",
+                            "description": "URL de l'API à interroger (optionnel)"
+                        }
+                    },
+                    "required": ["query"]
+                }
+            ),
             Tool(
                 name="get_agent_status",
                 description="Obtient le statut actuel de l'agent et ses capacités",
@@ -63,4 +98,77 @@ class BasicTools:
                     "required": []
                 }
             )
-        ]
\ No newline at end of file
+        ]
+    
+    def handlers(self) -> Dict[str, Callable[[Dict[str, Any]], str]]:
+        """Fonctions d'appel des outils, par nom"""
+        return {
+            "fetch_api_to_sheets": self.fetch_api_to_sheets,
+            "validate_api_query": self.validate_api_query,
+            "plan_export": self.plan_export,
+            "get_agent_status": self.get_agent_status,
+        }
+    
+    @staticmethod
+    def fetch_api_to_sheets(arguments: Dict[str, Any]) -> str:
+        """Pipeline complet: parsing, récupération, export"""
+        query = (arguments.get("query") or "").strip()
+        if not query:
+            return format_error_response("Requête vide", "fetch_api_to_sheets")
+        from agent.graph import run_agent_with_tracing
+        
+        try:
+            result = run_agent_with_tracing(query, api_url=arguments.get("api_url"))
+        except Exception as e:
+            logger.exception("Erreur fetch_api_to_sheets")
+            return format_error_response(str(e), f'Requête: "{query}"')
+        if result.get("error"):
+            return format_error_response(result["error"], f'Requête: "{query}"')
+        return format_success_response(result)
+    
+    @staticmethod
+    def validate_api_query(arguments: Dict[str, Any]) -> str:
+        """Parsing seul de la requête (aucun appel amont ni Google)"""
+        query = (arguments.get("query") or "").strip()
+        if not query:
+            return format_error_response("Requête vide", "validate_api_query")
+        from langchain_core.messages import HumanMessage
+        from agent.graph import get_initial_state, parse_user_query
+        
+        state = get_initial_state()
+        state["messages"] = [HumanMessage(content=query)]
+        update = parse_user_query(state)
+        if update.get("error"):
+            return format_error_response(update["error"], f'Requête: "{query}"')
+        return format_validation_response(update["extracted_params"], query)
+    
+    @staticmethod
+    def plan_export(arguments: Dict[str, Any]) -> str:
+        """Parsing et coût estimé du run (aucun appel amont ni Google)"""
+        query = (arguments.get("query") or "").strip()
+        if not query:
+            return format_error_response("Requête vide", "plan_export")
+        from agent.graph import plan_agent_run
+        
+        plan = plan_agent_run(query, api_url=arguments.get("api_url"))
+        if plan.get("error"):
+            return format_error_response(plan["error"], f'Requête: "{query}"')
+        return format_plan_response(plan, query)
+    
+    @staticmethod
+    def get_agent_status(arguments: Dict[str, Any]) -> str:
+        """Configuration et capacités (valeurs déjà chargées par agent.graph)"""
+        from agent import graph
+        
+        openai_ok = bool(graph.llm)
+        sheets_ok = bool(graph.gc)
+        return format_status_response({
+            "model": graph.OPENAI_MODEL,
+            "openai_status": "✅" if openai_ok else "❌",
+            "sheets_status": "✅" if sheets_ok else "❌",
+            "langsmith_status": "✅" if graph.langsmith_client else "❌",
+            "default_api": graph.DEFAULT_API_URL,
+            "valid_fields": graph.VALID_API_FIELDS,
+            "default_limit": graph.DEFAULT_LIMIT,
+            "overall_status": "✅ Opérationnel" if openai_ok and sheets_ok else "⚠️ Configuration incomplète",
+        })
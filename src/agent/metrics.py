@@ -0,0 +1,323 @@
+"""
+Métriques internes de l'agent (latences par nœud, lignes, octets, appels)
+
+Chaque nœud enregistré dans `build_graph` est enveloppé par `instrument_node`;
+la couche de récupération, le limiteur Google et le parsing LLM incrémentent
+leurs propres compteurs. La collecte est sans verrou: chaque thread écrit
+dans son propre fragment (shard), les fragments ne sont agrégés qu'à la
+lecture (`snapshot`, `render_prometheus`). Les fragments des threads
+terminés (pools d'effets de bord, workers HTTP...) sont repliés dans un
+fragment unique: leur nombre reste borné par celui des threads vivants. Le coût par mesure est de
+quelques opérations de dictionnaire, ce qui permet de laisser les métriques
+actives en production.
+
+Exposition: ressource MCP `metrics://agent` (JSON) et, si `METRICS_PORT`
+est défini, un endpoint HTTP au format texte Prometheus (`/metrics`).
+"""
+
+import os
+import sys
+import time
+import bisect
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from agent.blobs import row_count
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = pas d'endpoint HTTP
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_HELP = {
+    "agent_node_duration_seconds": "Durée d'exécution des nœuds du graphe",
+    "agent_node_runs_total": "Exécutions des nœuds du graphe",
+    "agent_node_errors_total": "Exécutions de nœuds terminées en erreur",
+    "agent_node_rows": "Lignes présentes dans l'état en sortie de nœud (cumul)",
+    "agent_upstream_requests_total": "Requêtes HTTP vers les API amont",
+    "agent_upstream_bytes_total": "Octets reçus des API amont",
+    "agent_upstream_cache_hits_total": "Réponses amont servies par le cache",
+    "agent_google_calls_total": "Appels Google Sheets/Drive (requêtes décomptées)",
+    "agent_google_quota_errors_total": "Erreurs de quota Google (429) rencontrées",
+    "agent_llm_calls_total": "Appels au LLM",
+    "agent_llm_duration_seconds": "Durée des appels au LLM",
+    "agent_llm_tokens_total": "Tokens consommés par le LLM (entrée/sortie)",
+    "agent_llm_batches_total": "Lots de parsing LLM envoyés (micro-batching)",
+    "agent_llm_batched_queries_total": "Requêtes parsées via un lot",
+    "agent_llm_batch_fill_ratio": "Remplissage des lots de parsing (taille / taille max)",
+    "agent_llm_batch_fallbacks_total": "Lots repassés requête par requête (sortie incohérente)",
+    "agent_export_cache_hits_total": "Exports servis depuis le cache local (requête identique récente)",
+    "agent_export_replay_total": "Exports différés renvoyés vers Google (envoyés, en échec)",
+    "agent_export_write_total": "Exports Google par chemin d'écriture (API values, import Drive)",
+    "agent_mcp_http_requests_total": "Requêtes du transport MCP HTTP (JSON, SSE, notifications, refusées)",
+    "agent_prefetch_total": "Récupérations spéculatives (lancées, réutilisées, annulées)",
+    "agent_sheet_pool_total": "Classeurs du pool pré-créé (créés, réclamés, ratés, supprimés)",
+    "agent_side_effect_duration_seconds": "Durée des effets de bord d'un export (dossier, partages, écriture)",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Optional[Dict[str, Any]]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+# =============================================================================
+# REGISTRE SANS VERROU (UN FRAGMENT PAR THREAD)
+# =============================================================================
+
+class _Shard:
+    """Compteurs et histogrammes écrits par un seul thread"""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self) -> None:
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+def _add_shard(target: _Shard, source: _Shard) -> None:
+    """Ajoute les valeurs de `source` à `target`"""
+    for key, value in list(source.counters.items()):
+        target.counters[key] = target.counters.get(key, 0) + value
+    for key, values in list(source.histograms.items()):
+        merged = target.histograms.setdefault(key, [0.0] * len(values))
+        for i, value in enumerate(values):
+            merged[i] += value
+
+class MetricsRegistry:
+    """Registre de métriques agrégé à la lecture"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, _Shard]] = []
+        self._retired = _Shard()  # Cumul des fragments des threads terminés
+        self._shards_lock = threading.Lock()  # Création d'un fragment, repli, lecture
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._retire_dead()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_dead(self) -> None:
+        """Replie les fragments des threads terminés (appelé sous `_shards_lock`)"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+                continue
+            # Thread terminé: plus aucune écriture concurrente sur son fragment
+            _add_shard(self._retired, shard)
+        self._shards = alive
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, Any]] = None) -> None:
+        """Incrémente un compteur"""
+        counters = self._shard().counters
+        key = (name, _labels(labels))
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        """Ajoute une observation à un histogramme"""
+        histograms = self._shard().histograms
+        key = (name, _labels(labels))
+        histogram = histograms.get(key)
+        if histogram is None:
+            # [compte par borne..., +Inf, somme, nombre]
+            histogram = histograms[key] = [0.0] * (len(self.buckets) + 3)
+        histogram[bisect.bisect_left(self.buckets, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def reset(self) -> None:
+        """Remet toutes les métriques à zéro (tests, benchmarks)"""
+        with self._shards_lock:
+            for _, shard in self._shards:
+                shard.counters.clear()
+                shard.histograms.clear()
+            self._retired = _Shard()
+
+    # ---- Lecture -----------------------------------------------------------
+
+    def _merged(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], List[float]]]:
+        merged = _Shard()
+        with self._shards_lock:
+            self._retire_dead()
+            _add_shard(merged, self._retired)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            _add_shard(merged, shard)
+        return merged.counters, merged.histograms
+
+    def _quantile(self, histogram: List[float], q: float) -> Optional[float]:
+        """Quantile estimé (borne supérieure du bucket atteint)"""
+        count = histogram[-1]
+        if not count:
+            return None
+        target = q * count
+        cumulative = 0.0
+        for i, bound in enumerate(self.buckets):
+            cumulative += histogram[i]
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Vue JSON des métriques (p50/p95/p99 estimés pour les histogrammes)"""
+        counters, histograms = self._merged()
+        result: Dict[str, Any] = {"counters": {}, "histograms": {}}
+        for (name, labels), value in sorted(counters.items()):
+            result["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), values in sorted(histograms.items()):
+            count = values[-1]
+            result["histograms"].setdefault(name, []).append({
+                "labels": dict(labels),
+                "count": int(count),
+                "sum": round(values[-2], 6),
+                "avg": round(values[-2] / count, 6) if count else None,
+                "p50": self._quantile(values, 0.50),
+                "p95": self._quantile(values, 0.95),
+                "p99": self._quantile(values, 0.99),
+            })
+        return result
+
+    def render_prometheus(self) -> str:
+        """Format d'exposition texte Prometheus"""
+        counters, histograms = self._merged()
+        lines: List[str] = []
+        seen = set()
+
+        def header(name: str, kind: str) -> None:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        def label_text(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            items = labels + extra
+            if not items:
+                return ""
+            return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{label_text(labels)} {_number(value)}")
+
+        for (name, labels), values in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets):
+                cumulative += values[i]
+                lines.append(f"{name}_bucket{label_text(labels, (('le', _number(bound)),))} {_number(cumulative)}")
+            cumulative += values[len(self.buckets)]
+            lines.append(f"{name}_bucket{label_text(labels, (('le', '+Inf'),))} {_number(cumulative)}")
+            lines.append(f"{name}_sum{label_text(labels)} {values[-2]:.6f}")
+            lines.append(f"{name}_count{label_text(labels)} {_number(values[-1])}")
+
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+# Registre partagé du processus
+metrics = MetricsRegistry()
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    """Raccourci: incrémente un compteur du registre partagé"""
+    if METRICS_ENABLED:
+        metrics.inc(name, value, labels)
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """Raccourci: observation d'histogramme dans le registre partagé"""
+    if METRICS_ENABLED:
+        metrics.observe(name, value, labels)
+
+# =============================================================================
+# INSTRUMENTATION DES NŒUDS
+# =============================================================================
+
+# Clé d'état dont la taille est rapportée en sortie de chaque nœud
+_ROWS_KEYS = {
+    "fetch_data": "api_data",
+    "process_data": "processed_data",
+    "aggregate": "processed_data",
+    "create_sheet": "processed_data",
+}
+
+def instrument_node(name: str, fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Enveloppe un nœud du graphe: latence, exécutions, erreurs, lignes"""
+    if not METRICS_ENABLED:
+        return fn
+
+    rows_key = _ROWS_KEYS.get(name)
+    labels = {"node": name}
+
+    @functools.wraps(fn)
+    def wrapper(state: Any) -> Any:
+        had_error = bool(state.get("error")) if isinstance(state, dict) else False
+        started = time.perf_counter()
+        try:
+            result = fn(state)
+        except Exception:
+            metrics.inc("agent_node_errors_total", 1, labels)
+            raise
+        finally:
+            metrics.observe("agent_node_duration_seconds", time.perf_counter() - started, labels)
+            metrics.inc("agent_node_runs_total", 1, labels)
+
+        if isinstance(result, dict):
+            if result.get("error") and not had_error:
+                metrics.inc("agent_node_errors_total", 1, labels)
+            if rows_key and result.get(rows_key):
+                metrics.inc("agent_node_rows", row_count(result[rows_key]), labels)
+        return result
+
+    return wrapper
+
+# =============================================================================
+# ENDPOINT HTTP PROMETHEUS
+# =============================================================================
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Démarre (une fois) l'endpoint `/metrics` dans un thread de fond"""
+    global _metrics_server
+    if _metrics_server is not None or not port:
+        return _metrics_server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            payload = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    try:
+        _metrics_server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"⚠️ Endpoint métriques indisponible sur le port {port}: {e}", file=sys.stderr)
+        return None
+    _metrics_server.daemon_threads = True
+    threading.Thread(target=_metrics_server.serve_forever, name="agent-metrics", daemon=True).start()
+    print(f"📈 Métriques Prometheus sur http://{host}:{port}/metrics", file=sys.stderr)
+    return _metrics_server
@@ -0,0 +1,204 @@
+"""
+Récupération spéculative de la source pendant le parsing LLM
+
+Le graphe est linéaire: le téléchargement amont attend la fin de l'appel
+LLM alors que, le plus souvent, la source est connue dès le départ
+(`state["api_url"]`, source par défaut). Avec `SPECULATIVE_PREFETCH=true`,
+un nœud `prefetch` placé avant `parse_query` lance la récupération de
+cette source dans un thread; `fetch_data` la réclame ensuite avec les
+paramètres extraits:
+
+- même source, sans filtre poussable côté serveur (ou source déjà lue en
+  entier): filtres et limite sont appliqués aux lignes spéculatives, la
+  pagination s'arrêtant dès que la demande est couverte; la latence devient
+  ~max(LLM, fetch) au lieu de leur somme;
+- autre source, filtre poussé (requête amont différente) ou plafond
+  `PREFETCH_MAX_ROWS` atteint sans couvrir la demande: la récupération est
+  annulée (arrêt entre deux pages) et `fetch_data` refait une requête normale.
+
+L'état ne contient que l'identifiant de la récupération (`prefetch_id`);
+après une reprise sur checkpoint dans un autre processus, il est inconnu et
+`fetch_data` récupère normalement.
+"""
+
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from agent.sources import registry as source_registry, ApiSource
+from agent.fetcher import fetch_source_rows, fetch_url_rows, split_filters
+from agent.metrics import inc as inc_metric
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "false").lower() == "true"
+# Plafond de lignes d'une récupération spéculative (la limite est encore inconnue)
+PREFETCH_MAX_ROWS = int(os.getenv("PREFETCH_MAX_ROWS", "50000"))
+# Récupérations en vol conservées au plus (runs abandonnés avant fetch_data)
+PREFETCH_MAX_INFLIGHT = int(os.getenv("PREFETCH_MAX_INFLIGHT", "64"))
+
+# =============================================================================
+# RÉCUPÉRATION SPÉCULATIVE
+# =============================================================================
+
+class SpeculativeFetch:
+    """Récupération d'une source dans un thread, annulable entre deux pages"""
+
+    def __init__(self, source: Optional[ApiSource], url: str, max_rows: int = PREFETCH_MAX_ROWS):
+        self.source = source
+        self.url = url
+        self.max_rows = max_rows
+        # Demande connue une fois les paramètres extraits: filtres et limite
+        self.conditions: Dict[str, Any] = {}
+        self.target: Optional[int] = None
+        self._scanned = self._matched = 0
+        self.rows: List[Dict] = []
+        self.stats: Dict[str, Any] = {}
+        self.error: Optional[BaseException] = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="speculative-fetch", daemon=True)
+
+    def start(self) -> "SpeculativeFetch":
+        """Lance la récupération dans son thread"""
+        self._thread.start()
+        return self
+
+    def _should_stop(self, rows: List[Dict]) -> bool:
+        """Appelé après chaque page: annulation, plafond, ou demande déjà couverte"""
+        if self._cancel.is_set() or len(rows) >= self.max_rows:
+            return True
+        target = self.target
+        if target is None:
+            return False
+        conditions = self.conditions
+        if not conditions:
+            return len(rows) >= target
+        # Comptage incrémental des lignes qui passent les filtres
+        for row in rows[self._scanned:]:
+            if all(row.get(key) == value for key, value in conditions.items()):
+                self._matched += 1
+        self._scanned = len(rows)
+        return self._matched >= target
+
+    def _run(self) -> None:
+        try:
+            if self.source is not None:
+                self.rows, self.stats = fetch_source_rows(self.source, None, None, stop=self._should_stop)
+            else:
+                self.rows, self.stats = fetch_url_rows(self.url)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    def cancel(self) -> None:
+        """Demande l'arrêt de la récupération à la prochaine page"""
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin de la récupération; False si `timeout` est écoulé"""
+        return self._done.wait(timeout)
+
+    @property
+    def complete(self) -> bool:
+        """Vrai si toute la source a été lue (ni arrêt, ni erreur)"""
+        return self._done.is_set() and self.error is None and not self.stats.get("stopped")
+
+    def take(self, filters: Dict[str, Any], limit: Optional[int]) -> Optional[Tuple[List[Dict], Dict[str, Any]]]:
+        """Lignes filtrées et limitées si la spéculation couvre la demande, sinon None
+
+        Pour une URL hors registre, toutes les lignes sont retournées telles
+        quelles (fetch_data applique lui-même filtres et limite).
+        """
+        if self.source is None:
+            self.wait()
+            return None if self.error is not None else (self.rows, self.stats)
+
+        pushed, local = split_filters(self.source, filters)
+        if pushed and not self.complete:
+            # Le filtre poussé change la requête amont (réponse plus petite côté serveur)
+            return None
+        conditions = dict(pushed, **local)
+
+        # La pagination spéculative s'arrête dès que la demande est couverte
+        self.conditions = conditions
+        self.target = limit
+        self.wait()
+        if self.error is not None:
+            return None
+
+        rows = self.rows
+        if conditions:
+            rows = [row for row in rows if all(row.get(key) == value for key, value in conditions.items())]
+        enough = limit is not None and len(rows) >= limit
+        if not (self.complete or enough):
+            return None
+
+        stats = dict(self.stats, speculative=True, pushed_filters=[], local_filters=sorted(conditions))
+        stats.pop("stopped", None)
+        return (rows[:limit] if limit is not None else rows), stats
+
+# =============================================================================
+# REGISTRE DES RÉCUPÉRATIONS EN VOL
+# =============================================================================
+
+_inflight: "OrderedDict[str, SpeculativeFetch]" = OrderedDict()
+_inflight_lock = threading.Lock()
+
+def start_prefetch(api_url: str, default_url: str) -> Optional[str]:
+    """Lance la récupération de la source présumée; retourne son identifiant"""
+    # Même résolution que fetch_data: une URL personnalisée désigne la source
+    if api_url and api_url != default_url:
+        source = source_registry.find_by_url(api_url)
+    else:
+        source = source_registry.default
+    prefetch = SpeculativeFetch(source, api_url or default_url).start()
+
+    prefetch_id = uuid.uuid4().hex
+    with _inflight_lock:
+        _inflight[prefetch_id] = prefetch
+        while len(_inflight) > PREFETCH_MAX_INFLIGHT:
+            _, abandoned = _inflight.popitem(last=False)
+            abandoned.cancel()
+    inc_metric("agent_prefetch_total", outcome="started")
+    return prefetch_id
+
+def _pop(prefetch_id: Optional[str]) -> Optional[SpeculativeFetch]:
+    if not prefetch_id:
+        return None
+    with _inflight_lock:
+        return _inflight.pop(prefetch_id, None)
+
+def claim_prefetch(
+    prefetch_id: Optional[str],
+    source: Optional[ApiSource],
+    api_url: str,
+    filters: Optional[Dict[str, Any]],
+    limit: Optional[int],
+) -> Optional[Tuple[List[Dict], Dict[str, Any]]]:
+    """Lignes de la source principale si la spéculation est réutilisable, sinon None"""
+    prefetch = _pop(prefetch_id)
+    if prefetch is None:
+        return None
+
+    if source is not None:
+        same_request = prefetch.source is not None and prefetch.source.name == source.name
+    else:
+        same_request = prefetch.source is None and prefetch.url == api_url
+    result = prefetch.take(filters or {}, limit) if same_request else None
+    if result is None:
+        prefetch.cancel()
+    inc_metric("agent_prefetch_total", outcome="hit" if result is not None else "miss")
+    return result
+
+def discard_prefetch(prefetch_id: Optional[str]) -> None:
+    """Annule une récupération devenue inutile (run en erreur)"""
+    prefetch = _pop(prefetch_id)
+    if prefetch is not None:
+        prefetch.cancel()
+        inc_metric("agent_prefetch_total", outcome="discarded")
@@ -0,0 +1,214 @@
+"""
+Profilage opt-in des exécutions de l'agent (flame graphs des runs lents)
+
+Un profileur par échantillonnage relève périodiquement la pile du thread qui
+exécute le graphe (`sys._current_frames`), sans instrumenter les appels: le
+coût est celui d'un thread qui se réveille toutes les `PROFILING_INTERVAL`
+secondes. Les threads auxiliaires du run (appels Google des effets de bord,
+fetch spéculatif, cf. `PROFILING_THREAD_PREFIXES`) sont aussi échantillonnés,
+sous une racine `thread:<nom>`: sans eux, un export lent n'apparaît que
+comme une attente dans le nœud. Un run est profilé si:
+
+- `PROFILING_SLOW_SECONDS` > 0: tous les runs sont échantillonnés, seuls ceux
+  qui dépassent le seuil sont conservés;
+- `PROFILING_SAMPLE_EVERY` = N > 0: un run sur N est conservé quelle que
+  soit sa durée.
+
+Les runs conservés produisent `<PROFILING_DIR>/<run_name>.collapsed`
+(format « collapsed stacks », lisible par flamegraph.pl ou speedscope) et un
+résumé des fonctions au plus fort temps propre, attaché au résultat du run.
+Avec `PROFILING_ENABLED=false` (défaut), `profile_run` ne démarre rien.
+
+Usage:
+    with profile_run("agent_run_x") as profile:
+        result = graph.invoke(state)
+    if profile.summary:
+        result["profile"] = profile.summary
+"""
+
+import os
+import re
+import sys
+import time
+import itertools
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SLOW_SECONDS = float(os.getenv("PROFILING_SLOW_SECONDS", "10"))  # 0 = pas de seuil
+PROFILING_SAMPLE_EVERY = int(os.getenv("PROFILING_SAMPLE_EVERY", "0"))  # 0 = pas de tirage 1/N
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.005"))  # secondes entre échantillons
+PROFILING_DIR = os.getenv("PROFILING_DIR", "./profiles")
+PROFILING_TOP = int(os.getenv("PROFILING_TOP", "15"))
+# Threads auxiliaires du run, échantillonnés en plus du thread du run (préfixes de nom)
+PROFILING_THREAD_PREFIXES = tuple(
+    prefix.strip() for prefix in os.getenv("PROFILING_THREAD_PREFIXES", "side-effect,speculative-fetch").split(",")
+    if prefix.strip()
+)
+# Échantillonne aussi tous les autres threads (workers, pools) en plus du thread du run
+PROFILING_ALL_THREADS = os.getenv("PROFILING_ALL_THREADS", "false").lower() == "true"
+
+_run_counter = itertools.count(1)
+
+# =============================================================================
+# ÉCHANTILLONNEUR
+# =============================================================================
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+def _stack(frame: Any) -> Tuple[str, ...]:
+    """Pile de la racine vers la feuille"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+class StackSampler:
+    """Relève périodiquement les piles d'un thread (et de ses auxiliaires) dans un thread de fond"""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = PROFILING_INTERVAL,
+                 all_threads: bool = PROFILING_ALL_THREADS,
+                 thread_prefixes: Tuple[str, ...] = PROFILING_THREAD_PREFIXES):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.all_threads = all_threads
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="agent-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            # Les pools créent et recyclent des threads: noms relus dès qu'un ident est nouveau
+            if any(ident not in names for ident in frames):
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                if ident == self.thread_id:
+                    self.samples[_stack(frame)] += 1
+                    continue
+                name = names.get(ident, "")
+                if self.all_threads or (self.thread_prefixes and name.startswith(self.thread_prefixes)):
+                    self.samples[(f"thread:{name or ident}",) + _stack(frame)] += 1
+
+    # ---- Exploitation ------------------------------------------------------
+
+    def collapsed(self) -> str:
+        """Format « collapsed stacks »: `racine;...;feuille <nombre>` par ligne"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.samples.items()))
+
+    def top_self(self, limit: int = PROFILING_TOP) -> List[Dict[str, Any]]:
+        """Fonctions au plus fort temps propre (échantillons où elles sont en feuille)"""
+        total = sum(self.samples.values())
+        if not total:
+            return []
+        leaves: Counter = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack[-1]] += count
+        return [
+            {
+                "function": function,
+                "samples": count,
+                "self_seconds": round(count * self.interval, 4),
+                "self_percent": round(100.0 * count / total, 1),
+            }
+            for function, count in leaves.most_common(limit)
+        ]
+
+# =============================================================================
+# PROFILAGE D'UN RUN
+# =============================================================================
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+class RunProfile:
+    """Contexte de profilage d'un run; `summary` est rempli si le run est conservé"""
+
+    def __init__(self, run_name: str, sampled: bool, slow_seconds: float,
+                 output_dir: str = PROFILING_DIR, interval: float = PROFILING_INTERVAL):
+        self.run_name = run_name
+        self.sampled = sampled
+        self.slow_seconds = slow_seconds
+        self.output_dir = output_dir
+        self.sampler = StackSampler(interval=interval)
+        self.summary: Optional[Dict[str, Any]] = None
+        self._started = 0.0
+
+    def __enter__(self) -> "RunProfile":
+        self._started = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.sampler.stop()
+        elapsed = time.perf_counter() - self._started
+        slow = self.slow_seconds > 0 and elapsed >= self.slow_seconds
+        if not (self.sampled or slow):
+            return
+        try:
+            path = self._write()
+        except OSError as e:
+            print(f"⚠️ Profil non écrit pour {self.run_name}: {e}", file=sys.stderr)
+            path = None
+        self.summary = {
+            "run_name": self.run_name,
+            "reason": "slow" if slow else "sampled",
+            "elapsed_seconds": round(elapsed, 3),
+            "samples": sum(self.sampler.samples.values()),
+            "interval_seconds": self.sampler.interval,
+            "collapsed_path": path,
+            "top_self": self.sampler.top_self(),
+        }
+
+    def _write(self) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{_SAFE_NAME.sub('_', self.run_name)}.collapsed")
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(self.sampler.collapsed())
+        return path
+
+class _NoProfile:
+    """Contexte vide quand le profilage est désactivé (aucun coût)"""
+
+    summary = None
+
+    def __enter__(self) -> "_NoProfile":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        return None
+
+_NO_PROFILE = _NoProfile()
+
+def profile_run(run_name: str) -> Any:
+    """Contexte de profilage d'un run selon la configuration courante"""
+    if not PROFILING_ENABLED:
+        return _NO_PROFILE
+    sampled = PROFILING_SAMPLE_EVERY > 0 and next(_run_counter) % PROFILING_SAMPLE_EVERY == 0
+    if not sampled and PROFILING_SLOW_SECONDS <= 0:
+        return _NO_PROFILE
+    return RunProfile(run_name, sampled, PROFILING_SLOW_SECONDS)
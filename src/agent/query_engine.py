@@ -0,0 +1,174 @@
+"""
+Petit moteur de requêtes multi-sources avec jointures par hachage
+
+Les sources d'une requête sont récupérées en parallèle (une seule fois
+chacune), un index de hachage est construit sur le plus petit côté de
+chaque jointure et le plus grand côté est streamé à travers cet index.
+Aucune boucle imbriquée, aucun appel API par ligne.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Iterator
+
+from agent.sources import registry as source_registry, ApiSource
+from agent.fetcher import fetch_source_rows
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+QUERY_MAX_PARALLEL_FETCHES = int(os.getenv("QUERY_MAX_PARALLEL_FETCHES", "4"))
+
+JOIN_FIELD_SEPARATOR = "."
+
+# =============================================================================
+# JOINTURES
+# =============================================================================
+
+def joined_field_name(alias: str, field: str) -> str:
+    """Nom de colonne d'un champ issu d'une source jointe (ex: users.name)"""
+    return f"{alias}{JOIN_FIELD_SEPARATOR}{field}"
+
+def build_join_specs(source: ApiSource, join_fields: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """Construit les spécifications de jointure à partir des relations déclarées"""
+    specs = []
+    for target_name, fields in join_fields.items():
+        keys = source.relations.get(target_name)
+        if not keys or target_name not in source_registry:
+            continue
+        left_key, right_key = keys
+        specs.append({
+            "source": target_name,
+            "left_key": left_key,
+            "right_key": right_key,
+            "fields": list(fields),
+        })
+    return specs
+
+def validate_join_specs(source: ApiSource, joins: Any) -> List[Dict[str, Any]]:
+    """Ne conserve que les jointures cohérentes avec le registre"""
+    if not isinstance(joins, list):
+        return []
+
+    valid = []
+    for spec in joins:
+        if not isinstance(spec, dict):
+            continue
+        target = source_registry.get(spec.get("source"))
+        if target is None:
+            continue
+        default_left, default_right = source.relations.get(target.name, (None, target.primary_key))
+        left_key = spec.get("left_key") or default_left
+        right_key = spec.get("right_key") or default_right
+        if not left_key or not source.has_field(left_key) or not target.has_field(right_key):
+            continue
+        fields = [field for field in spec.get("fields") or [] if target.has_field(field)]
+        valid.append({
+            "source": target.name,
+            "left_key": left_key,
+            "right_key": right_key,
+            "fields": fields or [field for field in target.fields if field != right_key],
+        })
+    return valid
+
+def _merge(left: Dict, right: Optional[Dict], alias: str, fields: List[str]) -> Dict:
+    merged = dict(left)
+    for field in fields:
+        merged[joined_field_name(alias, field)] = right.get(field) if right is not None else None
+    return merged
+
+def _build_index(rows: Iterable[Dict], key: str) -> Dict[Any, List[Dict]]:
+    index: Dict[Any, List[Dict]] = {}
+    for row in rows:
+        index.setdefault(row.get(key), []).append(row)
+    return index
+
+def hash_join(
+    left_rows: List[Dict],
+    right_rows: List[Dict],
+    left_key: str,
+    right_key: str,
+    alias: str,
+    fields: List[str],
+) -> Iterator[Dict]:
+    """Jointure externe gauche par hachage
+
+    L'index est construit sur le plus petit côté; l'autre est streamé.
+    Quand l'index porte sur la gauche, les lignes sortent dans l'ordre du
+    côté droit puis les lignes gauches sans correspondance sont émises.
+    """
+    if len(right_rows) <= len(left_rows):
+        right_index = _build_index(right_rows, right_key)
+        for left in left_rows:
+            matches = right_index.get(left.get(left_key))
+            if not matches:
+                yield _merge(left, None, alias, fields)
+                continue
+            for right in matches:
+                yield _merge(left, right, alias, fields)
+        return
+
+    left_index = _build_index(left_rows, left_key)
+    matched_keys = set()
+    for right in right_rows:
+        key = right.get(right_key)
+        lefts = left_index.get(key)
+        if not lefts:
+            continue
+        matched_keys.add(key)
+        for left in lefts:
+            yield _merge(left, right, alias, fields)
+
+    for key, lefts in left_index.items():
+        if key not in matched_keys:
+            for left in lefts:
+                yield _merge(left, None, alias, fields)
+
+# =============================================================================
+# EXÉCUTION
+# =============================================================================
+
+def execute_query(
+    source: ApiSource,
+    filters: Optional[Dict[str, Any]] = None,
+    limit: Optional[int] = None,
+    joins: Optional[List[Dict[str, Any]]] = None,
+    primary: Optional[Tuple[List[Dict], Dict[str, Any]]] = None,
+) -> Tuple[List[Dict], Dict[str, Any]]:
+    """Exécute une requête sur une source principale et ses jointures éventuelles
+
+    `primary`: lignes de la source principale déjà filtrées et limitées, et
+    leurs statistiques (récupération spéculative, voir agent.prefetch).
+    Retourne les lignes (jointes) et les statistiques de récupération par source.
+    """
+    if not joins:
+        rows, stats = primary or fetch_source_rows(source, filters, limit)
+        return rows, {source.name: stats}
+
+    tasks = [] if primary else [(source, filters, limit)]
+    for spec in joins:
+        tasks.append((source_registry.get(spec["source"]), None, None))
+
+    # Chaque source n'est récupérée qu'une fois, en parallèle
+    with ThreadPoolExecutor(max_workers=min(len(tasks), QUERY_MAX_PARALLEL_FETCHES)) as executor:
+        futures = [executor.submit(fetch_source_rows, *task) for task in tasks]
+        results = [future.result() for future in futures]
+    if primary:
+        results.insert(0, primary)
+
+    rows, primary_stats = results[0]
+    stats = {source.name: primary_stats}
+
+    for spec, (right_rows, right_stats) in zip(joins, results[1:]):
+        stats[spec["source"]] = right_stats
+        rows = list(hash_join(
+            rows,
+            right_rows,
+            spec["left_key"],
+            spec["right_key"],
+            spec["source"],
+            spec["fields"],
+        ))
+
+    return rows, stats
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Politique de rétention des exports et garbage collection des Google Sheets
+
+Chaque spreadsheet créé par `create_google_sheet` est enregistré dans un
+index SQLite local (ID, date de création, hash de la requête, taille
+estimée). Un GC de fond supprime les exports par âge, par nombre ou sous
+pression de quota Drive, en batchs (agent.drive_cleanup), à partir de cet
+index: il n'a jamais besoin de lister tout le Drive.
+
+Usage:
+    python -m agent.retention run            # un passage du GC (cron)
+    python -m agent.retention run --dry-run  # affiche ce qui serait supprimé
+    python -m agent.retention stats
+    python -m agent.retention list --limit 20
+"""
+
+import os
+import sys
+import json
+import hashlib
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable
+
+from agent.drive_cleanup import batch_delete_files
+from agent.google_quota import google_execute, READ, PRIORITY_BACKGROUND
+from agent.google_endpoint import DRIVE_SCOPES, load_credentials, build_drive_service
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+RETENTION_DB_PATH = os.getenv("RETENTION_DB_PATH", "./agent_retention.sqlite3")
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "30"))  # 0 = pas de limite d'âge
+RETENTION_MAX_SHEETS = int(os.getenv("RETENTION_MAX_SHEETS", "500"))  # 0 = pas de limite de nombre
+RETENTION_MIN_KEEP = int(os.getenv("RETENTION_MIN_KEEP", "10"))  # jamais supprimés sous pression de quota
+RETENTION_QUOTA_THRESHOLD = float(os.getenv("RETENTION_QUOTA_THRESHOLD", "0.8"))
+RETENTION_QUOTA_TARGET = float(os.getenv("RETENTION_QUOTA_TARGET", "0.7"))
+RETENTION_GC_INTERVAL = float(os.getenv("RETENTION_GC_INTERVAL", "3600"))  # secondes, 0 = pas de GC de fond
+
+GOOGLE_CREDENTIALS_PATH = os.getenv("GOOGLE_CREDENTIALS_PATH", "./google-credentials.json")
+
+# Sous pression de quota sans tailles connues, fraction des exports supprimés par passage
+_PRESSURE_FALLBACK_FRACTION = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    created_at TEXT NOT NULL,
+    query_hash TEXT,
+    rows INTEGER NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    deleted_at TEXT
+);
+CREATE INDEX IF NOT EXISTS sheets_live_created ON sheets (deleted_at, created_at);
+"""
+
+def _now() -> datetime:
+    return datetime.now()
+
+def query_hash(query: str) -> str:
+    """Hash court et stable de la requête utilisateur (normalisée)"""
+    normalized = " ".join((query or "").lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+def estimate_size(rows: List[List[Any]]) -> int:
+    """Taille approximative (octets) des valeurs écrites dans le sheet"""
+    return sum(len(str(value)) for row in rows for value in row)
+
+# =============================================================================
+# INDEX LOCAL DES EXPORTS (SQLITE)
+# =============================================================================
+
+class SheetIndex:
+    """Index des spreadsheets créés par l'agent"""
+
+    def __init__(self, db_path: str = RETENTION_DB_PATH):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(
+        self,
+        sheet_id: str,
+        title: str = "",
+        query: str = "",
+        rows: int = 0,
+        size_bytes: int = 0,
+        created_at: Optional[datetime] = None,
+    ) -> None:
+        """Enregistre un export créé"""
+        created = (created_at or _now()).isoformat(timespec="seconds")
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sheets (id, title, created_at, query_hash, rows, size_bytes) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sheet_id, title, created, query_hash(query), rows, size_bytes),
+            )
+
+    def mark_deleted(self, sheet_ids: List[str]) -> None:
+        """Marque des exports comme supprimés du Drive"""
+        if not sheet_ids:
+            return
+        deleted_at = _now().isoformat(timespec="seconds")
+        with closing(self._connect()) as conn:
+            conn.executemany(
+                "UPDATE sheets SET deleted_at = ? WHERE id = ?",
+                [(deleted_at, sheet_id) for sheet_id in sheet_ids],
+            )
+
+    def live(self) -> List[Dict[str, Any]]:
+        """Exports encore présents, du plus ancien au plus récent"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM sheets WHERE deleted_at IS NULL ORDER BY created_at, id"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Exports les plus récents (y compris supprimés)"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM sheets ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Nombre et taille estimée des exports présents / supprimés"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT "
+                "SUM(deleted_at IS NULL) AS live, "
+                "SUM(deleted_at IS NOT NULL) AS deleted, "
+                "SUM(CASE WHEN deleted_at IS NULL THEN size_bytes ELSE 0 END) AS live_bytes, "
+                "MIN(CASE WHEN deleted_at IS NULL THEN created_at END) AS oldest "
+                "FROM sheets"
+            ).fetchone()
+        return {
+            "live": row["live"] or 0,
+            "deleted": row["deleted"] or 0,
+            "live_bytes": row["live_bytes"] or 0,
+            "oldest": row["oldest"],
+        }
+
+# =============================================================================
+# POLITIQUE DE RÉTENTION
+# =============================================================================
+
+class RetentionPolicy:
+    """Limites de rétention (âge, nombre, pression de quota)"""
+
+    def __init__(
+        self,
+        max_age_days: float = RETENTION_MAX_AGE_DAYS,
+        max_sheets: int = RETENTION_MAX_SHEETS,
+        min_keep: int = RETENTION_MIN_KEEP,
+        quota_threshold: float = RETENTION_QUOTA_THRESHOLD,
+        quota_target: float = RETENTION_QUOTA_TARGET,
+    ):
+        self.max_age_days = max_age_days
+        self.max_sheets = max_sheets
+        self.min_keep = min_keep
+        self.quota_threshold = quota_threshold
+        self.quota_target = min(quota_target, quota_threshold)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Exporte les limites sous forme de dictionnaire"""
+        return dict(vars(self))
+
+def plan_deletions(
+    live: List[Dict[str, Any]],
+    policy: RetentionPolicy,
+    quota: Optional[Dict[str, int]] = None,
+    now: Optional[datetime] = None,
+) -> Dict[str, List[str]]:
+    """Choisit les exports à supprimer, par motif
+
+    `live` est trié du plus ancien au plus récent; `quota` contient
+    `usage` et `limit` (octets) tels que retournés par Drive `about.get`.
+    """
+    now = now or _now()
+    plan: Dict[str, List[str]] = {"age": [], "count": [], "quota": []}
+    remaining = list(live)
+
+    # 1. Âge
+    if policy.max_age_days > 0:
+        cutoff = (now - timedelta(days=policy.max_age_days)).isoformat(timespec="seconds")
+        plan["age"] = [sheet["id"] for sheet in remaining if sheet["created_at"] < cutoff]
+        remaining = remaining[len(plan["age"]):]
+
+    # 2. Nombre (les plus anciens au-delà du maximum)
+    if policy.max_sheets > 0 and len(remaining) > policy.max_sheets:
+        excess = len(remaining) - policy.max_sheets
+        plan["count"] = [sheet["id"] for sheet in remaining[:excess]]
+        remaining = remaining[excess:]
+
+    # 3. Pression de quota: les plus anciens jusqu'à revenir sous la cible
+    limit = int((quota or {}).get("limit") or 0)
+    usage = int((quota or {}).get("usage") or 0)
+    if limit > 0 and usage / limit >= policy.quota_threshold:
+        deletable = remaining[:max(0, len(remaining) - policy.min_keep)]
+        to_free = usage - policy.quota_target * limit
+        if sum(sheet["size_bytes"] for sheet in deletable) > 0:
+            freed = 0
+            for sheet in deletable:
+                if freed >= to_free:
+                    break
+                plan["quota"].append(sheet["id"])
+                freed += sheet["size_bytes"]
+        else:
+            count = max(1, int(len(deletable) * _PRESSURE_FALLBACK_FRACTION)) if deletable else 0
+            plan["quota"] = [sheet["id"] for sheet in deletable[:count]]
+
+    return plan
+
+# =============================================================================
+# GARBAGE COLLECTOR
+# =============================================================================
+
+def default_service_factory() -> Any:
+    """Client Drive du compte de service de l'agent"""
+    return build_drive_service(load_credentials(GOOGLE_CREDENTIALS_PATH, DRIVE_SCOPES))
+
+def get_storage_quota(service: Any) -> Dict[str, int]:
+    """Utilisation et limite du stockage Drive (octets)"""
+    about = google_execute(service.about().get(fields="storageQuota"), kind=READ, priority=PRIORITY_BACKGROUND)
+    quota = about.get("storageQuota", {})
+    return {"usage": int(quota.get("usage", 0)), "limit": int(quota.get("limit", 0))}
+
+def delete_exports(
+    service: Any,
+    sheet_ids: List[str],
+    index: "SheetIndex",
+    service_factory: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """Supprime des exports par batchs (priorité de fond) et les marque dans l'index"""
+    result = batch_delete_files(
+        service,
+        sheet_ids,
+        service_factory=service_factory,
+        priority=PRIORITY_BACKGROUND,
+    )
+    failed = set(result["errors"])
+    index.mark_deleted([sheet_id for sheet_id in sheet_ids if sheet_id not in failed])
+    return result
+
+class SheetGarbageCollector:
+    """Applique la politique de rétention, ponctuellement ou en tâche de fond"""
+
+    def __init__(
+        self,
+        index: Optional[SheetIndex] = None,
+        policy: Optional[RetentionPolicy] = None,
+        service_factory: Callable[[], Any] = default_service_factory,
+        interval: float = RETENTION_GC_INTERVAL,
+    ):
+        self.index = index or SheetIndex()
+        self.policy = policy or RetentionPolicy()
+        self.service_factory = service_factory
+        self.interval = interval
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Un passage du GC: planifie puis supprime par batchs"""
+        live = self.index.live()
+        report: Dict[str, Any] = {"live_before": len(live), "dry_run": dry_run}
+        if not live:
+            report.update(plan={}, deleted=0, errors={})
+            self.last_report = report
+            return report
+
+        service = self.service_factory()
+        quota = None
+        if self.policy.quota_threshold > 0:
+            try:
+                quota = get_storage_quota(service)
+            except Exception as e:
+                report["quota_error"] = str(e)
+        report["quota"] = quota
+
+        plan = plan_deletions(live, self.policy, quota)
+        report["plan"] = {reason: len(ids) for reason, ids in plan.items()}
+        sheet_ids = [sheet_id for ids in plan.values() for sheet_id in ids]
+
+        if dry_run or not sheet_ids:
+            report.update(deleted=0, errors={}, candidates=sheet_ids)
+            self.last_report = report
+            return report
+
+        result = delete_exports(service, sheet_ids, self.index, service_factory=self.service_factory)
+
+        report.update(
+            deleted=result["deleted"],
+            errors=result["errors"],
+            elapsed_seconds=result["elapsed_seconds"],
+        )
+        self.last_report = report
+        return report
+
+    def start(self) -> "SheetGarbageCollector":
+        """Démarre le GC de fond (un passage toutes les `interval` secondes)"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="agent-retention-gc", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Arrête la boucle de fond et attend la fin du thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_report = {"error": f"{type(e).__name__}: {e}"}
+
+# =============================================================================
+# INTÉGRATION AVEC L'AGENT
+# =============================================================================
+
+_default_index: Optional[SheetIndex] = None
+_background_gc: Optional[SheetGarbageCollector] = None
+_init_lock = threading.Lock()
+
+def get_index() -> SheetIndex:
+    """Index partagé (créé à la première utilisation)"""
+    global _default_index
+    with _init_lock:
+        if _default_index is None:
+            _default_index = SheetIndex()
+        return _default_index
+
+def record_export(sheet_id: str, title: str, query: str, rows: List[List[Any]],
+                  row_count: Optional[int] = None, size_bytes: Optional[int] = None) -> None:
+    """Enregistre un export et démarre le GC de fond si nécessaire
+    
+    `row_count` et `size_bytes` remplacent les valeurs calculées sur `rows`
+    quand les lignes n'ont pas été matérialisées (import Drive d'un CSV).
+    """
+    if not RETENTION_ENABLED:
+        return
+    get_index().record(
+        sheet_id,
+        title=title,
+        query=query,
+        rows=max(0, len(rows) - 1) if row_count is None else row_count,  # sans la ligne d'en-têtes
+        size_bytes=estimate_size(rows) if size_bytes is None else size_bytes,
+    )
+    ensure_background_gc()
+
+def ensure_background_gc() -> Optional[SheetGarbageCollector]:
+    """Démarre (une fois) le GC de fond du processus"""
+    global _background_gc
+    if not RETENTION_ENABLED or RETENTION_GC_INTERVAL <= 0:
+        return None
+    index = get_index()
+    with _init_lock:
+        if _background_gc is None:
+            _background_gc = SheetGarbageCollector(index).start()
+        return _background_gc
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Rétention des exports Google Sheets de l'agent")
+    parser.add_argument("--db", default=RETENTION_DB_PATH, help="Chemin de l'index SQLite des exports")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Un passage du garbage collector")
+    run.add_argument("--dry-run", action="store_true", help="Afficher sans supprimer")
+    run.add_argument("--max-age-days", type=float, default=RETENTION_MAX_AGE_DAYS)
+    run.add_argument("--max-sheets", type=int, default=RETENTION_MAX_SHEETS)
+    run.add_argument("--quota-threshold", type=float, default=RETENTION_QUOTA_THRESHOLD)
+
+    subparsers.add_parser("stats", help="Statistiques de l'index")
+
+    listing = subparsers.add_parser("list", help="Derniers exports enregistrés")
+    listing.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args(argv)
+    index = SheetIndex(args.db)
+
+    if args.command == "run":
+        policy = RetentionPolicy(
+            max_age_days=args.max_age_days,
+            max_sheets=args.max_sheets,
+            quota_threshold=args.quota_threshold,
+        )
+        report = SheetGarbageCollector(index, policy).run_once(dry_run=args.dry_run)
+        print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+        return 1 if report.get("errors") else 0
+
+    if args.command == "stats":
+        print(json.dumps(index.stats(), indent=2, ensure_ascii=False))
+        return 0
+
+    if args.command == "list":
+        print(json.dumps(index.list(args.limit), indent=2, ensure_ascii=False))
+        return 0
+
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
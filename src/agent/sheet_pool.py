@@ -0,0 +1,150 @@
+"""
+Pool de classeurs Google Sheets pré-créés
+
+Créer un classeur, le ranger dans le dossier des exports et le partager
+coûte plusieurs allers-retours Google sur le chemin de la requête. Avec
+`SHEET_POOL_SIZE > 0`, une tâche de fond garde ce nombre de classeurs vides
+déjà préparés (créés, déplacés, partagés); `create_google_sheet` en réclame
+un et ne fait plus que le renommer et y écrire les données.
+
+- Le remplissage se fait un classeur à la fois, à priorité de fond sur le
+  limiteur de débit partagé (les exports interactifs passent devant); une
+  erreur (quota, réseau) interrompt le passage jusqu'au suivant.
+- Un pool vide n'est qu'un raté: l'export crée son classeur normalement et
+  réveille le remplissage.
+- Sans export pendant `SHEET_POOL_MAX_IDLE_SECONDS`, le pool est vidé (les
+  classeurs sont supprimés) et ne se remplit plus avant le prochain export.
+
+La préparation et la suppression des classeurs sont fournies par l'appelant
+(voir agent.graph); le pool ne connaît que des éléments opaques.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from agent.metrics import inc as inc_metric
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+SHEET_POOL_SIZE = int(os.getenv("SHEET_POOL_SIZE", "0"))  # 0 = pas de pool
+SHEET_POOL_REFILL_INTERVAL = float(os.getenv("SHEET_POOL_REFILL_INTERVAL", "30"))  # secondes
+SHEET_POOL_MAX_IDLE_SECONDS = float(os.getenv("SHEET_POOL_MAX_IDLE_SECONDS", "3600"))  # 0 = jamais vidé
+
+# =============================================================================
+# POOL
+# =============================================================================
+
+class SheetPool:
+    """Classeurs prêts à l'emploi, remplis par un thread de fond"""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        discard: Callable[[List[Any]], None],
+        size: int = SHEET_POOL_SIZE,
+        refill_interval: float = SHEET_POOL_REFILL_INTERVAL,
+        max_idle: float = SHEET_POOL_MAX_IDLE_SECONDS,
+    ):
+        self.factory = factory
+        self.discard = discard
+        self.size = max(0, size)
+        self.refill_interval = refill_interval
+        self.max_idle = max_idle
+        self._ready: Deque[Tuple[Any, float]] = deque()  # (élément, date de création)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_claim = time.monotonic()
+        self.last_error: Optional[str] = None
+        self.stats = {"created": 0, "hits": 0, "misses": 0, "reclaimed": 0, "errors": 0}
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def claim(self) -> Optional[Any]:
+        """Un classeur préparé (le plus ancien), ou None si le pool est vide"""
+        with self._lock:
+            self.last_claim = time.monotonic()
+            item = self._ready.popleft()[0] if self._ready else None
+            self.stats["hits" if item is not None else "misses"] += 1
+        inc_metric("agent_sheet_pool_total", outcome="hit" if item is not None else "miss")
+        self._wake.set()
+        return item
+
+    def idle(self) -> bool:
+        """Vrai si aucun export n'a réclamé de classeur depuis `max_idle` secondes"""
+        return self.max_idle > 0 and time.monotonic() - self.last_claim > self.max_idle
+
+    def reclaim(self) -> int:
+        """Vide le pool et supprime ses classeurs; retourne leur nombre"""
+        with self._lock:
+            items = [item for item, _ in self._ready]
+            self._ready.clear()
+        if items:
+            self.discard(items)
+            self.stats["reclaimed"] += len(items)
+            inc_metric("agent_sheet_pool_total", len(items), outcome="reclaimed")
+        return len(items)
+
+    def refill_once(self) -> int:
+        """Un passage: vide le pool inactif, sinon le complète; retourne le nombre créé"""
+        if self.idle():
+            self.reclaim()
+            return 0
+        created = 0
+        while len(self._ready) < self.size and not self._stop.is_set():
+            try:
+                item = self.factory()
+            except Exception as e:
+                # Quota ou panne: on réessaiera au prochain passage
+                self.stats["errors"] += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                inc_metric("agent_sheet_pool_total", outcome="error")
+                break
+            with self._lock:
+                self._ready.append((item, time.monotonic()))
+            created += 1
+            self.stats["created"] += 1
+            inc_metric("agent_sheet_pool_total", outcome="created")
+        return created
+
+    def start(self) -> "SheetPool":
+        """Démarre le remplissage de fond (premier passage immédiat)"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._wake.set()
+        self._thread = threading.Thread(target=self._loop, name="agent-sheet-pool", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None, reclaim: bool = False) -> None:
+        """Arrête le remplissage de fond; `reclaim` supprime aussi les classeurs en attente"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if reclaim:
+            self.reclaim()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.refill_once()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def describe(self) -> Dict[str, Any]:
+        """Compteurs du pool, classeurs prêts et dernière erreur de remplissage"""
+        return dict(self.stats, ready=len(self), size=self.size, last_error=self.last_error)
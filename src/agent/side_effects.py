@@ -0,0 +1,132 @@
+"""
+Exécution concurrente des effets de bord d'un export (petit DAG)
+
+Les effets d'un export Google ne dépendent pas tous les uns des autres: le
+dossier Drive peut être résolu pendant la création du classeur, puis le
+déplacement, les partages et l'écriture des données partent en parallèle
+dès que l'identifiant du classeur est connu. `SideEffectPlan` déclare ces
+effets et leurs dépendances, puis les exécute sur un pool de threads:
+
+    plan = SideEffectPlan()
+    plan.add("sheet", create_sheet, required=True)
+    plan.add("folder", resolve_folder)
+    plan.add("move", move_sheet, after=("sheet", "folder"))
+    plan.add("write", write_rows, after=("sheet",), required=True)
+    results, report = plan.run()
+
+Chaque effet reçoit le dict des résultats déjà obtenus. Son statut est
+rapporté individuellement (`ok`, `failed`, `skipped`, avec durée et erreur);
+un effet dont une dépendance a échoué est ignoré, un effet peut se déclarer
+sans objet en levant `SkipEffect`. `SideEffectError` n'est levée qu'après la
+fin du plan, et seulement si un effet `required` n'a pas abouti.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+from agent.metrics import observe
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+SIDE_EFFECT_WORKERS = int(os.getenv("SIDE_EFFECT_WORKERS", "4"))
+
+EFFECT_OK = "ok"
+EFFECT_FAILED = "failed"
+EFFECT_SKIPPED = "skipped"
+
+class SkipEffect(Exception):
+    """Levée par un effet sans objet (ex: Drive non configuré)"""
+
+class SideEffectError(Exception):
+    """Un effet obligatoire a échoué ou n'a pas pu s'exécuter"""
+
+    def __init__(self, name: str, report: Dict[str, Dict[str, Any]], results: Dict[str, Any]):
+        self.name = name
+        self.report = report
+        self.results = results
+        entry = report.get(name, {})
+        super().__init__(f"{name}: {entry.get('error') or entry.get('reason') or entry.get('status')}")
+
+# =============================================================================
+# PLAN D'EFFETS
+# =============================================================================
+
+class SideEffectPlan:
+    """Effets nommés, dépendances et exécution concurrente"""
+
+    def __init__(self, max_workers: int = SIDE_EFFECT_WORKERS, metric_prefix: str = "agent_side_effect"):
+        self.max_workers = max(1, max_workers)
+        self.metric_prefix = metric_prefix
+        self._effects: Dict[str, Tuple[Callable[[Dict[str, Any]], Any], Tuple[str, ...], bool]] = {}
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Any], after: Sequence[str] = (),
+            required: bool = False) -> "SideEffectPlan":
+        """Déclare un effet; `after` doit ne citer que des effets déjà déclarés"""
+        missing = [dependency for dependency in after if dependency not in self._effects]
+        if missing:
+            raise ValueError(f"Dépendances inconnues pour {name}: {missing}")
+        self._effects[name] = (fn, tuple(after), required)
+        return self
+
+    def _execute(self, name: str, results: Dict[str, Any]) -> Tuple[str, Any, Dict[str, Any]]:
+        fn = self._effects[name][0]
+        started = time.perf_counter()
+        try:
+            value, entry = fn(results), {"status": EFFECT_OK}
+        except SkipEffect as skip:
+            value, entry = None, {"status": EFFECT_SKIPPED, "reason": str(skip)}
+        except Exception as e:
+            value, entry = None, {"status": EFFECT_FAILED, "error": str(e)}
+        elapsed = time.perf_counter() - started
+        entry["seconds"] = round(elapsed, 4)
+        observe(f"{self.metric_prefix}_duration_seconds", elapsed, effect=name, status=entry["status"])
+        return name, value, entry
+
+    def run(self) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+        """Exécute le plan; retourne (résultats des effets réussis, rapport par effet)"""
+        results: Dict[str, Any] = {}
+        report: Dict[str, Dict[str, Any]] = {}
+        pending = dict(self._effects)
+
+        def ready() -> List[str]:
+            names = []
+            for name, (_, after, _) in list(pending.items()):
+                failed = [dep for dep in after if dep in report and report[dep]["status"] != EFFECT_OK]
+                if failed:
+                    # Dépendance en échec ou sans objet: l'effet n'a pas lieu
+                    report[name] = {"status": EFFECT_SKIPPED, "reason": f"dépend de {', '.join(failed)}", "seconds": 0.0}
+                    del pending[name]
+                elif all(dep in results for dep in after):
+                    names.append(name)
+                    del pending[name]
+            return names
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="side-effect") as executor:
+            running = set()
+            while True:
+                # Un saut peut en rendre d'autres prêts (ou sautés): boucle jusqu'au point fixe
+                size = -1
+                while size != len(pending):
+                    size = len(pending)
+                    running.update(executor.submit(self._execute, name, dict(results)) for name in ready())
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, value, entry = future.result()
+                    report[name] = entry
+                    if entry["status"] == EFFECT_OK:
+                        results[name] = value
+
+        for name, (_, _, required) in self._effects.items():
+            if required and report[name]["status"] != EFFECT_OK:
+                raise SideEffectError(name, report, results)
+        return results, report
+
+def failed_effects(report: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, str]:
+    """Effets en échec d'un rapport: nom -> erreur"""
+    return {name: entry.get("error", "") for name, entry in (report or {}).items() if entry["status"] == EFFECT_FAILED}
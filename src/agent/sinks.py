@@ -0,0 +1,311 @@
+"""
+Sorties d'export: fichiers CSV, Parquet et SQLite à côté de Google Sheets
+
+Google Sheets reste la sortie par défaut (nœud `create_sheet` du graphe);
+pour les exports volumineux ou analytiques, la requête (« en csv »,
+« format parquet », « dans sqlite ») ou `EXPORT_SINK` choisit une sortie
+fichier, écrite par le nœud `write_file` à la vitesse du disque, sans quota.
+Un export qui dépasserait la limite de cellules d'un classeur
+(`SHEETS_MAX_CELLS`) est redirigé vers `SINK_OVERSIZE_FALLBACK`.
+
+Chaque sortie fichier est un `FileSink`: les lignes sont consommées par
+lots de `SINK_BATCH_ROWS` (itérateur), la mémoire utilisée par l'écrivain
+reste constante quel que soit le volume. Les colonnes sont celles de la
+première ligne, comme pour l'écriture dans Sheets.
+
+Parquet nécessite `pyarrow` (extra `parquet`): sans lui, la sortie n'est
+pas proposée et la requête retombe sur CSV. Le schéma Parquet est fixé par
+les en-têtes, toutes les colonnes en texte (valeurs nulles conservées): les
+lots suivants ne peuvent pas le contredire, quels que soient les types
+mélangés d'une colonne JSON.
+"""
+
+import os
+import csv
+import json
+import sqlite3
+from contextlib import closing
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Type
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+SINK_SHEETS = "sheets"
+SINK_CSV = "csv"
+SINK_PARQUET = "parquet"
+SINK_SQLITE = "sqlite"
+
+EXPORT_SINK = os.getenv("EXPORT_SINK", SINK_SHEETS)
+SINK_OUTPUT_DIR = os.getenv("SINK_OUTPUT_DIR", "./exports")
+SINK_SQLITE_PATH = os.getenv("SINK_SQLITE_PATH", "")  # défaut: <SINK_OUTPUT_DIR>/exports.sqlite3
+SINK_BATCH_ROWS = int(os.getenv("SINK_BATCH_ROWS", "5000"))
+SHEETS_MAX_CELLS = int(os.getenv("SHEETS_MAX_CELLS", "10000000"))  # limite Google par classeur
+SINK_OVERSIZE_FALLBACK = os.getenv("SINK_OVERSIZE_FALLBACK", SINK_CSV)  # "" = pas de redirection
+
+# Mots de la requête désignant une sortie
+SINK_KEYWORDS = {
+    "csv": SINK_CSV,
+    "parquet": SINK_PARQUET,
+    "sqlite": SINK_SQLITE,
+    "sqlite3": SINK_SQLITE,
+    "sheet": SINK_SHEETS,
+    "sheets": SINK_SHEETS,
+    "google sheet": SINK_SHEETS,
+    "google sheets": SINK_SHEETS,
+    "tableur": SINK_SHEETS,
+}
+
+def cell_value(value: Any) -> Any:
+    """Valeur scalaire pour un fichier (listes et objets en JSON)"""
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return value
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# =============================================================================
+# SORTIES FICHIER
+# =============================================================================
+
+class FileSink:
+    """Écrivain incrémental: ouverture, lots de lignes, fermeture"""
+
+    name = ""
+    extension = ""
+
+    def __init__(self, output_dir: str = SINK_OUTPUT_DIR, batch_rows: int = SINK_BATCH_ROWS):
+        self.output_dir = output_dir
+        self.batch_rows = max(1, batch_rows)
+
+    def target(self, title: str) -> str:
+        """Chemin du fichier d'un export (jamais un fichier existant)"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{title}.{self.extension}")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.output_dir, f"{title}_{suffix}.{self.extension}")
+            suffix += 1
+        return path
+
+    def write(self, rows: Iterable[Dict[str, Any]], title: str) -> Dict[str, Any]:
+        """Écrit toutes les lignes; retourne sortie, chemin et nombre de lignes"""
+        columns: Optional[List[str]] = None
+        count = 0
+        self.open(title)
+        try:
+            for batch in _batches(rows, self.batch_rows):
+                if columns is None:
+                    columns = list(batch[0].keys())
+                    self.begin(columns)
+                self.write_batch([[cell_value(row.get(column, "")) for column in columns] for row in batch])
+                count += len(batch)
+            if columns is None:
+                self.begin([])
+        except BaseException:
+            self.abort()
+            raise
+        result = self.close()
+        result.update(sink=self.name, rows=count, columns=columns or [])
+        return result
+
+    # Étapes spécifiques à chaque format
+    def open(self, title: str) -> str:
+        raise NotImplementedError
+
+    def begin(self, columns: List[str]) -> None:
+        raise NotImplementedError
+
+    def write_batch(self, values: List[List[Any]]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        pass
+
+class _AtomicFileSink(FileSink):
+    """Fichier écrit sous un nom temporaire puis renommé à la fermeture"""
+
+    def open(self, title: str) -> str:
+        self.path = self.target(title)
+        self.tmp_path = f"{self.path}.tmp"
+        return self.path
+
+    def close(self) -> Dict[str, Any]:
+        os.replace(self.tmp_path, self.path)
+        return {"path": self.path, "size_bytes": os.path.getsize(self.path)}
+
+    def abort(self) -> None:
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+class CsvSink(_AtomicFileSink):
+    name = SINK_CSV
+    extension = "csv"
+
+    def begin(self, columns: List[str]) -> None:
+        self._file = open(self.tmp_path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if columns:
+            self._writer.writerow(columns)
+
+    def write_batch(self, values: List[List[Any]]) -> None:
+        self._writer.writerows(values)
+
+    def close(self) -> Dict[str, Any]:
+        self._file.close()
+        return super().close()
+
+    def abort(self) -> None:
+        if getattr(self, "_file", None):
+            self._file.close()
+        super().abort()
+
+class ParquetSink(_AtomicFileSink):
+    """Un row group par lot, schéma texte fixé par les en-têtes (pyarrow requis)"""
+
+    name = SINK_PARQUET
+    extension = "parquet"
+
+    def begin(self, columns: List[str]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._columns = columns
+        self._schema = pa.schema([(column, pa.string()) for column in columns])
+        self._writer = None
+        self._pq = pq
+
+    def write_batch(self, values: List[List[Any]]) -> None:
+        table = self._pa.Table.from_arrays(
+            [
+                self._pa.array([None if row[index] is None else str(row[index]) for row in values],
+                               type=self._pa.string())
+                for index in range(len(self._columns))
+            ],
+            schema=self._schema,
+        )
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.tmp_path, self._schema)
+        self._writer.write_table(table)
+
+    def close(self) -> Dict[str, Any]:
+        if self._writer is None:
+            # Aucune ligne: fichier Parquet vide (schéma sans colonnes)
+            self._pq.write_table(self._pa.table({}), self.tmp_path)
+        else:
+            self._writer.close()
+        return super().close()
+
+    def abort(self) -> None:
+        if getattr(self, "_writer", None) is not None:
+            self._writer.close()
+        super().abort()
+
+class SqliteSink(FileSink):
+    """Une table par export dans une base SQLite partagée"""
+
+    name = SINK_SQLITE
+    extension = "sqlite3"
+
+    def __init__(self, output_dir: str = SINK_OUTPUT_DIR, batch_rows: int = SINK_BATCH_ROWS,
+                 db_path: str = SINK_SQLITE_PATH):
+        super().__init__(output_dir, batch_rows)
+        self.db_path = db_path or os.path.join(output_dir, "exports.sqlite3")
+
+    @staticmethod
+    def _quote(identifier: str) -> str:
+        return '"' + identifier.replace('"', '""') + '"'
+
+    def open(self, title: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self.table = title
+        suffix = 1
+        while self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table,)).fetchone():
+            self.table = f"{title}_{suffix}"
+            suffix += 1
+        # Une transaction pour tout l'export: table absente si l'écriture échoue
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self.db_path
+
+    def begin(self, columns: List[str]) -> None:
+        definitions = ", ".join(self._quote(column) for column in columns) or "_empty"
+        self._conn.execute(f"CREATE TABLE {self._quote(self.table)} ({definitions})")
+        self._insert = (
+            f"INSERT INTO {self._quote(self.table)} VALUES ({', '.join('?' for _ in columns)})"
+        )
+
+    def write_batch(self, values: List[List[Any]]) -> None:
+        self._conn.executemany(self._insert, values)
+
+    def close(self) -> Dict[str, Any]:
+        with closing(self._conn):
+            self._conn.execute("COMMIT")
+        return {"path": self.db_path, "table": self.table, "size_bytes": os.path.getsize(self.db_path)}
+
+    def abort(self) -> None:
+        with closing(self._conn):
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+
+# =============================================================================
+# REGISTRE
+# =============================================================================
+
+FILE_SINKS: Dict[str, Type[FileSink]] = {
+    SINK_CSV: CsvSink,
+    SINK_PARQUET: ParquetSink,
+    SINK_SQLITE: SqliteSink,
+}
+
+def sink_available(name: str) -> bool:
+    """Vrai si la sortie est connue et ses dépendances installées"""
+    if name == SINK_PARQUET:
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    return name == SINK_SHEETS or name in FILE_SINKS
+
+def resolve_sink(requested: Optional[str], default: str = EXPORT_SINK) -> str:
+    """Sortie retenue: demandée si disponible, sinon CSV (fichier) ou la sortie par défaut"""
+    name = (requested or "").strip().lower() or default
+    if sink_available(name):
+        return name
+    if name in FILE_SINKS:
+        return SINK_CSV
+    return default if sink_available(default) else SINK_SHEETS
+
+def detect_sink(words: Iterable[str]) -> Optional[str]:
+    """Sortie mentionnée dans la requête (une sortie fichier l'emporte sur Sheets)"""
+    sinks = [SINK_KEYWORDS[word] for word in words if word in SINK_KEYWORDS]
+    for sink in sinks:
+        if sink != SINK_SHEETS:
+            return sink
+    return sinks[0] if sinks else None
+
+def exceeds_sheet_limit(rows: int, columns: int, max_cells: int = SHEETS_MAX_CELLS) -> bool:
+    """Vrai si l'export (en-têtes compris) dépasse la limite de cellules d'un classeur"""
+    return max_cells > 0 and (rows + 1) * max(1, columns) > max_cells
+
+def write_file_sink(name: str, rows: Iterable[Dict[str, Any]], title: str, **options: Any) -> Dict[str, Any]:
+    """Écrit un export dans la sortie fichier `name`"""
+    if name not in FILE_SINKS:
+        raise ValueError(f"Sortie fichier inconnue: {name}")
+    return FILE_SINKS[name](**options).write(rows, title)
@@ -0,0 +1,375 @@
+"""
+Registre des sources d'API (endpoints) interrogeables par l'agent
+
+Chaque source déclare son URL, son schéma de champs, son style de pagination,
+les filtres que l'API sait appliquer côté serveur et sa clé primaire.
+Les index mots-clés → source/champ sont précalculés à l'enregistrement pour
+que l'analyse d'une requête reste O(nombre de tokens).
+"""
+
+import os
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+API_BASE_URL = os.getenv("API_BASE_URL", "https://jsonplaceholder.typicode.com").rstrip("/")
+DEFAULT_SOURCE_NAME = os.getenv("DEFAULT_SOURCE", "posts")
+
+# Styles de pagination supportés par la couche de récupération
+PAGINATION_NONE = "none"      # Une seule requête retourne tout le dataset
+PAGINATION_PAGE = "page"      # ?_page=N&_limit=M
+PAGINATION_OFFSET = "offset"  # ?_start=N&_limit=M
+
+PAGINATION_STYLES = (PAGINATION_NONE, PAGINATION_PAGE, PAGINATION_OFFSET)
+
+# =============================================================================
+# DÉCLARATION D'UNE SOURCE
+# =============================================================================
+
+class ApiSource:
+    """Déclaration d'un endpoint d'API et de son schéma"""
+
+    def __init__(
+        self,
+        name: str,
+        url_template: str,
+        fields: List[str],
+        primary_key: str = "id",
+        pagination: str = PAGINATION_NONE,
+        page_size: int = 100,
+        pushable_filters: Optional[List[str]] = None,
+        field_types: Optional[Dict[str, type]] = None,
+        keywords: Optional[List[str]] = None,
+        field_keywords: Optional[Dict[str, List[str]]] = None,
+        field_descriptions: Optional[Dict[str, str]] = None,
+        cache_ttl: int = 0,
+        label: Optional[str] = None,
+        relations: Optional[Dict[str, Tuple[str, str]]] = None,
+    ):
+        if pagination not in PAGINATION_STYLES:
+            raise ValueError(f"Style de pagination inconnu pour {name}: {pagination}")
+        if primary_key not in fields:
+            raise ValueError(f"Clé primaire '{primary_key}' absente du schéma de {name}")
+
+        self.name = name
+        self.url_template = url_template
+        self.fields = list(fields)
+        self.primary_key = primary_key
+        self.pagination = pagination
+        self.page_size = page_size
+        self.pushable_filters = frozenset(pushable_filters or [])
+        self.field_types = dict(field_types or {})
+        self.keywords = list(keywords or [name])
+        self.field_keywords = {field: list(kws) for field, kws in (field_keywords or {}).items()}
+        self.field_descriptions = dict(field_descriptions or {})
+        self.cache_ttl = cache_ttl
+        self.label = label or name
+        # source liée → (clé locale, clé distante), ex: posts.userId → users.id
+        self.relations = dict(relations or {})
+        self._field_set = frozenset(self.fields)
+
+    @property
+    def url(self) -> str:
+        """URL complète de l'endpoint"""
+        return self.url_template.format(base_url=API_BASE_URL, name=self.name)
+
+    def has_field(self, field: str) -> bool:
+        """Indique si le champ fait partie du schéma de la source"""
+        return field in self._field_set
+
+    def coerce_filter_value(self, field: str, value: Any) -> Any:
+        """Convertit la valeur d'un filtre dans le type déclaré du champ"""
+        field_type = self.field_types.get(field)
+        if field_type is None or isinstance(value, field_type):
+            return value
+        if field_type is bool and isinstance(value, str):
+            return value.strip().lower() in ("true", "1", "oui", "yes", "vrai")
+        return field_type(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation sérialisable de la source (ressources MCP)"""
+        return {
+            "name": self.name,
+            "url": self.url,
+            "fields": self.fields,
+            "primary_key": self.primary_key,
+            "pagination": self.pagination,
+            "pushable_filters": sorted(self.pushable_filters),
+            "cache_ttl": self.cache_ttl,
+            "relations": {target: list(keys) for target, keys in self.relations.items()},
+            "field_descriptions": self.field_descriptions,
+        }
+
+    def __repr__(self) -> str:
+        return f"ApiSource(name={self.name!r}, url={self.url!r})"
+
+# =============================================================================
+# REGISTRE
+# =============================================================================
+
+class SourceRegistry:
+    """Registre des sources avec index précalculés pour le parsing"""
+
+    def __init__(self, default_source: str = DEFAULT_SOURCE_NAME):
+        self._sources: Dict[str, ApiSource] = {}
+        self._default_name = default_source
+        # mot-clé → nom de source
+        self._source_keyword_index: Dict[str, str] = {}
+        # mot-clé → {nom de source: champ}
+        self._field_keyword_index: Dict[str, Dict[str, str]] = {}
+        # URL normalisée → nom de source
+        self._url_index: Dict[str, str] = {}
+        # Incrémenté à chaque modification (invalide les matchers compilés)
+        self.version = 0
+
+    def register(self, source: ApiSource) -> ApiSource:
+        """Enregistre une source et met à jour les index"""
+        if source.name in self._sources:
+            self.unregister(source.name)
+
+        self._sources[source.name] = source
+        self._url_index[source.url.rstrip("/")] = source.name
+
+        for keyword in source.keywords:
+            self._source_keyword_index[keyword.lower()] = source.name
+
+        for field in source.fields:
+            # Le nom du champ est toujours un mot-clé valide
+            for keyword in [field] + source.field_keywords.get(field, []):
+                self._field_keyword_index.setdefault(keyword.lower(), {})[source.name] = field
+
+        self.version += 1
+        return source
+
+    def unregister(self, name: str) -> None:
+        """Retire une source et ses entrées d'index"""
+        source = self._sources.pop(name, None)
+        if source is None:
+            return
+
+        self._url_index = {url: n for url, n in self._url_index.items() if n != name}
+        self._source_keyword_index = {kw: n for kw, n in self._source_keyword_index.items() if n != name}
+        for keyword in list(self._field_keyword_index):
+            mapping = self._field_keyword_index[keyword]
+            mapping.pop(name, None)
+            if not mapping:
+                del self._field_keyword_index[keyword]
+        self.version += 1
+
+    def get(self, name: Optional[str]) -> Optional[ApiSource]:
+        """Retourne une source par son nom"""
+        if not name:
+            return None
+        return self._sources.get(name)
+
+    @property
+    def default(self) -> ApiSource:
+        """Source utilisée quand la requête n'en désigne aucune"""
+        source = self._sources.get(self._default_name)
+        if source is None:
+            raise KeyError(f"Source par défaut non enregistrée: {self._default_name}")
+        return source
+
+    def names(self) -> List[str]:
+        """Noms des sources enregistrées"""
+        return list(self._sources)
+
+    def __iter__(self):
+        return iter(self._sources.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sources
+
+    def find_by_url(self, url: Optional[str]) -> Optional[ApiSource]:
+        """Retrouve la source correspondant exactement à une URL"""
+        if not url:
+            return None
+        name = self._url_index.get(url.split("?", 1)[0].rstrip("/"))
+        return self._sources.get(name) if name else None
+
+    def keywords(self) -> List[str]:
+        """Vocabulaire indexé (mots-clés de sources et de champs)"""
+        return list(self._source_keyword_index) + list(self._field_keyword_index)
+
+    def source_for_token(self, token: str) -> Optional[str]:
+        """Nom de la source désignée par un token (ou None)"""
+        return self._source_keyword_index.get(token)
+
+    def field_for_token(self, token: str, source_name: str) -> Optional[str]:
+        """Champ de la source désigné par un token (ou None)"""
+        mapping = self._field_keyword_index.get(token)
+        return mapping.get(source_name) if mapping else None
+
+    def detect_source(self, tokens: Iterable[str]) -> Optional[ApiSource]:
+        """Première source désignée explicitement dans la liste de tokens"""
+        for token in tokens:
+            name = self._source_keyword_index.get(token)
+            if name:
+                return self._sources[name]
+        return None
+
+    def match_fields(self, tokens: Iterable[str], source: ApiSource) -> List[str]:
+        """Champs de la source mentionnés dans les tokens, dans l'ordre du schéma"""
+        mentioned = set()
+        for token in tokens:
+            mapping = self._field_keyword_index.get(token)
+            if mapping and source.name in mapping:
+                mentioned.add(mapping[source.name])
+        return [field for field in source.fields if field in mentioned]
+
+    def match_join_fields(self, tokens: List[str], source: ApiSource) -> Dict[str, List[str]]:
+        """Champs des sources liées mentionnés dans les tokens
+
+        Seuls les champs absents du schéma de la source principale déclenchent
+        une jointure (« posts avec le nom et l'email de l'auteur »).
+        """
+        joins = {}
+        for target_name in source.relations:
+            target = self._sources.get(target_name)
+            if target is None:
+                continue
+            extra = [field for field in self.match_fields(tokens, target) if not source.has_field(field)]
+            if extra:
+                joins[target_name] = extra
+        return joins
+
+# =============================================================================
+# SOURCES PAR DÉFAUT (JSONPLACEHOLDER)
+# =============================================================================
+
+DEFAULT_SOURCES = [
+    ApiSource(
+        name="posts",
+        url_template="{base_url}/posts",
+        fields=["userId", "id", "title", "body"],
+        pagination=PAGINATION_OFFSET,
+        pushable_filters=["userId", "id"],
+        field_types={"userId": int, "id": int},
+        keywords=["posts", "post", "articles", "article"],
+        field_keywords={
+            "title": ["title", "titre"],
+            "id": ["id", "identifiant"],
+            "userId": ["userid", "user", "utilisateur"],
+            "body": ["body", "contenu", "texte"],
+        },
+        field_descriptions={
+            "userId": "ID de l'utilisateur",
+            "id": "ID unique du post",
+            "title": "Titre du post",
+            "body": "Contenu du post",
+        },
+        cache_ttl=300,
+        relations={"users": ("userId", "id")},
+    ),
+    ApiSource(
+        name="users",
+        url_template="{base_url}/users",
+        fields=["id", "name", "username", "email", "phone", "website"],
+        pagination=PAGINATION_NONE,
+        pushable_filters=["id", "username", "email"],
+        field_types={"id": int},
+        keywords=["users", "utilisateurs", "auteurs", "authors", "auteur", "author"],
+        field_keywords={
+            "id": ["id", "identifiant"],
+            "name": ["name", "nom"],
+            "username": ["username", "pseudo"],
+            "email": ["email", "mail", "courriel"],
+            "phone": ["phone", "téléphone", "telephone"],
+            "website": ["website", "site"],
+        },
+        field_descriptions={
+            "id": "ID unique de l'utilisateur",
+            "name": "Nom complet",
+            "username": "Pseudo",
+            "email": "Adresse email",
+            "phone": "Téléphone",
+            "website": "Site web",
+        },
+        cache_ttl=3600,
+        label="utilisateurs",
+    ),
+    ApiSource(
+        name="comments",
+        url_template="{base_url}/comments",
+        fields=["postId", "id", "name", "email", "body"],
+        pagination=PAGINATION_OFFSET,
+        pushable_filters=["postId", "id", "email"],
+        field_types={"postId": int, "id": int},
+        keywords=["comments", "comment", "commentaires", "commentaire"],
+        field_keywords={
+            "postId": ["postid"],
+            "id": ["id", "identifiant"],
+            "name": ["name", "nom"],
+            "email": ["email", "mail"],
+            "body": ["body", "contenu", "texte"],
+        },
+        cache_ttl=300,
+        label="commentaires",
+        relations={"posts": ("postId", "id")},
+    ),
+    ApiSource(
+        name="todos",
+        url_template="{base_url}/todos",
+        fields=["userId", "id", "title", "completed"],
+        pagination=PAGINATION_OFFSET,
+        pushable_filters=["userId", "id", "completed"],
+        field_types={"userId": int, "id": int, "completed": bool},
+        keywords=["todos", "todo", "tâches", "taches", "tasks"],
+        field_keywords={
+            "userId": ["userid", "user", "utilisateur"],
+            "id": ["id", "identifiant"],
+            "title": ["title", "titre"],
+            "completed": ["completed", "terminé", "termine", "fait"],
+        },
+        cache_ttl=300,
+        label="tâches",
+        relations={"users": ("userId", "id")},
+    ),
+    ApiSource(
+        name="albums",
+        url_template="{base_url}/albums",
+        fields=["userId", "id", "title"],
+        pagination=PAGINATION_OFFSET,
+        pushable_filters=["userId", "id"],
+        field_types={"userId": int, "id": int},
+        keywords=["albums", "album"],
+        field_keywords={
+            "userId": ["userid", "user", "utilisateur"],
+            "id": ["id", "identifiant"],
+            "title": ["title", "titre"],
+        },
+        cache_ttl=300,
+        relations={"users": ("userId", "id")},
+    ),
+    ApiSource(
+        name="photos",
+        url_template="{base_url}/photos",
+        fields=["albumId", "id", "title", "url", "thumbnailUrl"],
+        pagination=PAGINATION_PAGE,
+        page_size=500,
+        pushable_filters=["albumId", "id"],
+        field_types={"albumId": int, "id": int},
+        keywords=["photos", "photo", "images", "image"],
+        field_keywords={
+            "albumId": ["albumid"],
+            "id": ["id", "identifiant"],
+            "title": ["title", "titre"],
+            "url": ["url", "lien"],
+            "thumbnailUrl": ["thumbnailurl", "miniature"],
+        },
+        cache_ttl=300,
+        relations={"albums": ("albumId", "id")},
+    ),
+]
+
+def build_default_registry() -> SourceRegistry:
+    """Construit le registre avec les sources JSONPlaceholder"""
+    registry = SourceRegistry()
+    for source in DEFAULT_SOURCES:
+        registry.register(source)
+    return registry
+
+# Registre partagé par le parser, la couche fetch et le serveur MCP
+registry = build_default_registry()
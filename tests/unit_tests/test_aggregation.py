@@ -0,0 +1,42 @@
+from agent.aggregation import aggregate_rows, build_aggregate_spec
+from agent.graph import aggregate_data, get_initial_state, validate_extracted_params
+
+ROWS = [
+    {"userId": 1, "id": 1},
+    {"userId": 2, "id": 2},
+    {"userId": 1, "id": 3},
+    {"userId": 1, "id": None},
+]
+
+
+def test_hash_aggregator_metrics() -> None:
+    spec = build_aggregate_spec(
+        ["userId"],
+        [{"op": op, "field": None if op == "count" else "id"} for op in ("count", "sum", "min", "max", "avg")],
+    )
+    assert aggregate_rows(ROWS, spec) == [
+        {"userId": 1, "count": 3, "sum_id": 4, "min_id": 1, "max_id": 3, "avg_id": 2.0},
+        {"userId": 2, "count": 1, "sum_id": 2, "min_id": 2, "max_id": 2, "avg_id": 2.0},
+    ]
+
+
+def test_parser_recognizes_count_per_group() -> None:
+    params = validate_extracted_params({}, "nombre de posts par utilisateur")
+    assert params["aggregate"] == {
+        "group_by": ["userId"],
+        "metrics": [{"op": "count", "field": None, "alias": "count"}],
+    }
+    assert "userId" in params["fields"]
+
+
+def test_parser_ignores_plain_queries() -> None:
+    assert validate_extracted_params({}, "récupère 5 posts triés par id")["aggregate"] is None
+    assert validate_extracted_params({}, "max 5 posts")["aggregate"] is None
+
+
+def test_aggregate_node_replaces_rows_with_summary() -> None:
+    state = get_initial_state()
+    state["extracted_params"] = {"aggregate": build_aggregate_spec(["userId"], [{"op": "count"}])}
+    state["processed_data"] = ROWS
+    result = aggregate_data(state)
+    assert result["processed_data"] == [{"userId": 1, "count": 3}, {"userId": 2, "count": 1}]
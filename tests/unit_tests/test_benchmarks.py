@@ -0,0 +1,36 @@
+import json
+from urllib.request import urlopen
+
+from benchmarks.compare import compare
+from benchmarks.upstream import UpstreamServer
+
+
+def _report(total_ms, google_calls):
+    return {"results": [{
+        "scenario": "export", "rows": 100, "peak_rss_mb": 100.0,
+        "total": {"median_ms": total_ms}, "nodes": {"fetch": {"median_ms": total_ms / 2}},
+        "upstream_calls": 1, "google_calls": {"sheets_get": google_calls},
+    }]}
+
+
+def test_compare_flags_latency_and_call_regressions() -> None:
+    rows = compare(_report(100.0, 2), _report(150.0, 3), threshold=0.1)
+    regressed = {row["metric"] for row in rows if row["regression"]}
+    assert regressed == {"total_ms", "fetch_ms", "google_calls"}
+    assert not any(row["regression"] for row in compare(_report(100.0, 2), _report(104.0, 2), 0.1))
+
+
+def test_upstream_paginates_generated_rows() -> None:
+    with UpstreamServer(rows=250) as upstream:
+        page = json.load(urlopen(f"{upstream.url}/posts?_start=200&_limit=100"))
+        filtered = json.load(urlopen(f"{upstream.url}/posts?userId=3&_limit=5"))
+    assert [row["id"] for row in page] == list(range(201, 251))
+    assert len(filtered) == 5 and all(row["userId"] == 3 for row in filtered)
+    assert upstream.calls["posts"] == 2
+
+
+def test_keyword_benchmark_implementations_agree() -> None:
+    from benchmarks.keywords import run
+
+    report = run(queries=200, synonyms=100, repeat=1)
+    assert set(report["results"]) == {"substring", "tokens", "compiled"}
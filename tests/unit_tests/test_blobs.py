@@ -0,0 +1,80 @@
+import pytest
+
+from agent import blobs
+from agent.blobs import RowBlobStore, load_rows, release_rows, row_count, store_rows
+
+
+def test_large_row_sets_are_stored_out_of_band(monkeypatch) -> None:
+    monkeypatch.setattr(blobs, "BLOB_INLINE_MAX_ROWS", 2)
+    small, large = [{"id": 1}], [{"id": i} for i in range(5)]
+
+    assert store_rows(small) is small
+    handle = store_rows(large)
+    assert handle == {"$rows": handle["$rows"], "count": 5}
+    assert load_rows(handle) is large
+    assert row_count(handle) == 5 and row_count(small) == 1 and row_count(None) == 0
+
+    release_rows(handle)
+    with pytest.raises(KeyError):
+        load_rows(handle)
+
+
+def test_store_evicts_least_recently_used_blob() -> None:
+    store = RowBlobStore(max_blobs=2, max_idle=0)
+    first, second = store.put([{"id": 1}]), store.put([{"id": 2}])
+    store.get(first)
+    store.put([{"id": 3}])
+
+    assert store.get(first) == [{"id": 1}]
+    with pytest.raises(KeyError):
+        store.get(second)
+    assert store.stats["evicted"] == 1
+
+
+def test_store_keeps_blobs_in_use_beyond_its_bound() -> None:
+    store = RowBlobStore(max_blobs=1, max_idle=60)
+    handles = [store.put([{"id": i}]) for i in range(3)]
+
+    # Runs concurrents: aucune poignée récente n'est retirée
+    assert [store.get(handle) for handle in handles] == [[{"id": 0}], [{"id": 1}], [{"id": 2}]]
+    for handle in handles:
+        store.release(handle)
+    assert len(store) == 0 and store.stats["evicted"] == 0
+
+
+def test_process_node_returns_partial_update_and_projects_in_place(monkeypatch) -> None:
+    from agent.graph import get_initial_state, process_data
+
+    monkeypatch.setattr(blobs, "BLOB_INLINE_MAX_ROWS", 1)
+    state = get_initial_state()
+    state["extracted_params"] = {"fields": ["id"]}
+    state["api_data"] = raw = store_rows([{"id": 1, "title": "a"}, {"id": 2, "title": "b"}])
+
+    update = process_data(state)
+
+    assert set(update) == {"processed_data", "api_data"}
+    assert update["api_data"] is None
+    # Projection en place: la poignée brute devient celle des lignes traitées
+    assert update["processed_data"] is raw
+    assert load_rows(raw) == [{"id": 1}, {"id": 2}]
+
+
+def test_interactive_runs_release_their_rows(monkeypatch) -> None:
+    from agent import graph as agent_graph
+
+    monkeypatch.setattr(blobs, "BLOB_INLINE_MAX_ROWS", 1)
+    handles = []
+
+    def fake_invoke(state, thread_id=None, run_name=None):
+        handles.append(store_rows([{"id": 1}, {"id": 2}]))
+        return {"processed_data": handles[-1]}
+
+    monkeypatch.setattr(agent_graph, "langsmith_client", None)
+    monkeypatch.setattr(agent_graph, "invoke_graph", fake_invoke)
+    assert row_count(agent_graph.run_agent_with_tracing("q")["processed_data"]) == 2
+    with pytest.raises(KeyError):
+        load_rows(handles[0])
+
+    kept = agent_graph.run_agent_with_tracing("q", keep_rows=True)["processed_data"]
+    assert load_rows(kept) == [{"id": 1}, {"id": 2}]
+    release_rows(kept)
@@ -0,0 +1,144 @@
+from typing import Any, Dict, Optional
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from agent import blobs
+from agent.blobs import RowBlobStore, load_rows, store_rows
+from agent.checkpoints import SqliteCheckpointSaver
+
+
+class ExportState(TypedDict, total=False):
+    query: str
+    rows: Optional[Any]
+    total: int
+
+
+def build_export_graph(checkpointer: SqliteCheckpointSaver, calls: Dict[str, int], crash: Dict[str, bool]) -> Any:
+    def fetch(state: ExportState) -> Dict[str, Any]:
+        calls["fetch"] += 1
+        return {"rows": store_rows([{"id": i, "title": f"t{i}"} for i in range(10)])}
+
+    def process(state: ExportState) -> Dict[str, Any]:
+        calls["process"] += 1
+        if crash["process"]:
+            raise RuntimeError("processus interrompu")
+        return {"total": sum(row["id"] for row in load_rows(state["rows"]))}
+
+    workflow = StateGraph(ExportState)
+    workflow.add_node("fetch", fetch)
+    workflow.add_node("process", process)
+    workflow.add_edge(START, "fetch")
+    workflow.add_edge("fetch", "process")
+    workflow.add_edge("process", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+@pytest.fixture
+def fresh_store(monkeypatch):
+    def install() -> RowBlobStore:
+        store = RowBlobStore()
+        monkeypatch.setattr(blobs, "row_store", store)
+        return store
+
+    monkeypatch.setattr(blobs, "BLOB_INLINE_MAX_ROWS", 2)
+    return install
+
+
+def test_run_resumes_after_crash_without_replaying_fetch(tmp_path, fresh_store) -> None:
+    db_path = str(tmp_path / "checkpoints.sqlite3")
+    calls, crash = {"fetch": 0, "process": 0}, {"process": True}
+    config = {"configurable": {"thread_id": "job-1"}}
+
+    saver = SqliteCheckpointSaver(db_path, store=fresh_store())
+    with pytest.raises(RuntimeError):
+        build_export_graph(saver, calls, crash).invoke({"query": "q"}, config, durability="sync")
+    # Les lignes du fetch sont écrites une seule fois (put_writes), le checkpoint les référence
+    assert saver.stats["row_blobs_written"] == 1
+
+    # Nouveau processus: magasin en mémoire vide, même base
+    store = fresh_store()
+    saver = SqliteCheckpointSaver(db_path, store=store)
+    graph = build_export_graph(saver, calls, crash)
+    assert graph.get_state(config).next == ("process",)
+
+    crash["process"] = False
+    result = graph.invoke(None, config, durability="sync")
+
+    assert result["total"] == sum(range(10))
+    assert calls == {"fetch": 1, "process": 2}
+    assert saver.stats["row_blobs_loaded"] == 1 and store.stats["loaded"] == 1
+    assert graph.get_state(config).next == ()
+
+
+def test_large_values_are_compressed_and_thread_deletion_drops_rows(tmp_path, fresh_store) -> None:
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"), store=fresh_store(), compress_min_bytes=64)
+    graph = build_export_graph(saver, {"fetch": 0, "process": 0}, {"process": False})
+    config = {"configurable": {"thread_id": "job-2"}}
+
+    graph.invoke({"query": "x" * 500}, config, durability="sync")
+
+    with saver._connect() as conn:
+        types = {row["type"] for row in conn.execute("SELECT type FROM channel_values WHERE channel = 'query'")}
+        assert types == {"msgpack+zlib"}
+        assert conn.execute("SELECT COUNT(*) FROM row_blobs").fetchone()[0] == 1
+    assert graph.get_state(config).values["query"] == "x" * 500
+
+    saver.delete_thread("job-2")
+    with saver._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM row_blobs").fetchone()[0] == 0
+    assert graph.get_state(config).next == ()
+
+
+def test_invoke_graph_resumes_pending_thread(tmp_path, fresh_store, monkeypatch) -> None:
+    from agent import graph as agent_graph
+
+    calls, crash = {"fetch": 0, "process": 0}, {"process": True}
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"), store=fresh_store())
+    monkeypatch.setattr(agent_graph, "checkpointer", saver)
+    monkeypatch.setattr(agent_graph, "graph", build_export_graph(saver, calls, crash))
+
+    with pytest.raises(RuntimeError):
+        agent_graph.invoke_graph({"query": "q"}, thread_id="job-3")
+    crash["process"] = False
+    result = agent_graph.invoke_graph({"query": "ignoré à la reprise"}, thread_id="job-3")
+
+    assert result["query"] == "q" and result["total"] == sum(range(10))
+    assert calls["fetch"] == 1
+    # Run terminé sans erreur: checkpoints supprimés (CHECKPOINT_KEEP_COMPLETED=false)
+    assert list(saver.list({"configurable": {"thread_id": "job-3"}})) == []
+
+
+def test_runs_without_thread_id_never_share_a_thread(monkeypatch) -> None:
+    from agent import graph as agent_graph
+
+    threads = []
+    monkeypatch.setattr(agent_graph, "langsmith_client", None)
+    monkeypatch.setattr(agent_graph, "invoke_graph",
+                        lambda state, thread_id=None, run_name=None: threads.append(thread_id) or {})
+    agent_graph.run_agent_with_tracing("q", run_name="même_seconde")
+    agent_graph.run_agent_with_tracing("q", run_name="même_seconde")
+    agent_graph.run_agent_with_tracing("q", thread_id="job-4")
+
+    assert threads[0] != threads[1] and threads[2] == "job-4"
+
+
+def test_row_refs_are_written_once_per_step_across_threads(tmp_path, fresh_store) -> None:
+    import threading
+
+    store = fresh_store()
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite3"), store=store)
+    handle = store.put([{"id": i} for i in range(100)])
+    refs = []
+
+    threads = [threading.Thread(target=lambda: refs.append(saver._row_ref("job-5", "parent", handle)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({ref["ref"] for ref in refs}) == 1 and len(refs) == 8
+    assert saver.stats["row_blobs_written"] == 1 and saver._pending_refs == {}
+    assert saver.load_row_blob(refs[0]["ref"]) == store.get(handle)
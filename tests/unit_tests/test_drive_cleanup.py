@@ -0,0 +1,208 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from agent import drive_cleanup
+from agent.google_quota import GoogleRateLimiter
+
+
+class FakeResp(dict):
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = FakeResp(status)
+
+
+class FakeRequest:
+    def __init__(self, fn):
+        self.execute = fn
+
+
+class FakeBatch:
+    def __init__(self, drive, callback):
+        self.drive = drive
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append(request_id)
+
+    def __len__(self):
+        return len(self.requests)
+
+    def execute(self):
+        self.drive.batch_sizes.append(len(self.requests))
+        for file_id in self.requests:
+            if self.drive.throttle_once.pop(file_id, False):
+                self.callback(file_id, None, FakeHttpError(429))
+            elif file_id in self.drive.broken:
+                self.callback(file_id, None, FakeHttpError(500))
+            else:
+                self.drive.files_by_id.pop(file_id, None)
+                self.callback(file_id, {}, None)
+
+
+class FakeDrive:
+    """Service Drive minimal: listing paginé et batchs de suppression"""
+
+    def __init__(self, count, page_size_cap=7):
+        self.files_by_id = {f"f{i}": {"id": f"f{i}", "name": f"API_Data_{i}"} for i in range(count)}
+        self.page_size_cap = page_size_cap
+        self.list_calls = 0
+        self.batch_sizes = []
+        self.throttle_once = {}
+        self.broken = set()
+
+    def files(self):
+        return self
+
+    def list(self, pageSize, fields, pageToken=None, **kwargs):
+        assert "nextPageToken" in fields
+
+        def execute():
+            self.list_calls += 1
+            ids = sorted(self.files_by_id)
+            start = int(pageToken or 0)
+            end = start + min(pageSize, self.page_size_cap)
+            page = {"files": [self.files_by_id[i] for i in ids[start:end]]}
+            if end < len(ids):
+                page["nextPageToken"] = str(end)
+            return page
+
+        return FakeRequest(execute)
+
+    def delete(self, fileId):
+        return fileId
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+class BrokenListDrive(FakeDrive):
+    """Service Drive dont le listing échoue (HTTP 500)"""
+
+    def list(self, **kwargs):
+        def execute():
+            raise FakeHttpError(500)
+
+        return FakeRequest(execute)
+
+
+def load_script(name):
+    path = Path(__file__).resolve().parents[2] / f"{name}.py"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def fast_limiter(monkeypatch):
+    limiter = GoogleRateLimiter(read_per_minute=60000, write_per_minute=60000)
+    monkeypatch.setattr(drive_cleanup, "rate_limiter", limiter)
+    monkeypatch.setattr(drive_cleanup, "quota_retry_delay", lambda error, attempt: 0.0 if error.resp.status == 429 else None)
+    return limiter
+
+
+def test_listing_follows_next_page_token() -> None:
+    drive = FakeDrive(count=30)
+    files = drive_cleanup.list_drive_files(drive, "name contains 'API_Data_'")
+    assert len(files) == 30
+    assert drive.list_calls == 5
+    assert len(drive_cleanup.list_drive_files(drive, max_files=10)) == 10
+
+
+def test_batch_delete_groups_requests_and_retries_throttled() -> None:
+    drive = FakeDrive(count=250)
+    drive.throttle_once["f3"] = True
+    drive.broken.add("f7")
+    progress = []
+
+    report = drive_cleanup.batch_delete_files(
+        drive,
+        sorted(drive.files_by_id),
+        service_factory=lambda: drive,
+        batch_size=100,
+        max_workers=3,
+        progress=progress.append,
+    )
+
+    assert report["deleted"] == 249
+    assert list(report["errors"]) == ["f7"]
+    assert report["batches"] == 3
+    assert sorted(drive.batch_sizes, reverse=True)[:3] == [100, 100, 50]
+    assert 1 in drive.batch_sizes  # réessai du fichier limité
+    assert progress[-1]["done"] == 250
+    assert set(drive.files_by_id) == {"f7"}
+
+
+def test_cli_exits_non_zero_when_listing_fails(monkeypatch) -> None:
+    sheets = load_script("cleanup_sheets")
+    drive = BrokenListDrive(count=0)
+    monkeypatch.setattr(sheets, "setup_drive_service", lambda: (drive, lambda: drive))
+    assert sheets.run_cli(["--list"]) == 1
+    assert sheets.run_cli(["--older-than", "7", "--yes"]) == 1
+
+    cleanup = load_script("cleanup_drive")
+    monkeypatch.setattr(cleanup, "setup_drive_service", lambda: drive)
+    assert cleanup.run_cli(["--pattern", "API_Data", "--yes"]) == 1
+    assert cleanup.run_cli(["--list"]) == 1
+
+
+def test_cli_ids_asks_confirmation_unless_yes(monkeypatch) -> None:
+    sheets = load_script("cleanup_sheets")
+    drive = FakeDrive(count=3)
+    monkeypatch.setattr(sheets, "setup_drive_service", lambda: (drive, lambda: drive))
+    monkeypatch.setattr("builtins.input", lambda prompt="": "non")
+
+    assert sheets.run_cli(["--ids", "f0,f1"]) == 0
+    assert set(drive.files_by_id) == {"f0", "f1", "f2"}
+
+    assert sheets.run_cli(["--ids", "f0,f1", "--yes"]) == 0
+    assert set(drive.files_by_id) == {"f2"}
+
+
+class FailingBatchDrive(FakeDrive):
+    """Service Drive dont l'exécution des batchs échoue (HTTP 500)"""
+
+    def new_batch_http_request(self, callback):
+        batch = FakeBatch(self, callback)
+
+        def execute():
+            raise FakeHttpError(500)
+
+        batch.execute = execute
+        return batch
+
+
+def test_sequential_batch_failure_is_reported() -> None:
+    drive = FailingBatchDrive(count=5)
+    report = drive_cleanup.batch_delete_files(drive, sorted(drive.files_by_id), batch_size=2)
+    assert report["deleted"] == 0
+    assert sorted(report["errors"]) == ["f0", "f1", "f2", "f3", "f4"]
+    assert report["batches"] == 3
+
+
+def test_cli_exits_non_zero_when_deletes_fail(monkeypatch) -> None:
+    sheets = load_script("cleanup_sheets")
+    drive = FailingBatchDrive(count=3)
+    for file in drive.files_by_id.values():
+        file["createdTime"] = "2020-01-01T00:00:00Z"
+    monkeypatch.setattr(sheets, "setup_drive_service", lambda: (drive, None))
+    assert sheets.run_cli(["--older-than", "7", "--yes", "--workers", "1"]) == 1
+
+    cleanup = load_script("cleanup_drive")
+    drive = FakeDrive(count=3)
+    drive.broken.add("f1")
+    monkeypatch.setattr(cleanup, "setup_drive_service", lambda: drive)
+    assert cleanup.run_cli(["--pattern", "API_Data", "--yes"]) == 1
+    assert set(drive.files_by_id) == {"f1"}
+    assert cleanup.run_cli(["--pattern", "API_Data", "--yes"]) == 1
+    drive.broken.clear()
+    assert cleanup.run_cli(["--pattern", "API_Data", "--yes"]) == 0
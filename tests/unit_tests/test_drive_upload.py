@@ -0,0 +1,30 @@
+import io
+
+from agent import drive_upload
+from agent.drive_upload import WRITE_UPLOAD, WRITE_VALUES, choose_write_path, write_csv
+
+
+def test_choose_write_path_uses_row_and_cell_thresholds(monkeypatch) -> None:
+    monkeypatch.setattr(drive_upload, "DRIVE_UPLOAD_MIN_ROWS", 100)
+    monkeypatch.setattr(drive_upload, "DRIVE_UPLOAD_MIN_CELLS", 1000)
+
+    assert choose_write_path(10, 5, mode="auto") == WRITE_VALUES
+    assert choose_write_path(100, 1, mode="auto") == WRITE_UPLOAD
+    assert choose_write_path(50, 20, mode="auto") == WRITE_UPLOAD  # 1000 cellules
+    assert choose_write_path(10, 5, mode="upload") == WRITE_UPLOAD
+    assert choose_write_path(10**6, 5, mode="values") == WRITE_VALUES
+
+    monkeypatch.setattr(drive_upload, "upload_available", lambda: False)
+    assert choose_write_path(10**6, 5, mode="upload") == WRITE_VALUES
+
+
+def test_write_csv_streams_batches(monkeypatch) -> None:
+    monkeypatch.setattr(drive_upload, "_CSV_BATCH_ROWS", 2)
+    buffer = io.BytesIO()
+
+    size = write_csv([{"id": i, "tags": ["é"]} for i in range(5)], buffer)
+
+    lines = buffer.getvalue().decode("utf-8").splitlines()
+    assert size == len(buffer.getvalue())
+    assert lines[0] == "id,tags" and lines[1] == '0,"[""é""]"' and len(lines) == 6
+    assert write_csv([], io.BytesIO()) == 0
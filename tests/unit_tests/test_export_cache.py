@@ -0,0 +1,74 @@
+import os
+
+from agent.export_cache import (
+    EXPORT_FAILED,
+    EXPORT_PENDING,
+    EXPORT_STORED,
+    EXPORT_UPLOADED,
+    ExportCache,
+    ExportReplayer,
+    export_key,
+    read_columnar,
+    write_columnar,
+)
+
+
+def test_columnar_roundtrip_keeps_missing_values_and_projects(tmp_path) -> None:
+    rows = [{"id": 1, "title": "a", "score": None}, {"id": 2, "title": "b"}, {"id": 3, "extra": [1, 2]}]
+    path = str(tmp_path / "export.agcol")
+    assert write_columnar(path, rows) == os.path.getsize(path)
+
+    assert read_columnar(path) == rows
+    assert read_columnar(path, columns=["id"]) == [{"id": 1}, {"id": 2}, {"id": 3}]
+
+
+def test_lookup_ttl_and_eviction_keep_pending_exports(tmp_path) -> None:
+    cache = ExportCache(str(tmp_path), ttl_seconds=60, max_bytes=0)
+    key = export_key("https://api/posts", {"limit": 2, "fields": ["id"]})
+    assert key == export_key("https://api/posts", {"fields": ["id"], "limit": 2})
+
+    cache.put(key, [{"id": 1}, {"id": 2}], query="2 posts")
+    assert cache.lookup(key) == [{"id": 1}, {"id": 2}]
+    assert ExportCache(str(tmp_path), ttl_seconds=0).lookup(key) is None
+
+    cache.max_bytes = 1
+    cache.put("other", [{"id": 3}])
+    cache.mark_pending("other")
+    assert cache.evict() == 0  # rien d'envoyé: aucun export en attente n'est supprimé
+    cache.mark_uploaded(key, "https://sheet/1")
+    assert cache.evict() == 1
+    assert cache.get(key) is None and cache.get("other")["status"] == EXPORT_PENDING
+
+
+def test_replayer_stops_at_first_failure_and_gives_up_after_max_attempts(tmp_path) -> None:
+    cache = ExportCache(str(tmp_path))
+    for key in ("a", "b"):
+        cache.put(key, [{"key": key}])
+    # Export encore en cours: jamais rejoué en parallèle du run
+    assert cache.get("a")["status"] == EXPORT_STORED and cache.pending() == []
+    for key in ("a", "b"):
+        cache.mark_pending(key)
+    google = {"up": False, "uploaded": []}
+
+    def upload(rows, entry):
+        if not google["up"]:
+            raise RuntimeError("HTTP 503")
+        google["uploaded"].append(rows)
+        return f"https://sheet/{entry['key']}"
+
+    replayer = ExportReplayer(cache, upload, max_attempts=2)
+    report = replayer.run_once()
+    assert report["uploaded"] == [] and list(report["failed"]) == ["a"]
+    assert cache.get("b")["attempts"] == 0
+
+    google["up"] = True
+    assert replayer.run_once()["uploaded"] == ["a", "b"]
+    assert google["uploaded"] == [[{"key": "a"}], [{"key": "b"}]]
+    assert cache.get("a")["status"] == EXPORT_UPLOADED and cache.get("a")["sheet_url"] == "https://sheet/a"
+
+    cache.put("c", [{"key": "c"}])
+    cache.mark_pending("c")
+    google["up"] = False
+    replayer.run_once()
+    replayer.run_once()
+    assert cache.get("c")["status"] == EXPORT_FAILED and cache.pending() == []
@@ -0,0 +1,160 @@
+import pytest
+
+from agent import google_endpoint, google_quota, retention
+from agent.fake_google import FakeGoogleServer
+from agent.google_quota import GoogleRateLimiter
+
+
+@pytest.fixture
+def fake_google(tmp_path, monkeypatch):
+    server = FakeGoogleServer(seed=0).start()
+    monkeypatch.setattr(google_endpoint, "GOOGLE_API_ENDPOINT", server.url)
+    monkeypatch.setattr(google_quota, "rate_limiter", GoogleRateLimiter(60000, 60000))
+    monkeypatch.setattr(google_quota, "GOOGLE_BACKOFF_BASE", 0.0)
+    monkeypatch.setattr(retention, "_default_index", retention.SheetIndex(str(tmp_path / "retention.sqlite3")))
+    monkeypatch.setattr(retention, "RETENTION_GC_INTERVAL", 0)
+    yield server
+    server.stop()
+
+
+def test_create_google_sheet_against_fake_backend(fake_google, monkeypatch) -> None:
+    from agent import graph as agent_graph
+
+    monkeypatch.setattr(agent_graph, "gc", google_endpoint.build_gspread_client(None))
+    monkeypatch.setattr(agent_graph, "GOOGLE_PERSONAL_EMAIL", "me@example.com")
+    fake_google.quota_errors_every = 5  # 429 injectées, absorbées par le limiteur
+
+    state = agent_graph.get_initial_state()
+    state["user_query"] = "récupère 2 posts"
+    state["processed_data"] = [{"id": 1, "title": "a"}, {"id": 2, "title": "b"}]
+    result = agent_graph.create_google_sheet(state)
+
+    assert not result.get("error")
+    assert {name: entry["status"] for name, entry in result["export_effects"].items()} == {
+        "folder": "ok", "sheet": "ok", "move": "ok", "share_personal": "ok", "write": "ok",
+    }
+    sheet_id = result["sheets_url"].rsplit("/", 1)[-1]
+    backend = fake_google.backend
+    assert backend.sheet_values(sheet_id) == [["id", "title"], [1, "a"], [2, "b"]]
+    folder = next(f for f in backend.files.values() if f["name"] == agent_graph.SHEETS_FOLDER_NAME)
+    assert backend.files[sheet_id]["parents"] == [folder["id"]]
+    assert backend.files[sheet_id]["permissions"][0]["emailAddress"] == "me@example.com"
+    assert fake_google.quota_errors > 0
+    assert [sheet["id"] for sheet in retention.get_index().live()] == [sheet_id]
+
+
+def test_drive_batch_delete_against_fake_backend(fake_google) -> None:
+    from agent.drive_cleanup import batch_delete_files, list_drive_files
+
+    drive = google_endpoint.build_drive_service(None)
+    ids = [drive.files().create(body={"name": f"API_Data_{i}"}).execute()["id"] for i in range(12)]
+    assert len(list_drive_files(drive, "name contains 'API_Data_'", page_size=5)) == 12
+
+    report = batch_delete_files(drive, ids, service_factory=lambda: google_endpoint.build_drive_service(None),
+                                batch_size=5, max_workers=2)
+
+    assert report["deleted"] == 12
+    assert report["batches"] == 3
+    assert fake_google.calls["drive_batch"] == 3
+    assert fake_google.backend.files == {}
+
+
+def test_create_google_sheet_claims_pooled_sheet(fake_google, monkeypatch) -> None:
+    from agent import graph as agent_graph
+    from agent.sheet_pool import SheetPool
+
+    monkeypatch.setattr(agent_graph, "gc", google_endpoint.build_gspread_client(None))
+    monkeypatch.setattr(agent_graph, "GOOGLE_PERSONAL_EMAIL", "me@example.com")
+    pool = SheetPool(agent_graph.prepare_pooled_sheet, agent_graph.discard_pooled_sheets, size=2)
+    monkeypatch.setattr(agent_graph, "sheet_pool", pool)
+    assert pool.refill_once() == 2
+    created_before = fake_google.calls["drive_create"]
+
+    state = agent_graph.get_initial_state()
+    state["processed_data"] = [{"id": 1, "title": "a"}]
+    result = agent_graph.create_google_sheet(state)
+
+    assert not result.get("error")
+    assert set(result["export_effects"]) == {"sheet", "rename", "write"}
+    assert fake_google.calls["drive_create"] == created_before  # aucun classeur créé sur le chemin de la requête
+    sheet_id = result["sheets_url"].rsplit("/", 1)[-1]
+    backend = fake_google.backend
+    assert backend.files[sheet_id]["name"].startswith(f"{agent_graph.SHEETS_DEFAULT_TITLE_PREFIX}_2")
+    assert backend.files[sheet_id]["permissions"][0]["emailAddress"] == "me@example.com"
+    assert backend.sheet_values(sheet_id) == [["id", "title"], [1, "a"]]
+
+    # Pool inactif: le classeur restant est supprimé et marqué dans l'index
+    pool.last_claim -= pool.max_idle + 1
+    pool.refill_once()
+    assert len(pool) == 0 and len(backend.files) == 2  # dossier + export
+    assert [sheet["id"] for sheet in retention.get_index().live()] == [sheet_id]
+
+
+def test_google_outage_defers_export_and_identical_request_uses_cache(fake_google, tmp_path, monkeypatch) -> None:
+    from agent import export_cache
+    from agent import graph as agent_graph
+    from agent.export_cache import ExportCache, ExportReplayer, export_key
+
+    monkeypatch.setattr(agent_graph, "gc", google_endpoint.build_gspread_client(None))
+    monkeypatch.setattr(export_cache, "EXPORT_CACHE_ENABLED", True)
+    monkeypatch.setattr(export_cache, "EXPORT_REPLAY_INTERVAL", 0)
+    cache = ExportCache(str(tmp_path / "exports"))
+    monkeypatch.setattr(export_cache, "_default_cache", cache)
+    key = export_key(agent_graph.DEFAULT_API_URL, {"limit": 2})
+
+    state = agent_graph.get_initial_state()
+    state.update(processed_data=[{"id": 1}, {"id": 2}], export_cache={"key": key, "hit": False})
+    fake_google.quota_errors_every = 1  # Google indisponible
+    result = agent_graph.create_google_sheet(state)
+
+    assert not result.get("error") and result["export_cache"]["deferred"]
+    assert cache.get(key)["status"] == "pending"
+    state.update(result)
+    assert "sera envoyé automatiquement" in agent_graph.generate_response(state)["messages"][-1].content
+
+    # Requête identique: lignes relues depuis le cache, sans appel amont
+    state = agent_graph.get_initial_state()
+    state["extracted_params"] = {"limit": 2}
+    fetched = agent_graph.fetch_api_data(state)
+    assert fetched["export_cache"] == {"key": key, "hit": True}
+    assert fetched["processed_data"] == [{"id": 1}, {"id": 2}]
+
+    fake_google.quota_errors_every = 0
+    report = ExportReplayer(cache, agent_graph.replay_export).run_once()
+    assert report["uploaded"] == [key]
+    sheet_id = cache.get(key)["sheet_url"].rsplit("/", 1)[-1]
+    assert fake_google.backend.sheet_values(sheet_id) == [["id"], [1], [2]]
+
+
+def test_large_export_is_imported_through_resumable_drive_upload(fake_google, monkeypatch) -> None:
+    from agent import drive_upload
+    from agent import graph as agent_graph
+
+    monkeypatch.setattr(agent_graph, "gc", google_endpoint.build_gspread_client(None))
+    monkeypatch.setattr(drive_upload, "DRIVE_UPLOAD_MIN_ROWS", 1000)
+    rows = [{"id": i, "title": f"t{i}", "tags": ["a"]} for i in range(1500)]
+
+    state = agent_graph.get_initial_state()
+    state["processed_data"] = rows
+    result = agent_graph.create_google_sheet(state)
+
+    assert not result.get("error")
+    assert set(result["export_effects"]) == {"folder", "upload", "sheet", "move"}
+    assert fake_google.calls.get("values_append", 0) == 0
+    sheet_id = result["sheets_url"].rsplit("/", 1)[-1]
+    values = fake_google.backend.sheet_values(sheet_id)
+    assert values[0] == ["id", "title", "tags"]
+    assert values[1] == [0, "t0", '["a"]'] and len(values) == 1501
+    assert retention.get_index().live()[0]["rows"] == 1500
+
+
+def test_drive_upload_sends_resumable_chunks(fake_google) -> None:
+    from agent.drive_upload import upload_rows_as_spreadsheet
+
+    drive = google_endpoint.build_drive_service(None)
+    rows = [{"id": i, "label": "x" * 40} for i in range(12000)]
+    uploaded = upload_rows_as_spreadsheet(drive, rows, "API_Data_big", chunk_bytes=256 * 1024)
+
+    assert uploaded["chunks"] == 3 and uploaded["rows"] == 12000
+    assert uploaded["size_bytes"] > 2 * 256 * 1024
+    assert fake_google.backend.sheet_values(uploaded["id"])[-1] == [11999, "x" * 40]
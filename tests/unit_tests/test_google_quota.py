@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from agent.google_quota import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    GoogleRateLimiter,
+    TokenBucket,
+)
+
+
+class FakeResp(dict):
+    def __init__(self, status, retry_after=None):
+        super().__init__()
+        self.status = status
+        if retry_after is not None:
+            self["retry-after"] = retry_after
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.resp = FakeResp(status, retry_after)
+
+
+def test_bucket_enforces_rate_after_burst() -> None:
+    bucket = TokenBucket("w", requests_per_minute=600, burst=2)  # 10/s
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_interactive_requests_jump_ahead_of_background() -> None:
+    bucket = TokenBucket("w", requests_per_minute=1200, burst=1)  # 20/s
+    bucket.acquire()  # vide le seau
+    order = []
+
+    def worker(name, priority, delay):
+        time.sleep(delay)
+        bucket.acquire(priority)
+        order.append(name)
+
+    threads = [threading.Thread(target=worker, args=(f"bg{i}", PRIORITY_BACKGROUND, 0)) for i in range(3)]
+    threads.append(threading.Thread(target=worker, args=("ui", PRIORITY_INTERACTIVE, 0.01)))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert order.index("ui") <= 1
+
+
+def test_limiter_retries_on_429_with_retry_after() -> None:
+    limiter = GoogleRateLimiter(read_per_minute=6000, write_per_minute=6000)
+    calls = []
+
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise FakeHttpError(429, retry_after="0.05")
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert calls[1] - calls[0] >= 0.05
+    snapshot = limiter.snapshot()["write"]
+    assert snapshot["throttled"] == 1
+    assert snapshot["rate_per_minute"] < snapshot["configured_per_minute"]
+
+
+def test_limiter_does_not_retry_other_errors() -> None:
+    limiter = GoogleRateLimiter()
+
+    def broken():
+        raise FakeHttpError(404)
+
+    with pytest.raises(FakeHttpError):
+        limiter.call(broken, kind="read")
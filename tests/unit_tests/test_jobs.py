@@ -0,0 +1,94 @@
+import threading
+import time
+
+from agent.concurrency import concurrency_limit, set_concurrency_limit
+from agent.jobs import JOB_FAILED, JOB_RUNNING, JOB_SUCCEEDED, JobRunner, JobStore
+
+
+def test_job_lifecycle(tmp_path) -> None:
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    def executor(job):
+        if "boom" in job["query"]:
+            raise RuntimeError("boom")
+        return {"sheets_url": f"https://sheet/{job['query']}", "error": ""}
+
+    ok_id = store.submit("ok")
+    ko_id = store.submit("boom")
+    with JobRunner(store, workers=2, executor=executor, poll_interval=0.01):
+        ok = store.wait(ok_id, timeout=5, poll_interval=0.01)
+        ko = store.wait(ko_id, timeout=5, poll_interval=0.01)
+
+    assert ok["status"] == JOB_SUCCEEDED
+    assert ok["result"]["sheets_url"] == "https://sheet/ok"
+    assert ko["status"] == JOB_FAILED
+    assert "boom" in ko["error"]
+    assert store.counts() == {JOB_SUCCEEDED: 1, JOB_FAILED: 1}
+
+
+def test_interrupted_jobs_are_requeued(tmp_path) -> None:
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit("q")
+    assert store.claim()["id"] == job_id
+    assert store.claim() is None
+    assert store.requeue_running() == 1
+    assert store.claim()["id"] == job_id
+
+
+def test_live_leases_are_not_taken_over(tmp_path) -> None:
+    path = str(tmp_path / "jobs.sqlite3")
+    owner = JobStore(path, worker_id="a", lease_seconds=0.2)
+    other = JobStore(path, worker_id="b", lease_seconds=0.2)
+    job_id = owner.submit("q")
+    assert owner.claim()["worker_id"] == "a"
+
+    assert other.requeue_running() == 0  # bail encore valide: job d'un autre processus
+    time.sleep(0.1)
+    assert owner.heartbeat() == 1
+    time.sleep(0.15)
+    assert other.requeue_running() == 0
+    assert JobStore(path, worker_id="a").requeue_running() == 1  # redémarrage du même worker
+    assert other.claim()["id"] == job_id
+
+    time.sleep(0.25)
+    assert owner.requeue_running() == 1  # bail de « b » expiré
+    assert other.get(job_id)["worker_id"] is None
+
+
+def test_concurrency_limit_bounds_parallel_calls() -> None:
+    set_concurrency_limit("test", 2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call():
+        with concurrency_limit("test"):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+
+
+def test_expired_worker_cannot_overwrite_new_owner(tmp_path) -> None:
+    path = str(tmp_path / "jobs.sqlite3")
+    stale = JobStore(path, worker_id="a", lease_seconds=0.05)
+    owner = JobStore(path, worker_id="b")
+    job_id = stale.submit("q")
+    stale.claim()
+    time.sleep(0.1)
+    assert owner.requeue_running() == 1
+    owner.claim()
+
+    assert stale.complete(job_id, {"sheets_url": "stale", "error": ""}) is False
+    assert stale.fail(job_id, "stale") is False
+    assert owner.get(job_id)["status"] == JOB_RUNNING
+    assert owner.complete(job_id, {"sheets_url": "fresh", "error": ""}) is True
+    assert owner.get(job_id)["result"]["sheets_url"] == "fresh"
@@ -0,0 +1,29 @@
+from agent.keyword_matcher import KeywordMatcher
+from agent.sources import ApiSource, SourceRegistry
+
+
+def test_scan_extracts_tokens_numbers_and_markers_in_one_pass() -> None:
+    matcher = KeywordMatcher(["adresse email", "nom complet"], {"restriction": ["avec", "seulement"]})
+
+    scan = matcher.scan("Récupère 12 users avec  Adresse Email et nom, 5ème page 3")
+
+    assert scan.tokens == ["récupère", "12", "users", "avec", "adresse email", "et", "nom", "5ème", "page", "3"]
+    assert scan.numbers == [12, 3]
+    assert scan.first_number() == 12
+    assert scan.has("restriction") and not scan.has("other")
+    assert matcher.scan("adresse emails").tokens == ["adresse", "emails"]
+
+
+def test_multi_word_keywords_resolve_through_registry() -> None:
+    reg = SourceRegistry(default_source="items")
+    reg.register(ApiSource(
+        name="items", url_template="http://x/items", fields=["id", "email"],
+        keywords=["items"], field_keywords={"email": ["adresse email"]},
+    ))
+    version = reg.version
+
+    scan = KeywordMatcher(reg.keywords()).scan("5 items avec l'adresse email")
+
+    assert reg.match_fields(scan.tokens, reg.default) == ["email"]
+    reg.unregister("items")
+    assert reg.version > version
@@ -0,0 +1,86 @@
+from langchain_core.messages import AIMessage
+
+from agent.llm_parser import PARSE_MAX_TOKENS, get_parse_chain, message_to_params
+from benchmarks.fake_llm import FakeChatModel
+
+
+def test_parse_chain_is_built_once_per_llm() -> None:
+    llm = FakeChatModel()
+    chain = get_parse_chain(llm)
+
+    assert get_parse_chain(llm) is chain
+    assert get_parse_chain(FakeChatModel()) is not chain
+    bound = chain.steps[-1]
+    assert bound.kwargs["max_tokens"] == PARSE_MAX_TOKENS
+    assert bound.kwargs["tool_choice"] == "QueryParams"
+
+
+def test_structured_output_round_trip() -> None:
+    params = {
+        "source": "posts",
+        "limit": 5,
+        "fields": ["id", "title"],
+        "aggregate": {"group_by": ["userId"], "metrics": [{"op": "count"}]},
+    }
+    llm = FakeChatModel(responses={"5 posts": params})
+
+    message = get_parse_chain(llm).invoke({"user_query": "récupère 5 posts", "sources": "posts"})
+
+    assert message.tool_calls[0]["name"] == "QueryParams"
+    assert message_to_params(message) == {
+        "source": "posts",
+        "limit": 5,
+        "fields": ["id", "title"],
+        "aggregate": {"group_by": ["userId"], "metrics": [{"op": "count"}]},
+    }
+    assert message.usage_metadata["output_tokens"] > 0
+
+
+def test_message_to_params_falls_back_to_json_content() -> None:
+    assert message_to_params(AIMessage(content='{"limit": 3}')) == {"limit": 3}
+    # Type invalide: le dict brut est laissé à validate_extracted_params
+    assert message_to_params(AIMessage(content='{"limit": "beaucoup"}')) == {"limit": "beaucoup"}
+
+
+def test_batcher_groups_concurrent_queries_into_one_call() -> None:
+    import threading
+
+    from agent.llm_parser import ParseBatcher
+
+    queries = [f"récupère {n} posts" for n in range(2, 6)]
+    llm = FakeChatModel(responses={query: {"limit": int(query.split()[1])} for query in queries})
+    batcher = ParseBatcher(window=0.5, max_size=len(queries))
+    results = {}
+
+    def submit(query: str) -> None:
+        results[query] = batcher.submit(llm, query, "posts")
+
+    threads = [threading.Thread(target=submit, args=(query,)) for query in queries]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert llm.calls == 1
+    assert results == {query: {"limit": int(query.split()[1])} for query in queries}
+    assert batcher.fill_ratio() == 1.0
+
+
+def test_parse_many_falls_back_to_single_calls_on_mismatch() -> None:
+    from agent.llm_parser import parse_many
+
+    class ShortBatchModel(FakeChatModel):
+        def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+            result = super()._generate(messages, stop, run_manager, tools=tools, **kwargs)
+            call = result.generations[0].message.tool_calls[0]
+            if call["name"] == "QueryParamsBatch":
+                call["args"]["items"].pop()
+            return result
+
+    llm = ShortBatchModel(responses={"zulu": {"limit": 1}, "yankee": {"limit": 2}})
+
+    results = parse_many(llm, ["zulu", "yankee"], "posts")
+
+    # Un élément manquant dans la réponse du lot: un appel par requête
+    assert results == [{"limit": 1}, {"limit": 2}]
+    assert llm.calls == 3
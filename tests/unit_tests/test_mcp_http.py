@@ -0,0 +1,150 @@
+import asyncio
+import json
+import socket
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+from agent.mcp.http_server import McpHttpServer
+
+
+def _run(server: McpHttpServer, scenario) -> None:
+    async def main() -> None:
+        await server.start()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, scenario, server.url)
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+def _echo(message):
+    if "id" not in message:
+        return None
+    return {"jsonrpc": "2.0", "id": message["id"], "result": {"method": message["method"]}}
+
+
+def test_sessions_batches_and_notifications() -> None:
+    seen = []
+
+    def dispatch(message):
+        seen.append(message["method"])
+        return _echo(message)
+
+    def scenario(url: str) -> None:
+        http = requests.Session()
+        init = http.post(url, json={"jsonrpc": "2.0", "id": 1, "method": "initialize"})
+        session_id = init.headers["Mcp-Session-Id"]
+        assert init.json()["result"] == {"method": "initialize"}
+
+        headers = {"Mcp-Session-Id": session_id}
+        notified = http.post(url, json={"jsonrpc": "2.0", "method": "notifications/initialized"}, headers=headers)
+        assert notified.status_code == 202
+        batch = http.post(url, headers=headers, json=[
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+            {"jsonrpc": "2.0", "id": 3, "method": "resources/list"},
+        ])
+        assert [response["id"] for response in batch.json()] == [2, 3]
+
+        unknown = http.post(url, json={"jsonrpc": "2.0", "id": 4, "method": "tools/list"},
+                            headers={"Mcp-Session-Id": "inconnue"})
+        assert unknown.status_code == 404
+        assert http.delete(url, headers=headers).status_code == 204
+        assert http.post(url, json={"jsonrpc": "2.0", "id": 5, "method": "tools/list"}, headers=headers).status_code == 404
+
+    _run(McpHttpServer(dispatch, port=0), scenario)
+    assert seen == ["initialize", "notifications/initialized", "tools/list", "resources/list"]
+
+
+def test_per_client_limit_and_sse_tool_call() -> None:
+    release = threading.Event()
+    started = threading.Event()
+
+    def dispatch(message):
+        if message["method"] == "tools/call":
+            started.set()
+            release.wait(5)
+        return _echo(message)
+
+    def scenario(url: str) -> None:
+        session_id = requests.post(url, json={"jsonrpc": "2.0", "id": 1, "method": "initialize"}).headers["Mcp-Session-Id"]
+        headers = {"Mcp-Session-Id": session_id, "Accept": "application/json, text/event-stream"}
+        call = {"jsonrpc": "2.0", "id": 2, "method": "tools/call"}
+
+        result = {}
+        slow = threading.Thread(target=lambda: result.update(response=requests.post(url, json=call, headers=headers)))
+        slow.start()
+        assert started.wait(5)
+        throttled = requests.post(url, json=dict(call, id=3), headers=headers)
+        assert throttled.status_code == 429 and throttled.headers["Retry-After"] == "1"
+        # Un autre client n'est pas limité
+        other = requests.post(url, json={"jsonrpc": "2.0", "id": 1, "method": "initialize"})
+        assert other.status_code == 200
+
+        release.set()
+        slow.join(5)
+        response = result["response"]
+        assert response.headers["Content-Type"] == "text/event-stream"
+        events = [line for line in response.text.splitlines() if line.startswith("data: ")]
+        assert json.loads(events[0][len("data: "):]) == {"jsonrpc": "2.0", "id": 2, "result": {"method": "tools/call"}}
+        assert requests.get(url.rsplit("/", 1)[0] + "/health").json()["inflight"] == 0
+
+    _run(McpHttpServer(dispatch, port=0, max_per_client=1, sse_ping=0.05), scenario)
+
+
+def test_initialize_cannot_bypass_session_caps() -> None:
+    release = threading.Event()
+    started = threading.Event()
+
+    def dispatch(message):
+        if message["method"] == "tools/call":
+            started.set()
+            release.wait(5)
+        return _echo(message)
+
+    def scenario(url: str) -> None:
+        init = {"jsonrpc": "2.0", "id": 1, "method": "initialize"}
+        first, second = (requests.post(url, json=init).headers["Mcp-Session-Id"] for _ in range(2))
+        third = requests.post(url, json=init).headers["Mcp-Session-Id"]
+        # Plafond par adresse atteint: la plus ancienne session inactive est remplacée
+        listing = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+        assert requests.post(url, json=listing, headers={"Mcp-Session-Id": first}).status_code == 404
+        assert requests.get(url.rsplit("/", 1)[0] + "/health").json()["sessions"] == 2
+
+        busy = [threading.Thread(target=requests.post, args=(url,),
+                                 kwargs={"json": {"jsonrpc": "2.0", "id": 3, "method": "tools/call"},
+                                         "headers": {"Mcp-Session-Id": session_id}})
+                for session_id in (second, third)]
+        for thread in busy:
+            thread.start()
+        assert started.wait(5)
+        while requests.get(url.rsplit("/", 1)[0] + "/health").json()["inflight"] < 2:
+            pass
+        # Toutes les sessions de l'adresse sont occupées: pas de nouvelle session
+        assert requests.post(url, json=init).status_code == 429
+
+        release.set()
+        for thread in busy:
+            thread.join(5)
+
+    _run(McpHttpServer(dispatch, port=0, max_sessions_per_client=2), scenario)
+
+
+def test_batches_count_per_message_and_bad_content_length() -> None:
+    def scenario(url: str) -> None:
+        session_id = requests.post(url, json={"jsonrpc": "2.0", "id": 1, "method": "initialize"}).headers["Mcp-Session-Id"]
+        headers = {"Mcp-Session-Id": session_id}
+        batch = [{"jsonrpc": "2.0", "id": i, "method": "tools/call"} for i in range(3)]
+        # Un lot plus grand que la limite du client n'occupe pas les workers
+        assert requests.post(url, json=batch, headers=headers).status_code == 429
+        assert requests.post(url, json=batch[:2], headers=headers).status_code == 200
+
+        split = urlsplit(url)
+        for length in (b"abc", b"-5"):
+            with socket.create_connection((split.hostname, split.port), timeout=5) as sock:
+                sock.sendall(b"POST /mcp HTTP/1.1\r\nHost: x\r\nContent-Length: " + length + b"\r\n\r\n")
+                assert sock.recv(1024).startswith(b"HTTP/1.1 400 ")
+
+    _run(McpHttpServer(_echo, port=0, max_per_client=2), scenario)
@@ -0,0 +1,86 @@
+import json
+
+from agent.mcp import server
+from agent.mcp.resources.config import ConfigResources
+from agent.sources import registry
+from benchmarks.fake_llm import FakeChatModel
+
+
+def _call(method, **params):
+    return server.dispatch({"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+
+
+def test_tools_and_resources_come_from_registry() -> None:
+    listing = _call("tools/list")["result"]
+    names = [tool["name"] for tool in listing["tools"]]
+    assert {"hello", "fetch_api_to_sheets", "validate_api_query", "get_agent_status"} <= set(names)
+    assert _call("tools/list")["result"] is listing  # précalculée
+    assert "inputSchema" in listing["tools"][names.index("validate_api_query")]
+
+    uris = [resource["uri"] for resource in _call("resources/list")["result"]["resources"]]
+    assert "config://agent-config" in uris
+    assert _call("tools/call", name="inconnu")["error"]["code"] == -32601
+    assert "Statut de l'agent" in _call("tools/call", name="get_agent_status")["result"]["content"][0]["text"]
+
+
+def test_failing_tool_returns_internal_error(monkeypatch) -> None:
+    def boom(arguments):
+        raise RuntimeError("panne")
+
+    monkeypatch.setitem(server.tools._handlers, "hello", boom)
+    response = _call("tools/call", name="hello")
+    assert response["id"] == 1 and response["error"]["code"] == -32603
+    assert "panne" in response["error"]["message"]
+
+
+def test_resource_bodies_are_memoized_until_dependencies_change(monkeypatch) -> None:
+    renders = []
+    render = ConfigResources.render_resource
+    monkeypatch.setattr(ConfigResources, "_cache", {})
+    monkeypatch.setattr(ConfigResources, "render_resource",
+                        staticmethod(lambda uri: renders.append(uri) or render(uri)))
+
+    first = _call("resources/read", uri="config://api-fields")["result"]["contents"][0]["text"]
+    assert _call("resources/read", uri="config://api-fields")["result"]["contents"][0]["text"] == first
+    assert renders == ["config://api-fields"]
+
+    monkeypatch.setattr(registry, "version", registry.version + 1)  # source ajoutée/retirée
+    _call("resources/read", uri="config://api-fields")
+    _call("resources/read", uri="metrics://agent")
+    _call("resources/read", uri="metrics://agent")
+    assert renders == ["config://api-fields"] * 2 + ["metrics://agent"] * 2
+    assert "sources" in json.loads(first)
+
+
+def test_validate_api_query_only_parses(monkeypatch) -> None:
+    from agent import graph as agent_graph
+
+    params = {"source": "posts", "limit": 3, "fields": ["id", "title"], "filters": {}}
+    monkeypatch.setattr(agent_graph, "llm", FakeChatModel(responses={"3 posts": params}))
+    monkeypatch.setattr(agent_graph, "gc", None)
+    monkeypatch.setattr(agent_graph, "fetch_url_rows", lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+
+    text = _call("tools/call", name="validate_api_query",
+                 arguments={"query": "récupère 3 posts"})["result"]["content"][0]["text"]
+
+    assert "Requête valide" in text and "Limite: 3" in text
+
+
+def test_plan_export_estimates_without_side_effects(monkeypatch) -> None:
+    from agent import graph as agent_graph
+
+    params = {"source": "posts", "limit": 25, "fields": ["id", "title"], "filters": {}, "sink": "sheets"}
+    monkeypatch.setattr(agent_graph, "llm", FakeChatModel(responses={"25 posts": params}))
+    monkeypatch.setattr(agent_graph, "fetch_url_rows", lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+    from agent import fetcher
+    monkeypatch.setattr(fetcher.requests, "get", lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+
+    plan = agent_graph.plan_agent_run("récupère 25 posts")
+    assert plan["upstream"]["fetches"][0]["rows"] == 25
+    assert plan["output"]["cells"] == 26 * plan["output"]["columns"]
+    assert plan["output"]["google_calls"]["write"] >= 2
+    assert plan["llm"]["calls"] == 1 and plan["llm"]["input_tokens"] > 0
+
+    text = _call("tools/call", name="plan_export",
+                 arguments={"query": "récupère 25 posts"})["result"]["content"][0]["text"]
+    assert "rien n'a été exécuté" in text and f"cellules: {plan['output']['cells']}" in text
@@ -0,0 +1,105 @@
+import threading
+import urllib.request
+
+import pytest
+
+from agent import metrics as agent_metrics
+from agent.metrics import MetricsRegistry, instrument_node
+
+
+def test_registry_merges_thread_shards() -> None:
+    registry = MetricsRegistry()
+
+    def work() -> None:
+        for _ in range(1000):
+            registry.inc("agent_node_runs_total", 1, {"node": "fetch_data"})
+            registry.observe("agent_node_duration_seconds", 0.02, {"node": "fetch_data"})
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = registry.snapshot()
+    assert snapshot["counters"]["agent_node_runs_total"][0]["value"] == 4000
+    histogram = snapshot["histograms"]["agent_node_duration_seconds"][0]
+    assert histogram["count"] == 4000
+    assert histogram["p50"] == histogram["p99"] == 0.025
+
+    # Threads terminés: fragments repliés, valeurs conservées
+    for _ in range(50):
+        thread = threading.Thread(target=registry.inc, args=("agent_node_runs_total", 1, {"node": "fetch_data"}))
+        thread.start()
+        thread.join()
+    assert len(registry._shards) <= 1
+    assert registry.snapshot()["counters"]["agent_node_runs_total"][0]["value"] == 4050
+
+    registry.reset()
+    assert registry.snapshot() == {"counters": {}, "histograms": {}}
+
+
+def test_prometheus_rendering() -> None:
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc("agent_upstream_bytes_total", 512)
+    registry.observe("agent_llm_duration_seconds", 0.5, {"operation": "parse_query"})
+    registry.observe("agent_llm_duration_seconds", 5.0, {"operation": "parse_query"})
+
+    text = registry.render_prometheus()
+
+    assert "# TYPE agent_upstream_bytes_total counter" in text
+    assert "agent_upstream_bytes_total 512" in text
+    assert 'agent_llm_duration_seconds_bucket{operation="parse_query",le="0.1"} 0' in text
+    assert 'agent_llm_duration_seconds_bucket{operation="parse_query",le="1"} 1' in text
+    assert 'agent_llm_duration_seconds_bucket{operation="parse_query",le="+Inf"} 2' in text
+    assert 'agent_llm_duration_seconds_count{operation="parse_query"} 2' in text
+
+
+def test_instrument_node_counts_runs_errors_and_rows(monkeypatch) -> None:
+    registry = MetricsRegistry()
+    monkeypatch.setattr(agent_metrics, "metrics", registry)
+
+    def fetch(state):
+        state["api_data"] = [{"id": 1}, {"id": 2}]
+        if state.get("fail"):
+            state["error"] = "boom"
+        return state
+
+    def crash(state):
+        raise RuntimeError("crash")
+
+    node = instrument_node("fetch_data", fetch)
+    node({})
+    node({"fail": True})
+    with pytest.raises(RuntimeError):
+        instrument_node("respond", crash)({})
+
+    counters = {(name, tuple(sorted(entry["labels"].items()))): entry["value"]
+                for name, entries in registry.snapshot()["counters"].items() for entry in entries}
+    assert counters[("agent_node_runs_total", (("node", "fetch_data"),))] == 2
+    assert counters[("agent_node_rows", (("node", "fetch_data"),))] == 4
+    assert counters[("agent_node_errors_total", (("node", "fetch_data"),))] == 1
+    assert counters[("agent_node_errors_total", (("node", "respond"),))] == 1
+
+
+def test_metrics_http_endpoint(monkeypatch) -> None:
+    monkeypatch.setattr(agent_metrics, "_metrics_server", None)
+    agent_metrics.inc("agent_google_calls_total", 3, kind="write")
+
+    server = agent_metrics.start_metrics_server(port=_free_port(), host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'agent_google_calls_total{kind="write"}' in body
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
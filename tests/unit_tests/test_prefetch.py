@@ -0,0 +1,56 @@
+from agent import prefetch
+from agent.prefetch import SpeculativeFetch, claim_prefetch
+from agent.sources import PAGINATION_OFFSET, ApiSource
+from benchmarks.upstream import UpstreamServer
+
+
+def posts_source(upstream: UpstreamServer) -> ApiSource:
+    return ApiSource(
+        name="posts",
+        url_template=f"{upstream.url}/posts",
+        fields=["userId", "id", "title", "body"],
+        pagination=PAGINATION_OFFSET,
+        pushable_filters=["userId", "id"],
+        field_types={"userId": int, "id": int},
+    )
+
+
+def test_speculative_rows_cover_a_plain_limit_but_not_a_full_scan() -> None:
+    with UpstreamServer(rows=1000) as upstream:
+        source = posts_source(upstream)
+        capped = SpeculativeFetch(source, source.url, max_rows=300).start()
+        rows, stats = capped.take({}, 120)
+        assert [row["id"] for row in rows] == list(range(1, 121))
+        assert stats["speculative"] and "stopped" not in stats
+
+        # Agrégation (toutes les lignes): le plafond ne couvre pas la demande
+        capped = SpeculativeFetch(source, source.url, max_rows=300).start()
+        assert capped.take({}, None) is None
+        # Pagination arrêtée au plafond (3 pages de 100), voire avant pour la limite
+        assert upstream.calls["posts"] <= 6
+
+
+def test_pushed_filters_are_applied_locally_only_on_a_complete_source() -> None:
+    with UpstreamServer(rows=250) as upstream:
+        source = posts_source(upstream)
+        complete = SpeculativeFetch(source, source.url).start()
+        complete.wait()
+        rows, stats = complete.take({"userId": "3"}, 5)
+        assert rows and all(row["userId"] == 3 for row in rows) and len(rows) == 5
+        assert stats["pushed_filters"] == [] and stats["local_filters"] == ["userId"]
+
+        partial = SpeculativeFetch(source, source.url, max_rows=100).start()
+        partial.wait()
+        assert partial.take({"userId": 3}, 5) is None
+
+
+def test_claim_cancels_speculation_for_another_source(monkeypatch) -> None:
+    with UpstreamServer(rows=200) as upstream:
+        source = posts_source(upstream)
+        speculative = SpeculativeFetch(source, source.url).start()
+        monkeypatch.setitem(prefetch._inflight, "run-1", speculative)
+        other = ApiSource(name="users", url_template=f"{upstream.url}/users", fields=["id", "name"])
+
+        assert claim_prefetch("run-1", other, other.url, {}, 10) is None
+        assert "run-1" not in prefetch._inflight
+        assert speculative._cancel.is_set()
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from agent import profiling
+from agent.profiling import RunProfile, profile_run
+
+
+def _busy(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profile_run_is_noop_when_disabled(monkeypatch) -> None:
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", False)
+    with profile_run("disabled") as profile:
+        pass
+    assert profile.summary is None
+
+
+def test_slow_run_writes_collapsed_stacks(tmp_path) -> None:
+    with RunProfile("slow run/1", sampled=False, slow_seconds=0.05,
+                    output_dir=str(tmp_path), interval=0.002) as profile:
+        _busy(0.2)
+
+    summary = profile.summary
+    assert summary["reason"] == "slow"
+    assert summary["samples"] > 10
+    assert summary["collapsed_path"] == str(tmp_path / "slow_run_1.collapsed")
+    lines = (tmp_path / "slow_run_1.collapsed").read_text().splitlines()
+    assert any("test_profiling:_busy" in line for line in lines)
+    assert summary["top_self"][0]["function"].endswith("test_profiling:_busy")
+
+
+def test_fast_unsampled_run_is_discarded(tmp_path) -> None:
+    with RunProfile("fast", sampled=False, slow_seconds=10, output_dir=str(tmp_path)) as profile:
+        pass
+    assert profile.summary is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_run_helper_threads_are_sampled_by_default(tmp_path) -> None:
+    helper = threading.Thread(target=_busy, args=(0.2,), name="side-effect_0")
+    other = threading.Thread(target=_busy, args=(0.2,), name="unrelated")
+    with RunProfile("helpers", sampled=True, slow_seconds=0, output_dir=str(tmp_path), interval=0.002):
+        helper.start()
+        other.start()
+        helper.join()
+        other.join()
+
+    stacks = (tmp_path / "helpers.collapsed").read_text().splitlines()
+    assert any(line.startswith("thread:side-effect_0;") and "test_profiling:_busy" in line for line in stacks)
+    assert not any(line.startswith("thread:unrelated;") for line in stacks)
@@ -0,0 +1,50 @@
+from agent import query_engine
+from agent.graph import validate_extracted_params
+from agent.query_engine import execute_query, hash_join
+from agent.sources import registry
+
+POSTS = [{"id": i, "userId": (i % 3) + 1, "title": f"p{i}"} for i in range(1, 7)]
+USERS = [{"id": 1, "name": "Ann"}, {"id": 2, "name": "Bob"}]
+
+
+def test_hash_join_indexes_smaller_side() -> None:
+    rows = list(hash_join(POSTS, USERS, "userId", "id", "users", ["name"]))
+    assert [r["users.name"] for r in rows] == ["Bob", None, "Ann", "Bob", None, "Ann"]
+
+
+def test_hash_join_indexes_left_when_left_is_smaller() -> None:
+    rows = list(hash_join(USERS, POSTS, "id", "userId", "posts", ["title"]))
+    assert sorted((r["name"], r["posts.title"]) for r in rows) == [
+        ("Ann", "p3"), ("Ann", "p6"), ("Bob", "p1"), ("Bob", "p4"),
+    ]
+
+
+def test_left_join_keeps_unmatched_rows_when_left_is_indexed() -> None:
+    lonely = [{"id": 9, "name": "Zed"}]
+    rows = list(hash_join(lonely, POSTS, "id", "userId", "posts", ["title"]))
+    assert rows == [{"id": 9, "name": "Zed", "posts.title": None}]
+
+
+def test_execute_query_fetches_each_source_once(monkeypatch) -> None:
+    calls = []
+
+    def fake_fetch(source, filters=None, limit=None):
+        calls.append(source.name)
+        rows = POSTS[:limit] if source.name == "posts" else USERS
+        return rows, {"requests": 1}
+
+    monkeypatch.setattr(query_engine, "fetch_source_rows", fake_fetch)
+    joins = [{"source": "users", "left_key": "userId", "right_key": "id", "fields": ["name"]}]
+    rows, stats = execute_query(registry.get("posts"), limit=3, joins=joins)
+    assert sorted(calls) == ["posts", "users"]
+    assert set(stats) == {"posts", "users"}
+    assert [r["users.name"] for r in rows] == ["Bob", None, "Ann"]
+
+
+def test_parser_detects_join_fields() -> None:
+    params = validate_extracted_params({}, "5 posts avec le titre, le nom et l'email de l'auteur")
+    assert params["source"] == "posts"
+    assert params["joins"] == [
+        {"source": "users", "left_key": "userId", "right_key": "id", "fields": ["name", "email"]}
+    ]
+    assert params["fields"] == ["title", "users.name", "users.email"]
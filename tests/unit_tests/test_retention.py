@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from agent import retention
+from agent.retention import RetentionPolicy, SheetGarbageCollector, SheetIndex, plan_deletions
+
+
+def make_index(tmp_path, count, now):
+    index = SheetIndex(str(tmp_path / "retention.sqlite3"))
+    for i in range(count):
+        index.record(f"s{i}", title=f"API_Data_{i}", query="posts", rows=10, size_bytes=100,
+                     created_at=now - timedelta(days=count - i))
+    return index
+
+
+def test_plan_by_age_count_and_quota_pressure(tmp_path) -> None:
+    now = datetime(2026, 1, 31, 12, 0, 0)
+    live = make_index(tmp_path, 10, now).live()
+
+    plan = plan_deletions(live, RetentionPolicy(max_age_days=7.5, max_sheets=5, min_keep=2), now=now)
+    assert plan["age"] == ["s0", "s1", "s2"]
+    assert plan["count"] == ["s3", "s4"]
+
+    quota = {"usage": 950, "limit": 1000}
+    policy = RetentionPolicy(max_age_days=0, max_sheets=0, min_keep=2, quota_threshold=0.9, quota_target=0.7)
+    plan = plan_deletions(live, policy, quota, now=now)
+    assert plan["quota"] == ["s0", "s1", "s2"]  # 300 octets pour passer de 950 à 700
+
+
+def test_gc_deletes_and_marks_index(tmp_path, monkeypatch) -> None:
+    now = datetime.now()
+    index = make_index(tmp_path, 4, now)
+    deleted_batches = []
+
+    def fake_batch_delete(service, ids, **kwargs):
+        deleted_batches.append(list(ids))
+        return {"deleted": len(ids) - 1, "errors": {"s1": "HTTP 500"}, "elapsed_seconds": 0.0}
+
+    monkeypatch.setattr(retention, "batch_delete_files", fake_batch_delete)
+    gc = SheetGarbageCollector(
+        index,
+        RetentionPolicy(max_age_days=2.5, max_sheets=0, quota_threshold=0),
+        service_factory=lambda: object(),
+    )
+
+    assert gc.run_once(dry_run=True)["candidates"] == ["s0", "s1"]
+    assert deleted_batches == []
+
+    report = gc.run_once()
+    assert deleted_batches == [["s0", "s1"]]
+    assert report["deleted"] == 1
+    assert [sheet["id"] for sheet in index.live()] == ["s1", "s2", "s3"]
+    assert index.stats()["deleted"] == 1
@@ -0,0 +1,39 @@
+import itertools
+
+from agent.sheet_pool import SheetPool
+
+
+def test_pool_fills_claims_and_reclaims_when_idle() -> None:
+    counter = itertools.count()
+    discarded = []
+    pool = SheetPool(lambda: f"sheet-{next(counter)}", discarded.extend, size=2, max_idle=60)
+
+    assert pool.refill_once() == 2 and len(pool) == 2
+    assert pool.claim() == "sheet-0"
+    assert pool.refill_once() == 1
+    assert [pool.claim(), pool.claim(), pool.claim()] == ["sheet-1", "sheet-2", None]
+    assert pool.stats["hits"] == 3 and pool.stats["misses"] == 1
+
+    pool.refill_once()
+    pool.last_claim -= 120  # aucun export depuis plus de max_idle
+    assert pool.refill_once() == 0
+    assert discarded == ["sheet-3", "sheet-4"] and len(pool) == 0
+    assert pool.refill_once() == 0  # inactif: plus de remplissage
+
+    assert pool.claim() is None  # un export réveille le pool
+    assert pool.refill_once() == 2
+
+
+def test_factory_errors_stop_the_pass() -> None:
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("HTTP 429")
+        return len(calls)
+
+    pool = SheetPool(factory, lambda items: None, size=3)
+    assert pool.refill_once() == 1
+    assert pool.stats["errors"] == 1 and "429" in pool.last_error
+    assert pool.refill_once() == 2 and len(pool) == 3
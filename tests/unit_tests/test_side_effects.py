@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from agent.side_effects import SideEffectError, SideEffectPlan, SkipEffect, failed_effects
+
+
+def test_independent_effects_run_concurrently_once_dependencies_are_met() -> None:
+    # Les trois effets dépendants ne passent la barrière que s'ils s'exécutent ensemble
+    barrier = threading.Barrier(3, timeout=5)
+    plan = SideEffectPlan(max_workers=4)
+    plan.add("sheet", lambda done: "sheet-1", required=True)
+    for name in ("move", "share", "write"):
+        plan.add(name, lambda done, name=name: (barrier.wait(), f"{name}:{done['sheet']}")[1], after=("sheet",))
+
+    results, report = plan.run()
+
+    assert results["write"] == "write:sheet-1"
+    assert {entry["status"] for entry in report.values()} == {"ok"}
+
+
+def test_failures_are_reported_per_effect_and_skip_dependents() -> None:
+    def broken(done):
+        raise RuntimeError("quota")
+
+    def unavailable(done):
+        raise SkipEffect("Drive non configuré")
+
+    plan = SideEffectPlan()
+    plan.add("sheet", lambda done: "sheet-1", required=True)
+    plan.add("folder", unavailable)
+    plan.add("move", lambda done: "moved", after=("folder", "sheet"))
+    plan.add("share", broken, after=("sheet",))
+    plan.add("write", lambda done: 3, after=("sheet",), required=True)
+
+    results, report = plan.run()
+
+    assert results == {"sheet": "sheet-1", "write": 3}
+    assert report["folder"]["status"] == "skipped"
+    assert report["move"] == {"status": "skipped", "reason": "dépend de folder", "seconds": 0.0}
+    assert failed_effects(report) == {"share": "quota"}
+
+
+def test_required_failure_raises_after_the_plan_completes() -> None:
+    plan = SideEffectPlan()
+    plan.add("sheet", lambda done: "sheet-1", required=True)
+    plan.add("share", lambda done: "shared", after=("sheet",))
+    plan.add("write", lambda done: 1 / 0, after=("sheet",), required=True)
+
+    with pytest.raises(SideEffectError) as excinfo:
+        plan.run()
+
+    assert excinfo.value.name == "write"
+    assert excinfo.value.results["share"] == "shared"
+    assert excinfo.value.report["write"]["status"] == "failed"
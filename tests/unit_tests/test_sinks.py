@@ -0,0 +1,88 @@
+import csv
+import sqlite3
+
+import pytest
+
+from agent import sinks
+from agent.sinks import CsvSink, SqliteSink, detect_sink, exceeds_sheet_limit, resolve_sink
+
+
+ROWS = [{"id": i, "title": f"t{i}", "tags": ["a", "b"]} for i in range(7)]
+
+
+def test_csv_sink_streams_batches_and_serializes_nested_values(tmp_path) -> None:
+    result = CsvSink(str(tmp_path), batch_rows=3).write(iter(ROWS), "API_Data_x")
+
+    assert result["sink"] == "csv" and result["rows"] == 7
+    with open(result["path"], newline="", encoding="utf-8") as f:
+        lines = list(csv.reader(f))
+    assert lines[0] == ["id", "title", "tags"]
+    assert lines[1] == ["0", "t0", '["a", "b"]'] and len(lines) == 8
+    # Un second export du même titre ne remplace pas le premier
+    assert CsvSink(str(tmp_path)).write(ROWS, "API_Data_x")["path"].endswith("API_Data_x_1.csv")
+
+
+def test_sqlite_sink_creates_one_table_per_export_and_rolls_back_on_error(tmp_path) -> None:
+    db_path = str(tmp_path / "exports.sqlite3")
+    first = SqliteSink(str(tmp_path), batch_rows=2, db_path=db_path).write(ROWS, "API_Data_x")
+    assert first["table"] == "API_Data_x"
+
+    def failing_rows():
+        yield ROWS[0]
+        raise RuntimeError("source interrompue")
+
+    with pytest.raises(RuntimeError):
+        SqliteSink(str(tmp_path), db_path=db_path).write(failing_rows(), "API_Data_x")
+
+    with sqlite3.connect(db_path) as conn:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        assert tables == ["API_Data_x"]
+        assert conn.execute('SELECT COUNT(*), MAX(id) FROM "API_Data_x"').fetchone() == (7, 6)
+
+
+def test_parquet_sink_keeps_header_schema_across_batches(tmp_path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    rows = [{"id": None, "value": 1}, {"id": None, "value": "x"}, {"id": 3, "value": 2.5}, {"id": "4", "value": None}]
+
+    result = sinks.ParquetSink(str(tmp_path), batch_rows=2).write(rows, "API_Data_x")
+
+    table = pq.read_table(result["path"])
+    assert result["rows"] == 4 and pq.ParquetFile(result["path"]).num_row_groups == 2
+    assert table.column_names == ["id", "value"]
+    assert table.to_pydict() == {"id": [None, None, "3", "4"], "value": ["1", "x", "2.5", None]}
+
+
+def test_sink_selection(monkeypatch) -> None:
+    assert detect_sink(["exporte", "sheet", "csv"]) == "csv"
+    assert detect_sink(["google sheets"]) == "sheets"
+    assert detect_sink(["posts"]) is None
+
+    monkeypatch.setattr(sinks, "sink_available", lambda name: name in ("sheets", "csv", "sqlite"))
+    assert resolve_sink("parquet") == "csv"  # pyarrow absent
+    assert resolve_sink(None, default="sqlite") == "sqlite"
+    assert resolve_sink("excel") == "sheets"
+
+    assert exceeds_sheet_limit(999, 10, max_cells=10000) is False
+    assert exceeds_sheet_limit(1000, 10, max_cells=10000) is True
+
+
+def test_graph_routes_file_sinks_and_oversized_exports(tmp_path, monkeypatch) -> None:
+    from agent import graph as agent_graph
+
+    params = agent_graph.validate_extracted_params({}, "exporte 20 posts en csv")
+    assert params["sink"] == "csv"
+    assert agent_graph.validate_extracted_params({}, "exporte 20 posts")["sink"] == "sheets"
+
+    state = agent_graph.get_initial_state()
+    state.update(extracted_params={"sink": "sheets"}, processed_data=ROWS)
+    assert agent_graph.route_export(state) == "create_sheet"
+    monkeypatch.setattr(agent_graph, "exceeds_sheet_limit",
+                        lambda rows, columns: sinks.exceeds_sheet_limit(rows, columns, max_cells=12))
+    assert agent_graph.route_export(state) == "write_file"
+
+    monkeypatch.chdir(tmp_path)
+    result = agent_graph.write_file_export(state)
+    assert result["export_file"]["rows"] == 7
+    assert (tmp_path / "exports").is_dir()
+    state.update(result)
+    assert "Fichier exporté (csv)" in agent_graph.generate_response(state)["messages"][-1].content
@@ -0,0 +1,117 @@
+import pytest
+
+from agent import fetcher
+from agent.graph import validate_extracted_params
+from agent.sources import (
+    PAGINATION_OFFSET,
+    PAGINATION_PAGE,
+    ApiSource,
+    SourceRegistry,
+    registry,
+)
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+        self.content = b"x" * 10
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    rows = [{"userId": i % 3, "id": i, "title": f"t{i}"} for i in range(1, 26)]
+    calls = []
+
+    def fake_get(url, params=None, timeout=None):
+        params = params or {}
+        calls.append(dict(params))
+        data = [r for r in rows if all(str(r.get(k)) == str(v) for k, v in params.items() if not k.startswith("_"))]
+        if "_page" in params:
+            start = (params["_page"] - 1) * params["_limit"]
+            data = data[start:start + params["_limit"]]
+        elif "_start" in params:
+            data = data[params["_start"]:params["_start"] + params["_limit"]]
+        return FakeResponse(data)
+
+    monkeypatch.setattr(fetcher.requests, "get", fake_get)
+    fetcher.clear_response_cache()
+    return calls
+
+
+def make_source(**kwargs):
+    defaults = dict(
+        name="items",
+        url_template="{base_url}/items",
+        fields=["userId", "id", "title"],
+        field_types={"userId": int, "id": int},
+        page_size=10,
+    )
+    defaults.update(kwargs)
+    return ApiSource(**defaults)
+
+
+def test_registry_indexes_keywords_per_source() -> None:
+    reg = SourceRegistry(default_source="items")
+    source = reg.register(make_source(keywords=["items"], field_keywords={"title": ["titre"]}))
+    assert reg.detect_source(["5", "items"]) is source
+    assert reg.match_fields(["titre", "id"], source) == ["id", "title"]
+    assert reg.find_by_url(source.url + "?x=1") is source
+    reg.unregister("items")
+    assert reg.field_for_token("titre", "items") is None
+
+
+def test_offset_pagination_pushes_limit(fake_api) -> None:
+    rows, stats = fetcher.fetch_source_rows(make_source(pagination=PAGINATION_OFFSET), limit=4)
+    assert [r["id"] for r in rows] == [1, 2, 3, 4]
+    assert fake_api == [{"_start": 0, "_limit": 4}]
+    assert stats["pages"] == 1
+
+
+def test_page_pagination_applies_local_filters_across_pages(fake_api) -> None:
+    source = make_source(pagination=PAGINATION_PAGE)
+    rows, stats = fetcher.fetch_source_rows(source, filters={"userId": "1"}, limit=None)
+    assert [r["id"] for r in rows] == [1, 4, 7, 10, 13, 16, 19, 22, 25]
+    assert stats["local_filters"] == ["userId"]
+    assert stats["pages"] == 3
+
+
+def test_pushable_filters_and_cache(fake_api) -> None:
+    source = make_source(pushable_filters=["userId"], cache_ttl=60)
+    first, _ = fetcher.fetch_source_rows(source, filters={"userId": "2"})
+    second, stats = fetcher.fetch_source_rows(source, filters={"userId": "2"})
+    assert first == second
+    assert fake_api == [{"userId": 2}]
+    assert stats["cache_hits"] == 1
+
+
+def test_plan_matches_fetch_and_counts_cached_pages(fake_api, monkeypatch) -> None:
+    monkeypatch.setattr(fetcher, "_source_profiles", {})
+    source = make_source(pagination=PAGINATION_PAGE, cache_ttl=60)
+    plan = fetcher.plan_source_fetch(source, filters={"userId": "1"})
+    assert plan["pages"] is None and plan["local_filters"] == ["userId"]  # total encore inconnu
+
+    _, stats = fetcher.fetch_source_rows(source, limit=None)
+    assert fetcher.source_profile("items")["total_rows"] == 25
+
+    plan = fetcher.plan_source_fetch(source, filters={"userId": "1"})
+    assert plan["pages"] == stats["pages"] == 3
+    assert plan["cached_pages"] == 3 and plan["requests"] == 0 and plan["bytes"] == 0
+    assert fetcher.plan_source_fetch(make_source(), limit=4)["requests"] == 1
+    assert len(fake_api) == 3
+
+
+def test_validate_params_per_source() -> None:
+    params = validate_extracted_params({}, "récupère 3 utilisateurs avec seulement nom et email")
+    assert params["source"] == "users"
+    assert params["fields"] == ["name", "email"]
+    assert params["limit"] == 3
+
+    params = validate_extracted_params({"filters": {"userId": 1, "name": "x"}}, "5 posts")
+    assert params["source"] == registry.default.name
+    assert params["filters"] == {"userId": 1}